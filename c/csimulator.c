@@ -38,6 +38,14 @@
 #define OUT(p, v) if (mem == NULL && (p & 0x8002) == 0 && (self->out7ffd & 0x20) == 0) out7ffd(self, v)
 #define CHECK_SIGNALS if ((TIME & 0xFFFFFF) < 10) PyErr_CheckSignals()
 #define SCR_LEN 6912
+#define FFWD_DISABLED 0x10000
+#define NOGIL_SLICE 0x1000000
+#define PROFILE_SIZE 0x20000
+#define BP_REG 1
+#define BP_PAIR 2
+#define BP_MEM 3
+#define BP_IN 4
+#define BP_OUT 5
 
 #define GET_OPCODE_FUNC(opcodes) \
     byte opcode = PEEK(pc); \
@@ -81,6 +89,8 @@ typedef struct {
     int ear;
     unsigned ear_mask;
     unsigned polarity;
+    int byte_reg;
+    unsigned byte_init;
     unsigned hits;
 } tsl_accelerator;
 
@@ -5064,6 +5074,25 @@ static PyObject* convert_memory(PyObject* source) {
     PyObject* memory = NULL;
     char* mem = NULL;
 
+    if (PyByteArray_Check(source) && PyByteArray_Size(source) == 0x10000) {
+        // Share the storage of a 64K bytearray instead of copying it
+        Py_INCREF(source);
+        return source;
+    }
+    if (PyObject_CheckBuffer(source)) {
+        Py_buffer buffer;
+        if (PyObject_GetBuffer(source, &buffer, PyBUF_SIMPLE) == 0) {
+            if (buffer.len == 0x10000) {
+                memory = PyByteArray_FromStringAndSize(buffer.buf, buffer.len);
+                PyBuffer_Release(&buffer);
+                return memory;
+            }
+            PyBuffer_Release(&buffer);
+        } else {
+            PyErr_Clear();
+        }
+    }
+
     PyObject* mem_iter = PyObject_GetIter(source);
     if (mem_iter == NULL) {
         PyErr_SetString(PyExc_TypeError, "Failed to create iterator for memory");
@@ -5231,6 +5260,152 @@ done:
     return NULL;
 }
 
+#define CHECKPOINT_REGS 30
+
+/*
+ * A checkpoint consists of the 30 registers (8 bytes each, little-endian),
+ * followed by the 64K of memory (48K), or the last value written to port
+ * 0x7FFD and RAM banks 0-7 (128K). This is the same format as produced by
+ * Simulator.checkpoint().
+ */
+static PyObject* CSimulator_checkpoint(CSimulatorObject* self, PyObject* Py_UNUSED(ignored)) {
+    Py_ssize_t size = CHECKPOINT_REGS * 8 + (self->memory ? 0x10000 : 0x20001);
+    PyObject* checkpoint = PyBytes_FromStringAndSize(NULL, size);
+    if (checkpoint == NULL) {
+        return NULL;
+    }
+
+    byte* data = (byte*)PyBytes_AS_STRING(checkpoint);
+    for (int i = 0; i < CHECKPOINT_REGS; i++) {
+        for (int j = 0; j < 8; j++) {
+            *data++ = (self->registers[i] >> (8 * j)) & 0xFF;
+        }
+    }
+    if (self->memory) {
+        memcpy(data, self->memory, 0x10000);
+    } else {
+        *data++ = self->out7ffd;
+        for (int i = 0; i < 8; i++) {
+            memcpy(data, self->banks[i], 0x4000);
+            data += 0x4000;
+        }
+    }
+
+    return checkpoint;
+}
+
+static PyObject* CSimulator_restore(CSimulatorObject* self, PyObject* args, PyObject* kwds) {
+    static char* kwlist[] = {"", NULL};
+    Py_buffer checkpoint;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "y*", kwlist, &checkpoint)) {
+        return NULL;
+    }
+
+    Py_ssize_t size = CHECKPOINT_REGS * 8 + (self->memory ? 0x10000 : 0x20001);
+    if (checkpoint.len != size) {
+        PyBuffer_Release(&checkpoint);
+        PyErr_Format(PyExc_ValueError, "checkpoint length is %zd (expected %zd)", checkpoint.len, size);
+        return NULL;
+    }
+
+    byte* data = checkpoint.buf;
+    for (int i = 0; i < CHECKPOINT_REGS; i++) {
+        unsigned long long value = 0;
+        for (int j = 7; j >= 0; j--) {
+            value = (value << 8) + data[j];
+        }
+        self->registers[i] = value;
+        data += 8;
+    }
+    if (self->memory) {
+        memcpy(self->memory, data, 0x10000);
+    } else {
+        byte value = *data++;
+        for (int i = 0; i < 8; i++) {
+            memcpy(self->banks[i], data, 0x4000);
+            data += 0x4000;
+        }
+        out7ffd(self, value);
+        PyObject* rv = PyObject_CallMethod(self->memory_obj, "out7ffd", "(i)", value);
+        if (rv == NULL) {
+            PyBuffer_Release(&checkpoint);
+            return NULL;
+        }
+        Py_DECREF(rv);
+    }
+
+    PyBuffer_Release(&checkpoint);
+    Py_RETURN_NONE;
+}
+
+/*
+ * Return whether instructions can be executed without holding the GIL, i.e.
+ * whether there are no port tracers that would have to be called.
+ */
+static int gil_free(CSimulatorObject* self) {
+    return self->in_a_n_tracer == NULL && self->in_r_c_tracer == NULL && self->ini_tracer == NULL && self->out_tracer == NULL;
+}
+
+/*
+ * Execute instructions with the GIL released until PC reaches 'stop' (return
+ * 3), 'max_operations' instructions have been executed (return 1), or
+ * 'max_time' is reached (return 2). Return 0 after NOGIL_SLICE T-states
+ * without any of these conditions being met, so that the caller can check
+ * for signals.
+ */
+static int run_nogil(CSimulatorObject* self, unsigned stop, int interrupts, byte* exec_bits, unsigned long long* profile,
+                     unsigned long long max_operations, unsigned long long max_time, unsigned long long* operations) {
+    unsigned long long* reg = self->registers;
+    byte* mem = self->memory;
+    unsigned frame_duration = self->frame_duration;
+    unsigned int_active = self->int_active;
+    unsigned long long end = TIME + NOGIL_SLICE;
+    unsigned long long ops = *operations;
+    int rv = 0;
+
+    Py_BEGIN_ALLOW_THREADS
+    while (TIME < end) {
+        unsigned long long t0 = TIME;
+        unsigned pc = REG(PC);
+        GET_OPCODE_FUNC(&opcodes);
+
+        opcode_func->func(self, opcode_func->lookup, opcode_func->args);
+
+        if (exec_bits) {
+            exec_bits[pc >> 3] |= 1 << (pc & 7);
+        }
+
+        if (profile) {
+            profile[pc] += 1;
+            profile[0x10000 + pc] += TIME - t0;
+        }
+
+        if (interrupts && REG(IFF) && (TIME % frame_duration) < int_active) {
+            accept_interrupt(self, pc);
+        }
+
+        ops += 1;
+
+        if (max_operations > 0 && ops >= max_operations) {
+            rv = 1;
+            break;
+        }
+        if (max_time > 0 && TIME >= max_time) {
+            rv = 2;
+            break;
+        }
+        if (REG(PC) == stop) {
+            rv = 3;
+            break;
+        }
+    }
+    Py_END_ALLOW_THREADS
+
+    *operations = ops;
+    return rv;
+}
+
 static PyObject* CSimulator_run(CSimulatorObject* self, PyObject* args, PyObject* kwds) {
     static char* kwlist[] = {"start", "stop", "interrupts", NULL};
     unsigned start = 0x10000;
@@ -5250,6 +5425,16 @@ static PyObject* CSimulator_run(CSimulatorObject* self, PyObject* args, PyObject
         LD(PC, start);
     }
 
+    if (stop < 0x10000 && gil_free(self)) {
+        unsigned long long operations = 0;
+        while (run_nogil(self, stop, interrupts, NULL, NULL, 0, 0, &operations) == 0) {
+            if (PyErr_CheckSignals()) {
+                return NULL;
+            }
+        }
+        Py_RETURN_NONE;
+    }
+
     while (1) {
         unsigned pc = REG(PC);
         GET_OPCODE_FUNC(&opcodes);
@@ -5312,16 +5497,160 @@ static PyObject* CSimulator_exec_with_cb(CSimulatorObject* self, PyObject* args,
     Py_RETURN_NONE;
 }
 
-static PyObject* CSimulator_exec_frame(CSimulatorObject* self, PyObject* args, PyObject* kwds) {
-    static char* kwlist[] = {"fetch_count", "exec_map", "trace", NULL};
-    int fetch_count;
-    PyObject* exec_map = Py_None;
-    PyObject* trace = Py_None;
+/*
+ * Acquire the buffer of a code execution map. Returns 1 if 'exec_map' is a
+ * writable buffer of at least 8192 bytes (a bitmap in Z80 map format), 0 if it
+ * is None or a set, or -1 (with an exception set) otherwise.
+ */
+static int get_exec_bitmap(PyObject* exec_map, Py_buffer* view) {
+    if (exec_map == Py_None || PySet_Check(exec_map)) {
+        return 0;
+    }
+    if (PyObject_GetBuffer(exec_map, view, PyBUF_WRITABLE) == -1) {
+        return -1;
+    }
+    if (view->len < 8192) {
+        PyBuffer_Release(view);
+        PyErr_SetString(PyExc_ValueError, "execution map must be at least 8192 bytes long");
+        return -1;
+    }
+    return 1;
+}
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "i|OO", kwlist, &fetch_count, &exec_map, &trace)) {
-        return NULL;
+/*
+ * Get a buffer view of 'array' (unless it is None). Return 1 on success, 0 if
+ * 'array' is None, or -1 on error (including an item size other than
+ * 'itemsize' or fewer than 'min_len' items).
+ */
+static int get_array(PyObject* array, Py_buffer* view, Py_ssize_t itemsize, Py_ssize_t min_len, const char* error) {
+    if (array == Py_None) {
+        return 0;
+    }
+    if (PyObject_GetBuffer(array, view, PyBUF_WRITABLE) == -1) {
+        return -1;
+    }
+    if (view->itemsize != itemsize || view->len < min_len * itemsize) {
+        PyBuffer_Release(view);
+        PyErr_SetString(PyExc_ValueError, error);
+        return -1;
     }
+    return 1;
+}
 
+/*
+ * Return 0x10000 + the port read, or 0x20000 + the port written, by the
+ * instruction at 'pc', or 0 if it is not an IN or OUT instruction.
+ */
+static unsigned get_io(CSimulatorObject* self, unsigned pc) {
+    unsigned long long* reg = self->registers;
+    byte* mem = self->memory;
+    byte opcode = PEEK(pc);
+
+    if (opcode == 0xDB) {
+        return 0x10000 + PEEK(ADDR(pc + 1)) + 256 * REG(A);
+    }
+    if (opcode == 0xD3) {
+        return 0x20000 + PEEK(ADDR(pc + 1)) + 256 * REG(A);
+    }
+    if (opcode == 0xED) {
+        byte opcode2 = PEEK(ADDR(pc + 1));
+        unsigned bc = REG(C) + 256 * REG(B);
+        if ((opcode2 & 0xC7) == 0x40 || (opcode2 & 0xE7) == 0xA2) {
+            return 0x10000 + bc; /* IN r,(C) / INI / IND / INIR / INDR */
+        }
+        if ((opcode2 & 0xC7) == 0x41) {
+            return 0x20000 + bc; /* OUT (C),r */
+        }
+        if ((opcode2 & 0xE7) == 0xA3) {
+            return 0x20000 + REG(C) + 256 * ((REG(B) - 1) & 0xFF); /* OUTI / OUTD / OTIR / OTDR */
+        }
+    }
+    return 0;
+}
+
+/*
+ * Return the index of the first breakpoint in 'bp' (compiled by
+ * traceutils.compile_breakpoints()) whose conditions are all met, or -1 if
+ * there is none. 'io' is the value returned by get_io() for the instruction
+ * just executed.
+ */
+static int check_breakpoints(CSimulatorObject* self, unsigned long long* bp, Py_ssize_t len, unsigned io) {
+    unsigned long long* reg = self->registers;
+    byte* mem = self->memory;
+    Py_ssize_t i = 0;
+    int index = 0;
+
+    while (i < len) {
+        unsigned long long count = bp[i++];
+        int met = 1;
+        for (unsigned long long c = 0; c < count; c++) {
+            if (i + 5 > len || i + 5 + 2 * (Py_ssize_t)bp[i + 4] > len) {
+                return -1;
+            }
+            unsigned long long kind = bp[i];
+            unsigned long long arg = bp[i + 1];
+            unsigned long long mask = bp[i + 2];
+            unsigned long long negate = bp[i + 3];
+            unsigned long long* ranges = bp + i + 5;
+            unsigned long long* end = ranges + 2 * bp[i + 4];
+            i = end - bp;
+            if (!met) {
+                continue;
+            }
+            unsigned long long value = 0;
+            int valid = 1;
+            switch (kind) {
+                case BP_REG:
+                    value = reg[arg % 30];
+                    break;
+                case BP_PAIR:
+                    value = 256 * reg[arg % 29] + reg[arg % 29 + 1];
+                    break;
+                case BP_MEM:
+                    value = PEEK(ADDR(arg));
+                    break;
+                case BP_IN:
+                    valid = (io >> 16) == 1;
+                    value = io & 0xFFFF;
+                    break;
+                case BP_OUT:
+                    valid = (io >> 16) == 2;
+                    value = io & 0xFFFF;
+                    break;
+                default:
+                    valid = 0;
+            }
+            int in_range = 0;
+            value &= mask;
+            for (; valid && ranges < end; ranges += 2) {
+                if (ranges[0] <= value && value <= ranges[1]) {
+                    in_range = 1;
+                    break;
+                }
+            }
+            met = valid && in_range != (negate != 0);
+        }
+        if (met) {
+            return index;
+        }
+        index++;
+    }
+    return -1;
+}
+
+static int add_to_exec_map(PyObject* exec_map, byte* exec_bits, unsigned pc) {
+    if (exec_bits) {
+        exec_bits[pc >> 3] |= 1 << (pc & 7);
+    } else if (exec_map != Py_None) {
+        PyObject* addr = PyLong_FromLong(pc);
+        int rv = PySet_Add(exec_map, addr);
+        Py_XDECREF(addr);
+        return rv;
+    }
+    return 0;
+}
+
+static PyObject* exec_frame(CSimulatorObject* self, int fetch_count, PyObject* exec_map, byte* exec_bits, PyObject* trace) {
     unsigned long long* reg = self->registers;
     byte* mem = self->memory;
     unsigned pc;
@@ -5378,13 +5707,8 @@ static PyObject* CSimulator_exec_frame(CSimulatorObject* self, PyObject* args, P
             return NULL;
         }
 
-        if (exec_map != Py_None) {
-            PyObject* addr = PyLong_FromLong(pc);
-            int rv = PySet_Add(exec_map, addr);
-            Py_XDECREF(addr);
-            if (rv == -1) {
-                return NULL;
-            }
+        if (add_to_exec_map(exec_map, exec_bits, pc) == -1) {
+            return NULL;
         }
 
         if (r_inc) {
@@ -5411,6 +5735,28 @@ static PyObject* CSimulator_exec_frame(CSimulatorObject* self, PyObject* args, P
     return PyLong_FromLong(pc);
 }
 
+static PyObject* CSimulator_exec_frame(CSimulatorObject* self, PyObject* args, PyObject* kwds) {
+    static char* kwlist[] = {"fetch_count", "exec_map", "trace", NULL};
+    int fetch_count;
+    PyObject* exec_map = Py_None;
+    PyObject* trace = Py_None;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "i|OO", kwlist, &fetch_count, &exec_map, &trace)) {
+        return NULL;
+    }
+
+    Py_buffer view;
+    int bitmap = get_exec_bitmap(exec_map, &view);
+    if (bitmap == -1) {
+        return NULL;
+    }
+    PyObject* rv = exec_frame(self, fetch_count, exec_map, bitmap ? view.buf : NULL, trace);
+    if (bitmap) {
+        PyBuffer_Release(&view);
+    }
+    return rv;
+}
+
 static PyObject* CSimulator_accept_interrupt(CSimulatorObject* self, PyObject* args, PyObject* kwds) {
     static char* kwlist[] = {"", "", "", NULL};
     PyObject* registers = NULL;
@@ -5427,24 +5773,118 @@ static PyObject* CSimulator_accept_interrupt(CSimulatorObject* self, PyObject* a
     Py_RETURN_FALSE;
 }
 
-static PyObject* CSimulator_trace(CSimulatorObject* self, PyObject* args, PyObject* kwds) {
-    static char* kwlist[] = {"", "", "", "", "", "", "", "", "", "", NULL};
-    PyObject* start_obj;
-    PyObject* stop_obj;
-    unsigned long long max_operations;
-    unsigned long long max_time;
-    int interrupts;
-    PyObject* draw;
-    PyObject* exec_map;
-    PyObject* keyboard;
-    PyObject* disassemble;
-    PyObject* trace;
+#define TRACE_RECORD_SIZE 40
+#define TRACE_BUFFER_SIZE (TRACE_RECORD_SIZE * 4096)
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOKKpOOOOO", kwlist, &start_obj, &stop_obj, &max_operations,
-                                     &max_time, &interrupts, &draw, &exec_map, &keyboard, &disassemble, &trace)) {
-        return NULL;
+/*
+ * A buffer of fixed-size binary trace records that is written to a file
+ * object whenever it fills up. Each record consists of the timestamp (8
+ * bytes), PC (2 bytes) and the first four bytes of the instruction before it
+ * was executed, followed by A, F, B, C, D, E, H, L, IXh, IXl, IYh, IYl, SP (2
+ * bytes), I, R, A', F', B', C', D', E', H', L' and MEMPTR (2 bytes) after it
+ * was executed. Multi-byte values are little-endian.
+ */
+typedef struct {
+    PyObject* file;
+    byte* data;
+    Py_ssize_t len;
+} TraceBuffer;
+
+static int flush_trace_buffer(TraceBuffer* tb) {
+    if (tb->len) {
+        PyObject* rv = PyObject_CallMethod(tb->file, "write", "y#", tb->data, tb->len);
+        tb->len = 0;
+        if (rv == NULL) {
+            return -1;
+        }
+        Py_DECREF(rv);
+    }
+    return 0;
+}
+
+static int add_trace_record(CSimulatorObject* self, TraceBuffer* tb, unsigned pc, unsigned long long t0, byte* ibytes) {
+    unsigned long long* reg = self->registers;
+    byte* rec = tb->data + tb->len;
+    for (int i = 0; i < 8; i++) {
+        rec[i] = (t0 >> (8 * i)) & 0xFF;
+    }
+    rec[8] = pc % 256;
+    rec[9] = pc / 256;
+    memcpy(rec + 10, ibytes, 4);
+    for (int i = 0; i < 12; i++) {
+        rec[14 + i] = REG(A + i);
+    }
+    rec[26] = REG(SP) % 256;
+    rec[27] = REG(SP) / 256;
+    rec[28] = REG(I);
+    rec[29] = REG(R);
+    for (int i = 0; i < 8; i++) {
+        rec[30 + i] = REG(xA + i);
+    }
+#ifdef CONTENTION
+    rec[38] = REG(MEMPTR) % 256;
+    rec[39] = REG(MEMPTR) / 256;
+#else
+    rec[38] = rec[39] = 0;
+#endif
+    tb->len += TRACE_RECORD_SIZE;
+    if (tb->len == TRACE_BUFFER_SIZE) {
+        return flush_trace_buffer(tb);
+    }
+    return 0;
+}
+
+/*
+ * The addresses in a watch map, and their contents when tracing started. The
+ * contents are checked after each instruction in run_trace() (and not in
+ * POKE), so that memory writes cost nothing extra when nothing is watched.
+ */
+typedef struct {
+    unsigned* addrs;
+    byte* values;
+    unsigned len;
+} WatchList;
+
+static int init_watch_list(CSimulatorObject* self, WatchList* wl, byte* watch) {
+    byte* mem = self->memory;
+    wl->len = 0;
+    for (unsigned a = 0; a < 65536; a++) {
+        if (watch[a >> 3] & (1 << (a & 7))) {
+            wl->len++;
+        }
+    }
+    wl->addrs = PyMem_Malloc(wl->len * sizeof(unsigned));
+    wl->values = PyMem_Malloc(wl->len);
+    if (wl->addrs == NULL || wl->values == NULL) {
+        PyMem_Free(wl->addrs);
+        PyMem_Free(wl->values);
+        PyErr_NoMemory();
+        return -1;
+    }
+    unsigned i = 0;
+    for (unsigned a = 0; a < 65536; a++) {
+        if (watch[a >> 3] & (1 << (a & 7))) {
+            wl->addrs[i] = a;
+            wl->values[i++] = PEEK(a);
+        }
+    }
+    return 0;
+}
+
+static int watched_value_changed(CSimulatorObject* self, WatchList* wl) {
+    byte* mem = self->memory;
+    for (unsigned i = 0; i < wl->len; i++) {
+        if (PEEK(wl->addrs[i]) != wl->values[i]) {
+            return 1;
+        }
     }
+    return 0;
+}
 
+static PyObject* run_trace(CSimulatorObject* self, PyObject* start_obj, PyObject* stop_obj, unsigned long long max_operations,
+                           unsigned long long max_time, int interrupts, PyObject* draw, PyObject* exec_map, byte* exec_bits,
+                           unsigned long long* profile, unsigned long long* bp, Py_ssize_t bp_len, WatchList* wl,
+                           PyObject* keyboard, PyObject* disassemble, PyObject* trace, TraceBuffer* tb) {
     if (self->tracer == NULL) {
         PyErr_SetString(PyExc_ValueError, "no tracer set");
         return NULL;
@@ -5467,12 +5907,28 @@ static PyObject* CSimulator_trace(CSimulatorObject* self, PyObject* args, PyObje
         LD(PC, start);
     }
 
+    if (draw == Py_None && trace == Py_None && (exec_bits || exec_map == Py_None) && bp_len == 0 && wl == NULL
+            && gil_free(self)) {
+        Py_DECREF(border);
+        while (1) {
+            int rv = run_nogil(self, stop, interrupts, exec_bits, profile, max_operations, max_time, &operations);
+            if (rv) {
+                return Py_BuildValue("(IL)", rv, operations);
+            }
+            if (PyErr_CheckSignals()) {
+                return NULL;
+            }
+        }
+    }
+
     while (1) {
         PyObject* i = NULL;
         unsigned long long t0 = TIME;
         unsigned long long prev_frame = t0 / frame_duration;
         unsigned pc = REG(PC);
         GET_OPCODE_FUNC(&opcodes);
+        byte ibytes[4];
+        unsigned io = bp_len ? get_io(self, pc) : 0;
 
         if (disassembling) {
             PyObject* arg = PyLong_FromLong(pc);
@@ -5481,6 +5937,10 @@ static PyObject* CSimulator_trace(CSimulatorObject* self, PyObject* args, PyObje
             if (i == NULL) {
                 return NULL;
             }
+        } else if (tb) {
+            for (int j = 0; j < 4; j++) {
+                ibytes[j] = PEEK(ADDR(pc + j));
+            }
         }
 
         opcode_func->func(self, opcode_func->lookup, opcode_func->args);
@@ -5489,14 +5949,18 @@ static PyObject* CSimulator_trace(CSimulatorObject* self, PyObject* args, PyObje
             return NULL;
         }
 
-        if (exec_map != Py_None) {
-            PyObject* addr = PyLong_FromLong(pc);
-            int rv = PySet_Add(exec_map, addr);
-            Py_XDECREF(addr);
-            if (rv == -1) {
-                Py_XDECREF(i);
-                return NULL;
-            }
+        if (add_to_exec_map(exec_map, exec_bits, pc) == -1) {
+            Py_XDECREF(i);
+            return NULL;
+        }
+
+        if (profile) {
+            profile[pc] += 1;
+            profile[0x10000 + pc] += TIME - t0;
+        }
+
+        if (tb && add_trace_record(self, tb, pc, t0, ibytes) == -1) {
+            return NULL;
         }
 
         if (disassembling) {
@@ -5540,12 +6004,106 @@ static PyObject* CSimulator_trace(CSimulatorObject* self, PyObject* args, PyObje
         if (REG(PC) == stop) {
             return Py_BuildValue("(IL)", 3, operations);
         }
+        if (wl && watched_value_changed(self, wl)) {
+            return Py_BuildValue("(IL)", 4, operations);
+        }
+        if (bp_len) {
+            int index = check_breakpoints(self, bp, bp_len, io);
+            if (index >= 0) {
+                return Py_BuildValue("(IL)", 5 + index, operations);
+            }
+        }
     }
 
     Py_XDECREF(border);
     Py_RETURN_NONE;
 }
 
+static PyObject* CSimulator_trace(CSimulatorObject* self, PyObject* args, PyObject* kwds) {
+    static char* kwlist[] = {"", "", "", "", "", "", "", "", "", "", "", "", "", NULL};
+    PyObject* start_obj;
+    PyObject* stop_obj;
+    unsigned long long max_operations;
+    unsigned long long max_time;
+    int interrupts;
+    PyObject* draw;
+    PyObject* exec_map;
+    PyObject* profile;
+    PyObject* breakpoints;
+    PyObject* watch;
+    PyObject* keyboard;
+    PyObject* disassemble;
+    PyObject* trace_obj;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOKKpOOOOOOOO", kwlist, &start_obj, &stop_obj, &max_operations,
+                                     &max_time, &interrupts, &draw, &exec_map, &profile, &breakpoints, &watch,
+                                     &keyboard, &disassemble, &trace_obj)) {
+        return NULL;
+    }
+
+    /* If there is no disassembler, binary trace records are written to 'trace_obj' (a file object) */
+    TraceBuffer trace_buffer;
+    TraceBuffer* tb = NULL;
+    if (disassemble == Py_None && trace_obj != Py_None) {
+        trace_buffer.file = trace_obj;
+        trace_buffer.data = PyMem_Malloc(TRACE_BUFFER_SIZE);
+        trace_buffer.len = 0;
+        if (trace_buffer.data == NULL) {
+            return PyErr_NoMemory();
+        }
+        tb = &trace_buffer;
+    }
+
+    /*
+     * The 'profile', 'breakpoints' and 'watch' arrays (if not None) are used
+     * to count instructions and T-states per address, and to stop when a
+     * breakpoint condition is met or the contents of a watched address change
+     */
+    Py_buffer view;
+    Py_buffer profile_view;
+    Py_buffer bp_view;
+    Py_buffer watch_view;
+    int bitmap = get_exec_bitmap(exec_map, &view);
+    int profiling = bitmap < 0 ? -1 : get_array(profile, &profile_view, 8, PROFILE_SIZE,
+                                                "profile must be an array of at least 131072 64-bit integers");
+    int breaking = profiling < 0 ? -1 : get_array(breakpoints, &bp_view, 8, 0,
+                                                  "breakpoints must be an array of 64-bit integers");
+    int watching = breaking < 0 ? -1 : get_array(watch, &watch_view, 1, 8192,
+                                                 "watch map must be at least 8192 bytes long");
+    WatchList watch_list;
+    int watch_ok = watching > 0 ? init_watch_list(self, &watch_list, watch_view.buf) : watching;
+    PyObject* rv = NULL;
+    if (watch_ok >= 0) {
+        rv = run_trace(self, start_obj, stop_obj, max_operations, max_time, interrupts, draw, exec_map,
+                       bitmap ? view.buf : NULL, profiling ? profile_view.buf : NULL, breaking ? bp_view.buf : NULL,
+                       breaking ? bp_view.len / 8 : 0, watching > 0 ? &watch_list : NULL, keyboard, disassemble,
+                       trace_obj, tb);
+    }
+    if (watching > 0 && watch_ok == 0) {
+        PyMem_Free(watch_list.addrs);
+        PyMem_Free(watch_list.values);
+    }
+    if (watching > 0) {
+        PyBuffer_Release(&watch_view);
+    }
+    if (breaking > 0) {
+        PyBuffer_Release(&bp_view);
+    }
+    if (profiling > 0) {
+        PyBuffer_Release(&profile_view);
+    }
+    if (bitmap > 0) {
+        PyBuffer_Release(&view);
+    }
+    if (tb) {
+        if (rv && flush_trace_buffer(tb) == -1) {
+            Py_CLEAR(rv);
+        }
+        PyMem_Free(tb->data);
+    }
+    return rv;
+}
+
 static PyObject* CSimulator_press_keys(CSimulatorObject* self, PyObject* args, PyObject* kwds) {
     static char* kwlist[] = {"", "", "", "", "", "", NULL};
     PyObject* keys;
@@ -5877,10 +6435,25 @@ static int get_tsl_accelerators(PyObject* accelerators, tsl_accelerator* accs) {
         PyObject* ear_obj = PyObject_GetAttrString(item, "ear");
         PyObject* ear_mask_obj = PyObject_GetAttrString(item, "ear_mask");
         PyObject* polarity_obj = PyObject_GetAttrString(item, "polarity");
+        PyObject* block_obj = PyErr_Occurred() ? NULL : PyObject_GetAttrString(item, "block");
         if (name == NULL || code_obj == NULL || c0_obj == NULL || c1_obj == NULL || counter_obj == NULL || inc_obj == NULL ||
-            loop_time_obj == NULL || loop_r_inc_obj == NULL || ear_obj == NULL || ear_mask_obj == NULL || polarity_obj == NULL) {
+            loop_time_obj == NULL || loop_r_inc_obj == NULL || ear_obj == NULL || ear_mask_obj == NULL || polarity_obj == NULL ||
+            block_obj == NULL) {
             ok = 0;
         } else {
+            accelerator->byte_reg = -1;
+            if (block_obj != Py_None) {
+                PyObject* byte_reg_obj = PyObject_GetAttrString(block_obj, "byte_reg");
+                PyObject* byte_init_obj = PyObject_GetAttrString(block_obj, "byte_init");
+                if (byte_reg_obj == NULL || byte_init_obj == NULL) {
+                    ok = 0;
+                } else {
+                    accelerator->byte_reg = PyLong_AsLong(byte_reg_obj);
+                    accelerator->byte_init = PyLong_AsLong(byte_init_obj);
+                }
+                Py_XDECREF(byte_reg_obj);
+                Py_XDECREF(byte_init_obj);
+            }
             accelerator->c0 = PyLong_AsLong(c0_obj);
             accelerator->c1 = PyLong_AsLong(c1_obj);
             accelerator->counter = PyLong_AsLong(counter_obj);
@@ -5917,6 +6490,7 @@ static int get_tsl_accelerators(PyObject* accelerators, tsl_accelerator* accs) {
         Py_XDECREF(ear_obj);
         Py_XDECREF(ear_mask_obj);
         Py_XDECREF(polarity_obj);
+        Py_XDECREF(block_obj);
         Py_DECREF(item);
         if (!ok) {
             break;
@@ -6002,6 +6576,11 @@ static unsigned read_port(CSimulatorObject* self, unsigned port) {
                                 }
                             }
                         }
+                        if (acc->byte_reg >= 0 && self->tracer_state[10] == 0 && REG(acc->byte_reg) == acc->byte_init) {
+                            /* Request a fast forward if this is the start of a
+                               byte in a block loader */
+                            self->tracer_state[10] = pc;
+                        }
                         if (k) {
                             /* Move the selected accelerator to the beginning of the
                                list so that it can be found quicker next time */
@@ -6317,6 +6896,27 @@ static PyObject* CSimulator_load(CSimulatorObject* self, PyObject* args, PyObjec
                 }
             }
             pc = REG(PC);
+        } else if (self->tracer_state[10] && self->tracer_state[10] < FFWD_DISABLED) {
+            PyObject* ff = PyObject_CallMethod(self->tracer, "fast_forward", "(O)", (PyObject*)self);
+            if (ff == NULL) {
+                break;
+            }
+            did_fast_load = PyObject_IsTrue(ff);
+            Py_DECREF(ff);
+            if (did_fast_load) {
+                if (self->tracer_state[1] == self->max_index) {
+                    /* Final edge, so stop the tape */
+                    PyObject* st = PyObject_CallMethod(self->tracer, "stop_tape", "(K)", TIME);
+                    if (st == NULL) {
+                        break;
+                    }
+                    Py_DECREF(st);
+                } else {
+                    self->tracer_state[8] = ((TIME + frame_duration - int_active) / frame_duration) * frame_duration;
+                    self->tracer_state[9] = 0;
+                }
+            }
+            pc = REG(PC);
         }
         if (!did_fast_load) {
             if (end_of_tape && stop == 0x10000) {
@@ -6429,11 +7029,13 @@ static PyMemberDef CSimulator_members[] = {
 
 static PyMethodDef CSimulator_methods[] = {
     {"accept_interrupt", (PyCFunction) CSimulator_accept_interrupt, METH_VARARGS | METH_KEYWORDS, "Accept an interrupt if allowed"},
+    {"checkpoint", (PyCFunction) CSimulator_checkpoint, METH_NOARGS, "Save memory and registers"},
     {"exec_frame", (PyCFunction) CSimulator_exec_frame, METH_VARARGS | METH_KEYWORDS, "Execute an RZX frame"},
     {"exec_with_cb", (PyCFunction) CSimulator_exec_with_cb, METH_VARARGS | METH_KEYWORDS, "Execute one or more instructions with an 'RST $10' callback"},
     {"load", (PyCFunction) CSimulator_load, METH_VARARGS | METH_KEYWORDS, "Load a tape"},
     {"press", (PyCFunction) CSimulator_press, METH_VARARGS | METH_KEYWORDS, "Simulate keypresses"},
     {"press_keys", (PyCFunction) CSimulator_press_keys, METH_VARARGS | METH_KEYWORDS, "Simulate keypresses"},
+    {"restore", (PyCFunction) CSimulator_restore, METH_VARARGS | METH_KEYWORDS, "Restore memory and registers from a checkpoint"},
     {"run", (PyCFunction) CSimulator_run, METH_VARARGS | METH_KEYWORDS, "Execute one or more instructions"},
     {"set_tracer", (PyCFunction) CSimulator_set_tracer, METH_VARARGS | METH_KEYWORDS, "Set the tracer"},
     {"trace", (PyCFunction) CSimulator_trace, METH_VARARGS | METH_KEYWORDS, "Execute one or more instructions with optional tracing"},
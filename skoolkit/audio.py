@@ -14,11 +14,19 @@
 # You should have received a copy of the GNU General Public License along with
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
+import sys
+from array import array
+from itertools import islice
 from math import ceil
 from struct import pack
 
 from skoolkit.simutils import CLOCK_SPEEDS, CONTENTION_INTERVALS, FRAME_DURATIONS
 
+try:
+    import numpy
+except ImportError: # pragma: no cover
+    numpy = None
+
 CLOCK_SPEED = 'ClockSpeed'
 CONTENTION_BEGIN = 'ContentionBegin'
 CONTENTION_END = 'ContentionEnd'
@@ -27,12 +35,20 @@ FRAME_DURATION = 'FrameDuration'
 INTERRUPT_DELAY = 'InterruptDelay'
 SAMPLE_RATE = 'SampleRate'
 
+WAV_BLOCK_SIZE = 8192
+DELAY_BLOCK_SIZE = 65536
+SAMPLE_BLOCK_SIZE = 65536
+
 def moving_average_filter(delays, options, volume):
+    if numpy:
+        return _batch_filter(delays, options, volume)
+    return _filter(delays, options, volume)
+
+def _filter(delays, options, volume):
     sample_delay = options[CLOCK_SPEED] / options[SAMPLE_RATE]
     s0, s1 = 0, sample_delay
     t, t1 = 0, ceil(s1)
     bit = bits = 0
-    samples = []
     for d in delays:
         while True:
             if t + d < t1:
@@ -44,19 +60,92 @@ def moving_average_filter(delays, options, volume):
             if bit:
                 bits += i
             d -= i
-            samples.append(volume * bits / (t1 - s0))
+            yield volume * bits / (t1 - s0)
             s0 = t = t1
             s1 += sample_delay
             t1 = ceil(s1)
             bits = 0
         bit = 1 - bit
-    return samples
 
-def write_wav(audio_file, samples, sample_rate, channels=1):
+def _batch_filter(delays, options, volume):
+    # Equivalent to _filter(), but uses numpy to compute the samples for a
+    # block of delays at a time: each sample boundary is located in the array
+    # of speaker flip times by binary search, and the time the speaker is
+    # high up to that boundary is looked up in an array of prefix sums
+    sample_delay = options[CLOCK_SPEED] / options[SAMPLE_RATE]
+    delays = iter(delays)
+    s1 = 0
+    t = bits = 0        # Time and high time at the start of the block
+    s0 = h0 = 0         # Time and high time at the last sample boundary
+    bit = 0
+    while True:
+        block = numpy.fromiter(islice(delays, DELAY_BLOCK_SIZE), numpy.int64)
+        if not len(block):
+            break
+        levels = numpy.arange(bit, bit + len(block) + 1, dtype=numpy.int64) % 2
+        edges = numpy.empty(len(block) + 1, numpy.int64)
+        edges[0] = t
+        numpy.cumsum(block, out=edges[1:])
+        edges[1:] += t
+        high = numpy.empty(len(block) + 1, numpy.int64)
+        high[0] = bits
+        numpy.cumsum(block * levels[:-1], out=high[1:])
+        high[1:] += bits
+        t = int(edges[-1])
+        bits = int(high[-1])
+        bit = (bit + len(block)) % 2
+
+        # Sample boundaries are computed by repeated addition (as in
+        # _filter()) so that they are rounded in exactly the same way; at
+        # most SAMPLE_BLOCK_SIZE boundaries are computed at a time, so that
+        # a long delay does not need a correspondingly large array
+        while True:
+            steps = numpy.full(min(int((t - s1) / sample_delay) + 3, SAMPLE_BLOCK_SIZE), sample_delay)
+            steps[0] = s1
+            sums = numpy.cumsum(steps)[1:]
+            bounds = numpy.ceil(sums)
+            count = int(numpy.searchsorted(bounds, t, 'right'))
+            if count:
+                s1 = float(sums[count - 1])
+                bounds = bounds[:count].astype(numpy.int64)
+                i = numpy.searchsorted(edges, bounds, 'right') - 1
+                h = high[i] + (bounds - edges[i]) * levels[i]
+                widths = numpy.diff(bounds, prepend=s0)
+                samples = volume * numpy.diff(h, prepend=h0) / widths
+                s0 = int(bounds[-1])
+                h0 = int(h[-1])
+                yield from samples.tolist()
+            if count < len(sums):
+                break
+
+def _int16_block(samples):
+    # Convert samples to 16-bit values, raising OverflowError (as array('h')
+    # does) instead of letting numpy wrap any value that is out of range
+    values = numpy.rint(numpy.fromiter(samples, float) * 0xFFFF) - 0x8000
+    if len(values):
+        if values.min() < -0x8000:
+            raise OverflowError('signed short integer is less than minimum')
+        if values.max() > 0x7FFF:
+            raise OverflowError('signed short integer is greater than maximum')
+    return array('h', values.astype(numpy.int16).tobytes())
+
+def _wav_blocks(samples):
+    samples = iter(samples)
+    while True:
+        if numpy:
+            block = _int16_block(islice(samples, WAV_BLOCK_SIZE))
+        else:
+            block = array('h', [round(s * 0xFFFF) - 0x8000 for s in islice(samples, WAV_BLOCK_SIZE)])
+        if not block:
+            break
+        if sys.byteorder == 'big':
+            block.byteswap()
+        yield block
+
+def _wav_header(data_length, sample_rate, channels):
     bits_per_sample = 16
     bytes_per_sample = (bits_per_sample // 8) * channels
     byte_rate = bytes_per_sample * sample_rate
-    data_length = bytes_per_sample * len(samples) // channels
     header = bytearray()
     header.extend(b'RIFF')
     header.extend(pack('<I', 36 + data_length))
@@ -65,9 +154,28 @@ def write_wav(audio_file, samples, sample_rate, channels=1):
     header.extend(pack('<HIIHH', channels, sample_rate, byte_rate, bytes_per_sample, bits_per_sample))
     header.extend(b'data')
     header.extend(pack('<I', data_length))
-    audio_file.write(header)
-    for sample in samples:
-        audio_file.write(pack('<h', round(sample * 0xFFFF) - 0x8000))
+    return header
+
+def write_wav(audio_file, samples, sample_rate, channels=1):
+    if audio_file.seekable():
+        # Write the samples in blocks as they are generated, and then go back
+        # and fill in the data length in the header
+        start = audio_file.tell()
+        audio_file.write(_wav_header(0, sample_rate, channels))
+        data_length = 0
+        for block in _wav_blocks(samples):
+            audio_file.write(block)
+            data_length += len(block) * 2
+        end = audio_file.tell()
+        audio_file.seek(start)
+        audio_file.write(_wav_header(data_length, sample_rate, channels))
+        audio_file.seek(end)
+    else:
+        blocks = list(_wav_blocks(samples))
+        data_length = sum(len(b) for b in blocks) * 2
+        audio_file.write(_wav_header(data_length, sample_rate, channels))
+        for block in blocks:
+            audio_file.write(block)
 
 class BeeperOptions:
     def __init__(self, volume, contention, interrupts, offset, is128k):
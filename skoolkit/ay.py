@@ -14,10 +14,17 @@
 # You should have received a copy of the GNU General Public License along with
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
+from itertools import islice, zip_longest
+
 from skoolkit.audio import (CLOCK_SPEED, FRAME_DURATION, SAMPLE_RATE,
                             moving_average_filter, write_wav)
 from skoolkit.simutils import CLOCK_SPEEDS, FRAME_DURATIONS
 
+try:
+    import numpy
+except ImportError: # pragma: no cover
+    numpy = None
+
 AY_CLOCK_RATE = 1773400
 AY_DAC_TABLE = tuple(v / 0xFFFF for v in (
     0x0000, 0x0385, 0x053D, 0x0770, 0x0AD7, 0x0FD5, 0x15B0, 0x230C,
@@ -63,7 +70,33 @@ class Channel:
         self.pan_left = 1 - pan
         self.pan_right = pan
 
+def _envelope(shape, steps):
+    # Return the envelope values after the given numbers of steps since the
+    # envelope shape was set
+    (d0, e0), (d1, e1) = ENVELOPES[shape]
+    if d1:
+        m = steps % 64
+        return numpy.where(m < 32, e0 + d0 * m, e1 + d1 * (m - 32))
+    return numpy.where(steps < 32, e0 + d0 * steps, e1)
+
+def _cycles(ticks, counter, period):
+    # Return the number of times a counter that starts at 'counter' reaches
+    # 'period' (and is reset) by each element of 'ticks'
+    first = max(period - counter, 1)
+    return numpy.where(ticks >= first, 1 + (ticks - first) // period, 0)
+
+def _counter(ticks, counter, period):
+    # Return the value of a counter that starts at 'counter' after 'ticks'
+    # ticks
+    first = max(period - counter, 1)
+    if ticks >= first:
+        return (ticks - first) % period
+    return counter + ticks
+
 class AY:
+    # Noise generator output (as a numpy array), shared by all instances
+    noise_bits = None
+
     def __init__(self, pan):
         self.channels = tuple(Channel(p) for p in pan)
 
@@ -80,7 +113,11 @@ class AY:
             ay[reg] = value
 
     def render(self, ay_log, sample_rate, frame_duration, ay_res, volume):
-        samples = []
+        if numpy:
+            return self._render_segments(ay_log, sample_rate, frame_duration, ay_res, volume)
+        return self._render_samples(ay_log, sample_rate, frame_duration, ay_res, volume)
+
+    def _render_samples(self, ay_log, sample_rate, frame_duration, ay_res, volume):
         frame_rate = 50 * frame_duration / ay_res
         fstep = frame_rate / sample_rate
         fcounter = 1
@@ -153,10 +190,124 @@ class AY:
                         left += outv * channel.pan_left
                         right += outv * channel.pan_right
 
-            samples.append(left * volume)
-            samples.append(right * volume)
+            yield left * volume
+            yield right * volume
+
+    def _get_noise_bits(self):
+        if AY.noise_bits is None:
+            noise = 1
+            bits = bytearray()
+            while True:
+                bits.append(noise & 1)
+                noise = (noise // 2) | (((noise ^ (noise // 8)) & 1) * 65536)
+                if noise == 1:
+                    break
+            AY.noise_bits = numpy.frombuffer(bytes(bits), numpy.uint8)
+        return AY.noise_bits
+
+    def _render_segments(self, ay_log, sample_rate, frame_duration, ay_res, volume):
+        # Equivalent to _render_samples(), but uses numpy to compute the
+        # samples in each segment of the output during which the AY registers
+        # do not change
+        frame_rate = 50 * frame_duration / ay_res
+        fstep = frame_rate / sample_rate
+        fcounter = 1
+        frames = self.frames(ay_log, ay_res)
+        step = AY_CLOCK_RATE / (sample_rate * 64)
+        noise_bits = self._get_noise_bits()
+        dac = numpy.array(AY_DAC_TABLE)
+        state = {
+            'x': 0,
+            'left': 0,
+            'right': 0,
+            'noise': 0,
+            'noise_counter': 0,
+            'envelope_counter': 0,
+            'envelope_shape': 0,
+            'envelope_steps': 0
+        }
+        regs = None
+        count = 0
+        while True:
+            fcounter += fstep
+            while fcounter >= 1:
+                fcounter -= 1
+                r = next(frames, None)
+                if r is None:
+                    break
+                if r[13] >= 0 or r[:13] != regs:
+                    if count:
+                        yield from self._render_segment(regs, state, count, step, dac, noise_bits, volume)
+                        count = 0
+                    regs = r[:13]
+                if r[13] >= 0:
+                    state['envelope_shape'] = r[13] % 16
+                    state['envelope_counter'] = 0
+                    state['envelope_steps'] = 0
+                    r[13] = -1
+            if r is None:
+                break
+            count += 1
+        if count:
+            yield from self._render_segment(regs, state, count, step, dac, noise_bits, volume)
+
+    def _render_segment(self, r, state, count, step, dac, noise_bits, volume):
+        # Compute the number of times the generators are clocked up to and
+        # including each sample
+        x = state['x']
+        tick_counts = bytearray(count)
+        for j in range(count):
+            t = 0
+            for i in range(8):
+                x += step
+                if x >= 1:
+                    x -= 1
+                    t += 1
+            tick_counts[j] = t
+        state['x'] = x
+        ticks = numpy.cumsum(numpy.frombuffer(tick_counts, numpy.uint8), dtype=numpy.int64)
+        total = int(ticks[-1])
+
+        noise_period = ((r[6] & 0x1F) or 1) * 2
+        noise_counter = state['noise_counter']
+        noise_pos = state['noise'] + _cycles(ticks, noise_counter, noise_period)
+        n = noise_bits[noise_pos % len(noise_bits)]
+        state['noise'] = int(noise_pos[-1]) % len(noise_bits)
+        state['noise_counter'] = _counter(total, noise_counter, noise_period)
+
+        envelope_period = (r[11] + 256 * r[12]) or 1
+        envelope_counter = state['envelope_counter']
+        envelope_steps = state['envelope_steps'] + _cycles(ticks, envelope_counter, envelope_period)
+        envelope = _envelope(state['envelope_shape'], envelope_steps) // 2
+        state['envelope_steps'] = int(envelope_steps[-1])
+        state['envelope_counter'] = _counter(total, envelope_counter, envelope_period)
+
+        left = right = 0
+        for i, channel in enumerate(self.channels):
+            period = ((r[2 * i] + 256 * r[2 * i + 1]) & 0x0FFF) or 1
+            tone = channel.tone ^ (_cycles(ticks, channel.tone_counter, period) & 1)
+            channel.tone = int(tone[-1])
+            channel.tone_counter = _counter(total, channel.tone_counter, period)
+            level = (tone | ((r[7] >> i) & 1)) & (n | ((r[7] >> (i + 3)) & 1))
+            if r[8 + i] & 16:
+                outv = dac[level * envelope]
+            else:
+                outv = dac[level * (r[8 + i] % 16)]
+            left = left + outv * channel.pan_left
+            right = right + outv * channel.pan_right
+
+        # Samples before the first tick in this segment repeat the last sample
+        # of the previous segment
+        untouched = ticks == 0
+        left[untouched] = state['left']
+        right[untouched] = state['right']
+        state['left'] = float(left[-1])
+        state['right'] = float(right[-1])
 
-        return samples
+        samples = numpy.empty(2 * len(ticks))
+        samples[0::2] = left * volume
+        samples[1::2] = right * volume
+        yield from samples.tolist()
 
 class AYOptions:
     def __init__(self, volume, ay_res, beeper, mode):
@@ -229,13 +380,13 @@ class AYAudioWriter:
         ay_res = options.ay_res or 622 # 70908/622=114 (5700Hz)
         ay_samples = ay.render(ay_log, self.options[SAMPLE_RATE], frame_duration, ay_res, ay_volume)
         if options.beeper and beeper_log:
-            delays = [t1 - t0 for t0, t1 in zip(beeper_log, beeper_log[1:])]
+            delays = (t1 - t0 for t0, t1 in zip(beeper_log, islice(beeper_log, 1, None)))
             beeper_samples = moving_average_filter(delays, self.options, volume)
             samples = self._combine(ay_samples, beeper_samples)
         else:
             samples = ay_samples
         if channels == 1:
-            samples = samples[::2]
+            samples = islice(samples, 0, None, 2)
         write_wav(audio_file, samples, self.options[SAMPLE_RATE], channels)
 
     def _parse_log(self, audio_log):
@@ -249,15 +400,9 @@ class AYAudioWriter:
         return ay_log, beeper_log
 
     def _combine(self, ay_samples, beeper_samples):
-        samples = []
-        ay_len = len(ay_samples) // 2
-        beeper_len = len(beeper_samples)
-        max_len = max(ay_len, beeper_len)
-        ay_samples.extend([0] * ((max_len - ay_len) * 2))
-        beeper_samples.extend([0] * (max_len - beeper_len))
-        for i in range(max_len):
-            left = (ay_samples[2 * i] + beeper_samples[i]) / 2
-            right = (ay_samples[2 * i + 1] + beeper_samples[i]) / 2
-            samples.append(left)
-            samples.append(right)
-        return samples
+        ay_samples = iter(ay_samples)
+        for ay_pair, beeper in zip_longest(zip(ay_samples, ay_samples), beeper_samples):
+            left, right = ay_pair or (0, 0)
+            beeper = beeper or 0
+            yield (left + beeper) / 2
+            yield (right + beeper) / 2
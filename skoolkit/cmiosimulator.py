@@ -33,6 +33,7 @@ class CMIOSimulator(Simulator):
     def __init__(self, memory, registers=None, state=None, config=None):
         if config is None:
             config = {}
+        config['block_cache'] = False
         config['fast_djnz'] = False
         config['fast_ldir'] = False
         if len(memory) == 0x20000:
@@ -44,6 +44,7 @@ COMMANDS = {
         'SnapshotReferenceOperations': 'DJ,JR,JP,CA,RS'
     },
     'rzxplay': {
+        'MapFormat': (0, ''),
         'Screen': (1, 'screen'),
         'ScreenFps': (50, 'fps'),
         'ScreenScale': (2, 'scale'),
@@ -105,13 +106,15 @@ COMMANDS = {
         'Data': (0, 'data'),
         'PadLeft': (65536, ''),
         'PadRight': (0, ''),
+        'SkoolCache': ('', 'skool_cache'),
         'Verbose': (0, 'verbose'),
         'Warnings': (1, 'warn')
     },
     'skool2ctl': {
         'Hex': (0, 'write_hex'),
         'KeepLines': (0, 'keep_lines'),
-        'PreserveBase': (0, 'preserve_base')
+        'PreserveBase': (0, 'preserve_base'),
+        'SkoolCache': ('', 'skool_cache')
     },
     'skool2html': {
         'AsmLabels': (0, 'asm_labels'),
@@ -121,12 +124,17 @@ COMMANDS = {
         'CreateLabels': (0, 'create_labels'),
         'EntryLabel': ('L{address}', ''),
         'EntryPointLabel': ('{main}_{index}', ''),
+        'ImageCache': ('', 'image_cache'),
+        'ImageCacheSize': (100, ''),
+        'Incremental': (0, 'incremental'),
+        'Jobs': (1, 'jobs'),
         'JoinCss': ('', 'single_css'),
         'OutputDir': ('.', 'output_dir'),
         'Quiet': (0, 'quiet'),
         'RebuildAudio': (0, 'new_audio'),
         'RebuildImages': (0, 'new_images'),
         'Search': ((), 'search'),
+        'SkoolCache': ('', 'skool_cache'),
         'Theme': ((), 'themes'),
         'Time': (0, 'show_timings')
     },
@@ -138,6 +146,7 @@ COMMANDS = {
         'EntryLabel': ('L{address}', ''),
         'EntryPointLabel': ('{main}_{index}', ''),
         'Quiet': (0, 'quiet'),
+        'SkoolCache': ('', 'skool_cache'),
         'Templates': ('', ''),
         'Warnings': (1, 'warn')
     },
@@ -152,6 +161,8 @@ COMMANDS = {
         'UserAgent': ('', 'user_agent'),
     },
     'trace': {
+        'BlockCache': (0, ''),
+        'MapFormat': (0, ''),
         'PNGScale': (2, ''),
         'Screen': (0, 'screen'),
         'ScreenFps': (50, ''),
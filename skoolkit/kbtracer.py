@@ -365,7 +365,7 @@ class KeyboardTracer(PagingTracer):
                     frame = tstates // frame_duration
                     if frame > prev_frame:
                         if is128k:
-                            scr = memory.memory[1][:6912]
+                            scr = list(memory.memory[1][:6912])
                         else:
                             scr = memory[16384:23296]
                         draw(scr, frame, self.border)
@@ -447,7 +447,7 @@ class KeypressTracer(PagingTracer):
                     frame = tstates // frame_duration
                     if frame > prev_frame:
                         if is128k:
-                            scr = memory.memory[1][:6912]
+                            scr = list(memory.memory[1][:6912])
                         else:
                             scr = memory[16384:23296]
                         draw(scr, frame, self.border)
@@ -14,10 +14,24 @@
 # You should have received a copy of the GNU General Public License along with
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
-from skoolkit.simutils import B, C, D, E, H, L
+from skoolkit.simutils import B, C, D, E, H, L, IXh, IXl
+
+class BlockLoader:
+    def __init__(self, code, offset, byte_reg, byte_init, pointer, counter, checksum, returns, exit, bit_timer):
+        self.code = code
+        self.c0 = offset
+        self.c1 = len(code) - offset
+        self.byte_reg = byte_reg
+        self.byte_init = byte_init
+        self.pointer = pointer
+        self.counter = counter
+        self.checksum = checksum
+        self.returns = returns
+        self.exit = exit
+        self.bit_timer = bit_timer
 
 class Accelerator:
-    def __init__(self, name, code, offset, counter, inc, loop_time, loop_r_inc, ear, ear_mask, polarity):
+    def __init__(self, name, code, offset, counter, inc, loop_time, loop_r_inc, ear, ear_mask, polarity, block=None):
         self.name = name
         self.code = code
         self.c0 = offset
@@ -29,6 +43,10 @@ class Accelerator:
         self.ear = ear
         self.ear_mask = ear_mask
         self.polarity = polarity
+        if block:
+            self.block = BlockLoader(*block)
+        else:
+            self.block = None
         self.hits = 0
 
 class AnyByte:
@@ -1030,7 +1048,73 @@ ACCELERATORS = {
         9,    # R register increment per loop iteration
         C,    # EAR bit register
         0x20, # EAR mask
-        0     # Zero flag is reset upon edge detection by AND $20
+        0,    # Zero flag is reset upon edge detection by AND $20
+        (
+            [
+                0x08,             # LD_LOOP   EX AF,AF'           [$05A9]
+                0x20, 0x07,       #           JR NZ,LD_FLAG
+                0x30, 0x0F,       #           JR NC,LD_VERIFY
+                0xDD, 0x75, 0x00, #           LD (IX+0),L
+                0x18, 0x0F,       #           JR LD_NEXT
+                0xCB, 0x11,       # LD_FLAG   RL C
+                0xAD,             #           XOR L
+                0xC0,             #           RET NZ
+                0x79,             #           LD A,C
+                0x1F,             #           RRA
+                0x4F,             #           LD C,A
+                0x13,             #           INC DE
+                0x18, 0x07,       #           JR LD_DEC
+                0xDD, 0x7E, 0x00, # LD_VERIFY LD A,(IX+0)
+                0xAD,             #           XOR L
+                0xC0,             #           RET NZ
+                0xDD, 0x23,       # LD_NEXT   INC IX
+                0x1B,             # LD_DEC    DEC DE
+                0x08,             #           EX AF,AF'
+                0x06, BYTE,       #           LD B,n
+                0x2E, 0x01,       # LD_MARKER LD L,$01
+                0xCD, BYTE, BYTE, # LD_8_BITS CALL LD_EDGE_2
+                0xD0,             #           RET NC
+                0x3E, BYTE,       #           LD A,n
+                0xB8,             #           CP B
+                0xCB, 0x15,       #           RL L
+                0x06, BYTE,       #           LD B,n
+                0xD2, BYTE, BYTE, #           JP NC,LD_8_BITS
+                0x7C,             #           LD A,H
+                0xAD,             #           XOR L
+                0x67,             #           LD H,A
+                0x7A,             #           LD A,D
+                0xB3,             #           OR E
+                0x20, 0xCA,       #           JR NZ,LD_LOOP
+                0x7C,             #           LD A,H              [$05DF]
+                0xFE, 0x01,       #           CP $01
+                0xC9,             #           RET
+                0xCD, BYTE, BYTE, # LD_EDGE_2 CALL LD_EDGE_1
+                0xD0,             #           RET NC
+                0x3E, BYTE,       # LD_EDGE_1 LD A,n
+                0x3D,             # LD_DELAY  DEC A
+                0x20, 0xFD,       #           JR NZ,LD_DELAY
+                0xA7,             #           AND A
+                0x04,             # LD_SAMPLE INC B
+                0xC8,             #           RET Z
+                0x3E, BYTE,       #           LD A,n
+                0xDB, 0xFE,       #           IN A,($FE)          [$05F1]
+                0x1F,             #           RRA
+                0xD0,             #           RET NC
+                0xA9,             #           XOR C
+                0xE6, 0x20,       #           AND $20
+                0x28, 0xF3        #           JR Z,LD_SAMPLE
+            ],
+            72,           # Offset of IN A,($FE) instruction from LD_LOOP
+            L,            # Byte-assembly register
+            1,            # Initial value of the byte-assembly register
+            (IXh, IXl),   # Destination pointer
+            (D, E),       # Length counter
+            H,            # Checksum register
+            (61, 36),     # Offsets of return addresses (from LD_EDGE_1 and
+                          # LD_EDGE_2) on the stack
+            54,           # Offset of 'LD A,H' after the last byte is loaded
+            43            # Offset of the bit timer value (LD B,n)
+        )
     ),
 
     'search-loader': (
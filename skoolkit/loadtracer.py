@@ -20,7 +20,7 @@ from skoolkit import SkoolKitError, write, write_line
 from skoolkit.basic import TextReader
 from skoolkit.pagingtracer import PagingTracer
 from skoolkit.simulator import R1
-from skoolkit.simutils import A, D, E, F, H, IXh, IXl, SP, PC, T, IFF
+from skoolkit.simutils import A, B, D, E, F, H, IXh, IXl, SP, xF, PC, T, IFF
 from skoolkit.tape import get_edges
 from skoolkit.traceutils import Registers, disassemble
 
@@ -38,6 +38,8 @@ DEC = tuple(tuple((
 
 DEC0 = DEC[0]
 
+FFWD_DISABLED = 0x10000
+
 INC0 = tuple((
         v % 256,
         (v & 0xA8)                 # S.5.3.N.
@@ -53,6 +55,7 @@ class LoadTracer(PagingTracer):
         self.dec_a_jr_hits = 0
         self.dec_a_jp_hits = 0
         self.dec_a_misses = 0
+        self.stop_cond = None
         self.simulator = simulator
         self.frame_duration = simulator.frame_duration
         self.edges, self.blocks = get_edges(blocks, config['first_edge'], config['polarity'])
@@ -70,7 +73,8 @@ class LoadTracer(PagingTracer):
         self.block_data_index = self.blocks[0].start
         self.max_index = len(self.edges) - 1
         self.stop = config['stop']
-        self.flash_load = config['fast_load']
+        self.flash_load = config['fast_load'] & 1
+        self.fast_forward_blocks = config['fast_load'] & 2
         self.finish_tape = config['finish_tape']
         self.timeout = config['timeout']
         self.tracefile = config['tracefile']
@@ -93,7 +97,11 @@ class LoadTracer(PagingTracer):
             1,                  # state[7]: data block not yet announced
             0,                  # state[8]: time of next interrupt
             0,                  # state[9]: last frame drawn
+            0,                  # state[10]: address of IN instruction at which
+                                # to fast forward the current data block
         ]
+        if not self.fast_forward_blocks:
+            self.state[10] = FFWD_DISABLED
         if hasattr(simulator, 'load'): # pragma: Python no cover
             self.edges = array.array('Q', self.edges)
             self.state = array.array('Q', self.state)
@@ -169,7 +177,7 @@ class LoadTracer(PagingTracer):
                             frame = tstates // frame_duration
                             if frame > state[9]:
                                 if is128k:
-                                    scr = memory.memory[1][:6912]
+                                    scr = list(memory.memory[1][:6912])
                                 else:
                                     scr = memory[16384:23296]
                                 if not draw(scr, frame, self.border):
@@ -223,6 +231,15 @@ class LoadTracer(PagingTracer):
                         state[9] = 0
                     pc = registers[24]
                     tstates = registers[25]
+                elif 0 < state[10] < FFWD_DISABLED and self.fast_forward(simulator):
+                    tstates = registers[25]
+                    if state[1] == max_index:
+                        # Final edge, so stop the tape
+                        self.stop_tape(tstates)
+                    else:
+                        state[8] = ((tstates + frame_duration - int_active) // frame_duration) * frame_duration
+                        state[9] = 0
+                    pc = registers[24]
                 else:
                     if state[2] and stop is None:
                         # The tape has ended and no stop address is set
@@ -242,6 +259,7 @@ class LoadTracer(PagingTracer):
                         stop_cond = 4
                         break
 
+        self.stop_cond = stop_cond
         if stop_cond == 0:
             write_line(f'Simulation stopped (PC at start address): PC={pc}')
         elif stop_cond == 1:
@@ -352,6 +370,10 @@ class LoadTracer(PagingTracer):
                                         registers[25] += acc.loop_time * loops
                                         if registers[25] > state[0]:
                                             index += 1
+                                if acc.block and state[10] == 0 and registers[acc.block.byte_reg] == acc.block.byte_init:
+                                    # Request a fast forward if this is the
+                                    # start of a byte in a block loader
+                                    state[10] = pc
                                 if i:
                                     # Move the selected accelerator to the beginning of the
                                     # list so that it can be found quicker next time
@@ -388,6 +410,8 @@ class LoadTracer(PagingTracer):
             self.state[3] = self.blocks[self.block_index].end
             self.state[4] = int(not self.pause) # Pause tape unless configured not to
             self.state[7] = 1 # Signal: data block not yet announced
+            if self.fast_forward_blocks:
+                self.state[10] = 0
 
     def stop_tape(self, tstates):
         self.block_index = len(self.blocks)
@@ -484,3 +508,77 @@ class LoadTracer(PagingTracer):
         registers[PC] = 0x05E2
         self.state[7] = 0 # Signal: data block announced
         return True
+
+    def fast_forward(self, simulator):
+        # Called after an 'IN' instruction in a tape-sampling loop that belongs
+        # to a recognised block loader has been executed at the start of a
+        # byte; load the remaining bytes of the data block directly into
+        # memory if the state of the loader and the tape allow it
+        state = self.state
+        registers = simulator.registers
+        memory = simulator.memory
+        pc = state[10]
+        state[10] = FFWD_DISABLED # Signal: don't try again for this block
+        for acc in self.accelerators:
+            loader = acc.block
+            if loader and all(b == memory[(pc + i) % 65536] for i, b in enumerate(loader.code, -loader.c0)):
+                break
+        else:
+            return False
+
+        block = self.blocks[self.block_index]
+        data = block.data
+        if not block.fast_load or not data or block.end - block.start not in (16 * len(data), 16 * len(data) + 1):
+            # The data block does not have two edges per bit
+            return False
+        base = pc - loader.c0
+        sp = registers[SP]
+        for i, offset in enumerate(loader.returns):
+            addr = (base + offset) % 65536
+            if memory[(sp + 2 * i) % 65536] + 256 * memory[(sp + 2 * i + 1) % 65536] != addr:
+                # The loader was not called from the byte-loading loop
+                state[10] = 0
+                return False
+        k, r = divmod(state[1] - block.start - 1, 16)
+        if r or k < 1:
+            # Not at the start of a byte after the flag byte, so try again at
+            # the next byte
+            state[10] = 0
+            return False
+        if registers[xF] & 0x41 != 0x41:
+            # The loader is verifying the data
+            return False
+        if registers[IFF]:
+            # Interrupts are enabled, so the loader cannot be skipped
+            return False
+        count = registers[loader.counter[0]] * 256 + registers[loader.counter[1]] + 1
+        if k + count > len(data):
+            # The loader expects more bytes than the block contains
+            return False
+
+        addr = start = registers[loader.pointer[0]] * 256 + registers[loader.pointer[1]]
+        checksum = registers[loader.checksum]
+        for b in data[k:k + count - 1]:
+            if addr > 0x3FFF:
+                memory[addr] = b
+            checksum ^= b
+            addr = (addr + 1) % 65536
+        checksum ^= data[k + count - 1]
+        registers[loader.byte_reg] = data[k + count - 1]
+        registers[loader.checksum] = checksum
+        registers[loader.pointer[0]] = addr // 256
+        registers[loader.pointer[1]] = addr % 256
+        registers[loader.counter[0]] = registers[loader.counter[1]] = 0
+        registers[A] = 0
+        registers[F] = 0x44 # 'OR E' with DE=0: set ZF and PF
+        registers[B] = memory[(base + loader.bit_timer) % 65536]
+        registers[SP] = (sp + 2 * len(loader.returns)) % 65536
+        registers[PC] = (base + loader.exit) % 65536
+
+        index = block.start + 16 * (k + count)
+        tstates = registers[T]
+        skipped = (self.edges[index] - tstates) / (50 * self.frame_duration)
+        write_line(f'Fast forwarding data block: {start},{count - 1} ({skipped:0.2f}s)')
+        state[1] = index
+        registers[T] = state[0] = self.edges[index]
+        return True
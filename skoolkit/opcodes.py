@@ -924,23 +924,57 @@ def _opcode(snapshot, addr, value):
         return size, max_count, op_id, operation
     return _defb(snapshot, addr, 65536 - addr)
 
+def _decode(snapshot, addr, rst_handler):
+    value = snapshot[addr]
+    if value == 0xCB:
+        size, max_count, op_id, operation = _after_cb(snapshot, addr + 1)
+    elif value == 0xED:
+        size, max_count, op_id, operation = _after_ed(snapshot, addr + 1)
+    elif value in (0xDD, 0xFD):
+        size, max_count, op_id, operation = _after_dd(snapshot, addr + 1, value)
+    else:
+        size, max_count, op_id, operation = _opcode(snapshot, addr, value)
+    if rst_handler:
+        rst_args = rst_handler.handle(snapshot, addr)
+        if rst_args:
+            size += sum(s[0] for s in rst_args[1])
+    else:
+        rst_args = None
+    return (addr, size, max_count, op_id, operation, rst_args)
+
 def decode(snapshot, start, end, rst_handler=None):
     addr = start
     while addr < end:
-        value = snapshot[addr]
-        if value == 0xCB:
-            size, max_count, op_id, operation = _after_cb(snapshot, addr + 1)
-        elif value == 0xED:
-            size, max_count, op_id, operation = _after_ed(snapshot, addr + 1)
-        elif value in (0xDD, 0xFD):
-            size, max_count, op_id, operation = _after_dd(snapshot, addr + 1, value)
-        else:
-            size, max_count, op_id, operation = _opcode(snapshot, addr, value)
-        if rst_handler:
-            rst_args = rst_handler.handle(snapshot, addr)
-            if rst_args:
-                size += sum(s[0] for s in rst_args[1])
-        else:
-            rst_args = None
-        yield (addr, size, max_count, op_id, operation, rst_args)
-        addr += size
+        instruction = _decode(snapshot, addr, rst_handler)
+        yield instruction
+        addr += instruction[1]
+
+class Decoder:
+    """Decode instructions in a snapshot, remembering the result at each
+    address so that it can be reused by later passes over the same code. The
+    snapshot must not be modified while the decoder is in use.
+
+    :param snapshot: The snapshot.
+    :param rst_handler: The RST handler to use (if any).
+    """
+    def __init__(self, snapshot, rst_handler=None):
+        self.snapshot = snapshot
+        self.rst_handler = rst_handler
+        self.instructions = [None] * 65536
+
+    def get(self, addr):
+        """Return the instruction at an address as a tuple of the form
+        ``(addr, size, max_count, op_id, operation, rst_args)``.
+        """
+        instruction = self.instructions[addr]
+        if instruction is None:
+            instruction = self.instructions[addr] = _decode(self.snapshot, addr, self.rst_handler)
+        return instruction
+
+    def decode(self, start, end):
+        """Decode the instructions in an address range."""
+        addr = start
+        while addr < end:
+            instruction = self.get(addr)
+            yield instruction
+            addr += instruction[1]
@@ -18,19 +18,27 @@ from skoolkit import ROM128, ROM_PLUS2, read_bin_file
 
 ROMS = {'128K': ROM128, '+2': ROM_PLUS2}
 
+def _bytearray(data):
+    if isinstance(data, bytearray):
+        return data
+    return bytearray(data)
+
 class Memory:
     def __init__(self, banks=None, out7ffd=0, machine='128K'):
-        self.banks = banks or tuple([0] * 16384 for b in range(8))
-        self.roms = tuple(list(read_bin_file(r)) for r in ROMS.get(machine, ROM128))
+        if banks:
+            self.banks = [_bytearray(b) for b in banks]
+        else:
+            self.banks = [bytearray(0x4000) for b in range(8)]
+        self.roms = tuple(bytearray(read_bin_file(r)) for r in ROMS.get(machine, ROM128))
         self.memory = [None, self.banks[5], self.banks[2], None]
         self.out7ffd(out7ffd)
         self.machine = machine
 
     def __getitem__(self, index):
-        return self.memory[index // 0x4000][index % 0x4000]
+        return self.memory[index >> 14][index & 0x3FFF]
 
     def __setitem__(self, index, value):
-        self.memory[index // 0x4000][index % 0x4000] = value
+        self.memory[index >> 14][index & 0x3FFF] = value
 
     def __len__(self):
         return 0x20000
@@ -41,18 +49,19 @@ class Memory:
         self.o7ffd = value
 
     def convert(self):
-        # Prepare for use by a CSimulator
+        # Prepare for use by a CSimulator (a no-op unless the ROMs or RAM banks
+        # have been replaced by something other than bytearrays)
         rom_id = (self.o7ffd % 32) // 16
         page = self.o7ffd % 8
-        self.roms = tuple(bytearray(rom) for rom in self.roms)
-        self.banks = [bytearray(bank) for bank in self.banks]
+        self.roms = tuple(_bytearray(rom) for rom in self.roms)
+        self.banks = [_bytearray(bank) for bank in self.banks]
         self.memory = [self.roms[rom_id], self.banks[5], self.banks[2], self.banks[page]]
 
 class SliceableMemory(Memory):
     def __getitem__(self, index):
         if isinstance(index, int):
-            return self.memory[index // 0x4000][index % 0x4000]
-        return [self.memory[a // 0x4000][a % 0x4000] for a in range(index.start, min(index.stop, 65536), index.step or 1)]
+            return self.memory[index >> 14][index & 0x3FFF]
+        return [self.memory[a >> 14][a & 0x3FFF] for a in range(index.start, min(index.stop, 65536), index.step or 1)]
 
 class PagingTracer:
     def write_port(self, registers, port, value, offset):
@@ -16,6 +16,8 @@
 
 import zlib
 
+from skoolkit.graphics import Frame
+
 # http://www.libpng.org/pub/png/spec/iso/index-object.html
 # https://wiki.mozilla.org/APNG_Specification
 PNG_SIGNATURE = bytes((137, 80, 78, 71, 13, 10, 26, 10))
@@ -27,7 +29,7 @@ IDAT = bytes((73, 68, 65, 84))
 FDAT = bytes((102, 100, 65, 84))
 FDAT2 = bytes((102, 100, 65, 84, 0, 0, 0, 2))
 IEND_CHUNK = bytes((0, 0, 0, 0, 73, 69, 78, 68, 174, 66, 96, 130))
-CRC_MASK = 4294967295
+FILTER = bytes(1)
 
 BITS4 = [[int(d) for d in '{:04b}'.format(n)] for n in range(16)]
 BIT_PAIRS = [[((n << m) & 128) // 64 + ((n << m) & 8) // 8 for m in range(4)] for n in range(256)]
@@ -48,18 +50,33 @@ def _get_bytes(depth, scale):
             bd_bytes[scale].append(tuple([int(b[i:i + 8], 2) for i in range(0, len(b), 8)]))
     return bd_bytes[scale]
 
+class _Pixels(dict):
+    # Maps a UDG byte (or a UDG byte and mask byte pair) to the bytes of the
+    # corresponding section of a scanline, building each entry on first use
+    def __init__(self, build, *args):
+        self.build = build
+        self.args = args
+
+    def __missing__(self, key):
+        value = self[key] = self.build(key, *self.args)
+        return value
+
 class PngWriter:
     def __init__(self, alpha=255, compression_level=9, masks=None):
         self.alpha = alpha
         self.compression_level = compression_level
         self.masks = masks
-        self._create_crc_table()
+        self.pixels = {}
         self._create_png_method_dict()
 
     def write_image(self, frames, img_file, palette, attr_map, has_trans, flash_rect):
         bit_depth, palette_size = self._get_bit_depth(palette)
         frame1 = frames[0]
         width, height = frame1.width, frame1.height
+        if len(frames) > 1:
+            frames = self._optimise_frames(frames)
+        else:
+            frames = [(frame1, frame1.delay, 0, 0)]
         frame1_data, frame2_data = self._build_image_data(frame1, palette_size, bit_depth, attr_map, flash_rect)
 
         # PNG signature
@@ -84,43 +101,87 @@ class PngWriter:
         if len(frames) == 1 and flash_rect:
             img_file.write(ACTL_CHUNK)
         elif len(frames) > 1:
-            actl_chunk = (97, 99, 84, 76, 0, 0, 0, len(frames), 0, 0, 0, 0)
+            actl_chunk = (97, 99, 84, 76, *self._to_bytes(len(frames)), 0, 0, 0, 0)
             self._write_chunk(img_file, actl_chunk)
 
         # fcTL
         if len(frames) > 1 or flash_rect:
             seq_num = 0
-            self._write_fctl_chunk(img_file, seq_num, frame1.delay, width, height)
+            self._write_fctl_chunk(img_file, seq_num, frames[0][1], width, height)
 
         # IDAT
-        self._write_img_data_chunk(img_file, IDAT + frame1_data)
+        self._write_img_data_chunk(img_file, IDAT, frame1_data)
 
         # fcTL and fdAT
         if len(frames) == 1 and flash_rect:
             f2_x_offset, f2_y_offset, f2_width, f2_height = flash_rect
             self._write_fctl_chunk(img_file, 1, frame1.delay, f2_width, f2_height, f2_x_offset, f2_y_offset)
-            self._write_img_data_chunk(img_file, FDAT2 + frame2_data)
-        for frame in frames[1:]:
+            self._write_img_data_chunk(img_file, FDAT2, frame2_data)
+        for frame, delay, x_offset, y_offset in frames[1:]:
             frame_data = self._build_image_data(frame, palette_size, bit_depth, attr_map)[0]
             seq_num += 1
-            self._write_fctl_chunk(img_file, seq_num, frame.delay, frame.width, frame.height, frame.x_offset, frame.y_offset)
+            self._write_fctl_chunk(img_file, seq_num, delay, frame.width, frame.height, x_offset, y_offset)
             seq_num += 1
             fdat = FDAT + bytes(self._to_bytes(seq_num))
-            self._write_img_data_chunk(img_file, fdat + frame_data)
+            self._write_img_data_chunk(img_file, fdat, frame_data)
 
         # IEND
         img_file.write(IEND_CHUNK)
 
-    def _create_crc_table(self):
-        self.crc_table = []
-        for i in range(256):
-            c = i
-            for k in range(8):
-                if c & 1:
-                    c = 3988292384 ^ (c >> 1)
-                else:
-                    c = c >> 1
-            self.crc_table.append(c)
+    def _optimise_frames(self, frames):
+        # Return a list of (frame, delay, x_offset, y_offset) tuples in which
+        # each frame after the first is reduced to the smallest rectangle of
+        # tiles that differs from the previous frame (if the two frames have
+        # the same geometry), and identical consecutive frames are merged
+        prev = frames[0]
+        anim = [[prev, prev.delay, 0, 0]]
+        geometry = (prev.scale, prev.mask, prev.x, prev.y, prev.width, prev.height, 0, 0)
+        for frame in frames[1:]:
+            x_offset, y_offset = frame.x_offset, frame.y_offset
+            f_geometry = (frame.scale, frame.mask, frame.x, frame.y, frame.width, frame.height, x_offset, y_offset)
+            if f_geometry == geometry:
+                delta = self._get_delta(prev, frame)
+            else:
+                delta = frame
+            if delta is None and anim[-1][1] + frame.delay < 65536:
+                anim[-1][1] += frame.delay
+                continue
+            if delta is None or delta is frame:
+                anim.append([frame, frame.delay, x_offset, y_offset])
+            else:
+                anim.append([delta, frame.delay, x_offset + delta.x_offset, y_offset + delta.y_offset])
+            prev, geometry = frame, f_geometry
+        return anim
+
+    def _get_delta(self, frame1, frame2):
+        # Return a frame that contains the region of frame2 in which it differs
+        # from frame1 (which has the same size, scale, mask and crop
+        # rectangle), or None if the two frames are identical
+        udgs1, udgs2 = frame1.udgs, frame2.udgs
+        if len(udgs1) != len(udgs2) or len(udgs1[0]) != len(udgs2[0]):
+            return frame2
+        inc = 8 * frame2.scale
+        x0, y0 = frame2.x, frame2.y
+        x1, y1 = x0 + frame2.width, y0 + frame2.height
+        c0, c1 = x0 // inc, (x1 - 1) // inc + 1
+        rows = []
+        cols = []
+        for r in range(y0 // inc, (y1 - 1) // inc + 1):
+            row1, row2 = udgs1[r][c0:c1], udgs2[r][c0:c1]
+            if row1 != row2:
+                rows.append(r)
+                cols.extend([c for c, (u1, u2) in enumerate(zip(row1, row2), c0) if u1 != u2])
+        if not rows:
+            return None
+        r0, r1, c0, c1 = rows[0], rows[-1] + 1, min(cols), max(cols) + 1
+        dx0, dy0 = max(c0 * inc, x0), max(r0 * inc, y0)
+        dx1, dy1 = min(c1 * inc, x1), min(r1 * inc, y1)
+        if (dx0, dy0, dx1, dy1) == (x0, y0, x1, y1):
+            return frame2
+        udgs = [row[c0:c1] for row in udgs2[r0:r1]]
+        delta = Frame(udgs, frame2.scale, frame2.mask, dx0 - c0 * inc, dy0 - r0 * inc, dx1 - dx0, dy1 - dy0, x_offset=dx0 - x0, y_offset=dy0 - y0)
+        delta.has_masks = frame2.has_masks
+        return delta
 
     def _create_png_method_dict(self):
         # The PNG method dictionary is keyed on:
@@ -227,21 +288,17 @@ class PngWriter:
 
         return frame1, frame2
 
-    def _get_crc(self, byte_list):
-        crc = CRC_MASK
-        for b in byte_list:
-            crc = self.crc_table[(crc ^ b) & 255] ^ (crc >> 8)
-        return self._to_bytes(crc ^ CRC_MASK)
-
     def _write_chunk(self, img_file, chunk_data):
+        chunk_data = bytes(chunk_data)
         img_file.write(bytes(self._to_bytes(len(chunk_data) - 4))) # length
-        img_file.write(bytes(chunk_data))
-        img_file.write(bytes(self._get_crc(chunk_data))) # CRC
+        img_file.write(chunk_data)
+        img_file.write(bytes(self._to_bytes(zlib.crc32(chunk_data)))) # CRC
 
-    def _write_img_data_chunk(self, img_file, img_data):
-        img_file.write(bytes(self._to_bytes(len(img_data) - 4))) # length
+    def _write_img_data_chunk(self, img_file, chunk_type, img_data):
+        img_file.write(bytes(self._to_bytes(len(chunk_type) + len(img_data) - 4))) # length
+        img_file.write(chunk_type)
         img_file.write(img_data)
-        img_file.write(bytes(self._get_crc(img_data))) # CRC
+        img_file.write(bytes(self._to_bytes(zlib.crc32(img_data, zlib.crc32(chunk_type))))) # CRC
 
     def _scan_frame(self, frame, scan_udg_f, *args):
         compressor = zlib.compressobj(self.compression_level)
@@ -249,19 +306,32 @@ class PngWriter:
         scale = frame.scale
         for row in frame.udgs:
             scanlines = (
-                bytearray((0,)), bytearray((0,)), bytearray((0,)), bytearray((0,)),
-                bytearray((0,)), bytearray((0,)), bytearray((0,)), bytearray((0,))
+                bytearray(FILTER), bytearray(FILTER), bytearray(FILTER), bytearray(FILTER),
+                bytearray(FILTER), bytearray(FILTER), bytearray(FILTER), bytearray(FILTER)
             )
             for udg in row:
                 scan_udg_f(udg, scanlines, *args)
-            img_data.extend(compressor.compress(scanlines[0] * scale))
-            img_data.extend(compressor.compress(scanlines[1] * scale))
-            img_data.extend(compressor.compress(scanlines[2] * scale))
-            img_data.extend(compressor.compress(scanlines[3] * scale))
-            img_data.extend(compressor.compress(scanlines[4] * scale))
-            img_data.extend(compressor.compress(scanlines[5] * scale))
-            img_data.extend(compressor.compress(scanlines[6] * scale))
-            img_data.extend(compressor.compress(scanlines[7] * scale))
+            img_data.extend(compressor.compress(b''.join([s * scale for s in scanlines])))
+        img_data.extend(compressor.flush())
+        return img_data
+
+    def _scan_rows(self, frame, pixels, masked=False):
+        # Build the scanlines for each row of UDGs in one go, using 'pixels'
+        # (a map of attribute values to _Pixels objects) to convert each UDG
+        # byte (or UDG byte and mask byte pair) into packed pixel values
+        compressor = zlib.compressobj(self.compression_level)
+        img_data = bytearray()
+        scale = frame.scale
+        for row in frame.udgs:
+            if masked:
+                udgs = [(pixels[u.attr], u.data, u.mask or u.data) for u in row]
+                scanlines = [FILTER + b''.join([p[d[k] * 256 + m[k]] for p, d, m in udgs]) for k in range(8)]
+            else:
+                udgs = [(pixels[u.attr], u.data) for u in row]
+                scanlines = [FILTER + b''.join([p[d[k]] for p, d in udgs]) for k in range(8)]
+            if scale > 1:
+                scanlines = [s * scale for s in scanlines]
+            img_data.extend(compressor.compress(b''.join(scanlines)))
         img_data.extend(compressor.flush())
         return img_data
 
@@ -335,148 +405,71 @@ class PngWriter:
         img_data.extend(compressor.flush())
         return img_data
 
-    def _scan_udg_bd4_nt(self, udg, scanlines, attrs):
-        pixels = attrs[udg.attr]
-        udg_bytes = udg.data
-        byte = udg_bytes[0]
-        scanlines[0].extend(pixels[byte // 16])
-        scanlines[0].extend(pixels[byte & 15])
-        byte = udg_bytes[1]
-        scanlines[1].extend(pixels[byte // 16])
-        scanlines[1].extend(pixels[byte & 15])
-        byte = udg_bytes[2]
-        scanlines[2].extend(pixels[byte // 16])
-        scanlines[2].extend(pixels[byte & 15])
-        byte = udg_bytes[3]
-        scanlines[3].extend(pixels[byte // 16])
-        scanlines[3].extend(pixels[byte & 15])
-        byte = udg_bytes[4]
-        scanlines[4].extend(pixels[byte // 16])
-        scanlines[4].extend(pixels[byte & 15])
-        byte = udg_bytes[5]
-        scanlines[5].extend(pixels[byte // 16])
-        scanlines[5].extend(pixels[byte & 15])
-        byte = udg_bytes[6]
-        scanlines[6].extend(pixels[byte // 16])
-        scanlines[6].extend(pixels[byte & 15])
-        byte = udg_bytes[7]
-        scanlines[7].extend(pixels[byte // 16])
-        scanlines[7].extend(pixels[byte & 15])
-
     def _build_image_data_bd4_nt(self, frame, *args):
         # Bit depth 4, full size, no masks
-        p = _get_bytes(4, frame.scale)
-        attrs = {attr: [p[t[d] * 16 + t[c]] + p[t[b] * 16 + t[a]] for d, c, b, a in BITS4] for attr, t in frame.attr_map.items()}
-        return self._scan_frame(frame, self._scan_udg_bd4_nt, attrs)
-
-    def _scan_udg_bd2_nt(self, udg, scanlines, attrs):
-        pixels = attrs[udg.attr]
-        udg_bytes = udg.data
-        byte = udg_bytes[0]
-        scanlines[0].extend(pixels[byte // 16])
-        scanlines[0].extend(pixels[byte & 15])
-        byte = udg_bytes[1]
-        scanlines[1].extend(pixels[byte // 16])
-        scanlines[1].extend(pixels[byte & 15])
-        byte = udg_bytes[2]
-        scanlines[2].extend(pixels[byte // 16])
-        scanlines[2].extend(pixels[byte & 15])
-        byte = udg_bytes[3]
-        scanlines[3].extend(pixels[byte // 16])
-        scanlines[3].extend(pixels[byte & 15])
-        byte = udg_bytes[4]
-        scanlines[4].extend(pixels[byte // 16])
-        scanlines[4].extend(pixels[byte & 15])
-        byte = udg_bytes[5]
-        scanlines[5].extend(pixels[byte // 16])
-        scanlines[5].extend(pixels[byte & 15])
-        byte = udg_bytes[6]
-        scanlines[6].extend(pixels[byte // 16])
-        scanlines[6].extend(pixels[byte & 15])
-        byte = udg_bytes[7]
-        scanlines[7].extend(pixels[byte // 16])
-        scanlines[7].extend(pixels[byte & 15])
+        scale = frame.scale
+        p = _get_bytes(4, scale)
+        pixels = {}
+        for attr, t in frame.attr_map.items():
+            key = (4, scale, t)
+            if key not in self.pixels:
+                nibbles = [bytes(p[t[d] * 16 + t[c]] + p[t[b] * 16 + t[a]]) for d, c, b, a in BITS4]
+                self.pixels[key] = _Pixels(self._get_pixels_nt, nibbles)
+            pixels[attr] = self.pixels[key]
+        return self._scan_rows(frame, pixels)
 
     def _build_image_data_bd2_nt(self, frame, *args):
         # Bit depth 2, full size, no masks
-        bits = _get_bytes(2, frame.scale)
-        attrs = {attr: [bits[t[d] * 64 + t[c] * 16 + t[b] * 4 + t[a]] for d, c, b, a in BITS4] for attr, t in frame.attr_map.items()}
-        return self._scan_frame(frame, self._scan_udg_bd2_nt, attrs)
-
-    def _scan_udg_bd2_at(self, udg, scanlines, attrs):
-        pixels = attrs[udg.attr]
-        udg_bytes = udg.data
-        mask_bytes = udg.mask or udg_bytes
-        byte = udg_bytes[0]
-        mask_byte = mask_bytes[0]
-        scanlines[0].extend(pixels[(byte & 240) + mask_byte // 16])
-        scanlines[0].extend(pixels[(byte & 15) * 16 + (mask_byte & 15)])
-        byte = udg_bytes[1]
-        mask_byte = mask_bytes[1]
-        scanlines[1].extend(pixels[(byte & 240) + mask_byte // 16])
-        scanlines[1].extend(pixels[(byte & 15) * 16 + (mask_byte & 15)])
-        byte = udg_bytes[2]
-        mask_byte = mask_bytes[2]
-        scanlines[2].extend(pixels[(byte & 240) + mask_byte // 16])
-        scanlines[2].extend(pixels[(byte & 15) * 16 + (mask_byte & 15)])
-        byte = udg_bytes[3]
-        mask_byte = mask_bytes[3]
-        scanlines[3].extend(pixels[(byte & 240) + mask_byte // 16])
-        scanlines[3].extend(pixels[(byte & 15) * 16 + (mask_byte & 15)])
-        byte = udg_bytes[4]
-        mask_byte = mask_bytes[4]
-        scanlines[4].extend(pixels[(byte & 240) + mask_byte // 16])
-        scanlines[4].extend(pixels[(byte & 15) * 16 + (mask_byte & 15)])
-        byte = udg_bytes[5]
-        mask_byte = mask_bytes[5]
-        scanlines[5].extend(pixels[(byte & 240) + mask_byte // 16])
-        scanlines[5].extend(pixels[(byte & 15) * 16 + (mask_byte & 15)])
-        byte = udg_bytes[6]
-        mask_byte = mask_bytes[6]
-        scanlines[6].extend(pixels[(byte & 240) + mask_byte // 16])
-        scanlines[6].extend(pixels[(byte & 15) * 16 + (mask_byte & 15)])
-        byte = udg_bytes[7]
-        mask_byte = mask_bytes[7]
-        scanlines[7].extend(pixels[(byte & 240) + mask_byte // 16])
-        scanlines[7].extend(pixels[(byte & 15) * 16 + (mask_byte & 15)])
+        scale = frame.scale
+        bits = _get_bytes(2, scale)
+        pixels = {}
+        for attr, t in frame.attr_map.items():
+            key = (2, scale, t)
+            if key not in self.pixels:
+                nibbles = [bytes(bits[t[d] * 64 + t[c] * 16 + t[b] * 4 + t[a]]) for d, c, b, a in BITS4]
+                self.pixels[key] = _Pixels(self._get_pixels_nt, nibbles)
+            pixels[attr] = self.pixels[key]
+        return self._scan_rows(frame, pixels)
+
+    def _get_pixels_nt(self, byte, nibbles):
+        return nibbles[byte // 16] + nibbles[byte & 15]
 
     def _build_image_data_bd2_at(self, frame, mask, *args):
         # Bit depth 2, full size, masked
-        attrs = {}
-        bits = _get_bytes(2, frame.scale)
+        scale = frame.scale
+        bits = _get_bytes(2, scale)
+        pixels = {}
         for attr, (paper, ink) in frame.attr_map.items():
-            p = mask.colours((paper, ink, 0), 0, 1, 2)
-            attrs[attr] = [bits[p[d] * 64 + p[c] * 16 + p[b] * 4 + p[a]] for d, c, b, a in BIT_PAIRS]
-        return self._scan_frame(frame, self._scan_udg_bd2_at, attrs)
-
-    def _scan_udg_bd1_nt(self, udg, scanlines, attrs, bits):
-        paper, ink = attrs[udg.attr]
-        b_mask = paper * 255
-        if ink == paper:
-            data = bits[b_mask]
-            scanlines[0].extend(data)
-            scanlines[1].extend(data)
-            scanlines[2].extend(data)
-            scanlines[3].extend(data)
-            scanlines[4].extend(data)
-            scanlines[5].extend(data)
-            scanlines[6].extend(data)
-            scanlines[7].extend(data)
-        else:
-            udg_data = udg.data
-            scanlines[0].extend(bits[udg_data[0] ^ b_mask])
-            scanlines[1].extend(bits[udg_data[1] ^ b_mask])
-            scanlines[2].extend(bits[udg_data[2] ^ b_mask])
-            scanlines[3].extend(bits[udg_data[3] ^ b_mask])
-            scanlines[4].extend(bits[udg_data[4] ^ b_mask])
-            scanlines[5].extend(bits[udg_data[5] ^ b_mask])
-            scanlines[6].extend(bits[udg_data[6] ^ b_mask])
-            scanlines[7].extend(bits[udg_data[7] ^ b_mask])
+            key = (2, scale, paper, ink, frame.mask)
+            if key not in self.pixels:
+                p = mask.colours((paper, ink, 0), 0, 1, 2)
+                pairs = [bytes(bits[p[d] * 64 + p[c] * 16 + p[b] * 4 + p[a]]) for d, c, b, a in BIT_PAIRS]
+                self.pixels[key] = _Pixels(self._get_pixels_bd2_at, pairs)
+            pixels[attr] = self.pixels[key]
+        return self._scan_rows(frame, pixels, True)
+
+    def _get_pixels_bd2_at(self, key, pairs):
+        byte, mask_byte = key // 256, key & 255
+        return pairs[(byte & 240) + mask_byte // 16] + pairs[(byte & 15) * 16 + (mask_byte & 15)]
 
     def _build_image_data_bd1_nt(self, frame, *args):
         # 2 colours, full size, no masks
-        bits = _get_bytes(1, frame.scale)
-        return self._scan_frame(frame, self._scan_udg_bd1_nt, frame.attr_map, bits)
+        scale = frame.scale
+        bits = _get_bytes(1, scale)
+        pixels = {}
+        for attr, (paper, ink) in frame.attr_map.items():
+            key = (1, scale, paper, ink)
+            if key not in self.pixels:
+                if ink == paper:
+                    d_mask = 0
+                else:
+                    d_mask = 255
+                self.pixels[key] = _Pixels(self._get_pixels_bd1_nt, bits, paper * 255, d_mask)
+            pixels[attr] = self.pixels[key]
+        return self._scan_rows(frame, pixels)
+
+    def _get_pixels_bd1_nt(self, byte, bits, b_mask, d_mask):
+        return bytes(bits[(byte & d_mask) ^ b_mask])
 
     def _scan_udg_bd1_at(self, udg, scanlines, mask, attrs, pixels, bits):
         p, i = attrs[udg.attr]
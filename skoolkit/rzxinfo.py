@@ -19,8 +19,8 @@ import os
 import zlib
 
 from skoolkit import VERSION, SkoolKitError, get_dword, get_word, read_bin_file
+from skoolkit.rzxplay import get_input_recording, get_rzx_snapshot, read_rzx_blocks
 from skoolkit.snapinfo import get_szx_machine_type, get_z80_machine_type
-from skoolkit.snapshot import Snapshot
 
 def _get_str(data, i, max_len):
     s = ''
@@ -29,21 +29,18 @@ def _get_str(data, i, max_len):
         i += 1
     return s
 
-def _show_blocks(data, options):
-    vmajor, vminor = data[4:6]
+def _show_blocks(infile, header, options):
+    vmajor, vminor = header[4:6]
     print(f'Version: {vmajor}.{vminor}')
-    flags = get_dword(data, 6)
+    flags = get_dword(header, 6)
     print('Signed: {}'.format('Yes' if flags & 1 else 'No'))
-    i = 10
-    while i < len(data):
-        block_id = data[i]
-        block_len = get_dword(data, i + 1)
+    for offset, block_id, block_len, data in read_rzx_blocks(infile):
         if block_id == 0x10:
             print('Creator information:')
-            creator_id = _get_str(data, i + 5, 20)
-            vmajor = get_word(data, i + 25)
-            vminor = get_word(data, i + 27)
-            vcanonical = '.'.join(str(data[i + d]) for d in (26, 25, 28, 27))
+            creator_id = _get_str(data, 5, 20)
+            vmajor = get_word(data, 25)
+            vminor = get_word(data, 27)
+            vcanonical = '.'.join(str(data[d]) for d in (26, 25, 28, 27))
             print(f'  ID: {creator_id} {vmajor}.{vminor} ({vcanonical})')
         elif block_id == 0x20:
             print('Security information')
@@ -51,22 +48,17 @@ def _show_blocks(data, options):
             print('Security signature')
         elif block_id == 0x30:
             print('Snapshot:')
-            flags = data[i + 5]
-            ext = _get_str(data, i + 9, 4)
-            length = get_dword(data, i + 13)
+            flags = data[5]
+            ext = _get_str(data, 9, 4)
+            length = get_dword(data, 13)
             print(f'  Filename extension: {ext}')
-            sdata = data[i + 17:i + block_len]
+            sdata = data[17:]
             if flags & 1:
                 ext_sname = _get_str(sdata, 4, len(sdata) - 4)
                 print(f'  External snapshot: {ext_sname}')
             else:
                 print(f'  Size: {length} bytes')
-                if flags & 2:
-                    try:
-                        sdata = zlib.decompress(sdata)
-                    except zlib.error as e:
-                        raise SkoolKitError(f'Failed to decompress snapshot: {e.args[0]}')
-                snap = Snapshot.get(sdata, ext)
+                snap = get_rzx_snapshot(data)
                 if snap:
                     if snap.type == 'SNA':
                         if len(snap.tail) > 0xC000:
@@ -85,60 +77,40 @@ def _show_blocks(data, options):
                 print(f'  Start address: {start_addr}')
         elif block_id == 0x80:
             print('Input recording:')
-            num_frames = get_dword(data, i + 5)
+            num_frames = get_dword(data, 5)
             h = num_frames // 180000
             m = (num_frames % 180000) // 3000
             s = (num_frames % 3000) // 50
             print(f'  Number of frames: {num_frames} ({h}h{m:02}m{s:02}s)')
-            tstates = get_dword(data, i + 10)
+            tstates = get_dword(data, 10)
             print(f'  T-states: {tstates}')
-            flags = get_dword(data, i + 14)
+            flags = get_dword(data, 14)
             encrypted = flags & 1
             print('  Encrypted: {}'.format('Yes' if encrypted else 'No'))
             if options.frames and not encrypted:
-                frames = data[i + 18:i + block_len]
-                if flags & 2:
-                    try:
-                        frames = zlib.decompress(frames)
-                    except zlib.error as e:
-                        raise SkoolKitError(f'Failed to decompress input recording block: {e.args[0]}')
-                j = 0
-                pr_str = ''
-                port_readings = ()
-                suffix = ''
-                for k in range(num_frames):
-                    fetch_counter = get_word(frames, j)
-                    in_counter = get_word(frames, j + 2)
+                input_rec = get_input_recording(infile, offset, block_len, data)
+                for k, (fetch_counter, in_counter, port_readings) in enumerate(input_rec.frames()):
                     print(f'  Frame {k}:')
                     print(f'    Fetch counter: {fetch_counter}')
                     if in_counter == 65535:
                         print(f'    IN counter: {in_counter} ({len(port_readings)})')
-                        if pr_str:
-                            print(f'    Port readings: {pr_str}{suffix}')
-                        j += 4
                     else:
                         print(f'    IN counter: {in_counter}')
-                        port_readings = list(frames[j + 4:j + 4 + in_counter])
+                    if port_readings:
                         pr_str = ', '.join(str(b) for b in port_readings[:10])
                         suffix = '...' if len(port_readings) > 10 else ''
-                        if port_readings:
-                            print(f'    Port readings: {pr_str}{suffix}')
-                        j += 4 + in_counter
+                        print(f'    Port readings: {pr_str}{suffix}')
         else:
             print(f'Unknown block ID: 0x{block_id:02X}')
-        i += block_len
 
-def _extract_snapshots(data, prefix):
-    i = 10
+def _extract_snapshots(infile, prefix):
     s_count = 0
-    while i < len(data):
-        block_id = data[i]
-        block_len = get_dword(data, i + 1)
+    for offset, block_id, block_len, data in read_rzx_blocks(infile):
         if block_id == 0x30:
-            flags = data[i + 5]
+            flags = data[5]
             if flags & 1 == 0:
-                ext = _get_str(data, i + 9, 4).lower()
-                sdata = data[i + 17:i + block_len]
+                ext = _get_str(data, 9, 4).lower()
+                sdata = data[17:]
                 if flags & 2:
                     try:
                         sdata = zlib.decompress(sdata)
@@ -149,18 +121,17 @@ def _extract_snapshots(data, prefix):
                 with open(sfname, 'wb') as f:
                     f.write(sdata)
                 print(f'Extracted {sfname}')
-        i += block_len
     if s_count == 0:
         print('No snapshots found')
 
 def run(infile, options):
-    data = read_bin_file(infile)
-    if data[:4] != b'RZX!' or len(data) < 10:
+    header = read_bin_file(infile, 10)
+    if header[:4] != b'RZX!' or len(header) < 10:
         raise SkoolKitError('Not an RZX file')
     if options.extract:
-        _extract_snapshots(data, os.path.basename(infile))
+        _extract_snapshots(infile, os.path.basename(infile))
     else:
-        _show_blocks(data, options)
+        _show_blocks(infile, header, options)
 
 def main(args):
     parser = argparse.ArgumentParser(
@@ -24,30 +24,86 @@ from skoolkit import (VERSION, SkoolKitError, CSimulator, CCMIOSimulator,
                       as_dword, get_dword, get_word, parse_int, read_bin_file,
                       warn, write)
 from skoolkit.cmiosimulator import CMIOSimulator
-from skoolkit.components import get_screen
+from skoolkit.components import get_image_writer, get_screen
 from skoolkit.config import get_config, show_config, update_options
 from skoolkit.pagingtracer import Memory
 from skoolkit.simulator import Simulator
 from skoolkit.simutils import from_snapshot, get_state
 from skoolkit.snapshot import Snapshot, write_snapshot
-from skoolkit.traceutils import Registers, disassemble, get_trace_line
+from skoolkit.traceutils import (FrameWriter, Registers, disassemble,
+                                 get_exec_map, get_trace_line, write_exec_map)
+
+# The number of bytes to read from an RZX file at a time when streaming the
+# frames of an input recording block
+RZX_CHUNK_SIZE = 65536
 
 class RZXBlock:
-    def __init__(self, data, obj):
-        self.data = data
+    def __init__(self, rzxfile, offset, length, obj):
+        self.rzxfile = rzxfile
+        self.offset = offset
+        self.length = length
         self.obj = obj
 
+    def read(self):
+        with open(self.rzxfile, 'rb') as f:
+            f.seek(self.offset)
+            return f.read(self.length)
+
 class InputRecording:
-    def __init__(self, tstates, frames, data):
+    def __init__(self, tstates, num_frames, rzxfile, offset, length, compressed):
         self.tstates = tstates
-        self.frames = frames
-        self.data = data
+        self.num_frames = num_frames
+        self.rzxfile = rzxfile
+        self.offset = offset
+        self.length = length
+        self.compressed = compressed
 
-class Frame:
-    def __init__(self, fetch_counter, start, end):
-        self.fetch_counter = fetch_counter
-        self.start = start
-        self.end = end
+    def _chunks(self):
+        if self.compressed:
+            decompressor = zlib.decompressobj()
+        with open(self.rzxfile, 'rb') as f:
+            f.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = f.read(min(remaining, RZX_CHUNK_SIZE))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                if self.compressed:
+                    try:
+                        chunk = decompressor.decompress(chunk)
+                    except zlib.error as e:
+                        raise SkoolKitError(f'Failed to decompress input recording block: {e.args[0]}')
+                yield chunk
+        if self.compressed:
+            chunk = decompressor.flush()
+            if remaining > 0 or not decompressor.eof:
+                raise SkoolKitError('Failed to decompress input recording block: Error -5 while decompressing data: incomplete or truncated stream')
+            yield chunk
+
+    def frames(self):
+        """Generate a (fetch counter, IN counter, port readings) tuple for each
+        frame in this input recording block, decompressing the block data as
+        needed."""
+        data = b''
+        i = 0
+        count = 0
+        port_readings = b''
+        for chunk in self._chunks():
+            data = data[i:] + chunk
+            i = 0
+            while count < self.num_frames and i + 4 <= len(data):
+                fetch_counter = get_word(data, i)
+                in_counter = get_word(data, i + 2)
+                if in_counter == 65535:
+                    i += 4
+                elif i + 4 + in_counter <= len(data):
+                    port_readings = data[i + 4:i + 4 + in_counter]
+                    i += 4 + in_counter
+                else:
+                    break
+                yield fetch_counter, in_counter, port_readings
+                count += 1
 
 class RZXTracer:
     def __init__(self, context, input_rec):
@@ -63,26 +119,29 @@ class RZXTracer:
         self.outfe = context.snapshot.outfe
 
     def set_input_rec(self, input_rec):
-        self.frames = input_rec.frames
-        self.data = input_rec.data
-        self.frame_index = -1
+        self.frames = input_rec.frames()
+        self.frame = None
+        self.started = False
+        self.data = b''
         self.index = 0
         self.end = 0
 
     def next_frame(self):
         if self.end > self.index:
             raise SkoolKitError(f'{self.end - self.index} port reading(s) left for frame {self.context.frame_count}')
-        self.frame_index += 1
-        if self.frame_index > 0:
+        if self.started:
             self.context.frame_count += 1
-        while self.frame_index < len(self.frames):
-            frame = self.frames[self.frame_index]
-            if frame.fetch_counter > 0:
-                self.index = frame.start
-                self.end = frame.end
-                return frame.fetch_counter
-            self.frame_index += 1
+        self.started = True
+        for frame in self.frames:
+            fetch_counter, in_counter, data = frame
+            if fetch_counter > 0:
+                self.frame = frame
+                self.data = data
+                self.index = 0
+                self.end = len(data)
+                return fetch_counter
             self.context.frame_count += 1
+        self.frame = None
         return -1
 
     def read_port(self, registers, port):
@@ -152,12 +211,13 @@ def write_rzx(fname, context, rzx_blocks):
     rzx_data.extend(snapshot_data_z)
 
     tracer = context.simulator.tracer
-    frames = tracer.frames[tracer.frame_index:]
+    if tracer.frame:
+        frames = [tracer.frame, *tracer.frames]
+    else:
+        frames = []
     nf = len(frames)
     io_frames = bytearray()
-    for frame in frames:
-        fc = frame.fetch_counter
-        port_readings = tracer.data[frame.start:frame.end]
+    for fc, ic, port_readings in frames:
         ic = len(port_readings)
         io_frames.extend((fc % 256, fc // 256, ic % 256, ic // 256))
         io_frames.extend(port_readings)
@@ -174,57 +234,70 @@ def write_rzx(fname, context, rzx_blocks):
     rzx_data.extend(io_frames)
 
     for rzx_block in rzx_blocks:
-        rzx_data.extend(rzx_block.data)
+        rzx_data.extend(rzx_block.read())
 
     with open(fname, 'wb') as f:
         f.write(rzx_data)
 
-def parse_rzx(rzxfile):
-    data = read_bin_file(rzxfile)
+def read_rzx_blocks(rzxfile):
+    """Generate an (offset, block ID, block length, block data) tuple for each
+    block in an RZX file. For an input recording block, only the 18-byte
+    header is read; for any other block, the entire block is read."""
+    data = read_bin_file(rzxfile, 10)
     if data[:4] != b'RZX!' or len(data) < 10:
         raise SkoolKitError('Not an RZX file')
-    i = 10
+    with open(rzxfile, 'rb') as f:
+        offset = 10
+        f.seek(offset)
+        while True:
+            data = f.read(5)
+            if len(data) < 5:
+                break
+            block_id = data[0]
+            block_len = get_dword(data, 1)
+            if block_id == 0x80:
+                data += f.read(13)
+            else:
+                data += f.read(block_len - 5)
+            yield offset, block_id, block_len, data
+            offset += block_len
+            f.seek(offset)
+
+def get_input_recording(rzxfile, offset, block_len, data):
+    num_frames = get_dword(data, 5)
+    tstates = get_dword(data, 10)
+    flags = get_dword(data, 14)
+    input_rec = InputRecording(tstates, num_frames, rzxfile, offset + 18, block_len - 18, flags & 2)
+    if flags & 2:
+        # Check that the block data can be decompressed (at least initially)
+        with open(rzxfile, 'rb') as f:
+            f.seek(input_rec.offset)
+            try:
+                zlib.decompressobj().decompress(f.read(min(input_rec.length, 256)))
+            except zlib.error as e:
+                raise SkoolKitError(f'Failed to decompress input recording block: {e.args[0]}')
+    return input_rec
+
+def get_rzx_snapshot(data):
+    ext = ''.join(chr(b) for b in data[9:13] if b)
+    sdata = data[17:]
+    if data[5] & 2:
+        try:
+            sdata = zlib.decompress(sdata)
+        except zlib.error as e:
+            raise SkoolKitError(f'Failed to decompress snapshot: {e.args[0]}')
+    return Snapshot.get(sdata, ext)
+
+def parse_rzx(rzxfile):
     contents = []
-    while i < len(data):
-        block_id = data[i]
-        block_len = get_dword(data, i + 1)
+    for offset, block_id, block_len, data in read_rzx_blocks(rzxfile):
         if block_id == 0x30:
             # Snapshot
-            flags = data[i + 5]
-            if flags & 1 == 0:
-                ext = ''.join(chr(b) for b in data[i + 9:i + 13] if b)
-                sdata = data[i + 17:i + block_len]
-                if flags & 2:
-                    try:
-                        sdata = zlib.decompress(sdata)
-                    except zlib.error as e:
-                        raise SkoolKitError(f'Failed to decompress snapshot: {e.args[0]}')
-                contents.append(RZXBlock(data[i:i + block_len], Snapshot.get(sdata, ext)))
+            if data[5] & 1 == 0:
+                contents.append(RZXBlock(rzxfile, offset, block_len, get_rzx_snapshot(data)))
         elif block_id == 0x80:
             # Input recording
-            num_frames = get_dword(data, i + 5)
-            tstates = get_dword(data, i + 10)
-            flags = get_dword(data, i + 14)
-            frames = []
-            frames_data = data[i + 18:i + block_len]
-            if flags & 2:
-                try:
-                    frames_data = zlib.decompress(frames_data)
-                except zlib.error as e:
-                    raise SkoolKitError(f'Failed to decompress input recording block: {e.args[0]}')
-            contents.append(RZXBlock(data[i:i + block_len], InputRecording(tstates, frames, frames_data)))
-            j = 0
-            start = end = 0
-            for k in range(num_frames):
-                fetch_counter = get_word(frames_data, j)
-                in_counter = get_word(frames_data, j + 2)
-                if in_counter == 65535:
-                    j += 4
-                else:
-                    start = j + 4
-                    end = j = start + in_counter
-                frames.append(Frame(fetch_counter, start, end))
-        i += block_len
+            contents.append(RZXBlock(rzxfile, offset, block_len, get_input_recording(rzxfile, offset, block_len, data)))
     return contents
 
 def check_supported(snapshot, options):
@@ -329,7 +402,7 @@ def process_block(block, options, flags, context):
                 t0 = registers[25]
                 opcode = memory[pc]
                 if exec_map is not None:
-                    exec_map.add(pc)
+                    exec_map[pc >> 3] |= 1 << (pc & 7)
                 if opcode in (0xDD, 0xFD):
                     r0 = registers[15]
                     opcodes[opcode]()
@@ -341,7 +414,7 @@ def process_block(block, options, flags, context):
                     trace_exec(tracefile, context, fetch_counter, pc, t0)
         if draw:
             if is128k:
-                scr = memory.memory[1][:6912]
+                scr = list(memory.memory[1][:6912])
             else:
                 scr = memory[16384:23296]
             run = draw(scr, context.frame_count, tracer.border)
@@ -377,25 +450,23 @@ def process_block(block, options, flags, context):
 def run(infile, options, config):
     rzx_blocks = parse_rzx(infile)
     if options.snapshot:
-        rzx_blocks.insert(0, RZXBlock(None, Snapshot.get(options.snapshot)))
+        rzx_blocks.insert(0, RZXBlock(None, 0, 0, Snapshot.get(options.snapshot)))
     while rzx_blocks and isinstance(rzx_blocks[-1].obj, Snapshot):
         rzx_blocks.pop()
     if rzx_blocks and isinstance(rzx_blocks[0].obj, InputRecording):
         raise SkoolKitError('Missing snapshot')
 
+    screen = frame_writer = None
     if options.screen and rzx_blocks:
         is128k = rzx_blocks[0].obj.machine != '48K'
         screen = get_screen(options.scale, options.fps, os.path.basename(infile), is128k)
-    else:
-        screen = None
+    if options.frames and rzx_blocks:
+        is128k = rzx_blocks[0].obj.machine != '48K'
+        frame_writer = FrameWriter(options.frames, options.frame_step, options.scale, is128k, get_image_writer(), screen)
+        screen = frame_writer
     context = RZXContext(screen)
     if options.map:
-        context.exec_map = set()
-        if os.path.isfile(options.map):
-            with open(options.map) as f:
-                for line in f:
-                    if re.match(r'\$[0-9A-F]{4}', line):
-                        context.exec_map.add(int(line[1:5], 16))
+        context.exec_map = get_exec_map(options.map)
     if options.trace:
         context.tracefile = open(options.trace, 'w')
         trace_header = config['TraceHeader'].replace(r'\n', '\n')
@@ -406,21 +477,28 @@ def run(infile, options, config):
         context.operand_fmt = (op_fmt + ',' * (2 - op_fmt.count(','))).split(',')[:3]
     for block in rzx_blocks:
         if isinstance(block.obj, InputRecording):
-            context.total_frames += len(block.obj.frames)
+            context.total_frames += block.obj.num_frames
     if options.stop and options.stop > 0:
         context.total_frames = min(options.stop, context.total_frames)
 
     flags = parse_int(options.flags, 0)
-    while rzx_blocks:
-        process_block(rzx_blocks.pop(0).obj, options, flags, context)
-        if context.stop:
-            break
+    try:
+        while rzx_blocks:
+            process_block(rzx_blocks.pop(0).obj, options, flags, context)
+            if context.stop:
+                break
+    finally:
+        if frame_writer:
+            frame_count = frame_writer.close()
     if options.map:
-        with open(options.map, 'w') as f:
-            for addr in sorted(context.exec_map):
-                f.write(f'${addr:04X}\n')
+        write_exec_map(options.map, context.exec_map, config['MapFormat'])
     if context.tracefile:
         context.tracefile.close()
+    if frame_writer:
+        if frame_writer.apng:
+            print(f'Wrote {options.frames} ({frame_count} frames)')
+        else:
+            print(f'Wrote {frame_count} frames to {options.frames}')
     if options.dump:
         ext = options.dump.lower().rpartition('.')[2]
         if ext in ('szx', 'z80'):
@@ -480,6 +558,10 @@ def main(args):
     group.add_argument('--fps', type=int, default=config['ScreenFps'],
                        help="Run at this many frames per second (default: {}). "
                             "0 means maximum speed.".format(config['ScreenFps']))
+    group.add_argument('--frame-step', metavar='N', type=int, default=1,
+                       help='Capture every Nth frame with --frames (default: 1).')
+    group.add_argument('--frames', metavar='DIR|FILE.png',
+                       help="Write the screen contents of each frame to a numbered PNG file in DIR, or to an animated PNG file.")
     group.add_argument('-I', '--ini', dest='params', metavar='p=v', action='append', default=[],
                        help="Set the value of the configuration parameter 'p' to 'v'. This option may be used multiple times.")
     group.add_argument('--map', metavar='FILE',
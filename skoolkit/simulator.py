@@ -14,6 +14,8 @@
 # You should have received a copy of the GNU General Public License along with
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
+import struct
+
 from skoolkit import simutils
 from skoolkit.simutils import (FRAME_DURATIONS, INT_ACTIVE, A, F, B, C, D, E,
                                H, L, IXh, IXl, IYh, IYl, SP, SP2, I, R)
@@ -26,13 +28,298 @@ R1 = tuple((r & 0x80) + ((r + 1) % 128) for r in range(256))
 
 R2 = tuple((r & 0x80) + ((r + 2) % 128) for r in range(256))
 
+CHECKPOINT_REGISTERS = struct.Struct('<30Q')
+
+# Maximum number of instructions in a block
+MAX_BLOCK_LENGTH = 32
+
+# Number of times an address must be visited before a block is compiled there
+BLOCK_THRESHOLD = 4
+
+# Number of times a block may be invalidated (by self-modifying code) before no
+# more blocks are compiled at its address
+MAX_INVALIDATIONS = 2
+
+# Closure factories for instructions that change only the registers and PC
+# (by the length of the instruction), and so may appear in blocks
+BLOCK_OPS = frozenset((
+    'af_hl', 'af_n', 'af_r', 'af_xy', 'afc_hl', 'afc_n', 'afc_r', 'afc_xy',
+    'f_r', 'fc_r', 'adc_hl', 'add_rr', 'bit_hl', 'bit_r', 'bit_xy', 'cf',
+    'ex_af', 'ex_de_hl', 'exx', 'im', 'inc_dec_rr', 'ld_a_ir', 'ld_r_n',
+    'ld_r_r', 'ld_r_rr', 'ld_r_xy', 'ld_rr_nn', 'ld_a_m', 'ld_rr_mm',
+    'ld_sp_rr', 'neg', 'nop', 'pop', 'res_r', 'sbc_hl', 'set_r'
+))
+
 CONFIG = {
+    'block_cache': False,
     'fast_djnz': False,
     'fast_ldir': False,
     'frame_duration': FRAME_DURATIONS[0],
     'int_active': INT_ACTIVE[0]
 }
 
+def _flush(tstates, r_inc, pc):
+    lines = []
+    if tstates:
+        lines.append(f'r[25] += {tstates}')
+    if r_inc:
+        lines.append(f'r[15] = (r[15] & 128) + (r[15] + {r_inc}) % 128')
+    lines.append(f'r[24] = {pc}')
+    return lines
+
+def _indent(lines):
+    return ['    ' + s for s in lines]
+
+def _block_code(name, v, pc, end):
+    # Return the code for a straight-line instruction in a block, along with
+    # its timing, R register increment and length; a line of the form '@addr'
+    # marks where to check whether a write to 'addr' hit an opcode in the
+    # block
+    a1 = (pc + 1) % 65536
+    a2 = (pc + 2) % 65536
+    if end is not None:
+        size = (end - pc) % 65536
+        n1 = (end - 1) % 65536
+        n2 = (end - 2) % 65536
+        if name == 'nop':
+            return [], v['timing'], v['r_inc'], size
+        if name == 'ld_r_r' and v['r1'] != R:
+            return [f"r[{v['r1']}] = r[{v['r2']}]"], v['timing'], v['r_inc'], size
+        if name == 'ld_r_n':
+            return [f"r[{v['r']}] = m[{n1}]"], v['timing'], v['r_inc'], size
+        if name == 'ld_r_rr':
+            return [f"r[{v['r']}] = m[r[{v['rl']}] + 256 * r[{v['rh']}]]"], 7, 1, size
+        if name == 'ld_r_xy':
+            return [f"r[{v['r']}] = m[(r[{v['xyl']}] + 256 * r[{v['xyh']}] + OFFSETS[m[{a2}]]) % 65536]"], 19, 2, size
+        if name == 'ld_rr_nn':
+            if v['rl'] == SP:
+                return [f'r[12] = m[{n2}] + 256 * m[{n1}]'], v['timing'], v['r_inc'], size
+            return [f"r[{v['rl']}] = m[{n2}]", f"r[{v['rh']}] = m[{n1}]"], v['timing'], v['r_inc'], size
+        if name == 'ld_a_m':
+            return [f'r[0] = m[m[{a1}] + 256 * m[{a2}]]'], 13, 1, size
+        if name == 'inc_dec_rr':
+            if v['rl'] == SP:
+                return [f"r[12] = (r[12] + {v['inc']}) % 65536"], v['timing'], v['r_inc'], size
+            return [
+                f"rr = (r[{v['rl']}] + 256 * r[{v['rh']}] + {v['inc']}) % 65536",
+                f"r[{v['rh']}] = rr // 256",
+                f"r[{v['rl']}] = rr % 256"
+            ], v['timing'], v['r_inc'], size
+        if name == 'fc_r':
+            return [f"r[{v['r']}], r[1] = {v['fc']}[r[1] % 2][r[{v['r']}]]"], v['timing'], v['r_inc'], size
+        if name == 'f_r':
+            return [f"r[{v['r']}], r[1] = {v['f']}[r[{v['r']}]]"], 8, 2, size
+        if name == 'af_r':
+            return [f"r[:2] = {v['af']}[r[0]][r[{v['r']}]]"], v['timing'], v['r_inc'], size
+        if name == 'af_n':
+            return [f"r[:2] = {v['af']}[r[0]][m[{a1}]]"], 7, 1, size
+        if name == 'af_hl':
+            return [f"r[:2] = {v['af']}[r[0]][m[r[7] + 256 * r[6]]]"], 7, 1, size
+        if name == 'afc_r':
+            return [f"r[:2] = {v['afc']}[r[1] % 2][r[0]][r[{v['r']}]]"], v['timing'], v['r_inc'], size
+        if name == 'afc_n':
+            return [f"r[:2] = {v['afc']}[r[1] % 2][r[0]][m[{a1}]]"], 7, 1, size
+        if name == 'afc_hl':
+            return [f"r[:2] = {v['afc']}[r[1] % 2][r[0]][m[r[7] + 256 * r[6]]]"], 7, 1, size
+        if name == 'bit_r':
+            return [f"r[1] = {v['bit']}[r[1] % 2][{v['b']}][r[{v['reg']}]]"], 8, 2, size
+        if name == 'res_r':
+            return [f"r[{v['reg']}] &= {v['bit']}"], 8, 2, size
+        if name == 'set_r':
+            return [f"r[{v['reg']}] |= {v['bit']}"], 8, 2, size
+        if name == 'cf':
+            return [f"r[1] = {v['cf']}[r[1]][r[0]]"], 4, 1, size
+        if name == 'ex_af':
+            return ['r[0], r[16] = r[16], r[0]', 'r[1], r[17] = r[17], r[1]'], 4, 1, size
+        if name == 'ex_de_hl':
+            return ['r[4], r[6] = r[6], r[4]', 'r[5], r[7] = r[7], r[5]'], 4, 1, size
+        if name == 'exx':
+            return ['r[2:8], r[18:24] = r[18:24], r[2:8]'], 4, 1, size
+        if name == 'add_rr':
+            return [
+                f"addend_v = r[{v['rl']}] + 256 * r[{v['rh']}]",
+                f"augend_v = r[{v['al']}] + 256 * r[{v['ah']}]",
+                'result = augend_v + addend_v',
+                'if result > 0xFFFF:',
+                '    result %= 65536',
+                '    f = (r[1] & 0xC4) + 0x01',
+                'else:',
+                '    f = r[1] & 0xC4',
+                'if (augend_v % 4096) + (addend_v % 4096) > 0x0FFF:',
+                '    f += 0x10',
+                'result_hi = result // 256',
+                'r[1] = f + (result_hi & 0x28)',
+                f"r[{v['al']}] = result % 256",
+                f"r[{v['ah']}] = result_hi"
+            ], v['timing'], v['r_inc'], size
+        if name == 'adc_hl':
+            return [
+                f"rr = r[{v['rl']}] + 256 * r[{v['rh']}]",
+                'h = r[6]',
+                'hl = r[7] + 256 * h',
+                'result = hl + rr + r[1] % 2',
+                'if result > 0xFFFF:',
+                '    result %= 65536',
+                '    f = 0x01',
+                'else:',
+                '    f = 0',
+                'if result == 0:',
+                '    f += 0x40',
+                'r_h = result // 256',
+                'f += (h ^ (rr // 256) ^ r_h) & 0x10',
+                'if hl ^ rr < 0x8000 and hl ^ result > 0x7FFF:',
+                '    f += 0x04',
+                'r[1] = f + (r_h & 0xA8)',
+                'r[7] = result % 256',
+                'r[6] = r_h'
+            ], 15, 2, size
+        if name == 'sbc_hl':
+            return [
+                f"rr = r[{v['rl']}] + 256 * r[{v['rh']}]",
+                'h = r[6]',
+                'hl = r[7] + 256 * h',
+                'rr_c = rr + (r[1] % 2)',
+                'result = (hl - rr_c) % 65536',
+                'r_h = result // 256',
+                'if hl < rr_c:',
+                '    f = 0x03',
+                'else:',
+                '    f = 0x02',
+                'if result == 0:',
+                '    f += 0x40',
+                'f += (h ^ (rr // 256) ^ r_h) & 0x10',
+                'if hl ^ rr > 0x7FFF and hl ^ result > 0x7FFF:',
+                '    f += 0x04',
+                'r[1] = f + (r_h & 0xA8)',
+                'r[7] = result % 256',
+                'r[6] = r_h'
+            ], 15, 2, size
+        if name == 'pop':
+            return [
+                'sp = r[12]',
+                'r[12] = (sp + 2) % 65536',
+                f"r[{v['rl']}] = m[sp]",
+                f"r[{v['rh']}] = m[(sp + 1) % 65536]"
+            ], v['timing'], v['r_inc'], size
+        return None
+
+    if name == 'ld_rr_r':
+        return [
+            f"addr = r[{v['rl']}] + 256 * r[{v['rh']}]",
+            'if addr > 0x3FFF:',
+            f"    m[addr] = r[{v['r']}]",
+            '@addr'
+        ], 7, 1, 1
+    if name == 'ld_hl_n':
+        return [
+            'addr = r[7] + 256 * r[6]',
+            'if addr > 0x3FFF:',
+            f'    m[addr] = m[{a1}]',
+            '@addr'
+        ], 10, 1, 2
+    if name == 'ld_m_a':
+        return [
+            f'addr = m[{a1}] + 256 * m[{a2}]',
+            'if addr > 0x3FFF:',
+            '    m[addr] = r[0]',
+            '@addr'
+        ], 13, 1, 3
+    if name == 'ld_xy_r':
+        return [
+            f"addr = (r[{v['xyl']}] + 256 * r[{v['xyh']}] + OFFSETS[m[{a2}]]) % 65536",
+            'if addr > 0x3FFF:',
+            f"    m[addr] = r[{v['r']}]",
+            '@addr'
+        ], 19, 2, 3
+    if name == 'fc_hl':
+        return [
+            'addr = r[7] + 256 * r[6]',
+            f"value, r[1] = {v['fc']}[r[1] % 2][m[addr]]",
+            'if addr > 0x3FFF:',
+            '    m[addr] = value',
+            '@addr'
+        ], v['timing'], v['r_inc'], v['size']
+    if name == 'push':
+        return [
+            'sp = (r[12] - 2) % 65536',
+            'r[12] = sp',
+            'if sp > 0x3FFF:',
+            f"    m[sp] = r[{v['rl']}]",
+            'sp1 = (sp + 1) % 65536',
+            'if sp1 > 0x3FFF:',
+            f"    m[sp1] = r[{v['rh']}]",
+            '@sp',
+            '@sp1'
+        ], v['timing'], v['r_inc'], v['size']
+    return None
+
+def _branch_code(name, v, pc, tstates, r_inc):
+    # Return the code for a branch instruction that ends a block (including
+    # the pending T-states and R register increments), along with the
+    # maximum number of T-states that the block may take
+    a1 = (pc + 1) % 65536
+    a2 = (pc + 2) % 65536
+    a3 = (pc + 3) % 65536
+    if name in ('jr', 'jp', 'call', 'ret'):
+        c_and, c_val = v['c_and'], v['c_val']
+    if name == 'jr':
+        lines = [f'r[25] += {tstates + 12}', f'r[24] = ({pc} + JR_OFFSETS[m[{a1}]]) % 65536']
+        if c_and or c_val:
+            lines = [f'if r[1] & {c_and} == {c_val}:', *_indent(lines),
+                     'else:', f'    r[25] += {tstates + 7}', f'    r[24] = {a2}']
+        timing = 12
+    elif name == 'jp':
+        lines = [f'r[24] = m[{a1}] + 256 * m[{a2}]']
+        if c_and or c_val:
+            lines = [f'if r[1] & {c_and} == {c_val}:', *_indent(lines), 'else:', f'    r[24] = {a3}']
+        lines.append(f'r[25] += {tstates + 10}')
+        timing = 10
+    elif name == 'djnz':
+        lines = [
+            'b = (r[2] - 1) % 256',
+            'r[2] = b',
+            'if b:',
+            f'    r[25] += {tstates + 13}',
+            f'    r[24] = ({pc} + JR_OFFSETS[m[{a1}]]) % 65536',
+            'else:',
+            f'    r[25] += {tstates + 8}',
+            f'    r[24] = {a2}'
+        ]
+        timing = 13
+    elif name == 'ret':
+        lines = [
+            'sp = r[12]',
+            'r[12] = (sp + 2) % 65536',
+            'r[24] = m[sp] + 256 * m[(sp + 1) % 65536]'
+        ]
+        if c_and:
+            lines = [f'if r[1] & {c_and} == {c_val}:', f'    r[25] += {tstates + 5}', f'    r[24] = {a1}',
+                     'else:', f'    r[25] += {tstates + 11}', *_indent(lines)]
+            timing = 11
+        else:
+            lines.insert(0, f'r[25] += {tstates + 10}')
+            timing = 10
+    elif name == 'call':
+        lines = [
+            f'r[24] = m[{a1}] + 256 * m[{a2}]',
+            'sp = (r[12] - 2) % 65536',
+            'r[12] = sp',
+            'if sp > 0x3FFF:',
+            f'    m[sp] = {a3 % 256}',
+            'sp = (sp + 1) % 65536',
+            'if sp > 0x3FFF:',
+            f'    m[sp] = {a3 // 256}',
+            f'r[25] += {tstates + 17}'
+        ]
+        if c_and:
+            lines = [f'if r[1] & {c_and} == {c_val}:', f'    r[25] += {tstates + 10}', f'    r[24] = {a3}',
+                     'else:', *_indent(lines)]
+        timing = 17
+    else:
+        return None
+    lines.append(f'r[15] = (r[15] & 128) + (r[15] + {r_inc + 1}) % 128')
+    return lines, timing
+
 class Simulator:
     def __init__(self, memory, registers=None, state=None, config=None):
         self.memory = memory
@@ -48,6 +335,13 @@ class Simulator:
             self.after_ED[0xB0] = self.ldir_fast(self.registers, self.memory, 1)
             self.after_ED[0xB8] = self.ldir_fast(self.registers, self.memory, -1)
         self.int_active = cfg['int_active']
+        if cfg['block_cache']:
+            self.blocks = {}
+        else:
+            self.blocks = None
+        self.visits = {}
+        self.invalidations = {}
+        self.blocks_key = None
         self.set_tracer(None)
 
     def set_tracer(self, tracer, in_r_c=True, ini=True):
@@ -65,6 +359,29 @@ class Simulator:
         if hasattr(tracer, 'write_port'):
             self.out_tracer = tracer.write_port
 
+    def checkpoint(self):
+        memory = self.memory
+        if len(memory) == 0x20000:
+            data = bytes([memory.o7ffd]) + b''.join(bytes(bank) for bank in memory.banks)
+        else:
+            data = bytes(memory[0:0x10000])
+        return CHECKPOINT_REGISTERS.pack(*self.registers) + data
+
+    def restore(self, checkpoint):
+        memory = self.memory
+        size = CHECKPOINT_REGISTERS.size + (0x20001 if len(memory) == 0x20000 else 0x10000)
+        if len(checkpoint) != size:
+            raise ValueError(f'checkpoint length is {len(checkpoint)} (expected {size})')
+        self.registers[:] = CHECKPOINT_REGISTERS.unpack_from(checkpoint)
+        i = CHECKPOINT_REGISTERS.size
+        if len(memory) == 0x20000:
+            for bank in memory.banks:
+                bank[:] = checkpoint[i + 1:i + 0x4001]
+                i += 0x4000
+            memory.out7ffd(checkpoint[CHECKPOINT_REGISTERS.size])
+        else:
+            memory[0:0x10000] = checkpoint[i:]
+
     def run(self, start=None, stop=None, interrupts=False):
         opcodes = self.opcodes
         memory = self.memory
@@ -75,6 +392,8 @@ class Simulator:
 
         if stop is None:
             opcodes[memory[pc]]()
+        elif self.blocks is not None:
+            self.run_blocks(pc, stop, interrupts)
         elif interrupts:
             frame_duration = self.frame_duration
             int_active = self.int_active
@@ -101,6 +420,204 @@ class Simulator:
                 if pc == stop:
                     break
 
+    def run_blocks(self, pc, stop, interrupts):
+        # Run from 'pc' until 'stop' is reached, using compiled blocks where
+        # possible, and return the number of instructions executed
+        opcodes = self.opcodes
+        memory = self.memory
+        registers = self.registers
+        blocks = self.blocks
+        if (stop, interrupts) != self.blocks_key:
+            blocks.clear()
+            self.visits.clear()
+            self.invalidations.clear()
+            self.blocks_key = (stop, interrupts)
+        get_block = self.get_block
+        invalidate_block = self.invalidate_block
+        operations = 0
+
+        if interrupts:
+            frame_duration = self.frame_duration
+            int_active = self.int_active
+            frame_start = (registers[25] // frame_duration) * frame_duration
+            if registers[25] < frame_start + int_active:
+                next_int = frame_start
+            else:
+                next_int = frame_start + frame_duration
+            while True:
+                block, tstates = blocks.get(pc) or get_block(pc, stop, True)
+                if block and registers[25] + tstates < next_int:
+                    count = block()
+                    if count > 0:
+                        operations += count
+                        pc = registers[24]
+                        if pc == stop:
+                            break
+                        continue
+                    if count < 0:
+                        invalidate_block(pc)
+                        continue
+                opcodes[memory[pc]]()
+                operations += 1
+                if registers[25] >= next_int:
+                    if registers[25] < next_int + int_active:
+                        if registers[26]:
+                            self.accept_interrupt(registers, memory, pc)
+                    else:
+                        next_int += frame_duration
+                pc = registers[24]
+                if pc == stop:
+                    break
+        else:
+            while True:
+                block = (blocks.get(pc) or get_block(pc, stop, False))[0]
+                if block:
+                    count = block()
+                    if count < 0:
+                        invalidate_block(pc)
+                        continue
+                    operations += count
+                else:
+                    opcodes[memory[pc]]()
+                    operations += 1
+                pc = registers[24]
+                if pc == stop:
+                    break
+        return operations
+
+    def get_block(self, pc, stop, interrupts):
+        visits = self.visits.get(pc, 0) + 1
+        self.visits[pc] = visits
+        if visits < BLOCK_THRESHOLD:
+            return None, 0
+        block = self.blocks[pc] = self.compile_block(pc, stop, interrupts)
+        return block
+
+    def invalidate_block(self, pc):
+        # Discard the block at 'pc' (because an opcode in it has changed), and
+        # stop compiling blocks there if this keeps happening
+        invalidations = self.invalidations.get(pc, 0) + 1
+        self.invalidations[pc] = invalidations
+        if invalidations < MAX_INVALIDATIONS:
+            del self.blocks[pc]
+            self.visits[pc] = 0
+        else:
+            self.blocks[pc] = (None, 0)
+
+    def compile_block(self, start, stop, interrupts):
+        # Translate the instructions from 'start' up to and including the next
+        # branch (or up to but not including the stop address) into a function
+        # that checks that their opcodes are unchanged, executes them, and
+        # returns their number (or -1 if any opcode has changed); with
+        # interrupts, the block also ends before any instruction whose timing
+        # is not known in advance, because it must not run past the start of
+        # the next interrupt, and so its maximum duration is also returned
+        memory = self.memory
+        registers = self.registers
+        saved = registers[:]
+        namespace = {'m': memory, 'r': registers, 'OFFSETS': OFFSETS, 'JR_OFFSETS': JR_OFFSETS}
+        tables = {}
+        addresses = {}
+        lines = []
+        tstates = r_inc = count = duration = 0
+        pc = start
+        flush = True
+        while count < MAX_BLOCK_LENGTH:
+            opcode = addresses[pc] = memory[pc]
+            if opcode in (0xCB, 0xED, 0xDD, 0xFD):
+                a1 = (pc + 1) % 65536
+                op1 = addresses[a1] = memory[a1]
+                if opcode == 0xCB:
+                    func = self.after_CB[op1]
+                elif opcode == 0xED:
+                    func = self.after_ED[op1]
+                elif op1 == 0xCB:
+                    a3 = (pc + 3) % 65536
+                    op3 = addresses[a3] = memory[a3]
+                    if opcode == 0xDD:
+                        func = self.after_DDCB[op3]
+                    else:
+                        func = self.after_FDCB[op3]
+                elif opcode == 0xDD:
+                    func = self.after_DD[op1]
+                else:
+                    func = self.after_FD[op1]
+            else:
+                func = self.opcodes[opcode]
+            cls_name, op_name = (['', ''] + func.__qualname__.split('.'))[-4:-2]
+            if op_name in BLOCK_OPS:
+                registers[24] = pc
+                t0 = registers[25]
+                func()
+                end = registers[24]
+                timing = registers[25] - t0
+            else:
+                end = None
+            code = None
+            if cls_name == 'Simulator':
+                values = {}
+                for name, cell in zip(func.__code__.co_freevars, func.__closure__):
+                    value = cell.cell_contents
+                    if name == 'r_inc':
+                        value = 1 if value is R1 else 2
+                    elif isinstance(value, (list, tuple)) and name not in ('registers', 'memory'):
+                        if id(value) not in tables:
+                            tables[id(value)] = f't{len(tables)}'
+                            namespace[tables[id(value)]] = value
+                        value = tables[id(value)]
+                    values[name] = value
+                code = _block_code(op_name, values, pc, end)
+                if code is None and end is None:
+                    code = _branch_code(op_name, values, pc, tstates, r_inc)
+            if code and len(code) == 2:
+                # Branch
+                count += 1
+                lines.extend(code[0])
+                duration += code[1]
+                flush = False
+                break
+            if code:
+                count += 1
+                timing, inc, size = code[1:]
+                tstates += timing
+                r_inc += inc
+                duration += timing
+                pc = (pc + size) % 65536
+                for line in code[0]:
+                    if line.startswith('@'):
+                        lines.append(f'if {line[1:]} in ops:')
+                        lines.extend(_indent(_flush(tstates, r_inc, pc)))
+                        lines.append(f'    return {count}')
+                    else:
+                        lines.append(line)
+            elif interrupts and (end is None or cls_name != 'Simulator'):
+                break
+            else:
+                count += 1
+                lines.extend(_flush(tstates, r_inc, pc))
+                tstates = r_inc = 0
+                namespace[f'f{count}'] = func
+                lines.append(f'f{count}()')
+                if end is None:
+                    flush = False
+                    break
+                duration += timing
+                pc = end
+            if pc == stop:
+                break
+        registers[:] = saved
+        if flush:
+            lines.extend(_flush(tstates, r_inc, pc))
+        namespace['ops'] = frozenset(addresses)
+
+        check = ' and '.join(f'm[{a}] == {v}' for a, v in addresses.items())
+        args = ', '.join(f'{n}={n}' for n in namespace)
+        source = [f'def block({args}):', f'    if {check}:']
+        source.extend(_indent(_indent(lines)))
+        source.extend((f'        return {count}', '    return -1'))
+        exec('\n'.join(source), namespace)
+        return namespace['block'], duration
+
     def accept_interrupt(self, registers, memory, prev_pc):
         opcode = memory[prev_pc]
         pc = registers[24]
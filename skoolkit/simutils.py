@@ -15,6 +15,7 @@
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
 import array
+from concurrent.futures import ThreadPoolExecutor
 
 from skoolkit import ROM48, read_bin_file
 from skoolkit.pagingtracer import Memory
@@ -206,3 +207,33 @@ def get_registers(config, state, as_array=True):
     registers[HALT] = state.get('halted', 0)
     registers[T] = state.get('tstates', 0)
     return registers
+
+def run_many(simulators, start=None, stop=None, interrupts=False, jobs=None):
+    """Run each of a list of simulators on a thread pool and return their final
+    register values.
+
+    A CSimulator or CCMIOSimulator that has no port tracers releases the GIL
+    while running, so two or more of them can run in parallel. Each simulator
+    must be distinct, and must not be used by any other thread until this
+    function returns.
+
+    :param simulators: The simulators.
+    :param start: The start address (or `None` to start at the current value
+                  of PC).
+    :param stop: The stop address.
+    :param interrupts: Whether to execute interrupt routines.
+    :param jobs: The maximum number of threads to use (default: the default
+                 for `ThreadPoolExecutor`).
+    :return: A list of the registers of each simulator after it has finished
+             running.
+    """
+    kwargs = {'interrupts': interrupts}
+    if start is not None:
+        kwargs['start'] = start
+    if stop is not None:
+        kwargs['stop'] = stop
+    with ThreadPoolExecutor(jobs) as executor:
+        futures = [executor.submit(s.run, **kwargs) for s in simulators]
+        for future in futures:
+            future.result()
+    return [list(s.registers) for s in simulators]
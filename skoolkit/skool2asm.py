@@ -24,6 +24,7 @@ from skoolkit.config import get_config, show_config, update_options
 from skoolkit.refparser import RefParser
 from skoolkit.skoolasm import AsmWriter, TEMPLATES
 from skoolkit.skoolparser import SkoolParser
+from skoolkit.skoolutils import SkoolCache
 
 def clock(quiet, prefix, operation, *args, **kwargs):
     go = time.time()
@@ -47,9 +48,14 @@ def run(skoolfile, options, config):
         fname = skoolfile
     asm_mode = options.asm_mode + 4 * int(options.force)
     label_fmt = (config['EntryLabel'], config['EntryPointLabel'])
+    if options.skool_cache:
+        cache = SkoolCache(options.skool_cache)
+    else:
+        cache = None
     parser = clock(options.quiet, 'Parsed {}'.format(fname), SkoolParser, skoolfile,
                    options.case, options.base, asm_mode, options.warn, options.fix_mode, False,
-                   options.create_labels, True, label_fmt, options.start, options.end, options.variables)
+                   options.create_labels, True, label_fmt, options.start, options.end, options.variables,
+                   cache=cache)
 
     # Write the ASM file
     cls_name = options.writer or parser.asm_writer_class
@@ -112,6 +118,8 @@ def main(args):
                        help="Apply safe substitutions (@ssub) and relocatability\nsubstitutions (@rsub) (implies '-f 1').")
     group.add_argument('--show-config', dest='show_config', action='store_true',
                        help="Show configuration parameter values.")
+    group.add_argument('--skool-cache', dest='skool_cache', metavar='DIR', default=config['SkoolCache'],
+                       help="Cache parsed skool files in this directory.")
     group.add_argument('-s', '--ssub', dest='asm_mode', action='store_const', const=2, default=1,
                        help="Apply safe substitutions (@ssub).")
     group.add_argument('-S', '--start', dest='start', metavar='ADDR', type=integer, default=0,
@@ -20,11 +20,11 @@ from os.path import basename
 
 from skoolkit import SkoolParsingError, get_int_param, info, integer, open_file, parse_int, warn, VERSION
 from skoolkit.config import get_config, show_config, update_options
-from skoolkit.components import get_assembler, get_instruction_utility
+from skoolkit.components import get_assembler, get_instruction_utility, get_value
 from skoolkit.skoolmacro import MacroParsingError, parse_if
 from skoolkit.skoolutils import (DIRECTIVES, Memory, parse_address_range, parse_asm_bank_directive,
                                  parse_asm_bytes_directive, parse_asm_data_directive, parse_asm_keep_directive,
-                                 parse_asm_nowarn_directive, parse_asm_sub_fix_directive, read_skool)
+                                 parse_asm_nowarn_directive, parse_asm_sub_fix_directive, read_skool, SkoolCache)
 from skoolkit.textutils import partition_unquoted
 
 VALID_CTLS = DIRECTIVES + ' *'
@@ -55,7 +55,7 @@ class Instruction:
 
 class BinWriter:
     def __init__(self, skoolfile, asm_mode=0, fix_mode=0, banks=False, start=-1, end=65537,
-                 data=False, verbose=False, warn=False, pad_left=65536, pad_right=0):
+                 data=False, verbose=False, warn=False, pad_left=65536, pad_right=0, cache=None):
         if fix_mode > 2:
             asm_mode = 3
         elif asm_mode > 2:
@@ -91,9 +91,26 @@ class BinWriter:
         self.instructions = []
         self.address_map = {}
         self.assembler = get_assembler()
+        self._messages = []
+        self._deps = []
+
+        key = None
+        if cache:
+            key = cache.get_key(skoolfile, 'BinWriter', asm_mode, fix_mode, banks, start, end, data, verbose, warn,
+                                get_value('Assembler'), get_value('InstructionUtility'))
+            state = cache.load(key)
+            if state:
+                self.snapshot, self.base_address, self.end_address, messages = state
+                for warning, message in messages:
+                    self._log(warning, message)
+                return
+
         self._parse_skool(skoolfile)
         self._relocate()
 
+        if key:
+            cache.save(key, (self.snapshot, self.base_address, self.end_address, self._messages), self._deps)
+
     def _reset(self, data):
         self.subs = defaultdict(list, {(0, 0): ()})
         self.keep = None
@@ -225,6 +242,9 @@ class BinWriter:
                 'warn': False
             }
             parse_asm_bank_directive(directive, self.snapshot, BinWriter, **bw_args)
+            bank_file = directive[5:].partition(',')[2]
+            if bank_file:
+                self._deps.append(bank_file)
         return address
 
     def _poke(self, instruction, data):
@@ -233,11 +253,18 @@ class BinWriter:
         self.base_address = min(self.base_address, address)
         self.end_address = max(self.end_address, address + len(data))
         if self.verbose:
-            info(str(instruction))
+            self._log(False, str(instruction))
 
     def _warn(self, message, instruction):
         if self.warn:
-            warn('{}:\n  {}'.format(message, instruction))
+            self._log(True, '{}:\n  {}'.format(message, instruction))
+
+    def _log(self, warning, message):
+        self._messages.append((warning, message))
+        if warning:
+            warn(message)
+        else:
+            info(message)
 
     def _relocate(self):
         get_instruction_utility().substitute_labels(self.entries, self.remote_entries, self.address_map, self.asm_mode, self._warn)
@@ -285,9 +312,13 @@ class BinWriter:
         info("Wrote {}: start={}, end={}, size={}".format(binfile, base_address, end_address, len(data)))
 
 def run(skoolfile, binfile, options, config):
+    if options.skool_cache:
+        cache = SkoolCache(options.skool_cache)
+    else:
+        cache = None
     binwriter = BinWriter(skoolfile, options.asm_mode, options.fix_mode, options.banks, options.start,
                           options.end, options.data, options.verbose, options.warn,
-                          config['PadLeft'], config['PadRight'])
+                          config['PadLeft'], config['PadRight'], cache)
     binwriter.write(binfile)
 
 def main(args):
@@ -323,6 +354,8 @@ def main(args):
                        help="Apply @ofix, @bfix and @rfix directives (implies --rsub).")
     group.add_argument('--show-config', dest='show_config', action='store_true',
                        help="Show configuration parameter values.")
+    group.add_argument('--skool-cache', dest='skool_cache', metavar='DIR', default=config['SkoolCache'],
+                       help="Cache parsed skool files in this directory.")
     group.add_argument('-s', '--ssub', dest='asm_mode', action='store_const', const=2, default=0,
                        help="Apply @isub and @ssub directives.")
     group.add_argument('-S', '--start', dest='start', metavar='ADDR', type=integer, default=-1,
@@ -20,11 +20,16 @@ from skoolkit import integer, VERSION
 from skoolkit.config import get_config, show_config, update_options
 from skoolkit.skoolctl import (CtlWriter, ASM_DIRECTIVES, BLOCKS, BLOCK_TITLES, BLOCK_DESC,
                                REGISTERS, BLOCK_COMMENTS, SUBBLOCKS, COMMENTS, NON_ENTRY_BLOCKS)
+from skoolkit.skoolutils import SkoolCache
 
 def run(skoolfile, options):
+    if options.skool_cache:
+        cache = SkoolCache(options.skool_cache)
+    else:
+        cache = None
     writer = CtlWriter(skoolfile, options.elements, options.write_hex,
                        options.preserve_base, options.start, options.end,
-                       options.keep_lines)
+                       options.keep_lines, cache)
     writer.write()
 
 def main(args):
@@ -53,6 +58,8 @@ def main(args):
                        help='Write addresses in lower case hexadecimal format.')
     group.add_argument('--show-config', dest='show_config', action='store_true',
                        help="Show configuration parameter values.")
+    group.add_argument('--skool-cache', dest='skool_cache', metavar='DIR', default=config['SkoolCache'],
+                       help="Cache parsed skool files in this directory.")
     group.add_argument('-S', '--start', dest='start', metavar='ADDR', type=integer, default=0,
                        help="Start converting at this address.")
     group.add_argument('-V', '--version', action='version',
@@ -15,6 +15,7 @@
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
 import glob
+import multiprocessing
 import sys
 import os
 from os.path import isfile, isdir, basename, dirname
@@ -29,8 +30,9 @@ from skoolkit import (defaults, SkoolKitError, find_file, show_package_dir,
                       CASE_LOWER)
 from skoolkit.config import get_config, show_config, update_options
 from skoolkit.refparser import RefParser
-from skoolkit.skoolhtml import FileInfo
+from skoolkit.skoolhtml import FileInfo, ImageCache
 from skoolkit.skoolparser import SkoolParser
+from skoolkit.skoolutils import SkoolCache
 
 SEARCH_DIRS = (
     '',
@@ -84,6 +86,107 @@ def clock(operation, prefix, *args, **kwargs):
         notify('({0:0.2f}s)'.format(time.time() - go))
     return result
 
+def _run_jobs(jobs, tasks, file_info=None, get_state=None):
+    durations = [0] * len(tasks)
+    if jobs < 2 or len(tasks) < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+        for i, (func, args) in enumerate(tasks):
+            go = time.time()
+            func(*args)
+            durations[i] = time.time() - go
+        return durations
+
+    state = get_state() if get_state else None
+
+    ctx = multiprocessing.get_context('fork')
+    jobs = min(jobs, len(tasks))
+    workers = []
+    sys.stdout.flush()
+    sys.stderr.flush()
+    for n in range(jobs):
+        conn_r, conn_w = ctx.Pipe(False)
+        worker = ctx.Process(target=_run_job, args=(tasks, range(n, len(tasks), jobs), file_info, get_state, state, conn_w))
+        worker.start()
+        conn_w.close()
+        workers.append((worker, conn_r))
+    error = None
+    changed = False
+    results = []
+    for worker, conn in workers:
+        try:
+            timings, updates, exc, state_changed = conn.recv()
+        except EOFError:
+            timings, updates, exc, state_changed = (), None, None, False
+        results.append((timings, updates))
+        worker.join()
+        if exc is None and worker.exitcode:
+            exc = SkoolKitError('Worker process exited with code {}'.format(worker.exitcode))
+        error = error or exc
+        changed = changed or state_changed
+    if changed:
+        # A page changed the state (variables, memory snapshot etc.) that
+        # later pages may depend on, so write every page again in order
+        return _run_jobs(1, tasks)
+    if error:
+        raise error
+    for timings, updates in results:
+        for i, duration in timings:
+            durations[i] = duration
+        if updates:
+            file_info.apply_updates(updates)
+    return durations
+
+def _run_job(tasks, indexes, file_info, get_state, state, conn):
+    timings = []
+    changed = False
+    if file_info:
+        file_info.clear_updates()
+    try:
+        for i in indexes:
+            func, args = tasks[i]
+            go = time.time()
+            func(*args)
+            timings.append((i, time.time() - go))
+            if get_state and get_state() != state:
+                changed = True
+                break
+        exc = None
+    except SkoolKitError as e:
+        exc = e
+    except Exception as e:
+        exc = SkoolKitError('{}: {}'.format(e.__class__.__name__, e))
+    if file_info:
+        updates = file_info.get_updates()
+    else:
+        updates = None
+    sys.stderr.flush()
+    conn.send((timings, updates, exc, changed))
+    conn.close()
+
+def write_files(jobs, tasks, file_info=None, get_state=None):
+    if jobs < 2:
+        for message, func, args in tasks:
+            clock(func, message, *args)
+        return
+    go = time.time()
+    durations = _run_jobs(jobs, [t[1:] for t in tasks], file_info, get_state)
+    if verbose:
+        for (message, func, args), duration in zip(tasks, durations):
+            if show_timings:
+                notify('{} ({:0.2f}s)'.format(message, duration))
+            else:
+                notify(message)
+        if show_timings and len(tasks) > 1:
+            notify('Wrote {} files using {} jobs ({:0.2f}s)'.format(len(tasks), min(jobs, len(tasks)), time.time() - go))
+
+def write_entries(html_writer, write_method, message, jobs, *args):
+    if jobs < 2 or html_writer.asm_single_page:
+        clock(write_method, message, *args)
+    else:
+        count = len(html_writer.memory_map)
+        size = max(-(-count // jobs), 1)
+        chunks = [(*args, range(i, min(i + size, count))) for i in range(0, count, size)]
+        clock(_run_jobs, message, jobs, [(write_method, c) for c in chunks], html_writer.file_info, html_writer.get_state_digest)
+
 def _get_search_dirs(extra_search_dirs, first_search_dir=None):
     if first_search_dir:
         search_dirs = [first_search_dir]
@@ -212,14 +315,22 @@ def run(infiles, options, config):
     label_fmt = (config['EntryLabel'], config['EntryPointLabel'])
 
     # Parse the skool file and initialise the writer
+    if options.skool_cache:
+        skool_cache = SkoolCache(options.skool_cache)
+    else:
+        skool_cache = None
     skool_parser = clock(SkoolParser, 'Parsing {}'.format(fname), skoolfile, case=options.case, base=options.base,
                          html=True, create_labels=options.create_labels, asm_labels=options.asm_labels, label_fmt=label_fmt,
-                         variables=options.variables)
+                         variables=options.variables, cache=skool_cache)
     if options.output_dir == '.':
         topdir = ''
     else:
         topdir = normpath(options.output_dir)
-    file_info = FileInfo(topdir, game_dir, options.new_images, options.new_audio)
+    if options.image_cache:
+        image_cache = ImageCache(options.image_cache, config['ImageCacheSize'] * 1048576)
+    else:
+        image_cache = None
+    file_info = FileInfo(topdir, game_dir, options.new_images, options.new_audio, options.incremental, image_cache)
     html_writer = html_writer_class(skool_parser, ref_parser, file_info)
 
     # Check that the specified pages exist
@@ -229,9 +340,9 @@ def run(infiles, options, config):
             raise SkoolKitError('Invalid page ID: {0}'.format(page_id))
     pages = options.pages or all_page_ids
 
-    write_disassembly(html_writer, options.files, ref_search_dir, options.search, pages, options.themes, options.single_css)
+    write_disassembly(html_writer, options.files, ref_search_dir, options.search, pages, options.themes, options.single_css, options.jobs)
 
-def write_disassembly(html_writer, files, search_dir, extra_search_dirs, pages, css_themes, single_css):
+def write_disassembly(html_writer, files, search_dir, extra_search_dirs, pages, css_themes, single_css, jobs=1):
     paths = html_writer.paths
     game_vars = html_writer.game_vars
 
@@ -267,19 +378,24 @@ def write_disassembly(html_writer, files, search_dir, extra_search_dirs, pages,
             message = 'Writing ' + normpath(paths['AsmSinglePage'])
         else:
             message = 'Writing disassembly files in ' + normpath(html_writer.code_path)
-        clock(html_writer.write_asm_entries, message)
+        write_entries(html_writer, html_writer.write_asm_entries, message, jobs)
 
     # Write the memory map files
     if 'm' in files:
-        for map_name in html_writer.main_memory_maps:
-            clock(html_writer.write_map, 'Writing ' + normpath(paths[map_name]), map_name)
+        tasks = [('Writing ' + normpath(paths[m]), html_writer.write_map, (m,)) for m in html_writer.main_memory_maps]
+        write_files(jobs, tasks, html_writer.file_info, html_writer.get_state_digest)
 
     # Write pages defined by [Page:*] sections
     if 'P' in files:
+        tasks = []
         for page_id in pages:
             page_details = html_writer.pages[page_id]
             copy_resources(search_dir, extra_search_dirs, odir, page_details.get('JavaScript'), js_path)
-            clock(html_writer.write_page, 'Writing ' + normpath(paths[page_id]), page_id)
+            tasks.append(('Writing ' + normpath(paths[page_id]), html_writer.write_page, (page_id,)))
+            if jobs < 2:
+                write_files(jobs, tasks)
+                tasks = []
+        write_files(jobs, tasks, html_writer.file_info, html_writer.get_state_digest)
 
     # Write other code files
     if 'o' in files:
@@ -297,12 +413,19 @@ def write_disassembly(html_writer, files, search_dir, extra_search_dirs, pages,
                 message = 'Writing ' + normpath(paths[code['AsmSinglePageId']])
             else:
                 message = 'Writing disassembly files in ' + normpath(asm_path)
-            clock(html_writer2.write_entries, message, asm_path, map_path)
+            write_entries(html_writer2, html_writer2.write_entries, message, jobs, asm_path, map_path)
 
     # Write index.html
     if 'i' in files:
         clock(html_writer.write_index, 'Writing ' + normpath(paths['GameIndex']))
 
+    html_writer.file_info.write_manifest()
+
+    image_cache = html_writer.file_info.image_cache
+    if image_cache:
+        notify('Image cache: {} hits, {} misses'.format(image_cache.hits, image_cache.misses))
+        image_cache.prune()
+
 def main(args):
     global verbose, show_timings
 
@@ -334,6 +457,13 @@ def main(args):
                        help="Write the disassembly in hexadecimal.")
     group.add_argument('-I', '--ini', dest='params', metavar='p=v', action='append', default=[],
                        help="Set the value of the configuration parameter 'p' to\n'v'. This option may be used multiple times.")
+    group.add_argument('--image-cache', dest='image_cache', metavar='DIR', default=config['ImageCache'],
+                       help="Cache image files in this directory.")
+    group.add_argument('--incremental', dest='incremental', action='store_const', const=1, default=config['Incremental'],
+                       help="Write only those pages whose inputs have changed since\n"
+                            "the last run.")
+    group.add_argument('--jobs', dest='jobs', metavar='N', type=int, default=config['Jobs'],
+                       help="Write files using N worker processes (default: 1).")
     group.add_argument('-j', '--join-css', dest='single_css', metavar='NAME', default=config['JoinCss'],
                        help="Concatenate CSS files into a single file with this name.")
     group.add_argument('-l', '--lower', dest='case', action='store_const', const=CASE_LOWER, default=config['Case'],
@@ -361,6 +491,8 @@ def main(args):
                             "option may be used multiple times.")
     group.add_argument('--show-config', dest='show_config', action='store_true',
                        help="Show configuration parameter values.")
+    group.add_argument('--skool-cache', dest='skool_cache', metavar='DIR', default=config['SkoolCache'],
+                       help="Cache parsed skool files in this directory.")
     group.add_argument('-t', '--time', dest='show_timings', action='store_const', const=1, default=config['Time'],
                        help="Show timings.")
     group.add_argument('-T', '--theme', dest='themes', metavar='THEME', action='append', default=config['Theme'],
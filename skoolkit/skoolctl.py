@@ -17,7 +17,7 @@
 import re
 
 from skoolkit import SkoolParsingError, write_line, get_int_param, get_address_format, open_file
-from skoolkit.components import get_assembler, get_component, get_operand_evaluator
+from skoolkit.components import get_assembler, get_component, get_operand_evaluator, get_value
 from skoolkit.skoolutils import (Comment, parse_entry_header, parse_instruction,
                                  parse_address_comments, join_comments, read_skool, DIRECTIVES)
 from skoolkit.textutils import partition_unquoted
@@ -272,10 +272,10 @@ def extract_entry_asm_directives(asm_directives):
 
 class CtlWriter:
     def __init__(self, skoolfile, elements='abtdrmscn', write_hex=0,
-                 preserve_base=False, min_address=0, max_address=65536, keep_lines=0):
+                 preserve_base=False, min_address=0, max_address=65536, keep_lines=0, cache=None):
         self.keep_lines = keep_lines > 0
         self.assembler = get_assembler()
-        self.parser = SkoolParser(skoolfile, preserve_base, self.assembler, min_address, max_address, self.keep_lines)
+        self.parser = SkoolParser(skoolfile, preserve_base, self.assembler, min_address, max_address, self.keep_lines, cache)
         self.elements = elements
         self.write_asm_dirs = ASM_DIRECTIVES in elements
         self.address_fmt = get_address_format(write_hex, write_hex == 1)
@@ -537,7 +537,7 @@ class CtlWriter:
             self._write_lines(comment, ctl, addr_str + lengths, True)
 
 class SkoolParser:
-    def __init__(self, skoolfile, preserve_base, assembler, min_address, max_address, keep_lines):
+    def __init__(self, skoolfile, preserve_base, assembler, min_address, max_address, keep_lines, cache=None):
         self.skoolfile = skoolfile
         self.mode = Mode()
         self.memory_map = []
@@ -546,9 +546,21 @@ class SkoolParser:
         self.assembler = assembler
         self.composer = get_component('ControlDirectiveComposer', preserve_base)
 
+        key = None
+        if cache:
+            key = cache.get_key(skoolfile, 'CtlWriter', preserve_base, min_address, max_address, keep_lines,
+                                get_value('Assembler'), get_value('ControlDirectiveComposer'))
+            state = cache.load(key)
+            if state:
+                self.memory_map, self.end_address = state
+                return
+
         with open_file(skoolfile) as f:
             self._parse_skool(f, min_address, max_address)
 
+        if key:
+            cache.save(key, (self.memory_map, self.end_address))
+
     def _parse_skool(self, skoolfile, min_address, max_address):
         address_comments = []
         non_entries = []
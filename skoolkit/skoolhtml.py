@@ -19,14 +19,18 @@ Defines the :class:`FileInfo` and :class:`HtmlWriter` classes.
 """
 
 from html import unescape
+import hashlib
+import json
 import posixpath
 import os.path
 from os.path import isfile, isdir, basename
 from collections import defaultdict
+from functools import partial
 import re
+import sys
 from io import StringIO
 
-from skoolkit import skoolmacro, SkoolKitError, SkoolParsingError, evaluate, format_template, parse_int, warn
+from skoolkit import skoolmacro, SkoolKitError, SkoolParsingError, VERSION, evaluate, format_template, parse_int, warn
 from skoolkit.audio import BeeperOptions
 from skoolkit.ay import AYOptions
 from skoolkit.components import get_audio_writer, get_ay_audio_writer, get_component, get_image_writer
@@ -48,6 +52,10 @@ T_LAYOUT = 'Layout'
 # UDG image path ID
 UDG_IMAGE_PATH = 'UDGImagePath'
 
+# Name of the file (in the output directory) that records the inputs of each
+# page written in incremental mode
+MANIFEST = '.skool2html.json'
+
 def join(*path_components):
     return '/'.join([c for c in path_components if c.replace('/', '')])
 
@@ -74,6 +82,11 @@ class HtmlWriter:
         iw_config = self.get_dictionary('ImageWriter')
         self.image_writer = get_image_writer(iw_config, colours)
         self.frames = {}
+        self._input_digest = None
+        self._entry_digests = None
+        self._state_digest = None
+        self._dependencies = None
+        self._frame_macros = None
 
         self.snapshot = self.parser.snapshot
         self._snapshots = [(self.snapshot, '')]
@@ -757,9 +770,13 @@ class HtmlWriter:
         return entry_dict
 
     def write_entry(self, cwd, index, map_file):
+        fname = join(cwd, self.asm_fname(self.memory_map[index].address))
+        inputs = self._get_entry_digests()[max(index - 1, 0):index + 2]
+        self._write_if_changed(fname, inputs, self._write_entry, cwd, index, map_file, fname)
+
+    def _write_entry(self, cwd, index, map_file, fname):
         entry = self.memory_map[index]
         page_id = self._get_asm_page_id(self.code_id, entry.ctl)
-        fname = join(cwd, self.asm_fname(entry.address))
         group = self.entry_groups.get(entry.address)
         self._set_cwd(page_id, 'asm', fname, group)
 
@@ -784,20 +801,25 @@ class HtmlWriter:
 
     def _write_asm_single_page(self, map_file):
         page_id = self._get_asm_page_id(self.code_id)
+        self._write_if_changed(self.paths[page_id], self._get_entry_digests(), self._write_asm_entries, page_id, map_file)
+
+    def _write_asm_entries(self, page_id, map_file):
         fname, cwd = self._set_cwd(page_id, 'asm_single_page')
         asm_entries = [self._get_asm_entry(cwd, i, map_file) for i in range(len(self.memory_map))]
         html = self.format_template(T_LAYOUT, {'entries': asm_entries})
         self.write_file(fname, html)
 
-    def write_entries(self, cwd, map_file):
+    def write_entries(self, cwd, map_file, indexes=None):
         if self.asm_single_page:
             self._write_asm_single_page(map_file)
         else:
-            for i in range(len(self.memory_map)):
+            if indexes is None:
+                indexes = range(len(self.memory_map))
+            for i in indexes:
                 self.write_entry(cwd, i, map_file)
 
-    def write_asm_entries(self):
-        self.write_entries(self.code_path, self.paths['MemoryMap'])
+    def write_asm_entries(self, indexes=None):
+        self.write_entries(self.code_path, self.paths['MemoryMap'], indexes)
 
     def _should_write_map(self, map_details):
         if map_details.get('Write') == '0':
@@ -808,6 +830,9 @@ class HtmlWriter:
         return any([entry.ctl in entry_types for entry in self.memory_map])
 
     def write_map(self, map_name):
+        self._write_if_changed(self.paths[map_name], (map_name, self._get_entry_digests()), self._write_map, map_name)
+
+    def _write_map(self, map_name):
         fname, cwd = self._set_cwd(map_name, 'memory_map')
 
         map_details = self.memory_maps.get(map_name, {})
@@ -842,6 +867,9 @@ class HtmlWriter:
         self.write_file(fname, html)
 
     def write_page(self, page_id):
+        self._write_if_changed(self.paths[page_id], page_id, self._write_page, page_id)
+
+    def _write_page(self, page_id):
         page = self.pages[page_id]
         subs = {'Page': page}
         if page_id in self.box_pages:
@@ -862,6 +890,107 @@ class HtmlWriter:
         with self.file_info.open_file(fname) as f:
             f.write(contents)
 
+    def _write_if_changed(self, fname, inputs, write_method, *args):
+        if self.file_info is None or self.file_info.manifest is None:
+            write_method(*args)
+            return
+        state = self._get_state_digest()
+        key = hashlib.sha1('{}{}{}'.format(self._get_input_digest(), inputs, state).encode()).hexdigest()
+        if self.file_info.is_current(fname, key):
+            return
+        self._dependencies = []
+        write_method(*args)
+        self._state_digest = None
+        self.file_info.add_page(fname, key, self._get_state_digest() == state, self._dependencies)
+        self._dependencies = None
+
+    def _add_dependency(self, fname):
+        if self._dependencies is not None:
+            self._dependencies.append(fname)
+
+    def _get_input_digest(self):
+        # Digest of everything that may affect the contents of any page: the
+        # ref files, the writer class, and the structure of the disassembly
+        if self._input_digest is None:
+            writer_class = type(self)
+            digest = hashlib.sha1('{}{}{}{}{}{}'.format(
+                VERSION,
+                writer_class.__module__,
+                writer_class.__qualname__,
+                self.code_id,
+                self.parser.expands,
+                self.game_vars
+            ).encode())
+            module_file = getattr(sys.modules.get(writer_class.__module__), '__file__', None)
+            if module_file and isfile(module_file) and writer_class is not HtmlWriter:
+                with open(module_file, 'rb') as f:
+                    digest.update(f.read())
+            for name, lines in self.ref_parser._sections.items():
+                digest.update('[{}]{}'.format(name, lines).encode())
+            for entry in self.parser.memory_map:
+                digest.update('{}{}{}{}{}{}'.format(entry.ctl, entry.address, entry.addr_str, entry.asm_id, entry.description, entry.size).encode())
+                for i in entry.instructions:
+                    ref = i.reference
+                    if ref:
+                        ref = (ref.address, ref.addr_str, ref.use_label, ref.entry.address)
+                    digest.update('{}{}{}{}{}{}{}'.format(i.ctl, i.address, i.addr_str, i.asm_label, i.operation, i.bytes, ref).encode())
+            self._input_digest = digest.hexdigest()
+        return self._input_digest
+
+    def _get_entry_digests(self):
+        # Digests of the comments in each entry in the memory map
+        if self._entry_digests is None:
+            self._entry_digests = []
+            for entry in self.memory_map:
+                registers = [(r.delimiters, r.prefix, r.name, r.contents) for r in entry.registers]
+                comments = [(i.mid_block_comment, i.comment and (i.comment.rowspan, i.comment.text)) for i in entry.instructions]
+                text = '{}{}{}{}'.format(entry.details, registers, comments, entry.end_comment)
+                self._entry_digests.append(hashlib.sha1(text.encode()).hexdigest())
+        return self._entry_digests
+
+    def _frames_used(self):
+        # Named frames are relevant to the state only if some macro that
+        # uses them appears in the skool file or ref files
+        if self._frame_macros is None:
+            macros = ('#FRAMES', '#COPY', '#OVER', '#PLOT')
+            texts = [self.parser.expands] + list(self.ref_parser._sections.values())
+            for entry in self.parser.memory_map:
+                texts.extend((entry.description, entry.details, entry.end_comment, [r.contents for r in entry.registers]))
+                texts.extend((i.mid_block_comment, i.comment and i.comment.text) for i in entry.instructions)
+            self._frame_macros = any(m in str(t) for t in texts for m in macros)
+        return self._frame_macros
+
+    def get_state_digest(self):
+        # Return a digest of the current state that may be modified by skool
+        # macros (see _get_state_digest())
+        self._state_digest = None
+        return self._get_state_digest()
+
+    def _get_state_digest(self):
+        # Digest of the state that may be modified by skool macros: memory
+        # snapshots, variables, pokes, named frames and #DEF macros
+        if self._state_digest is None:
+            digest = hashlib.sha1()
+            for memory, name in self._snapshots:
+                digest.update(name.encode())
+                if hasattr(memory, 'banks'):
+                    blocks = {id(b): b for b in memory.memory + memory.banks if b}.values()
+                else:
+                    blocks = [memory]
+                for block in blocks:
+                    try:
+                        digest.update(bytes(block))
+                    except ValueError:
+                        digest.update(repr(block).encode())
+            if self._frames_used():
+                frames = [(n, f.scale, f.mask, f.delay, f.tindex, f.alpha, f.x_offset, f.y_offset) for n, f in self.frames.items()]
+            else:
+                frames = None
+            macros = [(n, m.args[1:] if isinstance(m, partial) and m.func is skoolmacro._expand_def_macro else None) for n, m in self.macros.items()]
+            digest.update('{}{}{}{}'.format(self.fields, self.pokes, frames, macros).encode())
+            self._state_digest = digest.hexdigest()
+        return self._state_digest
+
     def _set_cwd(self, page_id, include, asm_fname=None, group=None, js=None):
         if asm_fname is None:
             fname = self.paths[page_id]
@@ -954,6 +1083,7 @@ class HtmlWriter:
             self.frames[frames[0].name] = frames[0]
         image_path = self._image_path(fname, path_id)
         if image_path:
+            self._add_dependency(image_path)
             if self.file_info.need_image(image_path):
                 content = self._write_image(image_path, frames)
             else:
@@ -966,16 +1096,40 @@ class HtmlWriter:
         return ''
 
     def _write_image(self, image_path, frames):
+        image_cache = self.file_info.image_cache
+        if image_cache:
+            key = self._image_key(image_path, frames)
+            if image_cache.copy(key, join(self.file_info.odir, image_path)):
+                self.file_info.add_image(image_path)
+                return
         f = self.file_info.open_file(image_path, mode='wb')
         content = self.image_writer.write_image(frames, f)
         fsize = f.tell()
         f.close()
         if fsize:
             self.file_info.add_image(image_path)
+            if image_cache and content is None:
+                image_cache.add(key, f.name)
         elif isfile(f.name):
             os.remove(f.name)
         return content
 
+    def _image_key(self, image_path, frames):
+        writer_class = type(self.image_writer)
+        text = '{}{}{}{}{}{}'.format(
+            VERSION,
+            writer_class.__module__,
+            writer_class.__qualname__,
+            getattr(self.image_writer, 'options', None),
+            getattr(self.image_writer, 'colours', None),
+            image_path.rpartition('.')[2]
+        )
+        digest = hashlib.sha1(text.encode())
+        for f in frames:
+            params = (f.scale, f.mask, f.x, f.y, f.width, f.height, f.delay, f.tindex, f.alpha, f.x_offset, f.y_offset)
+            digest.update('{}{}'.format(params, f.udgs).encode())
+        return digest.hexdigest()
+
     def build_table(self, table):
         rows = []
         for row in table.rows:
@@ -1056,6 +1210,7 @@ class HtmlWriter:
 
     def expand_audio(self, text, index, cwd):
         end, interrupts, contention, offset, beeper, volume, ay_mode, ay_res, fname, delays, audio_log = skoolmacro.parse_audio(self, text, index, self._need_audio)
+        self._add_dependency(fname)
         if delays or audio_log:
             with self.file_info.open_file(fname, mode='wb') as f:
                 if delays:
@@ -1208,20 +1363,36 @@ class FileInfo:
                      files, image files and audio files.
     :param replace_images: Whether to overwrite existing image files.
     :param replace_audio: Whether to overwrite existing audio files.
+    :param incremental: Whether to skip writing HTML files whose inputs have
+                        not changed since they were last written (unless
+                        `replace_images` or `replace_audio` is set).
+    :param image_cache: The :class:`ImageCache` to use (if any).
     """
-    def __init__(self, topdir, game_dir, replace_images, replace_audio):
+    def __init__(self, topdir, game_dir, replace_images, replace_audio, incremental=False, image_cache=None):
         self.odir = join(topdir, game_dir)
         self.replace_images = replace_images
         self.images = set()
         self.replace_audio = replace_audio
         self.audio = set()
+        self.image_cache = image_cache
+        self.manifest = None
+        self.manifest_changes = {}
+        if incremental:
+            self.manifest = {}
+            manifest = join(self.odir, MANIFEST)
+            if isfile(manifest):
+                try:
+                    with open(manifest) as f:
+                        self.manifest = json.load(f)['files']
+                except (ValueError, KeyError, TypeError):
+                    pass
 
     def open_file(self, *names, mode='w'):
         path = self.odir
         for name in names:
             path = join(path, name)
         if not isdir(os.path.dirname(path)):
-            os.makedirs(os.path.dirname(path))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
         return open(path, mode, encoding=None if 'b' in mode else 'utf8')
 
     def add_image(self, image_path):
@@ -1241,6 +1412,107 @@ class FileInfo:
     def file_exists(self, fname):
         return isfile(join(self.odir, fname))
 
+    def is_current(self, fname, key):
+        if self.replace_images or self.replace_audio:
+            return False
+        record = self.manifest.get(fname)
+        if record and record[0] == key and record[1]:
+            return all(self.file_exists(f) for f in [fname] + record[2])
+        return False
+
+    def add_page(self, fname, key, pure, dependencies):
+        self.update_manifest({fname: [key, int(pure), sorted(set(dependencies))]})
+
+    def update_manifest(self, records):
+        self.manifest.update(records)
+        self.manifest_changes.update(records)
+
+    def clear_updates(self):
+        self.manifest_changes = {}
+        if self.image_cache:
+            self.image_cache.hits = self.image_cache.misses = 0
+
+    def get_updates(self):
+        updates = {'manifest': self.manifest_changes}
+        if self.image_cache:
+            updates['image_cache'] = (self.image_cache.hits, self.image_cache.misses)
+        return updates
+
+    def apply_updates(self, updates):
+        if updates['manifest']:
+            self.update_manifest(updates['manifest'])
+        if 'image_cache' in updates:
+            hits, misses = updates['image_cache']
+            self.image_cache.hits += hits
+            self.image_cache.misses += misses
+
+    def write_manifest(self):
+        if self.manifest is not None:
+            with self.open_file(MANIFEST) as f:
+                json.dump({'version': VERSION, 'files': self.manifest}, f, indent=0, sort_keys=True)
+
+class ImageCache:
+    """A directory of image files keyed by the content of the frames from
+    which they were built.
+
+    :param cache_dir: The cache directory.
+    :param max_size: The maximum total size (in bytes) of the files in the
+                     cache; least recently used files are removed by
+                     :meth:`prune` when this is exceeded.
+    """
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def copy(self, key, dest):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return False
+        os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+        with open(dest, 'wb') as f:
+            f.write(data)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return True
+
+    def add(self, key, fname):
+        path = self._path(key)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(fname, 'rb') as src, open(tmp_path, 'wb') as dest:
+            dest.write(src.read())
+        os.replace(tmp_path, path)
+
+    def prune(self):
+        """Remove the least recently used files from the cache until its total
+        size no longer exceeds the maximum."""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(f[1] for f in files)
+        for mtime, fsize, path in sorted(files):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= fsize
+
 class Bytes:
     def __init__(self, values=()):
         self.values = values
@@ -1254,6 +1526,49 @@ class Bytes:
             bspec, sep, fmt = spec, '', ''
         return '{:{}}'.format(sep.join(v.__format__(bspec) for v in self.values), fmt)
 
+def _sub_loop_vars(line, subs):
+    for substr, rep in subs:
+        line = line.replace(substr, rep)
+    return line
+
+class _Template:
+    # A template split into lines and include directives, and flagged by the
+    # other directives it contains
+    def __init__(self, text):
+        self.text = text
+        self.lines = text.split('\n')
+        self.segments = []
+        self.program = None
+        directives = set()
+        start = 0
+        for i, line in enumerate(self.lines):
+            directive = _html_template_directive(line)
+            if directive.startswith('include('):
+                if start < i:
+                    self.segments.append(self.lines[start:i])
+                self.segments.append(directive)
+                start = i + 1
+            elif directive.startswith(('foreach(', 'if(')):
+                directives.add(directive[:directive.index('(')])
+        if start < len(self.lines):
+            self.segments.append(self.lines[start:])
+        self.includes = any(isinstance(s, str) for s in self.segments)
+        self.loops = 'foreach' in directives
+        self.plain = not (self.includes or directives)
+
+class _Program:
+    # The lines of a template after include directives have been processed,
+    # and the loop tree parsed from them (on first use)
+    def __init__(self, lines, loops):
+        self.lines = lines
+        self.loops = loops
+        self.tree = None
+
+def _html_template_directive(line):
+    if line.startswith('<#') and line.endswith('#>'):
+        return line[2:-2].strip()
+    return ''
+
 class TemplateFormatter:
     """Initialise the template formatter.
 
@@ -1262,6 +1577,11 @@ class TemplateFormatter:
     # Component API
     def __init__(self, templates):
         self.templates = templates
+        self.compiled = {}
+        self.names = {}
+        self.programs = {}
+        self.directives = {}
+        self.exprs = {}
 
     # Component API
     def format_template(self, page_id, name, fields):
@@ -1272,15 +1592,19 @@ class TemplateFormatter:
         :param fields: A dictionary of replacement field values.
         :return: The text of the formatted template.
         """
-        tname, lines = self._get_template(page_id, name)
+        tname, template = self._get_template(page_id, name)
+        if template.plain:
+            return format_template(template.text, tname, **fields)
         try:
-            lines = self._process_include(page_id, lines, fields)
+            program = self._process_include(page_id, template, fields)
         except SkoolKitError as e:
             raise SkoolKitError("Invalid include directive: {}".format(e.args[0]))
-        try:
-            lines = self._process_foreach(lines, fields)
-        except (skoolmacro.MacroParsingError, NameError, ValueError) as e:
-            raise SkoolKitError("Invalid foreach directive: {}".format(e.args[0]))
+        lines = program.lines
+        if program.loops:
+            try:
+                lines = self._process_foreach(program, fields)
+            except (skoolmacro.MacroParsingError, NameError, ValueError) as e:
+                raise SkoolKitError("Invalid foreach directive: {}".format(e.args[0]))
         try:
             lines = self._process_if(lines, fields)
         except (SkoolKitError, skoolmacro.MacroParsingError, NameError, ValueError) as e:
@@ -1288,62 +1612,88 @@ class TemplateFormatter:
         return format_template('\n'.join(lines), tname, **fields)
 
     def _get_template(self, page_id, name):
-        tname = page_id
-        if name != T_LAYOUT:
-            tname += '-' + name
-        if tname not in self.templates:
-            tname = re.sub('Asm-[bcgstuw]', 'Asm', tname)
-        if tname not in self.templates:
-            tname = name
-        try:
-            return tname, self.templates[tname].split('\n')
-        except KeyError as e:
-            raise SkoolKitError("'{}' template does not exist".format(e.args[0]))
-
-    def _process_include(self, page_id, lines, fields):
+        tname = self.names.get((page_id, name))
+        if tname is None:
+            tname = page_id
+            if name != T_LAYOUT:
+                tname += '-' + name
+            if tname not in self.templates:
+                tname = re.sub('Asm-[bcgstuw]', 'Asm', tname)
+            if tname not in self.templates:
+                tname = name
+            if tname not in self.templates:
+                raise SkoolKitError("'{}' template does not exist".format(tname))
+            self.names[(page_id, name)] = tname
+        text = self.templates[tname]
+        template = self.compiled.get(tname)
+        if template is None or template.text is not text:
+            template = self.compiled[tname] = _Template(text)
+        return tname, template
+
+    def _process_include(self, page_id, template, fields):
+        if not template.includes:
+            if template.program is None:
+                template.program = _Program(template.lines, template.loops)
+            return template.program
+        segments = template.segments
+        loops = template.loops
         while 1:
             done = True
             processed = []
-            for line in lines:
-                directive = self._html_template_directive(line)
-                if directive.startswith('include('):
+            for segment in segments:
+                if isinstance(segment, str):
                     try:
-                        tname = skoolmacro.parse_strings(directive, 7, 1)[1].format(**fields)
+                        tname = skoolmacro.parse_strings(segment, 7, 1)[1].format(**fields)
                     except KeyError as e:
                         raise SkoolKitError("Unrecognised field '{}'".format(e.args[0]))
                     if tname:
-                        processed.extend(self._get_template(page_id, tname)[1])
+                        included = self._get_template(page_id, tname)[1]
+                        processed.extend(included.segments)
+                        loops = loops or included.loops
                     done = False
                 else:
-                    processed.append(line)
+                    processed.append(segment)
             if done:
-                return processed
-            lines = processed
+                break
+            segments = processed
+        lines = tuple(line for segment in segments for line in segment)
+        program = self.programs.get(lines)
+        if program is None:
+            program = self.programs[lines] = _Program(lines, loops)
+        return program
+
+    def _process_foreach(self, program, fields):
+        if program.tree is None:
+            program.tree = self._parse_loops(program.lines)
+        processed = program.tree
+        while any(not isinstance(line, str) for line in processed):
+            processed = self._unroll_loops(processed, fields)
+        return processed
 
-    def _process_foreach(self, lines, fields):
-        processed = []
-        stack = [processed]
+    def _parse_loops(self, lines):
+        tree = []
+        stack = [tree]
         for line in lines:
-            directive = self._html_template_directive(line)
+            directive = _html_template_directive(line)
             if directive.startswith('foreach('):
                 varname, seqname = skoolmacro.parse_strings(directive, 7, 2)[1]
                 stack.append([])
-                stack[-2].append((varname, seqname, stack[-1]))
+                stack[-2].append((varname, seqname, stack[-1], ()))
             elif directive == 'endfor' and len(stack) > 1:
                 stack.pop()
             else:
                 stack[-1].append(line)
-        while any(isinstance(line, tuple) for line in processed):
-            processed = self._unroll_loops(processed, fields)
-        return processed
+        return tree
 
     def _process_if(self, lines, fields):
         processed = []
         stack = [1]
         for line in lines:
-            directive = self._html_template_directive(line)
+            directive = _html_template_directive(line)
             if directive.startswith('if('):
-                end, expr = skoolmacro.parse_brackets(directive, 2)
+                expr = self.directives.get(directive)
+                if expr is None:
+                    expr = self.directives[directive] = skoolmacro.parse_brackets(directive, 2)[1]
                 value = self._eval_template_expr(expr, fields)
                 stack.append(value)
             elif directive == 'else' and len(stack) > 1:
@@ -1354,43 +1704,44 @@ class TemplateFormatter:
                 processed.append(line)
         return processed
 
-    def _html_template_directive(self, line):
-        if line.startswith('<#') and line.endswith('#>'):
-            return line[2:-2].strip()
-        return ''
-
     def _unroll_loops(self, lines, fields):
+        # Each loop is a (varname, seqname, body, subs) tuple, where 'subs' is
+        # the sequence of loop variable substitutions (from the outermost loop
+        # inwards) still to be applied to the lines in its body
         unrolled = []
         for line in lines:
-            if isinstance(line, tuple):
-                varname, seqname, loop = line
-                seq = self._eval_template_expr(seqname, fields)
-                try:
-                    for i in range(len(seq)):
-                        unrolled.extend(self._sub_loop_var(loop, varname, '{}[{}]'.format(seqname, i)))
-                except TypeError:
-                    raise ValueError("'{}' is not a list".format(seqname))
-            else:
+            if isinstance(line, str):
                 unrolled.append(line)
+                continue
+            varname, seqname, loop, subs = line
+            seq = self._eval_template_expr(seqname, fields)
+            try:
+                for i in range(len(seq)):
+                    l_subs = subs + ((varname, '{}[{}]'.format(seqname, i)),)
+                    for l in loop:
+                        if isinstance(l, str):
+                            unrolled.append(_sub_loop_vars(l, l_subs))
+                        else:
+                            unrolled.append((l[0], _sub_loop_vars(l[1], l_subs), l[2], l_subs))
+            except TypeError:
+                raise ValueError("'{}' is not a list".format(seqname))
         return unrolled
 
     def _eval_template_expr(self, expr, fields):
         if expr:
             try:
-                return eval(re.sub(r'\[([^0-9][^]]*)\]', r"['\1']", expr.format(**fields)), None, fields)
-            except SyntaxError:
-                raise ValueError("Syntax error in expression: '{}'".format(expr))
+                f_expr = expr.format(**fields)
+            except KeyError as e:
+                raise SkoolKitError("Unrecognised field '{}'".format(e.args[0]))
+            code = self.exprs.get(f_expr)
+            if code is None:
+                try:
+                    code = compile(re.sub(r'\[([^0-9][^]]*)\]', r"['\1']", f_expr), '<string>', 'eval')
+                except SyntaxError:
+                    raise ValueError("Syntax error in expression: '{}'".format(expr))
+                self.exprs[f_expr] = code
+            try:
+                return eval(code, None, fields)
             except KeyError as e:
                 raise SkoolKitError("Unrecognised field '{}'".format(e.args[0]))
         raise ValueError('Expression is missing')
-
-    def _sub_loop_var(self, lines, substr, rep):
-        subbed = []
-        for line in lines:
-            if isinstance(line, tuple):
-                varname, seqname, loop = line
-                subbed_loop = self._sub_loop_var(loop, substr, rep)
-                subbed.append((varname, seqname.replace(substr, rep), subbed_loop))
-            else:
-                subbed.append(line.replace(substr, rep))
-        return subbed
@@ -15,7 +15,7 @@
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
 from collections import defaultdict
-from functools import partial
+from functools import lru_cache, partial
 import html
 import inspect
 import re
@@ -189,15 +189,21 @@ def parse_ints(text, index=0, num=0, defaults=(), names=(), fields=None):
             params = _writer.expand(params, *_cwd)
         if fields is not None:
             params = _format_params(params, params, **fields)
-        return [end] + get_params(params, num, defaults, names, text[index:end], False)
+        values = _get_cached_params(params, num, defaults, names, False)
+        if values is None:
+            return [end] + get_params(params, num, defaults, names, text[index:end], False)
+        return [end, *values]
     if names:
-        pattern = PARAMS.format(NAMED_PARAM, len(names) - 1)
+        pattern = _get_params_re(NAMED_PARAM, len(names) - 1)
     elif num > 0:
-        pattern = PARAMS.format(INTEGER, num - 1)
+        pattern = _get_params_re(INTEGER, num - 1)
     else:
         return [index]
-    params = re.match(pattern, text[index:]).group()
-    return [index + len(params)] + get_params(params, num, defaults, names, text[index:])
+    params = pattern.match(text, index).group()
+    values = _get_cached_params(params, num, defaults, names, True)
+    if values is None:
+        return [index + len(params)] + get_params(params, num, defaults, names, text[index:])
+    return [index + len(params), *values]
 
 # API
 def parse_strings(text, index=0, num=0, defaults=()):
@@ -352,6 +358,24 @@ def _format_params(params, full_params, *args, **kwargs):
     except ValueError:
         raise FormattingError('Invalid format string: {}'.format(full_params))
 
+@lru_cache(maxsize=None)
+def _get_params_re(param, count):
+    return re.compile(PARAMS.format(param, count))
+
+@lru_cache(maxsize=4096)
+def _parse_params(param_string, num, defaults, dtypes, names, safe):
+    return tuple(get_params(param_string, num, defaults, names, '', safe))
+
+def _get_cached_params(param_string, num, defaults, names, safe):
+    # Return the values parsed from a parameter string that was seen before
+    # with the same defaults and names, or None if they cannot be cached (or
+    # cannot be parsed, in which case get_params() should be called to raise
+    # an error with the full context)
+    try:
+        return _parse_params(param_string, num, defaults, tuple(type(d) for d in defaults), names, safe)
+    except (TypeError, MacroParsingError):
+        return None
+
 def _split_unbracketed(text):
     if '(' not in text:
         return text.split(',')
@@ -567,7 +591,11 @@ def expand_macros(writer, text, *cwd):
     if '#' not in text:
         return text
 
-    index = 0
+    # Expanded text is collected in 'expanded', and 'text[pos:]' is the part
+    # still to be expanded. 'text' is rebuilt only when a macro's replacement
+    # text contains another macro, which must then be expanded in place.
+    expanded = []
+    pos = index = 0
     while 1:
         search = RE_MACRO.search(text, index)
         if not search:
@@ -579,7 +607,10 @@ def expand_macros(writer, text, *cwd):
 
         while RE_EXPAND.match(text, start):
             end, expr = parse_strings(text, start + 1, 1)
-            text = text[:start] + expand_macros(writer, expr, *cwd) + text[end:]
+            expanded.append(text[pos:index])
+            text = text[index:start] + expand_macros(writer, expr, *cwd) + text[end:]
+            start -= index
+            pos = index = 0
 
         repf = writer.macros[marker]
         try:
@@ -591,11 +622,16 @@ def expand_macros(writer, text, *cwd):
             if writer.fields['mode']['html']:
                 msg = html.unescape(msg)
             raise SkoolParsingError(f'Error while parsing {marker} macro: {msg}')
-        text = text[:index] + rep + text[abs(end):]
-        if end < 0:
-            index += len(rep)
+        expanded.append(text[pos:index])
+        if end < 0 or not (rep.endswith('#') or RE_MACRO.search(rep)):
+            expanded.append(rep)
+            pos = index = abs(end)
+        else:
+            text = rep + text[end:]
+            pos = index = 0
 
-    return text
+    expanded.append(text[pos:])
+    return ''.join(expanded)
 
 def _read_sim_state(writer, reg=None, clear=0):
     registers = {'iff': 0, 'im': 1, 'halted': 0, 'tstates': 0, 'fffd': 0, 'ay': [0] * 16}
@@ -20,7 +20,7 @@ import re
 
 from skoolkit import (BASE_10, BASE_16, CASE_LOWER, CASE_UPPER, ROM48, SkoolParsingError,
                       warn, get_int_param, parse_int, read_bin_file, open_file, z80)
-from skoolkit.components import get_assembler, get_instruction_utility
+from skoolkit.components import get_assembler, get_instruction_utility, get_value
 from skoolkit.skool2bin import BinWriter
 from skoolkit.skoolmacro import CFG, INTEGER, MacroParsingError, parse_if
 from skoolkit.skoolutils import (DIRECTIVES, Z80_ASSEMBLER, Comment, Memory, get_address, join_comments,
@@ -32,6 +32,11 @@ from skoolkit.textutils import split_quoted, split_unquoted
 
 Reference = namedtuple('Reference', 'entry address addr_str use_label')
 
+CACHED_ATTRS = (
+    'snapshot', 'expands', '_instructions', '_entries', 'memory_map', '_remote_entries',
+    'asm_writer_class', 'properties', '_replacements', 'equs', '_labels', '_warnings'
+)
+
 def _replace_nums(operation, hex_fmt=None, skip_bit=False, prefix=None):
     elements = re.split(r'(?<=[\s,(%*/+-])(\$[0-9A-Fa-f]+|\d+)', (prefix or '(') + operation)
     for i in range(2 * int(skip_bit) + 1, len(elements), 2):
@@ -91,10 +96,12 @@ class SkoolParser:
     :param fields: Fields to use instead of the initial set.
     :param snapshot: Base snapshot to use instead of an empty one.
     :param expands: List of @expand directive values.
+    :param cache: The :class:`~skoolkit.skoolutils.SkoolCache` to use (if
+                  any).
     """
     def __init__(self, skoolfile, case=0, base=0, asm_mode=0, warnings=False, fix_mode=0, html=False,
                  create_labels=False, asm_labels=True, label_fmt=None, min_address=0, max_address=65536,
-                 variables=(), fields=None, snapshot=None, expands=None):
+                 variables=(), fields=None, snapshot=None, expands=None, cache=None):
         self.skoolfile = skoolfile
         self._assembler = get_assembler()
         self.utility = get_instruction_utility()
@@ -130,10 +137,28 @@ class SkoolParser:
         self._replacements = []
         self.equs = []
         self._labels = {}
+        self._warnings = []
+        self._deps = []
+
+        key = None
+        if cache and fields is None and snapshot is None and expands is None:
+            key = cache.get_key(skoolfile, 'SkoolParser', case, base, asm_mode, fix_mode, html, create_labels,
+                                asm_labels, self.label_fmt, min_address, max_address, tuple(variables),
+                                get_value('Assembler'), get_value('InstructionUtility'))
+            state = cache.load(key)
+            if state:
+                self.__dict__.update(state)
+                if warnings:
+                    for message in self._warnings:
+                        warn(message)
+                return
 
         with open_file(skoolfile) as f:
             self._parse_skool(f, asm_mode, min_address, max_address)
 
+        if key:
+            cache.save(key, {a: getattr(self, a) for a in CACHED_ATTRS}, self._deps)
+
     def clone(self, skoolfile):
         return SkoolParser(
             skoolfile,
@@ -388,6 +413,9 @@ class SkoolParser:
                     'warn': False
                 }
                 parse_asm_bank_directive(directive, self.snapshot, BinWriter, **bw_args)
+                bank_file = directive[5:].partition(',')[2]
+                if bank_file:
+                    self._deps.append(bank_file)
             except Exception as e:
                 raise SkoolParsingError(f'Error while parsing @bank directive: {e.args[0]}')
         elif directive.startswith('assemble='):
@@ -471,8 +499,10 @@ class SkoolParser:
                 instruction.html_escape()
 
     def warn(self, message, instruction):
+        message = '{0}:\n  {1.addr_str} {1.operation}'.format(message, instruction)
+        self._warnings.append(message)
         if self.mode.warn:
-            warn('{0}:\n  {1.addr_str} {1.operation}'.format(message, instruction))
+            warn(message)
 
     def _generate_labels(self):
         """Generate labels for mid-routine entry points (based on the label of
@@ -15,9 +15,13 @@
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
 from collections import namedtuple
+import copyreg
+import hashlib
+import os
+import pickle
 import re
 
-from skoolkit import (CASE_LOWER, CASE_UPPER, ROM128, SkoolParsingError,
+from skoolkit import (CASE_LOWER, CASE_UPPER, ROM128, VERSION, SkoolParsingError,
                       get_int_param, parse_int, read_bin_file, wrap, z80)
 from skoolkit.skoolmacro import ClosingBracketError, MacroParsingError, parse_brackets, parse_strings
 from skoolkit.textutils import partition_unquoted
@@ -104,6 +108,116 @@ class Memory:
             self.banks = [bytearray(bank) for bank in self.banks]
             self.memory = [self.roms[rom_id], self.banks[5], self.banks[2], self.banks[page]]
 
+class SkoolCache:
+    """A directory of parsed skool files keyed by the contents of each skool
+    file, the options used to parse it, and the SkoolKit version.
+
+    :param cache_dir: The cache directory.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_key(self, skoolfile, *params):
+        """Return the key for a skool file parsed with a given set of options,
+        or `None` if the skool file cannot be cached.
+
+        :param skoolfile: The name of the skool file.
+        :param params: The parsing options.
+        """
+        if skoolfile == '-':
+            return None
+        digest = _file_digest(skoolfile)
+        if digest is None:
+            return None
+        params = repr((VERSION,) + params).encode('utf-8')
+        return hashlib.sha256(digest.encode('ascii') + params).hexdigest()
+
+    def load(self, key):
+        """Return the state saved under a key, or `None` if there is no such
+        state, or any of the files it depends on have changed since it was
+        saved.
+
+        :param key: The key.
+        """
+        if key:
+            try:
+                with open(os.path.join(self.cache_dir, key), 'rb') as f:
+                    unpickler = _Unpickler(f)
+                    deps = unpickler.load()
+                    if all(_file_digest(fname) == digest for fname, digest in deps):
+                        state = unpickler.load_all()
+                        self.hits += 1
+                        return state
+            except Exception:
+                pass
+        self.misses += 1
+
+    def save(self, key, state, deps=()):
+        """Save the state of a parsed skool file.
+
+        :param key: The key.
+        :param state: The state.
+        :param deps: The names of any other files that were read while parsing
+                     the skool file.
+        """
+        if key:
+            path = os.path.join(self.cache_dir, key)
+            tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+            try:
+                with open(tmp_path, 'wb') as f:
+                    pickler = _Pickler(f)
+                    pickler.dump([(fname, _file_digest(fname)) for fname in deps])
+                    pickler.dump_all(state)
+                os.replace(tmp_path, path)
+            except (OSError, AttributeError, RecursionError, TypeError, pickle.PicklingError):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+class _Pickler(pickle.Pickler):
+    # Pickles each SkoolKit object as an empty instance followed later by its
+    # attributes, so that the long chains of references between entries and
+    # instructions do not exhaust the stack
+    def __init__(self, f):
+        super().__init__(f, pickle.HIGHEST_PROTOCOL)
+        self.objects = []
+
+    def reducer_override(self, obj):
+        cls = type(obj)
+        if cls.__module__.startswith('skoolkit.') and hasattr(obj, '__dict__') and not isinstance(obj, type):
+            self.objects.append(obj)
+            return copyreg.__newobj__, (cls,)
+        return NotImplemented
+
+    def dump_all(self, state):
+        self.dump(state)
+        i = 0
+        while i < len(self.objects):
+            obj = self.objects[i]
+            self.dump((obj, obj.__dict__))
+            i += 1
+        self.dump(None)
+
+class _Unpickler(pickle.Unpickler):
+    def load_all(self):
+        state = self.load()
+        while 1:
+            obj_state = self.load()
+            if obj_state is None:
+                return state
+            obj_state[0].__dict__.update(obj_state[1])
+
+def _file_digest(fname):
+    try:
+        with open(fname, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
 class Comment:
     def __init__(self, rowspan, text):
         self.rowspan = rowspan
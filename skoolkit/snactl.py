@@ -20,7 +20,7 @@ import os
 from skoolkit import SkoolKitError, open_file, read_bin_file, write_line, get_address_format
 from skoolkit.components import get_comment_generator, get_component, get_rst_handler
 from skoolkit.ctlparser import CtlParser
-from skoolkit.opcodes import END, decode
+from skoolkit.opcodes import END, Decoder, decode
 from skoolkit.skoolctl import AD_ORG, AD_START
 from skoolkit.snaskool import Disassembly
 
@@ -166,10 +166,10 @@ def _get_addresses(f, fname, size, start, end):
 
     return sorted(addresses)
 
-def _find_terminal_instruction(snapshot, ctls, start, end, rst_handler, ctl=None):
+def _find_terminal_instruction(decoder, ctls, start, end, ctl=None):
     address = start
     while address < end:
-        i_addr, size, max_count, op_id = next(decode(snapshot, address, address + 1, rst_handler))[:4]
+        i_addr, size, max_count, op_id = decoder.get(address)[:4]
         address += size
         if ctl is None:
             for a in range(i_addr, address):
@@ -209,6 +209,7 @@ def _generate_ctls_with_code_map(snapshot, start, end, config, rst_handler, code
 
     # (1) Mark all executed blocks as 'c' and unexecuted blocks as 'U'
     # (unknown)
+    decoder = Decoder(snapshot, rst_handler)
     ctls = {start: 'U', end: 'i'}
     map_reader = get_component('CodeMapReader')
     for address, length in map_reader.read_map(code_map, snapshot, start, end):
@@ -218,14 +219,18 @@ def _generate_ctls_with_code_map(snapshot, start, end, config, rst_handler, code
 
     # (2) Where a 'c' block doesn't end with a RET/JP/JR, extend it up to the
     # next RET/JP/JR in the following 'U' blocks, or up to the next 'c' block
+    terminated = set()
     while 1:
         done = True
         for ctl, b_start, b_end in _get_blocks(ctls):
             if ctl == 'c':
-                last_op_id = list(decode(snapshot, b_start, b_end, rst_handler))[-1][3]
+                if (b_start, b_end) in terminated:
+                    continue
+                last_op_id = list(decoder.decode(b_start, b_end))[-1][3]
                 if last_op_id == END:
+                    terminated.add((b_start, b_end))
                     continue
-                if _find_terminal_instruction(snapshot, ctls, b_end, end, rst_handler) < end:
+                if _find_terminal_instruction(decoder, ctls, b_end, end) < end:
                     done = False
                     break
         if done:
@@ -248,7 +253,7 @@ def _generate_ctls_with_code_map(snapshot, start, end, config, rst_handler, code
                                 e_end = entry.next.address
                             else:
                                 e_end = 65536
-                            _find_terminal_instruction(snapshot, ctls, instruction.address, e_end, rst_handler, entry.ctl)
+                            _find_terminal_instruction(decoder, ctls, instruction.address, e_end, entry.ctl)
                             disassembly.remove_entry(entry.address)
                             done = False
                             break
@@ -262,11 +267,11 @@ def _generate_ctls_with_code_map(snapshot, start, end, config, rst_handler, code
     # (4) Split 'c' blocks on RET/JP/JR
     for ctl, b_address, b_end in _get_blocks(ctls):
         if ctl == 'c':
-            next_address = _find_terminal_instruction(snapshot, ctls, b_address, b_end, rst_handler, 'c')
+            next_address = _find_terminal_instruction(decoder, ctls, b_address, b_end, 'c')
             if next_address < b_end:
                 disassembly.remove_entry(b_address)
                 while next_address < b_end:
-                    next_address = _find_terminal_instruction(snapshot, ctls, next_address, b_end, rst_handler, 'c')
+                    next_address = _find_terminal_instruction(decoder, ctls, next_address, b_end, 'c')
 
     # (5) Scan the disassembly for pairs of adjacent blocks where the start
     # address of the second block is JRed or JPed to from the first block, and
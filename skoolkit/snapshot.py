@@ -86,50 +86,75 @@ SZX_REGISTERS = {
     'memptr': 35
 }
 
+def _bank(data):
+    if data is None or isinstance(data, bytearray):
+        return data
+    return bytearray(data)
+
 class Memory:
     def __init__(self, snapshot=None, banks=None, page=None):
         if banks:
             if isinstance(banks, dict):
-                self.banks = [banks.get(i) for i in range(max(8, max(banks)))]
+                self.banks = [_bank(banks.get(i)) for i in range(max(8, max(banks)))]
             else:
-                self.banks = banks
+                self.banks = [_bank(b) for b in banks]
             if page is None:
                 # Z80 48K
-                self.memory = [[0] * 0x4000, self.banks[5], self.banks[1], self.banks[2]]
+                self.memory = [bytearray(0x4000), self.banks[5], self.banks[1], self.banks[2]]
             else:
-                self.memory = [[0] * 0x4000, self.banks[5], self.banks[2], self.banks[page]]
+                self.memory = [bytearray(0x4000), self.banks[5], self.banks[2], self.banks[page]]
         elif len(snapshot) == 0x20000:
-            self.banks = [snapshot[a:a + 0x4000] for a in range(0, 0x20000, 0x4000)]
-            self.memory = [[0] * 0x4000, self.banks[5], self.banks[2], self.banks[page]]
+            ram = _bank(snapshot)
+            self.banks = [ram[a:a + 0x4000] for a in range(0, 0x20000, 0x4000)]
+            self.memory = [bytearray(0x4000), self.banks[5], self.banks[2], self.banks[page]]
         else:
+            ram = _bank(snapshot)
             self.banks = [None] * 8
-            self.memory = [[0] * 0x4000, snapshot[0x4000:0x8000], snapshot[0x8000:0xC000], snapshot[0xC000:]]
+            self.memory = [bytearray(0x4000), ram[0x4000:0x8000], ram[0x8000:0xC000], ram[0xC000:]]
 
     def __getitem__(self, index):
         if isinstance(index, int):
-            return self.memory[index // 0x4000][index % 0x4000]
-        return [self.memory[a // 0x4000][a % 0x4000] for a in range(index.start, min(index.stop, 0x10000), index.step or 1)]
+            return self.memory[index >> 14][index & 0x3FFF]
+        start, stop, step = index.indices(0x10000)
+        if step != 1:
+            return [self.memory[a >> 14][a & 0x3FFF] for a in range(start, stop, step)]
+        values = []
+        while start < stop:
+            end = min((start | 0x3FFF) + 1, stop)
+            values.extend(self.memory[start >> 14][start & 0x3FFF:((end - 1) & 0x3FFF) + 1])
+            start = end
+        return values
 
     def __setitem__(self, index, value):
         if isinstance(index, int):
-            self.memory[index // 0x4000][index % 0x4000] = value
+            self.memory[index >> 14][index & 0x3FFF] = value
+        elif index.step not in (None, 1):
+            for a, b in zip(range(index.start, index.stop, index.step), value):
+                self.memory[a >> 14][a & 0x3FFF] = b
         else:
-            for a, b in zip(range(index.start, index.stop, index.step or 1), value):
-                self.memory[a // 0x4000][a % 0x4000] = b
+            start = index.start
+            stop = min(index.stop, start + len(value))
+            i = 0
+            while start < stop:
+                end = min((start | 0x3FFF) + 1, stop)
+                offset = start & 0x3FFF
+                self.memory[start >> 14][offset:offset + end - start] = value[i:i + end - start]
+                i += end - start
+                start = end
 
     def contents(self):
         if all(self.banks):
-            return self.banks
-        return self.memory[1] + self.memory[2] + self.memory[3]
+            return [list(b) for b in self.banks]
+        return list(self.memory[1] + self.memory[2] + self.memory[3])
 
     def ram(self, page):
         if not all(self.banks) or page is None:
             if self.memory[2]:
-                return self.memory[1] + self.memory[2] + self.memory[3]
-            return self.memory[1] + [0] * 32768
+                return list(self.memory[1] + self.memory[2] + self.memory[3])
+            return list(self.memory[1]) + [0] * 32768
         if page >= 0:
-            return self.banks[5] + self.banks[2] + self.banks[page]
-        return self.banks[0] + self.banks[1] + self.banks[2] + self.banks[3] + self.banks[4] + self.banks[5] + self.banks[6] + self.banks[7]
+            return list(self.banks[5] + self.banks[2] + self.banks[page])
+        return list(b''.join(self.banks))
 
 class Snapshot:
     def __init__(self):
@@ -15,6 +15,7 @@
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
 from collections import defaultdict, namedtuple
+from functools import lru_cache
 import re
 
 from skoolkit import (SkoolKitError, warn, write_line, wrap, parse_int,
@@ -50,24 +51,29 @@ def calculate_references(entries, operations):
                        marked with an asterisk in the skool file.
     :return: A dictionary of entry point addresses.
     """
+    operations = tuple(operations)
     instructions = {i.address: (i, e) for e in entries for i in e.instructions}
     referrers = defaultdict(list)
     for entry in entries:
         for instruction in entry.instructions:
-            operation = instruction.operation
-            if any(re.match(op, operation.upper()) for op in operations):
-                addr_str = get_address(operation)
-                if addr_str:
-                    ref_addr = parse_int(addr_str)
-                    ref_i, ref_e = instructions.get(ref_addr, (None, None))
-                    if ref_i and entry.address not in ref_i.rrefs and ref_i.label != '' and (entry.ctl != 'u' or entry is ref_e):
-                        referrers[ref_addr].append(entry)
+            ref_addr = _get_ref_address(instruction.operation, operations)
+            if ref_addr is not None:
+                ref_i, ref_e = instructions.get(ref_addr, (None, None))
+                if ref_i and entry.address not in ref_i.rrefs and ref_i.label != '' and (entry.ctl != 'u' or entry is ref_e):
+                    referrers[ref_addr].append(entry)
             for ref_addr in instruction.refs:
                 referrer = instructions.get(ref_addr, (None, None))[1]
                 if referrer and referrer not in referrers[instruction.address]:
                     referrers[instruction.address].append(referrer)
     return referrers
 
+@lru_cache(maxsize=65536)
+def _get_ref_address(operation, operations):
+    if any(re.match(op, operation.upper()) for op in operations):
+        addr_str = get_address(operation)
+        if addr_str:
+            return parse_int(addr_str)
+
 class Instruction:
     def __init__(self, address, operation, data):
         self.address = address     # API (CommentGenerator, SnapshotReferenceCalculator)
@@ -17,8 +17,15 @@
 import sys
 import os
 import argparse
+import contextlib
+import functools
 import hashlib
+import io
+import json
+import multiprocessing
+import shlex
 import tempfile
+import time
 import zipfile
 from urllib.request import Request, urlopen
 from urllib.parse import urlparse
@@ -43,6 +50,16 @@ from skoolkit.traceutils import get_trace_line
 
 SUPPORTED_TAPES = ('.pzx', '.tap', '.tzx')
 
+STOP_CONDITIONS = (
+    'PC at start address',
+    'end of tape',
+    'PC in RAM',
+    'tape ended 1 second ago',
+    'timed out',
+    'tape paused',
+    'screen closed'
+)
+
 SYSVARS = (
     255, 0, 0, 0,         # 23552 - KSTATE0
     255, 0, 0, 0,         # 23556 - KSTATE4
@@ -222,7 +239,7 @@ SIM_LOAD_CONFIG_HELP = """
 Usage: --sim-load-config accelerate-dec-a=0/1/2/3
        --sim-load-config accelerator=auto/none/list/NAME[,NAME...]
        --sim-load-config cmio=0/1
-       --sim-load-config fast-load=0/1
+       --sim-load-config fast-load=0/1/2/3
        --sim-load-config finish-tape=0/1
        --sim-load-config first-edge=N
        --sim-load-config in-flags=FLAGS
@@ -257,13 +274,19 @@ Configure various properties of a simulated LOAD.
   cmio=1 to enable simulation of memory and I/O contention delays and MEMPTR.
   Note that when cmio=1, all acceleration is disabled.
 
---sim-load-config fast-load=0/1
+--sim-load-config fast-load=0/1/2/3
 
   By default, whenever the Spectrum ROM's load routine is called, a shortcut is
   taken by "fast loading" (also known as "flash loading") the next block on the
   tape. This significantly reduces the load time for many tapes, but can also
   cause some loaders to fail. Set fast-load=0 to disable fast loading.
 
+  Set fast-load=2 to "fast forward" instead: whenever a custom loader whose
+  byte-loading loop is a copy of the ROM's (possibly with different timing
+  constants) has read the first byte of a data block, the remainder of the
+  block is loaded directly into memory. Set fast-load=3 to enable both fast
+  loading and fast forwarding.
+
 --sim-load-config finish-tape=0/1
 
   By default, the simulated LOAD stops as soon as the program counter hits the
@@ -412,7 +435,7 @@ def _set_sim_load_config(options):
     options.accelerate_dec_a = 3
     options.accelerator = 'auto'
     options.cmio = False
-    options.fast_load = True
+    options.fast_load = 1
     options.finish_tape = False
     options.first_edge = 0
     options.in_flags = 0
@@ -457,7 +480,7 @@ def _set_sim_load_config(options):
             else:
                 raise SkoolKitError(f'Invalid sim-load configuration parameter: {name}')
 
-def sim_load(blocks, options, config):
+def sim_load(blocks, options, config, stats=None):
     press = {}
     for spec in options.press:
         block_num, sep, key_specs = spec.partition(':')
@@ -485,6 +508,7 @@ def sim_load(blocks, options, config):
                 warn(f'Unrecognised accelerator: {name}')
 
     interrupted = False
+    stop_cond = None
     sim_cfg = {'fast_djnz': False, 'fast_ldir': False}
     if options.machine == '128':
         if not options.load:
@@ -557,6 +581,7 @@ def sim_load(blocks, options, config):
         except KeyboardInterrupt:
             write_line(f'Simulation stopped (interrupted): PC={simulator.registers[PC]}')
             interrupted = True
+            stop_cond = 'interrupted'
     else:
         memory[0x5800:0x5B00] = [56] * 768 # PAPER 7: INK 0
         memory[0x5C00:0x5C00 + len(SYSVARS)] = SYSVARS
@@ -587,6 +612,7 @@ def sim_load(blocks, options, config):
 
     if timeout <= 0:
         write_line(f'Simulation stopped (timed out): PC={simulator.registers[PC]}')
+        stop_cond = STOP_CONDITIONS[4]
     elif not interrupted:
         if options.in_flags & 1:
             in_min_addr = 0x4000
@@ -602,7 +628,7 @@ def sim_load(blocks, options, config):
             'finish_tape': options.finish_tape,
             'first_edge': options.first_edge,
             'in_min_addr': in_min_addr,
-            'list_accelerators': list_accelerators,
+            'list_accelerators': list_accelerators or int(stats is not None),
             'pause': options.pause,
             'polarity': options.polarity,
             'prefix': prefix,
@@ -624,22 +650,33 @@ def sim_load(blocks, options, config):
                 kp_tracer.run(timeout, tracefile, trace_line, prefix, byte_fmt, word_fmt)
                 if kp_tracer.keys:
                     write_line(f'Simulation stopped (timed out): PC={simulator.registers[PC]}')
+                    tracer.stop_cond = 4
                     break
                 write_line('Resuming LOAD')
                 simulator.registers[T] = t0
                 simulator.set_tracer(tracer, options.in_flags & 4, False)
                 tracer.run(kp_tracer.border, kp_tracer.out7ffd, kp_tracer.outfffd, kp_tracer.ay, kp_tracer.outfe)
+            if tracer.stop_cond is not None:
+                stop_cond = STOP_CONDITIONS[tracer.stop_cond]
             _ram_operations(simulator.memory, options.ram_ops)
         except KeyboardInterrupt:
             write_line(f'Simulation stopped (interrupted): PC={simulator.registers[PC]}')
+            stop_cond = 'interrupted'
         if list_accelerators:
-            accelerators = '; '.join(f'{a.name}: {a.hits}' for a in sorted(accelerators, key=lambda a: a.name) if a.hits) or 'none'
+            acc_hits = '; '.join(f'{a.name}: {a.hits}' for a in sorted(accelerators, key=lambda a: a.name) if a.hits) or 'none'
             dec_a_stats = f'{tracer.dec_a_jr_hits}/{tracer.dec_a_jp_hits}/{tracer.dec_a_misses}'
-            write_line(f'Accelerators: {accelerators}; misses: {tracer.tsl_misses}; dec-a: {dec_a_stats}')
+            write_line(f'Accelerators: {acc_hits}; misses: {tracer.tsl_misses}; dec-a: {dec_a_stats}')
 
     if tracefile:
         tracefile.close()
 
+    if stats is not None:
+        stats.update({
+            'stop': stop_cond,
+            'pc': simulator.registers[PC],
+            'tstates': simulator.registers[T],
+            'accelerators': {a.name: a.hits for a in sorted(accelerators, key=lambda a: a.name) if a.hits}
+        })
     ram, registers, state = get_state(simulator, False)[:3]
     options.reg = registers + options.reg
     options.state = state + options.state
@@ -955,7 +992,7 @@ def _print_sim_load_config_help(param):
             help_text = '\n'.join(params[param]).rstrip()
     print(help_text)
 
-def make_snapshot(urls, options, outfile, config):
+def make_snapshot(urls, options, outfile, config, stats=None):
     tapes = _get_tapes(urls, options.user_agent, options.tape_name)
     for tape, tape_sum in zip(tapes, options.tape_sum):
         md5sum = hashlib.md5(tape[1]).hexdigest()
@@ -971,7 +1008,7 @@ def make_snapshot(urls, options, outfile, config):
         blocks = [block for block in tape_blocks if block.timings]
         if not blocks:
             raise TapeError('Tape is empty')
-        ram = sim_load(blocks, options, config)
+        ram = sim_load(blocks, options, config, stats)
     else:
         blocks = [block.data for block in tape_blocks]
         ram = _get_ram(blocks, options)
@@ -989,11 +1026,68 @@ def make_snapshot(urls, options, outfile, config):
     if options.output_dir:
         outfile = os.path.join(options.output_dir, outfile)
     _write_snapshot(ram, options, outfile)
+    return outfile
+
+def _get_batch(fname):
+    if os.path.isdir(fname):
+        tapes = (os.path.join(fname, f) for f in sorted(os.listdir(fname)))
+        return [[t] for t in tapes if t.lower().endswith(SUPPORTED_TAPES + ('.zip',))]
+    if fname.lower().endswith('.zip'):
+        with zipfile.ZipFile(open_file(fname, 'rb')) as z:
+            return [['--tape-name', n, fname] for n in z.namelist() if n.lower().endswith(SUPPORTED_TAPES)]
+    batch = []
+    with open_file(fname) as f:
+        for line in f:
+            args = shlex.split(line, True)
+            if len(args) == 1 and os.path.isdir(args[0]):
+                batch.extend(_get_batch(args[0]))
+            elif args:
+                batch.append(args)
+    return batch
+
+def _convert(args, config):
+    go = time.time()
+    summary = {'args': args[1]}
+    config = config.copy()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            # Append '--batch=' to cancel the '--batch' option in the global
+            # arguments
+            parsed = _parse_args(_get_parser(config), args[0] + args[1] + ['--batch='], config)
+            if parsed:
+                namespace, urls, outfile = parsed
+                stats = {}
+                summary['output'] = make_snapshot(urls, namespace, outfile, config, stats)
+                summary.update(stats)
+            else:
+                summary['error'] = 'Invalid arguments'
+    except SystemExit:
+        summary['error'] = 'Invalid arguments'
+    except Exception as e:
+        summary['error'] = str(e.args[0] if e.args else e)
+    summary['time'] = round(time.time() - go, 2)
+    return summary
+
+def run_batch(args, options, config):
+    batch = [(args, b) for b in _get_batch(options.batch)]
+    if CSimulator is None or any(a.startswith('python=1') for a in options.sim_load_config):
+        # Pre-load the simtables module so that its (significant) load time is
+        # incurred only once
+        from skoolkit import simtables
+    jobs = min(options.jobs, len(batch))
+    if jobs > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        sys.stdout.flush()
+        sys.stderr.flush()
+        with multiprocessing.get_context('fork').Pool(jobs) as pool:
+            for summary in pool.imap(functools.partial(_convert, config=config), batch):
+                write_line(json.dumps(summary))
+    else:
+        for b in batch:
+            write_line(json.dumps(_convert(b, config)))
 
-def main(args):
-    config = get_config('tap2sna')
+def _get_parser(config):
     parser = SkoolKitArgumentParser(
-        usage='\n  tap2sna.py [options] INPUT [INPUT] [OUTFILE]\n  tap2sna.py @FILE [args]',
+        usage='\n  tap2sna.py [options] INPUT [INPUT] [OUTFILE]\n  tap2sna.py [options] --batch FILE\n  tap2sna.py @FILE [args]',
         description="Convert one or two PZX, TAP or TZX files (which may be inside a zip archive) into an SZX or Z80 snapshot. "
                     "INPUT may be the full URL to a remote zip archive or tape file, or the path to a local file. "
                     "If two INPUTs are given, they must both be (local or remote) tape files. "
@@ -1005,6 +1099,9 @@ def main(args):
     parser.add_argument('arg2', help=argparse.SUPPRESS, nargs='?')
     parser.add_argument('arg3', help=argparse.SUPPRESS, nargs='?')
     group = parser.add_argument_group('Options')
+    group.add_argument('--batch', metavar='FILE',
+                       help="Convert each tape listed in FILE, or each tape in the directory or zip archive FILE, "
+                            "and print a JSON summary line for each one.")
     group.add_argument('-c', '--sim-load-config', metavar='name=value', action='append', default=[],
                        help="Set the value of a simulated LOAD configuration parameter. "
                             "Do '-c help' for more information, or '-c help-name' for help on a specific parameter. "
@@ -1013,6 +1110,8 @@ def main(args):
                        help="Write the snapshot file in this directory.")
     group.add_argument('-I', '--ini', dest='params', metavar='p=v', action='append', default=[],
                        help="Set the value of the configuration parameter 'p' to 'v'. This option may be used multiple times.")
+    group.add_argument('--jobs', dest='jobs', metavar='N', type=int, default=1,
+                       help="Convert tapes in a batch using N worker processes (default: 1).")
     group.add_argument('--press', metavar='N:KEYS', action='append', default=[],
                        help="Pause the tape at block number N and press KEYS before resuming. "
                             "KEYS must be a space-separated list of key identifiers. "
@@ -1052,6 +1151,9 @@ def main(args):
                        help="Set the User-Agent header.")
     group.add_argument('-V', '--version', action='version', version='SkoolKit {}'.format(VERSION),
                        help='Show SkoolKit version number and exit.')
+    return parser
+
+def _parse_args(parser, args, config):
     namespace, unknown_args = parser.parse_known_intermixed_args(args)
     if namespace.show_config:
         show_config('tap2sna', config)
@@ -1068,6 +1170,10 @@ def main(args):
     if 'help' in namespace.state:
         print_state_help()
         return
+    if namespace.batch:
+        if unknown_args or namespace.arg1:
+            parser.exit(2, parser.format_help())
+        return namespace, None, None
     if unknown_args or namespace.arg1 is None:
         parser.exit(2, parser.format_help())
     urls = [namespace.arg1]
@@ -1091,6 +1197,17 @@ def main(args):
             if arg.startswith('@') and arg.lower().endswith('.t2s') and os.path.isfile(arg[1:]):
                 outfile = os.path.basename(arg[1:-3]) + config['DefaultSnapshotFormat']
                 break
+    return namespace, urls, outfile
+
+def main(args):
+    config = get_config('tap2sna')
+    parsed = _parse_args(_get_parser(config), args, config)
+    if not parsed:
+        return
+    namespace, urls, outfile = parsed
+    if namespace.batch:
+        run_batch(args, namespace, config)
+        return
     try:
         make_snapshot(urls, namespace, outfile, config)
     except Exception as e:
@@ -15,6 +15,7 @@
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+from array import array
 import textwrap
 import time
 
@@ -33,7 +34,12 @@ from skoolkit.simutils import (CLOCK_SPEEDS, PC, T, from_memory, from_snapshot,
                                get_state)
 from skoolkit.snapshot import (Snapshot, make_snapshot, poke, print_reg_help,
                                print_state_help, write_snapshot)
-from skoolkit.traceutils import Registers, disassemble, get_trace_line
+from skoolkit.traceutils import (TRACE_MAGIC, FrameWriter, Registers,
+                                 check_breakpoints, compile_breakpoints,
+                                 disassemble, get_exec_map,
+                                 get_io, get_routines, get_trace_line,
+                                 get_watch_map, trace_record, write_exec_map,
+                                 write_profile)
 
 AY_MODE_NAMES = tuple(m[0] for m in AY_MODES)
 
@@ -51,12 +57,23 @@ class Tracer(PagingTracer):
         else:
             self.border = border
         self.operations = 0
+        self.profile = None
+        self.breakpoints = None
+        self.break_exprs = ()
+        self.watch = None
         self.spkr = None
         self.audio_log = []
         self.keyboard = None
 
+    def set_breakpoints(self, exprs, watch_specs):
+        if exprs:
+            self.breakpoints = compile_breakpoints(exprs)
+            self.break_exprs = exprs
+        if watch_specs:
+            self.watch = get_watch_map(watch_specs)
+
     def run(self, start, stop, max_operations, max_tstates, interrupts, draw,
-            exec_map, trace_header, trace_line, prefix, byte_fmt, word_fmt):
+            exec_map, trace_header, trace_line, prefix, byte_fmt, word_fmt, bin_trace=None):
         simulator = self.simulator
         memory = simulator.memory
         is128k = len(memory) == 0x20000
@@ -69,6 +86,8 @@ class Tracer(PagingTracer):
         if draw:
             self.keyboard = [0] * 8
         keyboard = self.keyboard
+        profile = self.profile
+        breakpoints = self.breakpoints
         if trace_line:
             r = Registers(registers)
 
@@ -79,8 +98,15 @@ class Tracer(PagingTracer):
                 df = lambda pc: disassemble(memory, pc, prefix, byte_fmt, word_fmt)[0]
                 tf = lambda pc, i, t0: print(trace_line.format(pc=pc, i=i, r=r, t=t0, m=memory))
             else:
-                df = tf = None
-            stop_cond, operations = simulator.trace(start, stop, max_operations, max_time, interrupts, draw, exec_map, keyboard, df, tf)
+                df, tf = None, bin_trace
+            stop_cond, operations = simulator.trace(start, stop, max_operations, max_time, interrupts, draw, exec_map,
+                                                    profile, breakpoints, self.watch, keyboard, df, tf)
+        elif getattr(simulator, 'blocks', None) is not None and stop is not None and not (
+                trace_line or bin_trace or draw or breakpoints or self.watch or max_operations or max_time
+                or exec_map is not None or profile is not None): # pragma: C no cover
+            registers[PC] = start
+            operations = simulator.run_blocks(start, stop, interrupts)
+            stop_cond = 3
         else: # pragma: C no cover
             opcodes = simulator.opcodes
             frame_duration = simulator.frame_duration
@@ -90,18 +116,34 @@ class Tracer(PagingTracer):
             operations = 0
             tstates = registers[25]
             next_int = ((tstates + frame_duration - int_active) // frame_duration) * frame_duration
+            if self.watch:
+                watched = [a for a in range(65536) if self.watch[a >> 3] & (1 << (a & 7))]
+                watched_values = [memory[a] for a in watched]
+            else:
+                watched = None
+            io = 0
             while True:
                 t0 = tstates
+                if breakpoints:
+                    io = get_io(memory, registers, pc)
                 if trace_line:
                     i = disassemble(memory, pc, prefix, byte_fmt, word_fmt)[0]
                     opcodes[memory[pc]]()
                     print(trace_line.format(pc=pc, i=i, r=r, t=t0, m=memory))
+                elif bin_trace:
+                    ibytes = bytes([memory[pc], memory[(pc + 1) % 65536], memory[(pc + 2) % 65536], memory[(pc + 3) % 65536]])
+                    opcodes[memory[pc]]()
+                    bin_trace.write(trace_record(registers, pc, t0, ibytes))
                 else:
                     opcodes[memory[pc]]()
                 tstates = registers[25]
 
                 if exec_map is not None:
-                    exec_map.add(pc)
+                    exec_map[pc >> 3] |= 1 << (pc & 7)
+
+                if profile is not None:
+                    profile[pc] += 1
+                    profile[65536 + pc] += tstates - t0
 
                 if tstates >= next_int:
                     if tstates < next_int + int_active:
@@ -112,7 +154,7 @@ class Tracer(PagingTracer):
                             frame = tstates // frame_duration
                             if frame > prev_frame:
                                 if is128k:
-                                    scr = memory.memory[1][:6912]
+                                    scr = list(memory.memory[1][:6912])
                                 else:
                                     scr = memory[16384:23296]
                                 if not draw(scr, frame, self.border, keyboard):
@@ -134,6 +176,14 @@ class Tracer(PagingTracer):
                 if pc == stop:
                     stop_cond = 3
                     break
+                if watched and [memory[a] for a in watched] != watched_values:
+                    stop_cond = 4
+                    break
+                if breakpoints:
+                    index = check_breakpoints(breakpoints, registers, memory, io)
+                    if index >= 0:
+                        stop_cond = 5 + index
+                        break
 
         stop_msg = f'Stopped at {prefix}{registers[PC]:{word_fmt}}'
         if stop_cond == 0:
@@ -144,6 +194,10 @@ class Tracer(PagingTracer):
             print(f'{stop_msg}: {registers[T] - start_time} T-states')
         elif stop_cond == 3:
             print(stop_msg)
+        elif stop_cond == 4:
+            print(f'{stop_msg}: watched address written')
+        else:
+            print(f'{stop_msg}: {self.break_exprs[stop_cond - 5]}')
         self.operations = operations
 
     def read_port(self, registers, port):
@@ -216,6 +270,31 @@ def simplify(delays, depth):
             length += 1
     return ', '.join(s0)
 
+def print_break_help():
+    print("""
+Usage: --break EXPR
+
+Stop execution after an instruction when every condition in EXPR is met.
+Conditions are separated by '&&', and take the form 'X op V' or 'X&M op V',
+where 'op' is one of '=', '!=', '<', '<=', '>' or '>=', and 'M' is a mask that
+is ANDed with the value of 'X' before comparing it with 'V'. For example:
+
+  --break 'pc=$8000'
+  --break 'a>=10&&(23672)=0'
+  --break 'pc=$8000-$80FF,$9000&&hl!=0'
+  --break 'out&$FF=$FE'
+
+With '=' or '!=', V may be a comma-separated list of values and ranges (A-B).
+
+X may be a register name, '(addr)' for the contents of a memory address, 't'
+for the current timestamp (in T-states), or 'in' or 'out' for the 16-bit port
+read or written by the instruction just executed. Recognised register names
+are:
+
+  a, b, bc, c, d, de, e, f, h, hl, i, ix, ixh, ixl, iy, iyh, iyl, l,
+  memptr, pc, r, sp, ^a, ^b, ^bc, ^c, ^d, ^de, ^e, ^f, ^h, ^hl, ^l
+""".strip())
+
 def run(snafile, options, config):
     snapshot = None
     org = 0
@@ -262,8 +341,15 @@ def run(snafile, options, config):
                     state[attr] = get_int_param(val)
             except ValueError:
                 raise SkoolKitError(f'Cannot parse integer: {spec}')
-    fast = options.verbose == 0 and options.max_operations == 0 and options.max_tstates == 0 and not options.screen
-    sim_config = {'fast_djnz': fast, 'fast_ldir': fast}
+    if options.verbose and options.bin_trace:
+        raise SkoolKitError('--bin-trace cannot be used with --verbose')
+    if options.profile and options.profile.lower().endswith('.ctl') and not options.routines:
+        raise SkoolKitError('--profile FILE.ctl requires --routines')
+    if options.routines and not options.profile:
+        raise SkoolKitError('--routines requires --profile')
+    fast = (options.verbose == 0 and options.max_operations == 0 and options.max_tstates == 0 and not options.screen
+            and not options.frames and not options.bin_trace and not options.profile and not options.breaks and not options.watch)
+    sim_config = {'fast_djnz': fast, 'fast_ldir': fast, 'block_cache': fast and config['BlockCache'] > 0}
     if snapshot:
         border = state.get('border', snapshot.border)
         out7ffd = state.get('7ffd', snapshot.out7ffd)
@@ -308,8 +394,9 @@ def run(snafile, options, config):
     ay_audio_writer = get_ay_audio_writer()
     ay_audio_fmts = [f.lower() for f in ay_audio_writer.formats()]
     audio_fmts = set(bpr_audio_fmts) | set(ay_audio_fmts)
-    port_fe = options.audio or any(f.lower().endswith(tuple(audio_fmts)) for f in options.dump) or options.screen
+    port_fe = options.audio or any(f.lower().endswith(tuple(audio_fmts)) for f in options.dump) or options.screen or options.frames
     tracer = Tracer(simulator, border, out7ffd, outfffd, ay, outfe, port_fe)
+    tracer.set_breakpoints(options.breaks, options.watch)
     simulator.set_tracer(tracer)
     if options.verbose:
         b = ('', 'Decimal')[options.decimal]
@@ -327,19 +414,39 @@ def run(snafile, options, config):
             trace_line.format(pc=0, i='.', r=Registers(simulator.registers), t=0, m=simulator.memory)
         except Exception as e:
             raise SkoolKitError(f"Invalid format string: '{orig_trace_line}'")
-    draw = None
+    draw = screen = frame_writer = None
     if options.screen:
         screen = get_screen(config['ScreenScale'], config['ScreenFps'], 'trace.py', len(memory) == 0x20000)
         if screen:
             draw = screen.draw
+    if options.frames:
+        frame_writer = FrameWriter(options.frames, options.frame_step, config['PNGScale'], len(memory) == 0x20000, image_writer, screen)
+        draw = frame_writer.draw
     if options.map:
-        exec_map = set()
+        exec_map = get_exec_map()
     else:
         exec_map = None
+    if options.profile:
+        tracer.profile = array('Q', bytes(8 * 0x20000))
+        if options.routines:
+            routines = get_routines(options.routines)
+        else:
+            routines = None
+    if options.bin_trace:
+        bin_trace = open(options.bin_trace, 'wb')
+        bin_trace.write(TRACE_MAGIC)
+    else:
+        bin_trace = None
     begin = time.time()
-    tracer.run(start, options.stop, options.max_operations, options.max_tstates,
-               options.interrupts, draw, exec_map, trace_header, trace_line,
-               prefix, byte_fmt, word_fmt)
+    try:
+        tracer.run(start, options.stop, options.max_operations, options.max_tstates,
+                   options.interrupts, draw, exec_map, trace_header, trace_line,
+                   prefix, byte_fmt, word_fmt, bin_trace)
+    finally:
+        if bin_trace:
+            bin_trace.close()
+        if frame_writer:
+            frame_count = frame_writer.close()
     rt = time.time() - begin
     is128k = len(simulator.memory) == 0x20000
     cpu_freq = CLOCK_SPEEDS[is128k]
@@ -358,10 +465,18 @@ def run(snafile, options, config):
         lines = textwrap.wrap(simplify(delays, options.depth), 78)
         print('Delays:\n {}'.format('\n '.join(lines)))
     if options.map:
-        with open(options.map, 'w') as f:
-            for addr in sorted(exec_map):
-                f.write(f'${addr:04X}\n')
+        write_exec_map(options.map, exec_map, config['MapFormat'])
         print(f'Wrote {options.map}')
+    if options.bin_trace:
+        print(f'Wrote {options.bin_trace}')
+    if frame_writer:
+        if frame_writer.apng:
+            print(f'Wrote {options.frames} ({frame_count} frames)')
+        else:
+            print(f'Wrote {frame_count} frames to {options.frames}')
+    if options.profile:
+        write_profile(options.profile, tracer.profile, routines, prefix, word_fmt, options.routines)
+        print(f'Wrote {options.profile}')
     for fname in options.dump:
         ext = fname.lower()[-4:]
         if ext in ay_audio_fmts and options.ay:
@@ -416,12 +531,22 @@ def main(args):
                        help='Set AY sampling resolution to this many T-states (default: 622).')
     group.add_argument('--beeper', action='store_true',
                        help="Capture beeper audio (when used with --ay).")
+    group.add_argument('--break', dest='breaks', metavar='EXPR', action='append', default=[],
+                       help="Stop execution when this condition is met. "
+                            "Do '--break help' for more information. "
+                            "This option may be used multiple times.")
+    group.add_argument('--bin-trace', metavar='FILE',
+                       help="Write a binary trace of executed instructions to a file.")
     group.add_argument('-c', '--cmio', action='store_true',
                        help="Simulate memory and I/O contention and the MEMPTR register.")
     group.add_argument('-D', '--decimal', action='store_true',
                        help="Show decimal values in verbose mode.")
     group.add_argument('--depth', type=int, default=2,
                        help='Simplify audio delays to this depth (default: 2).')
+    group.add_argument('--frame-step', metavar='N', type=int, default=1,
+                       help='Capture every Nth frame with --frames (default: 1).')
+    group.add_argument('--frames', metavar='DIR|FILE.png',
+                       help="Write the screen contents of each frame to a numbered PNG file in DIR, or to an animated PNG file.")
     group.add_argument('-I', '--ini', dest='params', metavar='p=v', action='append', default=[],
                        help="Set the value of the configuration parameter 'p' to 'v'. This option may be used multiple times.")
     group.add_argument('--map', metavar='FILE',
@@ -438,6 +563,8 @@ def main(args):
                        help="POKE N,v in RAM bank p for N in {a, a+c, a+2c..., b} before execution begins. "
                             "Prefix 'v' with '^' to perform an XOR operation, or '+' to perform an ADD operation. "
                             "This option may be used multiple times.")
+    group.add_argument('--profile', metavar='FILE',
+                       help="Write a profile of instruction counts and T-states per address to a file.")
     group.add_argument('--python', action='store_true',
                        help="Use the pure Python Z80 simulator.")
     group.add_argument('-r', '--reg', metavar='name=value', action='append', default=[],
@@ -445,6 +572,8 @@ def main(args):
                             "This option may be used multiple times.")
     group.add_argument('--rom', metavar='FILE',
                        help='Patch in a ROM at address 0 from this file.')
+    group.add_argument('--routines', metavar='FILE',
+                       help="Group the profile by the entries in this control file or skool file.")
     group.add_argument('--show-config', dest='show_config', action='store_true',
                        help="Show configuration parameter values.")
     group.add_argument('-s', '--start', metavar='ADDR', type=integer,
@@ -464,6 +593,9 @@ def main(args):
                        help='Show SkoolKit version number and exit.')
     group.add_argument('--volume', metavar='VOL', type=int, default=100,
                        help='Set audio volume percentage (default: 100).')
+    group.add_argument('--watch', metavar='A[-B]', action='append', default=[],
+                       help="Stop execution when an address from A to B is written to. "
+                            "This option may be used multiple times.")
     namespace, unknown_args = parser.parse_known_args(args)
     if namespace.show_config:
         show_config('trace', config)
@@ -473,6 +605,9 @@ def main(args):
     if 'help' in namespace.state:
         print_state_help(show_defaults=False, omit=['issue2'])
         return
+    if 'help' in namespace.breaks:
+        print_break_help()
+        return
     if unknown_args or namespace.snafile is None:
         parser.exit(2, parser.format_help())
     update_options('trace', namespace, namespace.params, config)
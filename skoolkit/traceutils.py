@@ -14,11 +14,53 @@
 # You should have received a copy of the GNU General Public License along with
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from functools import partial
+from string import Formatter
+import mmap
+import multiprocessing
+import os
 import re
+import struct
 
+from skoolkit import SkoolKitError, get_int_param, read_bin_file
+from skoolkit.graphics import Frame, Udg
 from skoolkit.simutils import (A, F, B, C, D, E, H, L, IXh, IXl, IYh, IYl,
                                SP, SP2, I, R, xA, xF, xB, xC, xD, xE, xH, xL,
-                               MEMPTR)
+                               PC, T, MEMPTR)
+
+TRACE_MAGIC = b'SKTRACE1'
+
+# Timestamp, PC, instruction bytes, A-IYl, SP, I, R, A'-L', MEMPTR
+TRACE_RECORD = struct.Struct('<QH4s12BH10BH')
+
+# Breakpoint condition operand types
+BP_REG = 1
+BP_PAIR = 2
+BP_MEM = 3
+BP_IN = 4
+BP_OUT = 5
+
+BP_OPERANDS = {
+    'a': (BP_REG, A), 'f': (BP_REG, F), 'b': (BP_REG, B), 'c': (BP_REG, C),
+    'd': (BP_REG, D), 'e': (BP_REG, E), 'h': (BP_REG, H), 'l': (BP_REG, L),
+    'ixh': (BP_REG, IXh), 'ixl': (BP_REG, IXl), 'iyh': (BP_REG, IYh), 'iyl': (BP_REG, IYl),
+    'i': (BP_REG, I), 'r': (BP_REG, R), 'sp': (BP_REG, SP), 'pc': (BP_REG, PC),
+    't': (BP_REG, T), 'memptr': (BP_REG, MEMPTR),
+    '^a': (BP_REG, xA), '^f': (BP_REG, xF), '^b': (BP_REG, xB), '^c': (BP_REG, xC),
+    '^d': (BP_REG, xD), '^e': (BP_REG, xE), '^h': (BP_REG, xH), '^l': (BP_REG, xL),
+    'bc': (BP_PAIR, B), 'de': (BP_PAIR, D), 'hl': (BP_PAIR, H), 'ix': (BP_PAIR, IXh),
+    'iy': (BP_PAIR, IYh), '^bc': (BP_PAIR, xB), '^de': (BP_PAIR, xD), '^hl': (BP_PAIR, xH),
+    'in': (BP_IN, 0), 'out': (BP_OUT, 0)
+}
+
+RE_BP_CONDITION = re.compile(r'\s*(\^?[a-z]+|\([^)]*\))\s*(&\s*[^=!<>]+?)?\s*(==|=|!=|<=|<|>=|>)\s*(\S.*?)\s*$', re.I)
+
+RE_CTL_ENTRY = re.compile(r'([bcgistuw])\s+(\$[0-9A-Fa-f]+|0x[0-9A-Fa-f]+|\d+)\s(.*)')
+
+BP_MASK = 2**64 - 1
 
 REGISTERS = {
     'a': (A, SP2),
@@ -71,6 +113,453 @@ def _m_repl(match):
 def get_trace_line(trace_line):
     return re.sub(r'(\{+)m\[(0x|\$)([0-9a-fA-F]+)\]', _m_repl, trace_line)
 
+def get_exec_map(fname=None):
+    exec_map = bytearray(8192)
+    if fname and os.path.isfile(fname):
+        if os.path.getsize(fname) == 8192:
+            # Assume this is a Z80 map file
+            exec_map[:] = read_bin_file(fname)
+        else:
+            with open(fname) as f:
+                for line in f:
+                    if re.match(r'\$[0-9A-F]{4}', line):
+                        addr = int(line[1:5], 16)
+                        exec_map[addr // 8] |= 1 << (addr % 8)
+    return exec_map
+
+def write_exec_map(fname, exec_map, z80):
+    if z80:
+        with open(fname, 'wb') as f:
+            f.write(exec_map)
+    else:
+        with open(fname, 'w') as f:
+            for i, b in enumerate(exec_map):
+                if b:
+                    for addr in range(i * 8, i * 8 + 8):
+                        if b & 1:
+                            f.write(f'${addr:04X}\n')
+                        b >>= 1
+
+def trace_record(registers, pc, t0, ibytes):
+    return TRACE_RECORD.pack(t0, pc, ibytes, *registers[A:SP], registers[SP], *registers[I:PC], registers[MEMPTR])
+
+def _parse_bp_condition(condition):
+    match = RE_BP_CONDITION.match(condition)
+    if not match:
+        raise ValueError
+    operand, mask, op, values = match.group(1).lower(), match.group(2), match.group(3), match.group(4)
+    if operand.startswith('('):
+        kind, arg = BP_MEM, get_int_param(operand[1:-1].strip(), True) % 65536
+    else:
+        kind, arg = BP_OPERANDS[operand]
+    if mask:
+        mask = get_int_param(mask[1:].strip(), True) & BP_MASK
+    else:
+        mask = BP_MASK
+    if op in ('=', '==', '!='):
+        ranges = []
+        for spec in values.split(','):
+            lo, sep, hi = spec.strip().partition('-')
+            ranges.append((get_int_param(lo, True), get_int_param(hi, True) if sep else get_int_param(lo, True)))
+        return (kind, arg, mask, int(op == '!='), ranges)
+    value = get_int_param(values, True)
+    if op == '<':
+        return (kind, arg, mask, 0, [(0, value - 1)])
+    if op == '<=':
+        return (kind, arg, mask, 0, [(0, value)])
+    if op == '>':
+        return (kind, arg, mask, 0, [(value + 1, BP_MASK)])
+    return (kind, arg, mask, 0, [(value, BP_MASK)])
+
+def compile_breakpoints(exprs):
+    program = []
+    for expr in exprs:
+        try:
+            conditions = [_parse_bp_condition(c) for c in expr.split('&&')]
+        except (KeyError, ValueError):
+            raise SkoolKitError(f"Invalid breakpoint: '{expr}'")
+        program.append(len(conditions))
+        for kind, arg, mask, negate, ranges in conditions:
+            program.extend((kind, arg, mask, negate, len(ranges)))
+            for lo, hi in ranges:
+                if hi < max(lo, 0) or lo > BP_MASK:
+                    program.extend((1, 0)) # Empty range
+                else:
+                    program.extend((max(lo, 0), min(hi, BP_MASK)))
+    return array('Q', program)
+
+def get_io(memory, registers, pc):
+    opcode = memory[pc]
+    if opcode in (0xDB, 0xD3):
+        port = memory[(pc + 1) % 65536] + 256 * registers[A]
+        return (0x10000, 0x20000)[opcode == 0xD3] + port
+    if opcode == 0xED:
+        opcode2 = memory[(pc + 1) % 65536]
+        bc = registers[C] + 256 * registers[B]
+        if opcode2 & 0xC7 == 0x40 or opcode2 & 0xE7 == 0xA2:
+            return 0x10000 + bc
+        if opcode2 & 0xC7 == 0x41:
+            return 0x20000 + bc
+        if opcode2 & 0xE7 == 0xA3:
+            return 0x20000 + registers[C] + 256 * ((registers[B] - 1) & 0xFF)
+    return 0
+
+def check_breakpoints(program, registers, memory, io):
+    i = index = 0
+    while i < len(program):
+        count = program[i]
+        i += 1
+        met = True
+        for c in range(count):
+            kind, arg, mask, negate, num = program[i:i + 5]
+            ranges = program[i + 5:i + 5 + 2 * num]
+            i += 5 + 2 * num
+            if met:
+                if kind == BP_REG:
+                    valid, value = True, registers[arg]
+                elif kind == BP_PAIR:
+                    valid, value = True, 256 * registers[arg] + registers[arg + 1]
+                elif kind == BP_MEM:
+                    valid, value = True, memory[arg]
+                elif kind == BP_IN:
+                    valid, value = io >> 16 == 1, io & 0xFFFF
+                else:
+                    valid, value = io >> 16 == 2, io & 0xFFFF
+                value &= mask
+                in_range = any(lo <= value <= hi for lo, hi in zip(ranges[::2], ranges[1::2]))
+                met = valid and in_range != bool(negate)
+        if met:
+            return index
+        index += 1
+    return -1
+
+def get_watch_map(specs):
+    watch = bytearray(8192)
+    for spec in specs:
+        try:
+            a, sep, b = spec.partition('-')
+            start = get_int_param(a, True)
+            end = get_int_param(b, True) if sep else start
+        except ValueError:
+            start = end = -1
+        if not 0 <= start <= end < 65536:
+            raise SkoolKitError(f"Invalid address range: '{spec}'")
+        for addr in range(start, end + 1):
+            watch[addr >> 3] |= 1 << (addr & 7)
+    return watch
+
+def get_routines(fname):
+    ctl = fname.lower().endswith('.ctl')
+    if ctl:
+        entry_re = RE_CTL_ENTRY
+    else:
+        entry_re = re.compile(r'([bcgistuw])(\$[0-9A-Fa-f]+|0x[0-9A-Fa-f]+|\d+)\s')
+    routines = []
+    title = None
+    with open(fname) as f:
+        for line in f:
+            line = line.rstrip()
+            if not line:
+                title = None
+            elif line.startswith(';'):
+                if title is None:
+                    title = line[1:].strip()
+            else:
+                match = entry_re.match(line + ' ')
+                if match:
+                    if ctl:
+                        title = match.group(3).strip()
+                    routines.append((get_int_param(match.group(2), True), match.group(1), title or ''))
+                    title = None
+    return sorted(routines)
+
+def _profile_rows(counts, tstates, routines):
+    if routines:
+        starts = [r[0] for r in routines]
+        rows = {}
+        for addr in range(65536):
+            if counts[addr]:
+                index = bisect_right(starts, addr) - 1
+                if index >= 0:
+                    row = rows.setdefault(index, [0, 0])
+                    row[0] += counts[addr]
+                    row[1] += tstates[addr]
+        return {routines[i][0]: r for i, r in rows.items()}
+    return {a: (counts[a], tstates[a]) for a in range(65536) if counts[a]}
+
+def _write_profile_ctl(fname, rows, total, routines, ctlfile):
+    # Write the input control file (or, if the routines came from a skool
+    # file, an entry line for each routine) with a profile 'D' directive after
+    # each entry that was executed
+    if ctlfile and ctlfile.lower().endswith('.ctl'):
+        with open(ctlfile) as f:
+            lines = f.readlines()
+    else:
+        lines = [f'{ctl} ${addr:04X} {title}'.rstrip() + '\n' for addr, ctl, title in routines]
+    with open(fname, 'w') as f:
+        for line in lines:
+            f.write(line.rstrip('\n') + '\n')
+            match = RE_CTL_ENTRY.match(line.rstrip() + ' ')
+            if match:
+                addr = get_int_param(match.group(2), True)
+                if addr in rows:
+                    count, t = rows[addr]
+                    f.write(f'D {match.group(2)} Profile: {t} T-states ({t * 100 / (total or 1):.2f}%), {count} instructions executed.\n')
+
+def write_profile(fname, profile, routines=None, prefix='$', word_fmt='04X', ctlfile=None):
+    counts, tstates = profile[:0x10000], profile[0x10000:0x20000]
+    total = sum(tstates)
+    if fname.lower().endswith('.ctl'):
+        _write_profile_ctl(fname, _profile_rows(counts, tstates, routines), total, routines, ctlfile)
+        return
+    with open(fname, 'w') as f:
+        f.write(f'Total: {total} T-states, {sum(counts)} instructions\n')
+        tables = [('Address', _profile_rows(counts, tstates, None), {})]
+        if routines:
+            titles = {addr: title for addr, ctl, title in routines}
+            tables.insert(0, ('Routine', _profile_rows(counts, tstates, routines), titles))
+        for heading, rows, titles in tables:
+            f.write(f'\n{heading:<8} {"T-states":>12} {"%":>7} {"Instructions":>12}\n')
+            for addr, (count, t) in sorted(rows.items(), key=lambda r: (-r[1][1], r[0])):
+                line = f'{prefix}{addr:{word_fmt}}'
+                line = f'{line:<8} {t:>12} {t * 100 / (total or 1):>7.2f} {count:>12}  {titles.get(addr, "")}'
+                f.write(line.rstrip() + '\n')
+
+# Maximum number of frames that may be captured in an animated PNG file (whose
+# frames are held in memory until the file is written)
+MAX_APNG_FRAMES = 10000
+
+# T-state at which the first visible pixel of each of the 240 lines of the
+# screen (including the border) is drawn, relative to the start of the frame
+BORDER_LINE_TIMES = (
+    tuple((y + 40) * 224 - 12 for y in range(240)), # 48K
+    tuple((y + 39) * 228 - 16 for y in range(240))  # 128K
+)
+
+def _border_udg(colours):
+    paper = colours[0]
+    others = [c for c in colours if c != paper]
+    if others:
+        ink = max(others, key=others.count)
+        return Udg(paper * 8 + ink, [255 * (c == ink) for c in colours])
+    return Udg(paper * 8, [0] * 8)
+
+def _frame_udgs(scr, border, flash):
+    udgs = []
+    for y in range(30):
+        colours = border[8 * y:8 * y + 8]
+        if 3 <= y < 27:
+            edge = [_border_udg(colours)] * 4
+            r = y - 3
+            attr_addr = 6144 + 32 * r
+            addr = 2048 * (r // 8) + 32 * (r % 8)
+            row = []
+            for i in range(32):
+                attr = scr[attr_addr + i]
+                if attr & 0x80:
+                    if flash:
+                        attr = (attr & 0x40) + ((attr & 0x07) * 8) + ((attr // 8) & 0x07)
+                    else:
+                        attr &= 0x7F
+                row.append(Udg(attr, scr[addr + i:addr + i + 2048:256]))
+            udgs.append(edge + row + edge)
+        else:
+            udgs.append([_border_udg(colours)] * 40)
+    return udgs
+
+def _get_frame(scr, border, flash, scale, delay=32):
+    return Frame(partial(_frame_udgs, scr, border, flash), scale, delay=delay)
+
+_frame_image_writer = None
+
+def _init_frame_worker(image_writer):
+    global _frame_image_writer
+    _frame_image_writer = image_writer
+
+def _write_frame(fname, scr, border, flash, scale):
+    with open(fname, 'wb') as f:
+        _frame_image_writer.write_image([_get_frame(scr, border, flash, scale)], f)
+
+class FrameWriter:
+    """Capture screen and border contents every `step` frames, and write them
+    either to numbered PNG files in a directory or to a single animated PNG
+    file (if `path` ends with '.png').
+
+    PNG files in a directory are written by a pool of worker processes (where
+    the 'fork' start method is available) so that the simulator does not have
+    to wait for them to be encoded. The frames of an animated PNG file are
+    held in memory until :meth:`close` is called, because the number of frames
+    and the palette must be known before the file can be written; capturing
+    more than ``MAX_APNG_FRAMES`` frames is an error.
+
+    :param path: The output directory or PNG file.
+    :param step: Capture every `step`-th frame.
+    :param scale: The image scale factor.
+    :param is128k: Whether to use 128K border timings.
+    :param image_writer: The image writer to use.
+    :param screen: A screen object whose `draw()` method (if any) is called
+                   after each frame has been captured.
+    :param jobs: The number of worker processes to use (default: the number of
+                 CPUs).
+    """
+    def __init__(self, path, step, scale, is128k, image_writer, screen=None, jobs=None):
+        self.path = path
+        self.step = max(step, 1)
+        self.scale = scale
+        self.line_times = BORDER_LINE_TIMES[is128k]
+        self.image_writer = image_writer
+        self.screen = screen
+        self.count = 0
+        self.frames = []
+        self.pending = deque()
+        self.pool = None
+        self.jobs = jobs or os.cpu_count() or 1
+        self.apng = path.lower().endswith('.png')
+        if not self.apng:
+            os.makedirs(path, exist_ok=True)
+            if 'fork' in multiprocessing.get_all_start_methods():
+                self.pool = multiprocessing.get_context('fork').Pool(self.jobs, _init_frame_worker, (image_writer,))
+            else: # pragma: no cover
+                _init_frame_worker(image_writer)
+
+    def _border_colours(self, border):
+        colours = bytearray(240)
+        index = 0
+        colour = border[0][1] & 7
+        for y, t in enumerate(self.line_times):
+            while index < len(border) and border[index][0] <= t:
+                colour = border[index][1] & 7
+                index += 1
+            colours[y] = colour
+        return colours
+
+    def draw(self, scr, frame, border, keyboard=None):
+        """Capture the screen and border (if this is a frame to be captured),
+        and then call the screen's `draw()` method (if there is a screen).
+
+        :param scr: A 6912-element sequence of byte values from the display
+                    file and attribute file.
+        :param frame: Frame number (used to determine the state of flashing
+                      cells).
+        :param border: A log of the output to port 0xFE.
+        :param keyboard: A list for capturing the keyboard state.
+        :return: `False` if the screen window has been closed, `True`
+                 otherwise.
+        """
+        if self.count % self.step == 0:
+            args = (bytes(scr), self._border_colours(border), (frame // 16) % 2)
+            index = self.count // self.step
+            if self.apng:
+                if len(self.frames) >= MAX_APNG_FRAMES:
+                    self.frames = []
+                    raise SkoolKitError(f'Too many frames for {self.path} (maximum {MAX_APNG_FRAMES}); use --frame-step or write the frames to a directory')
+                self.frames.append(args)
+            else:
+                fname = os.path.join(self.path, f'frame-{index:06}.png')
+                if self.pool:
+                    while len(self.pending) >= 2 * self.jobs:
+                        self.pending.popleft().get()
+                    self.pending.append(self.pool.apply_async(_write_frame, (fname, *args, self.scale)))
+                else: # pragma: no cover
+                    _write_frame(fname, *args, self.scale)
+        self.count += 1
+        if self.screen:
+            return self.screen.draw(scr, frame, border, keyboard)
+        border[:] = [(0, border[-1][1])]
+        return True
+
+    def close(self):
+        """Finish writing any PNG files that are still being encoded, or write
+        the animated PNG file.
+
+        :return: The number of frames captured.
+        """
+        if self.pool:
+            try:
+                while self.pending:
+                    self.pending.popleft().get()
+            finally:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
+        if self.apng and self.frames:
+            delay = 2 * self.step
+            frames = [_get_frame(*args, self.scale, delay) for args in self.frames]
+            with open(self.path, 'wb') as f:
+                self.image_writer.write_image(frames, f)
+        return (self.count + self.step - 1) // self.step
+
+class _Timestamps:
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return (len(self.data) - len(TRACE_MAGIC)) // TRACE_RECORD.size
+
+    def __getitem__(self, index):
+        return struct.unpack_from('<Q', self.data, len(TRACE_MAGIC) + index * TRACE_RECORD.size)[0]
+
+class BinaryTrace:
+    def __init__(self, fname):
+        with open(fname, 'rb') as f:
+            if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+                raise SkoolKitError(f'{fname}: not a binary trace file')
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.timestamps = _Timestamps(self.data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def close(self):
+        self.data.close()
+
+    def find(self, tstates):
+        # Timestamps increase from one record to the next, so the records
+        # themselves serve as an index
+        return bisect_left(self.timestamps, tstates)
+
+    def records(self, start=0):
+        registers = [0] * 30
+        offset = len(TRACE_MAGIC) + start * TRACE_RECORD.size
+        end = len(TRACE_MAGIC) + len(self) * TRACE_RECORD.size
+        for values in TRACE_RECORD.iter_unpack(memoryview(self.data)[offset:end]):
+            t, pc, ibytes = values[:3]
+            registers[A:SP] = values[3:15]
+            registers[SP] = values[15]
+            registers[I:PC] = values[16:26]
+            registers[PC] = pc
+            registers[T] = t
+            registers[MEMPTR] = values[26]
+            yield pc, t, ibytes, registers
+
+    def lines(self, trace_line, prefix='$', byte_fmt='02X', word_fmt='04X', start=0, end=65536,
+              min_time=0, max_time=None):
+        # Check the trace line before any records are read, because memory
+        # contents (the 'm' replacement field) are not recorded
+        for field in Formatter().parse(trace_line):
+            if field[1] is not None and re.split(r'[.\[]', field[1], 1)[0] == 'm':
+                raise SkoolKitError(f"Memory contents are not available in a binary trace: '{{{field[1]}}}'")
+        return self._lines(trace_line, prefix, byte_fmt, word_fmt, start, end, min_time, max_time)
+
+    def _lines(self, trace_line, prefix, byte_fmt, word_fmt, start, end, min_time, max_time):
+        r = Registers(None)
+        memory = [0] * 65536
+        for pc, t, ibytes, registers in self.records(self.find(min_time)):
+            if max_time is not None and t > max_time:
+                break
+            if start <= pc < end:
+                for i, b in enumerate(ibytes):
+                    memory[(pc + i) % 65536] = b
+                r.registers = registers
+                i = disassemble(memory, pc, prefix, byte_fmt, word_fmt)[0]
+                yield trace_line.format(pc=pc, i=i, r=r, t=t)
+
 def disassemble(memory, address, prefix='$', byte_fmt='02X', word_fmt='04X'):
     opcode = memory[address]
     func, operation, size = OPCODES[opcode]
@@ -27,6 +27,9 @@ INDEX_REG = ('IXH', 'IXL', 'IYH', 'IYL')
 INDEX_REG_PAIRS = ('IX', 'IY')
 OPERAND_AE_CHARS = frozenset('+-*/%0123456789()')
 
+# Maximum number of operations whose byte values are cached by the assembler
+ASSEMBLER_CACHE_SIZE = 8192
+
 TIMINGS = {
     0x00: 4,        # NOP
     0x01: 10,       # LD BC,nn
@@ -1058,6 +1061,16 @@ def _index_reg_index(index_reg):
 def _condition_index(condition):
     return ('NZ', 'Z', 'NC', 'C', 'PO', 'PE', 'P', 'M').index(condition)
 
+def _relocate(opcode, target, address):
+    offset = target - address
+    if offset >= 65410:
+        offset -= 65536
+    elif offset <= -65407:
+        offset += 65536
+    if -126 <= offset < 130:
+        return (opcode, (offset - 2) & 255)
+    return ()
+
 class Assembler:
     def __init__(self):
         self.op_evaluator = get_operand_evaluator()
@@ -1131,6 +1144,7 @@ class Assembler:
             'SUB': partial(self._arithmetic_a, 144),
             'XOR': partial(self._arithmetic_a, 168)
         }
+        self._cache = {}
 
     def _parse_expr(self, text, limit, brackets, non_neg, default):
         try:
@@ -1215,18 +1229,14 @@ class Assembler:
             return (_index_code(op), base_code8 + 32 + 8 * (_index_reg_index(op) % 2))
         return (base_code8 + 8 * _reg_index(op),)
 
-    def _address_offset(self, address, op):
-        offset = self.parse_word(op) - address
-        if offset >= 65410:
-            offset -= 65536
-        elif offset <= -65407:
-            offset += 65536
-        if -126 <= offset < 130:
-            return (offset - 2) & 255
-        raise ValueError
+    def _relative_jump(self, opcode, address, op):
+        target = self.parse_word(op)
+        if address is None:
+            return partial(_relocate, opcode, target)
+        return _relocate(opcode, target, address)
 
     def _assemble_djnz(self, address, op):
-        return (16, self._address_offset(address, op))
+        return self._relative_jump(16, address, op)
 
     def _assemble_ex(self, address, op1, op2):
         if op1 == 'AF' and op2 == "AF'":
@@ -1266,8 +1276,8 @@ class Assembler:
 
     def _assemble_jr(self, address, op1, op2=None):
         if op2 is None:
-            return (24, self._address_offset(address, op1))
-        return (32 + 8 * _condition_index(op1), self._address_offset(address, op2))
+            return self._relative_jump(24, address, op1)
+        return self._relative_jump(32 + 8 * _condition_index(op1), address, op2)
 
     def _assemble_ld(self, address, op1, op2):
         if op1 in REG:
@@ -1434,6 +1444,17 @@ class Assembler:
         return tuple(data)
 
     def convert_case(self, operation, lower=True, trim=False):
+        if '"' not in operation and operation.isascii() and operation.isprintable():
+            # No strings to preserve, and no whitespace other than spaces
+            if lower:
+                converted = operation.lower()
+            else:
+                converted = operation.upper()
+            if trim:
+                elements = converted.split(' ', 1)
+                if len(elements) > 1:
+                    return elements[0] + ' ' + elements[1].replace(' ', '')
+            return converted
         i = 0
         converted = ''
         convert = True
@@ -1479,6 +1500,15 @@ class Assembler:
             return
         return a(address, *parts[1:])
 
+    def _assemble_relocatable(self, operation):
+        # Return the byte values of an instruction that does not depend on its
+        # address, or a function that returns the byte values of a relative
+        # jump (JR or DJNZ) at a given address
+        try:
+            return self._assemble(operation, None) or ()
+        except:
+            return ()
+
     def split_operation(self, operation, tidy=False):
         if tidy:
             operation = self.convert_case(operation, False, True)
@@ -1508,7 +1538,14 @@ class Assembler:
         :return: A sequence of byte values (empty if the instruction cannot be
                  assembled).
         """
+        data = self._cache.get(operation)
+        if data is None:
+            if len(self._cache) >= ASSEMBLER_CACHE_SIZE:
+                self._cache.clear()
+            data = self._cache[operation] = self._assemble_relocatable(operation)
+        if isinstance(data, tuple):
+            return data
         try:
-            return self._assemble(operation, address) or ()
+            return data(address)
         except:
             return ()
@@ -124,6 +124,25 @@ class AttributesTest(CSimulatorAPITest):
         self.assertEqual(len(s.memory), len(memory))
         self.assertTrue(all(b1 == b2 for b1, b2 in zip(memory, s.memory)))
 
+    def test_memory_48k_bytearray(self):
+        memory = bytearray(n & 0xFF for n in range(65536))
+        s = CSimulator(memory)
+        self.assertIs(s.memory, memory)
+
+    def test_memory_48k_bytes(self):
+        memory = bytes(n & 0xFF for n in range(65536))
+        s = CSimulator(memory)
+        self.assertIsInstance(s.memory, bytearray)
+        self.assertEqual(s.memory, memory)
+
+    def test_memory_128k(self):
+        memory = Memory()
+        banks = memory.banks
+        s = CSimulator(memory)
+        self.assertIs(s.memory, memory)
+        for b in range(8):
+            self.assertIs(memory.banks[b], banks[b])
+
     def test_registers(self):
         s = CSimulator([0] * 65536, {'A': 123})
         self.assertTrue(hasattr(s, 'registers'))
@@ -299,6 +318,10 @@ class LoadTest(CSimulatorAPITest):
         key = lambda t: list(t.accelerators)[-1]
         self._test_missing_attribute(TestLoadTracer, 'polarity', key)
 
+    def test_accelerator_no_block(self):
+        key = lambda t: list(t.accelerators)[-1]
+        self._test_missing_attribute(TestLoadTracer, 'block', key)
+
 class PressTest(CSimulatorAPITest):
     def test_too_few_args(self):
         s = CSimulator([0] * 65536)
@@ -385,41 +408,92 @@ class TraceTest(CSimulatorAPITest):
         s = CSimulator([0] * 65536)
         with self.assertRaises(TypeError) as cm:
             s.trace(1)
-        self.assertEqual(cm.exception.args[0], "function takes exactly 10 positional arguments (1 given)")
+        self.assertEqual(cm.exception.args[0], "function takes exactly 13 positional arguments (1 given)")
 
     def test_too_many_args(self):
         s = CSimulator([0] * 65536)
         with self.assertRaises(TypeError) as cm:
-            s.trace(1, 1, 1, 1, True, None, None, None, None, None, None)
-        self.assertEqual(cm.exception.args[0], "function takes at most 10 arguments (11 given)")
+            s.trace(1, 1, 1, 1, True, None, None, None, None, None, None, None, None, None)
+        self.assertEqual(cm.exception.args[0], "function takes at most 13 arguments (14 given)")
 
     def test_no_tracer(self):
         s = CSimulator([0] * 65536)
         with self.assertRaises(ValueError) as cm:
-            s.trace(1, 1, 1, 1, True, None, None, None, None, None)
+            s.trace(1, 1, 1, 1, True, None, None, None, None, None, None, None, None)
         self.assertEqual(cm.exception.args[0], "no tracer set")
 
     def test_invalid_max_operations(self):
         s = CSimulator([0] * 65536)
         max_operations = None
         with self.assertRaises(TypeError) as cm:
-            s.trace(1, 1, max_operations, 1, True, None, None, None, None, None)
+            s.trace(1, 1, max_operations, 1, True, None, None, None, None, None, None, None, None)
         self.assertEqual(cm.exception.args[0], "argument 3 must be int, not None")
 
     def test_invalid_max_time(self):
         s = CSimulator([0] * 65536)
         max_time = ()
         with self.assertRaises(TypeError) as cm:
-            s.trace(1, 1, 1, max_time, True, None, None, None, None, None)
+            s.trace(1, 1, 1, max_time, True, None, None, None, None, None, None, None, None)
         self.assertEqual(cm.exception.args[0], "argument 4 must be int, not tuple")
 
     def test_no_border(self):
         s = CSimulator([0] * 65536)
         s.set_tracer(TestTracer())
         with self.assertRaises(AttributeError) as cm:
-            s.trace(1, 1, 1, 1, True, None, None, None, None, None)
+            s.trace(1, 1, 1, 1, True, None, None, None, None, None, None, None, None)
         self.assertEqual(cm.exception.args[0], "'TestTracer' object has no attribute 'border'")
 
+    def test_breakpoints_and_watch(self):
+        memory = [0] * 65536
+        memory[32768:32772] = (0x3C, 0x32, 0x00, 0x90) # INC A; LD (36864),A
+        s = CSimulator(memory)
+        s.set_tracer(TestKeypressTracer())
+        breakpoints = array.array('Q', (1, 1, 0, 255, 0, 1, 1, 1))
+        self.assertEqual(s.trace(32768, 32772, 0, 0, False, None, None, None, breakpoints, None, None, None, None), (5, 1))
+        watch = bytearray(8192)
+        watch[4608] = 1
+        s.registers[24] = 32768
+        self.assertEqual(s.trace(32768, 32773, 0, 0, False, None, None, None, None, watch, None, None, None), (4, 2))
+
+    def test_invalid_breakpoints(self):
+        s = CSimulator([0] * 65536)
+        s.set_tracer(TestKeypressTracer())
+        breakpoints = array.array('I', [0, 0])
+        with self.assertRaises(ValueError) as cm:
+            s.trace(1, 1, 1, 1, True, None, None, None, breakpoints, None, None, None, None)
+        self.assertEqual(cm.exception.args[0], "breakpoints must be an array of 64-bit integers")
+
+    def test_invalid_watch(self):
+        s = CSimulator([0] * 65536)
+        s.set_tracer(TestKeypressTracer())
+        watch = bytearray(8191)
+        with self.assertRaises(ValueError) as cm:
+            s.trace(1, 1, 1, 1, True, None, None, None, None, watch, None, None, None)
+        self.assertEqual(cm.exception.args[0], "watch map must be at least 8192 bytes long")
+
+    def test_invalid_profile(self):
+        s = CSimulator([0] * 65536)
+        s.set_tracer(TestKeypressTracer())
+        profile = array.array('Q', [0] * 65536)
+        with self.assertRaises(ValueError) as cm:
+            s.trace(1, 1, 1, 1, True, None, None, profile, None, None, None, None, None)
+        self.assertEqual(cm.exception.args[0], "profile must be an array of at least 131072 64-bit integers")
+
+    def test_without_port_tracers(self):
+        memory = [0] * 65536
+        memory[32768:32771] = (0x18, 0xFE, 0x00) # JR 32768; NOP
+        s = CSimulator(memory)
+        s.set_tracer(TestKeypressTracer())
+        exec_map = bytearray(8192)
+        self.assertEqual(s.trace(32768, None, 5, 0, False, None, exec_map, None, None, None, None, None, None), (1, 5))
+        self.assertEqual(s.registers[25], 60)
+        self.assertEqual(exec_map[4096], 1)
+        self.assertEqual(s.trace(None, None, 0, 120, False, None, None, None, None, None, None, None, None), (2, 5))
+        self.assertEqual(s.registers[25], 120)
+        s = CSimulator([0] * 65536)
+        s.set_tracer(TestKeypressTracer())
+        self.assertEqual(s.trace(32768, 32770, 0, 0, False, None, None, None, None, None, None, None, None), (3, 2))
+
 class RunTest(CSimulatorAPITest):
     def test_too_many_args(self):
         s = CSimulator([0] * 65536)
@@ -470,6 +544,25 @@ class ExecFrameTest(CSimulatorAPITest):
             s.exec_frame('1')
         self.assertEqual(cm.exception.args[0], "'str' object cannot be interpreted as an integer")
 
+    def test_invalid_exec_map(self):
+        s = CSimulator([0] * 65536)
+        with self.assertRaises(TypeError) as cm:
+            s.exec_frame(1, [])
+        self.assertEqual(cm.exception.args[0], "a bytes-like object is required, not 'list'")
+
+    def test_exec_map_too_small(self):
+        s = CSimulator([0] * 65536)
+        with self.assertRaises(ValueError) as cm:
+            s.exec_frame(1, bytearray(8191))
+        self.assertEqual(cm.exception.args[0], "execution map must be at least 8192 bytes long")
+
+    def test_exec_map_bitmap(self):
+        s = CSimulator([0] * 65536)
+        exec_map = bytearray(8192)
+        s.exec_frame(11, exec_map)
+        self.assertEqual(exec_map[:2], b'\xff\x07')
+        self.assertEqual(sum(exec_map), 262)
+
 class AcceptInterruptTest(CSimulatorAPITest):
     def test_too_few_args(self):
         s = CSimulator([0] * 65536)
@@ -508,6 +601,38 @@ class ExecWithCBTest(CSimulatorAPITest):
             s.exec_with_cb([], None)
         self.assertEqual(cm.exception.args[0], "'list' object cannot be interpreted as an integer")
 
+class CheckpointTest(CSimulatorAPITest):
+    def test_too_many_args(self):
+        s = CSimulator([0] * 65536)
+        with self.assertRaises(TypeError) as cm:
+            s.checkpoint(None)
+        self.assertEqual(cm.exception.args[0], "CSimulator.checkpoint() takes no arguments (1 given)")
+
+class RestoreTest(CSimulatorAPITest):
+    def test_too_few_args(self):
+        s = CSimulator([0] * 65536)
+        with self.assertRaises(TypeError) as cm:
+            s.restore()
+        self.assertEqual(cm.exception.args[0], "function takes exactly 1 positional argument (0 given)")
+
+    def test_too_many_args(self):
+        s = CSimulator([0] * 65536)
+        with self.assertRaises(TypeError) as cm:
+            s.restore(b'', None)
+        self.assertEqual(cm.exception.args[0], "function takes at most 1 argument (2 given)")
+
+    def test_invalid_checkpoint(self):
+        s = CSimulator([0] * 65536)
+        with self.assertRaises(TypeError) as cm:
+            s.restore(1)
+        self.assertEqual(cm.exception.args[0], "a bytes-like object is required, not 'int'")
+
+    def test_checkpoint_wrong_length(self):
+        s = CSimulator([0] * 65536)
+        with self.assertRaises(ValueError) as cm:
+            s.restore(b'')
+        self.assertEqual(cm.exception.args[0], "checkpoint length is 0 (expected 65776)")
+
 class SetTracerTest(CSimulatorAPITest):
     def test_too_few_args(self):
         s = CSimulator([0] * 65536)
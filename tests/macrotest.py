@@ -1348,6 +1348,19 @@ class CommonSkoolMacroTest:
         self.assertEqual(writer.expand('#IF1((0,1),(1,2))'), '(0,1)')
         self.assertEqual(writer.expand('#IF1(#IF0(0,1),2)'), '1')
 
+    def test_macro_if_output_completes_another_macro(self):
+        writer = self._get_writer()
+        self.assertEqual(writer.expand('#IF1(#)IF1(a,b)'), 'a')
+        self.assertEqual(writer.expand('#IF1(#I)F0(a,b)'), 'b')
+        self.assertEqual(writer.expand('(#IF1(#IF)0(c,#IF1(d,e)))'), '(d)')
+        self.assertEqual(writer.expand('#IF0(,#IF1(#IF1)(f,g)),h)'), 'f,h)')
+
+    def test_macro_if_many_in_one_text(self):
+        writer = self._get_writer()
+        text = ' '.join(f'#IF({i}%2)(odd,#IF({i}%3)(even,six)).' for i in range(100))
+        exp_text = ' '.join(('even.', 'odd.', 'six.')[(i % 2) or 2 * (i % 3 == 0)] for i in range(100))
+        self.assertEqual(writer.expand(text), exp_text)
+
     def test_macro_if_base_none(self):
         writer = self._get_writer(skool='')
         self.assertEqual(writer.expand('#IF({base}==0)(PASS,FAIL)'), 'PASS')
@@ -250,6 +250,48 @@ class SimLoadTest(SkoolKitTestCase):
         ]
         self._test_sim_load(f'-c accelerator=rom {tapfile} out.z80', exp_data, exp_reg, exp_output)
 
+    @patch.object(tap2sna, '_write_snapshot', mock_write_snapshot)
+    def test_custom_standard_speed_loader_with_fast_forward(self):
+        code2 = list(range(256))
+        code2_start = 49152
+        code2_end = code2_start + len(code2)
+        code = [
+            221, 33, 0, 192,  # LD IX,49152
+            17, 0, 1,         # LD DE,256
+            55,               # SCF
+            159,              # SBC A,A
+        ]
+        loader_start = 32768
+        code_start = loader_start - len(code)
+        code += get_loader(loader_start)
+        basic_data = self._get_basic_data(code_start)
+        blocks = [
+            create_tap_header_block("simloadbas", 10, len(basic_data), 0),
+            create_tap_data_block(basic_data),
+            create_tap_header_block("simloadbyt", code_start, len(code)),
+            create_tap_data_block(code),
+            create_tap_data_block(code2)
+        ]
+        tapfile = self._write_tap(blocks)
+
+        exp_data = (
+            (basic_data, 23755),
+            (code, code_start),
+            (code2, code2_start)
+        )
+        exp_reg = set(('SP=65342', f'IX={code2_end}', 'DE=0', 'HL=255', 'IY=23610', 'PC=32906'))
+        exp_output = [
+            'Program: simloadbas',
+            'Fast loading data block: 23755,20',
+            'Bytes: simloadbyt',
+            'Fast loading data block: 32759,184',
+            'Data (258 bytes)',
+            'Fast forwarding data block: 49152,256 (1.51s)',
+            'Tape finished',
+            'Simulation stopped (end of tape): PC=32906'
+        ]
+        self._test_sim_load(f'-c fast-load=3 {tapfile} out.z80', exp_data, exp_reg, exp_output)
+
     @patch.object(tap2sna, '_write_snapshot', mock_write_snapshot)
     def test_turbo_loader_pzx(self):
         code2 = [1, 2, 4, 8, 16, 32, 64, 128, 0, 255]
@@ -1,10 +1,12 @@
 from io import BytesIO
+from random import Random
 from struct import pack
+from unittest import skipUnless
 from unittest.mock import patch
 
 from skoolkittest import SkoolKitTestCase
 from skoolkit import audio
-from skoolkit.audio import AudioWriter, BeeperOptions
+from skoolkit.audio import CLOCK_SPEED, SAMPLE_RATE, AudioWriter, BeeperOptions, numpy
 
 def _flatten(elements):
     f = []
@@ -15,6 +17,10 @@ def _flatten(elements):
             f.append(e)
     return f
 
+class UnseekableStream(BytesIO):
+    def seekable(self):
+        return False
+
 def mock_write_wav(audio_file, samples, sample_rate):
     return
 
@@ -67,6 +73,48 @@ class AudioWriterTest(SkoolKitTestCase):
         samples = self._check_header(audio_bytes)
         self.assertEqual(samples, b'\x00\x80\x98\xdf\x99\xc1\x2a\x9d\x00\x00')
 
+    def test_samples_in_more_than_one_block(self):
+        audio_writer = AudioWriter()
+        audio_bytes = self._get_audio_data(audio_writer, [100] * 24000)
+        samples = self._check_header(audio_bytes)
+        self.assertEqual(len(samples), 2 * 30240)
+
+    def test_unseekable_audio_file(self):
+        audio_writer = AudioWriter()
+        options = BeeperOptions(100, False, False, 0, False)
+        audio_stream = UnseekableStream()
+        audio_writer.write_audio(audio_stream, [100] * 4, options)
+        samples = self._check_header(audio_stream.getvalue())
+        self.assertEqual(samples, b'\x00\x80\x30\x3f\x33\x03\x54\xba\xff\x7f')
+
+    @skipUnless(numpy, 'numpy is not installed')
+    def test_batch_filter(self):
+        rng = Random(0)
+        delays = [rng.choice((0, 1, 79, 80, 855, 1710)) for i in range(2 * audio.DELAY_BLOCK_SIZE + 1)]
+        options = {CLOCK_SPEED: 3500000, SAMPLE_RATE: 44100}
+        exp_samples = list(audio._filter(delays, options, 0.5))
+        samples = list(audio._batch_filter(iter(delays), options, 0.5))
+        self.assertEqual(len(samples), 744689)
+        self.assertEqual(exp_samples, samples)
+
+    @skipUnless(numpy, 'numpy is not installed')
+    @patch.object(audio, 'SAMPLE_BLOCK_SIZE', 16)
+    def test_batch_filter_with_long_delays(self):
+        delays = [100, 3500000, 79, 80, 1000000, 855]
+        options = {CLOCK_SPEED: 3500000, SAMPLE_RATE: 44100}
+        exp_samples = list(audio._filter(delays, options, 0.5))
+        samples = list(audio._batch_filter(iter(delays), options, 0.5))
+        self.assertEqual(len(samples), 56714)
+        self.assertEqual(exp_samples, samples)
+
+    def test_samples_out_of_range(self):
+        for mock_numpy in {numpy, None}:
+            with patch.object(audio, 'numpy', mock_numpy):
+                for sample, error in ((1.5, 'greater than maximum'), (-0.5, 'less than minimum')):
+                    with self.assertRaises(OverflowError) as cm:
+                        list(audio._wav_blocks([0.5, sample]))
+                    self.assertEqual(cm.exception.args[0], f'signed short integer is {error}')
+
     @patch.object(audio, 'moving_average_filter', mock_moving_average_filter)
     @patch.object(audio, 'write_wav', mock_write_wav)
     def test_contention_48k(self):
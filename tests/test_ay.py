@@ -1,8 +1,9 @@
 from io import BytesIO
 from struct import pack
+from unittest import skipUnless
 
 from skoolkittest import SkoolKitTestCase
-from skoolkit.ay import CLOCK_SPEED, FRAME_DURATION, SAMPLE_RATE, AYAudioWriter, AYOptions
+from skoolkit.ay import CLOCK_SPEED, FRAME_DURATION, SAMPLE_RATE, AY, AYAudioWriter, AYOptions, numpy
 
 DEFAULT_OPTIONS = AYOptions(100, 622, False, 0)
 
@@ -204,3 +205,26 @@ class AudioWriterTest(SkoolKitTestCase):
     def test_invalid_sample_rate(self):
         ay_audio_writer = AYAudioWriter({SAMPLE_RATE: 'NaN'})
         self.assertEqual(ay_audio_writer.options[SAMPLE_RATE], 44100)
+
+    @skipUnless(numpy, 'numpy is not installed')
+    def test_numpy_renderer(self):
+        ay_log = [(0, 7, 0b11000000)]
+        for frame in range(1, 5):
+            t = frame * 17727
+            ay_log.extend((
+                (t, 0, 0x40 * frame),     # Channel A fine pitch
+                (t + 1, 3, frame % 2),    # Channel B coarse pitch
+                (t + 2, 4, 0x90 - frame), # Channel C fine pitch
+                (t + 3, 6, 7 * frame),    # Noise pitch
+                (t + 4, 7, 0b11000000 | (0b10100101 >> frame) & 0b111111),
+                (t + 5, 8, 0x10),         # Channel A volume (envelope)
+                (t + 6, 9, 4 * frame),    # Channel B volume
+                (t + 7, 10, 0x10 | frame),# Channel C volume (envelope)
+                (t + 8, 11, 3 * frame),   # Envelope fine duration
+                (t + 9, 13, 3 * frame),   # Envelope shape
+            ))
+        ay_log.append((5 * 17727, 8, 0))
+        exp_samples = list(AY((0.25, 0.5, 0.75))._render_samples(ay_log, 44100, 70908, 622, 0.5))
+        samples = list(AY((0.25, 0.5, 0.75))._render_segments(ay_log, 44100, 70908, 622, 0.5))
+        self.assertEqual(len(samples), 2196)
+        self.assertEqual(exp_samples, samples)
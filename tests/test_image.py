@@ -824,6 +824,25 @@ class ImageWriterTest:
         udg.data[0] = 255       # Add black pixels
         self._test_image(frame)
 
+    def test_consecutive_writes_with_same_image_writer(self):
+        image_writer = ImageWriter()
+        udgs = [Udg(attr, [170, 85, 15, 240, 1, 128, 0, 255], [15] * 8) for attr in (49, 56, 10, 66, 113, 86)]
+        frames = (
+            Frame([udgs[:2]]),            # 2 colours
+            Frame([udgs[:2]], 2),         # 2 colours, scale 2
+            Frame([udgs[1:3]]),           # 4 colours
+            Frame([udgs[1:2]], 3, 1),     # 3 colours, OR-AND mask
+            Frame([udgs[1:2]], 3, 2),     # 3 colours, AND-OR mask
+            Frame([udgs[1:3]], 3, 1),     # 5 colours, OR-AND mask
+            Frame([udgs]),                # 9 colours
+            Frame([udgs], 2),             # 9 colours, scale 2
+            Frame([udgs[2:]]),            # 7 colours
+            Frame([udgs[:2]]),            # 2 colours
+        )
+        for frame in frames:
+            exp_img_bytes = self._get_image_data(ImageWriter(), frame)
+            self.assertEqual(exp_img_bytes, self._get_image_data(image_writer, frame))
+
     def test_animation(self):
         # 3 frames, 2 colours, 16x8
         frame1 = Frame([[Udg(6, (128,) * 8), Udg(6, (0,) * 8)]], delay=20)
@@ -847,6 +866,55 @@ class ImageWriterTest:
         frames = [frame1, frame2]
         self._test_animated_image(frames)
 
+    def test_animation_with_delta_frames(self):
+        # 3 frames, 24x16; only the tiles that change are written in frames 2
+        # and 3
+        udgs = [[Udg(56, (n,) * 8) for n in range(k, k + 3)] for k in (0, 3)]
+        frame1 = Frame(udgs, delay=20)
+        udgs = [row[:] for row in udgs]
+        udgs[1][1] = Udg(56, (255,) * 8)
+        frame2 = Frame(udgs, delay=30)
+        udgs = [row[:] for row in udgs]
+        udgs[0][0] = Udg(56, (170,) * 8)
+        udgs[0][1] = Udg(56, (85,) * 8)
+        frame3 = Frame(udgs, delay=40)
+        exp_frames = [
+            frame1,
+            Frame([[udgs[1][1]]], delay=30, x_offset=8, y_offset=8),
+            Frame([udgs[0][:2]], delay=40)
+        ]
+        self._test_animated_image([frame1, frame2, frame3], exp_frames=exp_frames)
+
+    def test_animation_with_cropped_delta_frame(self):
+        # 2 frames, 12x12 cropped from 24x24 at (5,6); the tile that changes
+        # in frame 2 is cropped to 8x2
+        udgs = [[Udg(56, (n,) * 8) for n in range(k, k + 3)] for k in (0, 3, 6)]
+        frame1 = Frame(udgs, x=5, y=6, width=12, height=12)
+        udgs = [row[:] for row in udgs]
+        udgs[0][1] = Udg(56, (129,) * 8)
+        frame2 = Frame(udgs, x=5, y=6, width=12, height=12, delay=50)
+        exp_frames = [
+            frame1,
+            Frame([[udgs[0][1]]], x=0, y=6, width=8, height=2, delay=50, x_offset=3)
+        ]
+        self._test_animated_image([frame1, frame2], exp_frames=exp_frames)
+
+    def test_animation_with_identical_frames_merged(self):
+        # 4 frames, the 2nd and 3rd of which are identical to the 1st and 4th
+        # respectively, so only 2 frames are written
+        frame1 = Frame([[Udg(56, (1,) * 8)]], delay=10)
+        frame2 = Frame([[Udg(56, (1,) * 8)]], delay=20)
+        frame3 = Frame([[Udg(56, (2,) * 8)]], delay=30)
+        frame4 = Frame([[Udg(56, (2,) * 8)]], delay=40)
+        exp_frames = [Frame(frame1.udgs, delay=30), Frame(frame3.udgs, delay=70)]
+        self._test_animated_image([frame1, frame2, frame3, frame4], exp_frames=exp_frames)
+
+    def test_animation_with_all_frames_identical(self):
+        # Written as a still image
+        frames = [Frame([[Udg(56, (170,) * 8)]], delay=d) for d in (10, 20, 30)]
+        exp_img_bytes = self._get_image_data(ImageWriter(), frames[0])
+        self.assertEqual(exp_img_bytes, self._get_animated_image_data(ImageWriter(), frames))
+
     def test_animation_mask1(self):
         # 2 frames, transparency on frame 2
         iw_args = {'config': self.alpha_option}
@@ -1162,7 +1230,7 @@ class PngWriterTest(SkoolKitTestCase, ImageWriterTest):
         # IEND
         self.assertEqual(img_bytes[i:], IEND_CHUNK)
 
-    def _test_animated_image(self, frames, iw_args=None):
+    def _test_animated_image(self, frames, iw_args=None, exp_frames=None):
         image_writer = ImageWriter(**(iw_args or {}))
         img_bytes = self._get_animated_image_data(image_writer, frames)
 
@@ -1180,6 +1248,12 @@ class PngWriterTest(SkoolKitTestCase, ImageWriterTest):
             for c in frame_palette:
                 if c not in exp_palette:
                     exp_palette.append(c)
+        if exp_frames:
+            frame_data = []
+            for frame in exp_frames:
+                x, y, width, height = frame.x, frame.y, frame.width, frame.height
+                pixels = self._get_pixels_from_udg_array(frame.udgs, frame.scale, frame.mask, exp_tindex, x, y, width, height)[3]
+                frame_data.append((width, height, pixels, frame.delay, frame.x_offset, frame.y_offset))
         if has_trans:
             exp_palette.remove(PALETTE[0])
             exp_palette.insert(0, PALETTE[0])
@@ -1212,7 +1286,7 @@ class PngWriterTest(SkoolKitTestCase, ImageWriterTest):
                 i = self._check_trns(img_bytes, i, alpha)
 
         # acTL
-        i = self._check_actl(img_bytes, i, len(frames))
+        i = self._check_actl(img_bytes, i, len(frame_data))
 
         # Frames
         seq_num = 0
@@ -327,7 +327,7 @@ class KeyboardTracerTest(SkoolKitTestCase):
         stop = start + len(code)
         for a, b in enumerate(code, start):
             memory[a] = b
-        exp_scr = memory.memory[1][:6912]
+        exp_scr = list(memory.memory[1][:6912])
         exp_frame = 1
         exp_border = [(0, 7), (70919, 6)]
         frame_duration = 70908
@@ -574,7 +574,7 @@ class KeypressTracerTest(SkoolKitTestCase):
         start = 0x8000
         for a, b in enumerate(code, start):
             memory[a] = b
-        exp_scr = memory.memory[1][:6912]
+        exp_scr = list(memory.memory[1][:6912])
         exp_frame = 1
         border = [(0, 3)]
         exp_border = border + [(70909, 1)]
@@ -32,6 +32,16 @@ class MemoryTest(SkoolKitTestCase):
             self.assertEqual(memory[0xC000], b)
             self.assertEqual(memory.o7ffd, b)
 
+    def test_banks_are_bytearrays(self):
+        banks = [[b] * 0x4000 for b in range(7)] + [bytearray([7]) * 0x4000]
+        memory = Memory(banks)
+        for b in range(8):
+            self.assertIsInstance(memory.banks[b], bytearray)
+            self.assertEqual(memory.banks[b], bytearray([b]) * 0x4000)
+        self.assertIs(memory.banks[7], banks[7])
+        for rom in memory.roms:
+            self.assertIsInstance(rom, bytearray)
+
     def test_convert(self):
         memory = Memory([[b] * 0x4000 for b in range(8)], 0x13)
         memory.convert()
@@ -1,8 +1,9 @@
 import os
 from textwrap import dedent
+from unittest.mock import patch
 
 from skoolkittest import SkoolKitTestCase, RZX
-from skoolkit import VERSION, SkoolKitError
+from skoolkit import VERSION, SkoolKitError, rzxplay
 
 class RzxinfoTest(SkoolKitTestCase):
     def _test_rzx(self, rzx, exp_output, options=''):
@@ -423,6 +424,40 @@ class RzxinfoTest(SkoolKitTestCase):
         """
         self._test_rzx(rzx, exp_output, '--frames')
 
+    @patch.object(rzxplay, 'RZX_CHUNK_SIZE', 3)
+    def test_option_frames_read_in_small_chunks(self):
+        frames = (
+            (1, 2, (3, 4)),  # Frame 0
+            (2, 65535, ()),  # Frame 1 (repeats frame 0)
+            (3, 3, [5] * 3), # Frame 2
+        )
+        exp_output = """
+            Version: 0.13
+            Signed: No
+            Creator information:
+              ID: SkoolKit 9.2 (0.9.0.2)
+            Input recording:
+              Number of frames: 3 (0h00m00s)
+              T-states: 0
+              Encrypted: No
+              Frame 0:
+                Fetch counter: 1
+                IN counter: 2
+                Port readings: 3, 4
+              Frame 1:
+                Fetch counter: 2
+                IN counter: 65535 (2)
+                Port readings: 3, 4
+              Frame 2:
+                Fetch counter: 3
+                IN counter: 3
+                Port readings: 5, 5, 5
+        """
+        for io_flags in (0, 2):
+            rzx = RZX()
+            rzx.add_snapshot(frames=frames, io_flags=io_flags)
+            self._test_rzx(rzx, exp_output, '--frames')
+
     def test_option_frames_first_frame_in_counter_65535(self):
         sna = [0] * 49179
         rzx = RZX()
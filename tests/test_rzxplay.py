@@ -3,8 +3,8 @@ from textwrap import dedent
 from unittest.mock import patch, Mock
 import zlib
 
-from skoolkittest import BLUE, QUIT, SkoolKitTestCase, MockPygameIO, MockPygame, RZX
-from skoolkit import VERSION, SkoolKitError, components, rzxplay, screen
+from skoolkittest import BLUE, QUIT, SkoolKitTestCase, MockPygameIO, MockPygame, RZX, as_dword
+from skoolkit import VERSION, SkoolKitError, components, read_bin_file, rzxplay, screen
 
 class MockSimulator:
     def __init__(self, *args, **kwargs):
@@ -35,6 +35,15 @@ class TestScreen(screen.Screen):
         super().draw(scr, frame, border, keyboard)
         self.border = border
 
+class MockImageWriter:
+    def __init__(self):
+        global image_writer
+        image_writer = self
+
+    def write_image(self, frames, img_file):
+        self.frames = frames
+        self.fname = img_file.name
+
 def mock_get_screen(scale, fps, caption, is128k):
     return TestScreen(scale, fps, caption, is128k)
 
@@ -333,6 +342,27 @@ class RzxplayTest(SkoolKitTestCase):
         exp_output = ''
         self._test_rzx(rzx, exp_output, '--quiet --no-screen')
 
+    @patch.object(rzxplay, 'RZX_CHUNK_SIZE', 3)
+    def test_input_recording_read_in_small_chunks(self):
+        ram = [0] * 0xC000
+        pc = 0xC000
+        code = [0xDB, 0xFE] * 5 # IN A,($FE)
+        ram[pc - 0x4000:pc - 0x4000 + len(code)] = code
+        z80data = self.write_z80(ram, {'PC': pc}, ret_data=True)
+        frames = [(2, 2, [1, 2]), (2, 65535, []), (1, 1, [3])]
+        exp_trace = """
+            F:0 $C000 A=1
+            F:0 $C002 A=2
+            F:1 $C004 A=1
+            F:1 $C006 A=2
+            F:2 $C008 A=3
+        """
+        for io_flags in (0, 2):
+            rzx = RZX()
+            rzx.add_snapshot(z80data, 'z80', frames, io_flags=io_flags)
+            options = ('--quiet', '--no-screen', '-I', 'TraceLine=F:{fr} ${pc:04X} A={r[a]}')
+            self._test_rzx(rzx, '', options, exp_trace)
+
     def test_multiple_snapshots(self):
         pc = 0xC000
         code = (
@@ -1366,6 +1396,25 @@ class RzxplayTest(SkoolKitTestCase):
             self.run_rzxplay(f'--no-screen {rzxfile}')
         self.assertEqual(cm.exception.args[0], 'Failed to decompress input recording block: Error -3 while decompressing data: unknown compression method')
 
+    def test_truncated_input_recording_block(self):
+        ram = [0] * 0xC000
+        pc = 0xD000
+        code = (
+            0xDB, 0xFE, # IN A,($FE)
+            0x18, 0xFC  # JR $D000
+        )
+        ram[pc - 0x4000:pc - 0x4000 + len(code)] = code
+        z80data = self.write_z80(ram, {'PC': pc}, version=1, ret_data=True)
+        rzx = RZX()
+        rzx.add_snapshot(z80data, 'z80', [(2, 1, [191])] * 100)
+        io_block = rzx.snapshots[0][1]
+        del io_block[-8:]
+        io_block[1:5] = as_dword(len(io_block))
+        rzxfile = self.write_rzx_file(rzx)
+        with self.assertRaises(SkoolKitError) as cm:
+            self.run_rzxplay(f'--no-screen {rzxfile}')
+        self.assertEqual(cm.exception.args[0], 'Failed to decompress input recording block: Error -5 while decompressing data: incomplete or truncated stream')
+
     def test_invalid_rzx_file(self):
         data = [0, 1, 2, 4]
         rzxfile = self.write_bin_file(data, suffix='.rzx')
@@ -1474,6 +1523,22 @@ class RzxplayTest(SkoolKitTestCase):
         mock_pygame.display.set_caption.assert_called_with(rzxfile)
         self.assertEqual(mock_pygame.display.get_surface().get_pixel(0, 0), BLUE)
 
+    def test_option_frames(self):
+        rzx = self._get_rzx(frames=[(1, 0, ())] * 3)
+        exp_output = 'Wrote 3 frames to frames\n'
+        self._test_rzx(rzx, exp_output, '--frames frames --no-screen --quiet')
+        self.assertEqual(['frame-000000.png', 'frame-000001.png', 'frame-000002.png'], sorted(os.listdir('frames')))
+
+    @patch.object(rzxplay, 'get_image_writer', MockImageWriter)
+    def test_option_frames_animated_png(self):
+        rzx = self._get_rzx(frames=[(1, 0, ())] * 5)
+        exp_output = 'Wrote anim.png (2 frames)\n'
+        self._test_rzx(rzx, exp_output, '--frames anim.png --frame-step 3 --scale 1 --no-screen --quiet')
+        self.assertEqual(image_writer.fname, 'anim.png')
+        self.assertEqual(len(image_writer.frames), 2)
+        self.assertEqual(image_writer.frames[0].delay, 6)
+        self.assertEqual(image_writer.frames[0].width, 320)
+
     @patch.object(rzxplay, 'run', mock_run)
     def test_option_I(self):
         self.run_rzxplay('-I TraceHeader=trace in.rzx')
@@ -1613,6 +1678,7 @@ class RzxplayTest(SkoolKitTestCase):
         self.assertEqual(error, '')
         exp_output = """
             [rzxplay]
+            MapFormat=0
             Screen=1
             ScreenFps=50
             ScreenScale=2
@@ -1632,6 +1698,7 @@ class RzxplayTest(SkoolKitTestCase):
         self.assertEqual(error, '')
         exp_output = """
             [rzxplay]
+            MapFormat=0
             Screen=1
             ScreenFps=50
             ScreenScale=2
@@ -1906,6 +1973,61 @@ class RzxplayTest(SkoolKitTestCase):
         """
         self._test_rzx(rzx, exp_output, '--quiet', exp_trace)
 
+    def test_config_MapFormat_read_from_file(self):
+        ini = """
+            [rzxplay]
+            MapFormat=1
+        """
+        self.write_text_file(dedent(ini).strip(), 'skoolkit.ini')
+        ram = [0] * 0xC000
+        pc = 0xFF00
+        code = (
+            0x06, 0x02,       # $FF00 LD B,2
+            0xCD, 0x52, 0x00, # $FF02 CALL $0052
+            0x10, 0xFB,       # $FF05 DJNZ $FF02
+            0x18, 0xF7,       # $FF07 JR $FF00
+        )
+        ram[pc - 0x4000:pc - 0x4000 + len(code)] = code
+        registers = {'PC': pc}
+        z80data = self.write_z80(ram, registers, ret_data=True)
+        rzx = RZX()
+        frames = [(9, 0, [])]
+        rzx.add_snapshot(z80data, 'z80', frames)
+        exp_output = ''
+        mapfile = 'out.map'
+        self._test_rzx(rzx, exp_output, f'--map {mapfile} --quiet --no-screen')
+        exp_map = [0] * 8192
+        exp_map[0x000A] = 0b00000100 # $0052
+        exp_map[0x1FE0] = 0b10100101 # $FF00, $FF02, $FF05, $FF07
+        self.assertEqual(exp_map, list(read_bin_file(mapfile)))
+
+    def test_config_MapFormat_set_on_command_line(self):
+        ram = [0] * 0xC000
+        pc = 0x6006
+        code = (
+            0x06, 0x02,       # $6006 LD B,2
+            0xCD, 0x52, 0x00, # $6008 CALL $0052
+            0x10, 0xFB,       # $600B DJNZ $6008
+            0x18, 0xF7,       # $600D JR $6006
+        )
+        ram[pc - 0x4000:pc - 0x4000 + len(code)] = code
+        registers = {'PC': pc}
+        z80data = self.write_z80(ram, registers, ret_data=True)
+        rzx = RZX()
+        frames = [(9, 0, [])]
+        rzx.add_snapshot(z80data, 'z80', frames)
+        existing_map = [0] * 8192
+        existing_map[0x000A] = 0b00000100 # $0052
+        existing_map[0x0C00] = 0b00001001 # $6000, $6003
+        mapfile = self.write_bin_file(existing_map, suffix='.map')
+        exp_output = ''
+        self._test_rzx(rzx, exp_output, f'-I MapFormat=1 --map {mapfile} --quiet --no-screen')
+        exp_map = [0] * 8192
+        exp_map[0x000A] = 0b00000100 # $0052
+        exp_map[0x0C00] = 0b01001001 # $6000, $6003, $6006
+        exp_map[0x0C01] = 0b00101001 # $6008, $600B, $600D
+        self.assertEqual(exp_map, list(read_bin_file(mapfile)))
+
     @patch.object(rzxplay, 'get_screen', new_callable=Mock())
     def test_config_Screen_read_from_file(self, get_screen):
         ini = """
@@ -1,9 +1,11 @@
 from skoolkittest import SkoolKitTestCase
 from skoolkit import CSimulator
+from skoolkit.pagingtracer import Memory
 from skoolkit.simulator import Simulator
 from skoolkit.simutils import (REGISTERS as SIMULATOR_REGISTERS, A, F, B, C, D,
                                E, H, L, IXh, IXl, IYh, IYl, SP, I, R, xA, xF,
-                               xB, xC, xD, xE, xH, xL, PC, T, IFF, IM, MEMPTR)
+                               xB, xC, xD, xE, xH, xL, PC, T, IFF, IM, MEMPTR,
+                               run_many)
 
 REGISTER_NAMES = {v: r for r, v in SIMULATOR_REGISTERS.items()}
 
@@ -32,6 +34,14 @@ class PortTracer:
     def write_port(self, registers, port, value, offset):
         self.out_ports.append((port, value))
 
+class PagingTracer:
+    def __init__(self, memory):
+        self.memory = memory
+
+    def write_port(self, registers, port, value, offset):
+        if port & 0x8002 == 0:
+            self.memory.out7ffd(value)
+
 class SimulatorTest(SkoolKitTestCase):
     simulator_cls = CSimulator or Simulator
 
@@ -2816,6 +2826,123 @@ class SimulatorTest(SkoolKitTestCase):
         self.assertEqual(simulator.registers[PC], 2)
         self.assertEqual(simulator.registers[T], 8)
 
+    def test_checkpoint_and_restore(self):
+        memory = [0] * 65536
+        start = 32768
+        code = (
+            0x21, 0x00, 0x90,       # 32768 LD HL,36864
+            0x34,                   # 32771 INC (HL)
+            0x23,                   # 32772 INC HL
+            0xD9,                   # 32773 EXX
+        )
+        memory[start:start + len(code)] = code
+        simulator = self.simulator_cls(memory, {'SP': 40000}, {'tstates': 100})
+        checkpoint = simulator.checkpoint()
+        self.assertEqual(len(checkpoint), 240 + 65536)
+        simulator.run(start, start + len(code))
+        registers = simulator.registers[:]
+        self.assertEqual(simulator.memory[36864], 1)
+
+        simulator.restore(checkpoint)
+        self.assertEqual(simulator.memory[36864], 0)
+        self.assertEqual(simulator.registers[PC], 0)
+        self.assertEqual(simulator.registers[SP], 40000)
+        self.assertEqual(simulator.registers[T], 100)
+        self.assertEqual(simulator.checkpoint(), checkpoint)
+
+        simulator.run(start, start + len(code))
+        self.assertEqual(simulator.registers[:], registers)
+        self.assertEqual(simulator.memory[36864], 1)
+
+    def test_checkpoint_and_restore_128k(self):
+        start = 32768
+        code = (
+            0x01, 0xFD, 0x7F,       # 32768 LD BC,32765
+            0x3E, 0x13,             # 32771 LD A,19
+            0xED, 0x79,             # 32773 OUT (C),A
+            0x32, 0x00, 0xC0,       # 32775 LD (49152),A
+        )
+        memory = Memory()
+        memory.banks[2][:len(code)] = code
+        simulator = self.simulator_cls(memory)
+        simulator.set_tracer(PagingTracer(simulator.memory))
+        checkpoint = simulator.checkpoint()
+        self.assertEqual(len(checkpoint), 240 + 1 + 0x20000)
+        simulator.run(start, start + len(code))
+        self.assertEqual(simulator.memory.o7ffd, 19)
+        self.assertEqual(simulator.memory.banks[3][0], 19)
+
+        simulator.restore(checkpoint)
+        self.assertEqual(simulator.memory.o7ffd, 0)
+        self.assertEqual(simulator.memory.banks[3][0], 0)
+        self.assertEqual(simulator.memory[49152], 0)
+        simulator.memory[49152] = 1
+        self.assertEqual(simulator.memory.banks[0][0], 1)
+        self.assertEqual(simulator.registers[PC], 0)
+        self.assertEqual(simulator.registers[T], 0)
+
+    def test_run_many(self):
+        start = 32768
+        code = (
+            0x06, 0x00,             # 32768 LD B,0
+            0x3C,                   # 32770 INC A
+            0x10, 0xFD,             # 32771 DJNZ 32770
+            0x0D,                   # 32773 DEC C
+            0x20, 0xF8,             # 32774 JR NZ,32768
+        )
+        simulators = []
+        for c in (1, 2, 3):
+            memory = [0] * 65536
+            memory[start:start + len(code)] = code
+            simulators.append(self.simulator_cls(memory, {'BC': c}))
+        states = run_many(simulators, start, start + len(code), jobs=2)
+        self.assertEqual(len(states), 3)
+        for c, (simulator, registers) in enumerate(zip(simulators, states), 1):
+            self.assertEqual(registers, list(simulator.registers))
+            self.assertEqual(registers[B], 0)
+            self.assertEqual(registers[C], 0)
+            self.assertEqual(registers[PC], start + len(code))
+            self.assertEqual(registers[T], 4370 * c - 5)
+
+    def test_run_many_with_port_tracer(self):
+        start = 32768
+        code = (
+            0xDB, 0xFE,             # 32768 IN A,(254)
+            0xD3, 0xFE,             # 32770 OUT (254),A
+        )
+        simulators = []
+        tracers = []
+        for value in (1, 2):
+            memory = [0] * 65536
+            memory[start:start + len(code)] = code
+            simulator = self.simulator_cls(memory)
+            tracer = PortTracer(value)
+            simulator.set_tracer(tracer)
+            simulators.append(simulator)
+            tracers.append(tracer)
+        states = run_many(simulators, start, start + len(code))
+        self.assertEqual([r[A] for r in states], [1, 2])
+        self.assertEqual([t.out_ports for t in tracers], [[(510, 1)], [(766, 2)]])
+
+    def test_restore_checkpoint_from_python_simulator(self):
+        memory = [0] * 65536
+        memory[32768:32771] = (0x3E, 0x7F, 0x76) # LD A,127; HALT
+        simulator = Simulator(memory[:])
+        simulator.run(32768, 32770)
+        checkpoint = simulator.checkpoint()
+        simulator = self.simulator_cls(memory)
+        simulator.restore(checkpoint)
+        self.assertEqual(simulator.registers[A], 127)
+        self.assertEqual(simulator.registers[PC], 32770)
+        self.assertEqual(simulator.registers[T], 7)
+        self.assertEqual(simulator.checkpoint(), checkpoint)
+
+    def test_restore_invalid_checkpoint(self):
+        simulator = self.simulator_cls([0] * 65536)
+        with self.assertRaises(ValueError) as cm:
+            simulator.restore(bytes(1000))
+        self.assertEqual(cm.exception.args[0], 'checkpoint length is 1000 (expected 65776)')
+
     def test_run_with_interrupts(self):
         start, end = 0xF000, 0xF001
         int_start = 0x8000
@@ -2946,3 +3073,190 @@ class SimulatorTest(SkoolKitTestCase):
         self.assertEqual(simulator.registers[SP], sp)
         self.assertEqual((0, 0), tuple(simulator.memory[sp - 2:sp]))
         self.assertEqual(simulator.registers[IFF], 1)
+
+class BlockCacheTest(SkoolKitTestCase):
+    def _compare(self, code, start, stop, interrupts=False, registers=None, state=None, memory=None):
+        if memory is None:
+            memory = [(i * 7) % 256 for i in range(65536)]
+        memory[start:start + len(code)] = code
+        simulators = []
+        for block_cache in (False, True):
+            simulator = Simulator(memory[:], registers, state, {'block_cache': block_cache})
+            simulator.run(start, stop, interrupts)
+            simulators.append(simulator)
+        self.assertGreater(len(simulators[1].blocks), 0)
+        self.assertEqual(simulators[0].registers, simulators[1].registers)
+        self.assertEqual(simulators[0].memory, simulators[1].memory)
+        return simulators[1]
+
+    def test_loops(self):
+        code = (
+            0x21, 0x00, 0x90,       # $8000 LD HL,$9000
+            0x11, 0x00, 0xA0,       # $8003 LD DE,$A000
+            0xDD, 0x21, 0x00, 0xB0, # $8006 LD IX,$B000
+            0x0E, 0x20,             # $800A LD C,$20
+            0x06, 0x00,             # $800C LD B,$00
+            0x7E,                   # $800E LD A,(HL)
+            0x81,                   # $800F ADD A,C
+            0x88,                   # $8010 ADC A,B
+            0xAB,                   # $8011 XOR E
+            0x07,                   # $8012 RLCA
+            0x12,                   # $8013 LD (DE),A
+            0x13,                   # $8014 INC DE
+            0xE5,                   # $8015 PUSH HL
+            0x19,                   # $8016 ADD HL,DE
+            0xED, 0x52,             # $8017 SBC HL,DE
+            0xE1,                   # $8019 POP HL
+            0xDD, 0x77, 0x01,       # $801A LD (IX+1),A
+            0xDD, 0x23,             # $801D INC IX
+            0xCB, 0x3F,             # $801F SRL A
+            0xFE, 0x40,             # $8021 CP $40
+            0x38, 0x03,             # $8023 JR C,$8028
+            0xCD, 0x34, 0x80,       # $8025 CALL $8034
+            0x23,                   # $8028 INC HL
+            0x10, 0xE3,             # $8029 DJNZ $800E
+            0x0D,                   # $802B DEC C
+            0xC2, 0x0C, 0x80,       # $802C JP NZ,$800C
+            0xD9,                   # $802F EXX
+            0x08,                   # $8030 EX AF,AF'
+            0xC3, 0x38, 0x80,       # $8031 JP $8038
+            0x34,                   # $8034 INC (HL)
+            0xEB,                   # $8035 EX DE,HL
+            0xEB,                   # $8036 EX DE,HL
+            0xC9,                   # $8037 RET
+            0x00,                   # $8038 NOP
+        )
+        self._compare(code, 0x8000, 0x8038, registers={'SP': 0xFF00})
+
+    def test_self_modifying_code(self):
+        code = (
+            0x06, 0x14,             # $8000 LD B,20
+            0x21, 0x0F, 0x80,       # $8002 LD HL,$800F
+            0x78,                   # $8005 LD A,B
+            0xE6, 0x01,             # $8006 AND 1
+            0x07,                   # $8008 RLCA
+            0x07,                   # $8009 RLCA
+            0x07,                   # $800A RLCA
+            0xC6, 0x0C,             # $800B ADD A,$0C
+            0x77,                   # $800D LD (HL),A
+            0x00,                   # $800E NOP
+            0x0C,                   # $800F INC C (or INC D)
+            0x10, 0xF0,             # $8010 DJNZ $8002
+        )
+        simulator = self._compare(code, 0x8000, 0x8012, registers={'C': 0, 'D': 0})
+        self.assertEqual(simulator.registers[C], 10)
+        self.assertEqual(simulator.registers[D], 10)
+
+    def test_modified_opcodes_in_cached_block(self):
+        memory = [0] * 65536
+        code = (
+            0x3C,                   # $8000 INC A
+            0x04,                   # $8001 INC B
+            0x0C,                   # $8002 INC C
+            0xC9,                   # $8003 RET
+        )
+        memory[0x8000:0x8000 + len(code)] = code
+        simulator = Simulator(memory, {'SP': 0xFF00}, config={'block_cache': True})
+        for i in range(8):
+            simulator.run(0x8000, 0x8003)
+        self.assertIn(0x8000, simulator.blocks)
+        memory[0x8001] = 0x14 # INC D
+        simulator.run(0x8000, 0x8003)
+        self.assertEqual(simulator.registers[A], 9)
+        self.assertEqual(simulator.registers[B], 8)
+        self.assertEqual(simulator.registers[C], 9)
+        self.assertEqual(simulator.registers[D], 1)
+        self.assertEqual(simulator.registers[T], 108)
+        self.assertEqual(simulator.registers[R], 27)
+
+    def test_stop_inside_cached_block(self):
+        memory = [0] * 65536
+        code = (
+            0x3C,                   # $8000 INC A
+            0x04,                   # $8001 INC B
+            0x0C,                   # $8002 INC C
+            0x14,                   # $8003 INC D
+        )
+        memory[0x8000:0x8000 + len(code)] = code
+        simulator = Simulator(memory, config={'block_cache': True})
+        for i in range(8):
+            simulator.run(0x8000, 0x8004)
+        simulator.run(0x8000, 0x8002)
+        self.assertEqual(simulator.registers[PC], 0x8002)
+        self.assertEqual(simulator.registers[A], 9)
+        self.assertEqual(simulator.registers[B], 9)
+        self.assertEqual(simulator.registers[C], 8)
+        self.assertEqual(simulator.registers[T], 136)
+
+    def test_interrupts(self):
+        memory = [0] * 65536
+        memory[0x0038:0x003E] = (
+            0xD9,                   # $0038 EXX
+            0x03,                   # $0039 INC BC
+            0xD9,                   # $003A EXX
+            0xFB,                   # $003B EI
+            0xC9,                   # $003C RET
+        )
+        code = (
+            0xFB,                   # $8000 EI
+            0x16, 0x28,             # $8001 LD D,40
+            0x06, 0x00,             # $8003 LD B,0
+            0x7E,                   # $8005 LD A,(HL)
+            0x85,                   # $8006 ADD A,L
+            0x6F,                   # $8007 LD L,A
+            0x23,                   # $8008 INC HL
+            0x10, 0xFA,             # $8009 DJNZ $8005
+            0x15,                   # $800B DEC D
+            0x20, 0xF5,             # $800C JR NZ,$8003
+        )
+        simulator = self._compare(code, 0x8000, 0x800E, True, {'SP': 0xFF00}, {'im': 1}, memory)
+        self.assertEqual(simulator.registers[xC], 5)
+
+    def test_interrupts_with_self_modifying_code(self):
+        # The interrupt routine toggles the instruction at $8011 between INC C
+        # and INC D, and the main loop toggles the instruction at $8012
+        # between INC L and DEC L
+        isr = (
+            0xF5,                   # PUSH AF
+            0x3A, 0x11, 0x80,       # LD A,($8011)
+            0xEE, 0x18,             # XOR $18
+            0x32, 0x11, 0x80,       # LD ($8011),A
+            0xF1,                   # POP AF
+            0xFB,                   # EI
+            0xED, 0x4D,             # RETI
+        )
+        code = (
+            0xFB,                   # $8000 EI
+            0x1E, 0x1E,             # $8001 LD E,30
+            0x06, 0x00,             # $8003 LD B,0
+            0x7E,                   # $8005 LD A,(HL)
+            0x85,                   # $8006 ADD A,L
+            0x6F,                   # $8007 LD L,A
+            0x23,                   # $8008 INC HL
+            0x3A, 0x12, 0x80,       # $8009 LD A,($8012)
+            0xEE, 0x01,             # $800C XOR 1
+            0x32, 0x12, 0x80,       # $800E LD ($8012),A
+            0x0C,                   # $8011 INC C (or INC D)
+            0x2C,                   # $8012 INC L (or DEC L)
+            0x10, 0xF0,             # $8013 DJNZ $8005
+            0x1D,                   # $8015 DEC E
+            0x20, 0xEB,             # $8016 JR NZ,$8003
+        )
+        start, stop = 0x8000, 0x8018
+        for im, isr_addr in ((1, 0x0038), (2, 0x9A9A)):
+            memory = [(i * 7) % 256 for i in range(65536)]
+            memory[0x9000:0x9101] = [0x9A] * 257
+            memory[isr_addr:isr_addr + len(isr)] = isr
+            memory[start:start + len(code)] = code
+            registers = {'SP': 0xFF00, 'HL': 0x4000, 'I': 0x90}
+            simulators = [Simulator(memory[:], registers, {'im': im}, {'block_cache': bc}) for bc in (False, True)]
+            for i in range(2):
+                for simulator in simulators:
+                    simulator.run(start, stop, True)
+                self.assertEqual(simulators[0].registers, simulators[1].registers, f'IM {im}, run {i + 1}')
+                self.assertEqual(simulators[0].memory, simulators[1].memory, f'IM {im}, run {i + 1}')
+            self.assertGreater(len(simulators[1].blocks), 0)
+            self.assertIn((None, 0), simulators[1].blocks.values())
+            self.assertGreater(simulators[1].registers[T], 4 * simulators[1].frame_duration)
+            self.assertGreater(simulators[1].registers[C], 0)
+            self.assertGreater(simulators[1].registers[D], 0)
@@ -14,7 +14,7 @@ def mock_run(*args):
 
 class MockSkoolParser:
     def __init__(self, skoolfile, case, base, asm_mode, warnings, fix_mode, html,
-                 create_labels, asm_labels, label_fmt, min_address, max_address, variables):
+                 create_labels, asm_labels, label_fmt, min_address, max_address, variables, cache=None):
         global mock_skool_parser
         mock_skool_parser = self
         self.skoolfile = skoolfile
@@ -29,6 +29,7 @@ class MockSkoolParser:
         self.label_fmt = label_fmt
         self.min_address = min_address
         self.max_address = max_address
+        self.cache = cache
         self.properties = {}
         self.asm_writer_class = ''
 
@@ -570,6 +571,7 @@ class Skool2AsmTest(SkoolKitTestCase):
             EntryLabel=L{address}
             EntryPointLabel={main}_{index}
             Quiet=0
+            SkoolCache=
             Templates=
             Warnings=1
         """
@@ -594,11 +596,28 @@ class Skool2AsmTest(SkoolKitTestCase):
             EntryLabel=L{address}
             EntryPointLabel={main}_{index}
             Quiet=1
+            SkoolCache=
             Templates=
             Warnings=1
         """
         self.assertEqual(dedent(exp_output).strip(), output.rstrip())
 
+    def test_option_skool_cache(self):
+        skool = """
+            @start
+            ; Routine
+            c32768 JR 32769
+        """
+        skoolfile = self.write_text_file(dedent(skool).strip(), suffix='.skool')
+        cache_dir = self.make_directory()
+        exp_output, exp_error = self.run_skool2asm('-q -s {}'.format(skoolfile))
+        self.assertNotEqual(exp_error, '')
+        for option in ('--skool-cache {}'.format(cache_dir), '-I SkoolCache={}'.format(cache_dir)):
+            output, error = self.run_skool2asm('-q -s {} {}'.format(option, skoolfile))
+            self.assertEqual(exp_output, output)
+            self.assertEqual(exp_error, error)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
     @patch.object(skool2asm, 'run', mock_run)
     def test_option_var_integer(self):
         self.run_skool2asm('--var foo=1 test-var.skool')
@@ -1,3 +1,4 @@
+import os
 from textwrap import dedent
 from unittest.mock import patch
 
@@ -5,7 +6,7 @@ from skoolkittest import SkoolKitTestCase, mock_find_file
 from skoolkit import SkoolKitError, VERSION, components, config, skool2bin
 
 class MockBinWriter:
-    def __init__(self, skoolfile, asm_mode, fix_mode, banks, start, end, data, verbose, warn, pad_left, pad_right):
+    def __init__(self, skoolfile, asm_mode, fix_mode, banks, start, end, data, verbose, warn, pad_left, pad_right, cache):
         global mock_bin_writer
         mock_bin_writer = self
         self.skoolfile = skoolfile
@@ -19,6 +20,7 @@ class MockBinWriter:
         self.warn = warn
         self.pad_left = pad_left
         self.pad_right = pad_right
+        self.cache = cache
         self.binfile = None
 
     def write(self, binfile):
@@ -337,6 +339,7 @@ class Skool2BinTest(SkoolKitTestCase):
             Data=0
             PadLeft=65536
             PadRight=0
+            SkoolCache=
             Verbose=0
             Warnings=1
         """
@@ -361,11 +364,32 @@ class Skool2BinTest(SkoolKitTestCase):
             Data=1
             PadLeft=16384
             PadRight=65536
+            SkoolCache=
             Verbose=1
             Warnings=0
         """
         self.assertEqual(dedent(exp_output).strip(), output.rstrip())
 
+    def test_option_skool_cache(self):
+        skool = """
+            ; Routine
+            c32768 JP 32771
+             32771 JR 32768
+        """
+        skoolfile = self.write_text_file(dedent(skool).strip(), suffix='.skool')
+        binfile = skoolfile[:-6] + '.bin'
+        cache_dir = self.make_directory()
+        exp_output, exp_error = self.run_skool2bin('-v {}'.format(skoolfile))
+        with open(binfile, 'rb') as f:
+            exp_data = f.read()
+        for option in ('--skool-cache {}'.format(cache_dir), '-I SkoolCache={}'.format(cache_dir)):
+            output, error = self.run_skool2bin('-v {} {}'.format(option, skoolfile))
+            self.assertEqual(exp_output, output)
+            self.assertEqual(exp_error, error)
+            with open(binfile, 'rb') as f:
+                self.assertEqual(exp_data, f.read())
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
     @patch.object(skool2bin, 'BinWriter', MockBinWriter)
     def test_option_s(self):
         skoolfile = 'test-s.skool'
@@ -1,3 +1,4 @@
+import os
 from textwrap import dedent
 from unittest.mock import patch
 
@@ -7,7 +8,7 @@ from skoolkit import config, skool2ctl, VERSION
 ELEMENTS = 'abtdrmscn'
 
 class MockCtlWriter:
-    def __init__(self, skoolfile, elements, write_hex, preserve_base, min_address, max_address, keep_lines):
+    def __init__(self, skoolfile, elements, write_hex, preserve_base, min_address, max_address, keep_lines, cache):
         global mock_ctl_writer
         self.skoolfile = skoolfile
         self.elements = elements
@@ -16,6 +17,7 @@ class MockCtlWriter:
         self.min_address = min_address
         self.max_address = max_address
         self.keep_lines = keep_lines
+        self.cache = cache
         self.write_called = False
         mock_ctl_writer = self
 
@@ -196,6 +198,7 @@ class Skool2CtlTest(SkoolKitTestCase):
             Hex=0
             KeepLines=0
             PreserveBase=0
+            SkoolCache=
         """
         self.assertEqual(dedent(exp_output).strip(), output.rstrip())
 
@@ -214,9 +217,27 @@ class Skool2CtlTest(SkoolKitTestCase):
             Hex=1
             KeepLines=1
             PreserveBase=1
+            SkoolCache=
         """
         self.assertEqual(dedent(exp_output).strip(), output.rstrip())
 
+    def test_option_skool_cache(self):
+        skool = """
+            ; Routine at 32768
+            ;
+            ; Description.
+            c32768 XOR A ; Comment
+             32769 RET
+        """
+        skoolfile = self.write_text_file(dedent(skool).strip(), suffix='.skool')
+        cache_dir = self.make_directory()
+        exp_output, exp_error = self.run_skool2ctl(skoolfile)
+        for option in ('--skool-cache {}'.format(cache_dir), '-I SkoolCache={}'.format(cache_dir)):
+            output, error = self.run_skool2ctl('{} {}'.format(option, skoolfile))
+            self.assertEqual(error, '')
+            self.assertEqual(exp_output, output)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
     def test_run(self):
         skool = """
             ; Test skool file for skool2ctl testing
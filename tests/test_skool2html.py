@@ -50,6 +50,7 @@ class MockSkoolParser:
         self.create_labels = kwargs.get('create_labels')
         self.asm_labels = kwargs.get('asm_labels')
         self.label_fmt = kwargs.get('label_fmt')
+        self.cache = kwargs.get('cache')
         self.snapshot = None
         self.entries = {}
         self.memory_map = []
@@ -142,6 +143,9 @@ class Skool2HtmlTest(SkoolKitTestCase):
         self.assertEqual(options.themes, [])
         self.assertFalse(options.quiet)
         self.assertFalse(options.show_timings)
+        self.assertEqual(options.jobs, 1)
+        self.assertEqual(options.image_cache, '')
+        self.assertFalse(options.incremental)
         self.assertEqual(options.config_specs, [])
         self.assertFalse(options.new_images)
         self.assertFalse(options.new_audio)
@@ -1151,6 +1155,408 @@ class Skool2HtmlTest(SkoolKitTestCase):
     def test_option_w_i(self):
         self._test_option_w('-w', 'i', 'write_index')
 
+    def _get_files(self, root):
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            for fname in filenames:
+                path = os.path.join(dirpath, fname)
+                with open(path, 'rb') as f:
+                    files[os.path.relpath(path, root)] = f.read()
+        return files
+
+    def test_option_jobs(self):
+        ref = """
+            [Page:Custom1]
+            PageContent=#UDG32768
+
+            [Page:Custom2]
+            PageContent=#R32770
+        """
+        skool = """
+            ; Routine 1
+            ;
+            ; #UDG32768(udg0)
+            c32768 LD A,1   ; {Load #R32770(A)
+                            ; with 1}
+
+            ; Routine 2
+            c32770 JR 32768 ; #LET(n=2)#EVAL({n})
+
+            ; Data
+            b32772 DEFB 1,2,3,4,5,6,7,8
+
+            ; Message
+            t32780 DEFM "Hi"
+        """
+        reffile = self._write_ref_file(ref)
+        skoolfile = self.write_text_file(dedent(skool).strip(), '{}.skool'.format(reffile[:-4]))
+        odir1 = self.make_directory()
+        output, error = self.run_skool2html('-d {} {}'.format(odir1, skoolfile))
+        self.assertEqual(error, '')
+        exp_files = self._get_files(odir1)
+        for option in ('--jobs 2', '--jobs 4', '-I Jobs=3'):
+            odir2 = self.make_directory()
+            output, error = self.run_skool2html('{} -d {} {}'.format(option, odir2, skoolfile))
+            self.assertEqual(error, '')
+            self.assertEqual(exp_files, self._get_files(odir2))
+
+    def test_option_jobs_with_state_changing_macros(self):
+        ref = """
+            [Page:Custom1]
+            PageContent=#LET(bar=3)#POKES30001,5
+
+            [Page:Custom2]
+            PageContent=#N({bar}) #N({foo}) #PEEK30001
+        """
+        skool = """
+            ; Routine 1
+            ;
+            ; #LET(foo=42)#POKES30000,7
+            c32768 RET
+
+            ; Routine 2
+            c32769 RET
+
+            ; Routine 3
+            c32770 RET
+
+            ; Routine 4
+            ;
+            ; #N({foo}) #PEEK30000
+            c32771 RET
+        """
+        reffile = self._write_ref_file(ref)
+        skoolfile = self.write_text_file(dedent(skool).strip(), '{}.skool'.format(reffile[:-4]))
+        odir1 = self.make_directory()
+        output, error = self.run_skool2html('--jobs 1 -d {} {}'.format(odir1, skoolfile))
+        self.assertEqual(error, '')
+        exp_files = self._get_files(odir1)
+        odir2 = self.make_directory()
+        output, error = self.run_skool2html('--jobs 3 -d {} {}'.format(odir2, skoolfile))
+        self.assertEqual(error, '')
+        self.assertEqual(exp_files, self._get_files(odir2))
+
+    def test_option_jobs_with_timings(self):
+        ref = """
+            [Page:Custom1]
+            PageContent=One
+
+            [Page:Custom2]
+            PageContent=Two
+        """
+        skool = """
+            ; Routine 1
+            c32768 RET
+
+            ; Routine 2
+            c32769 RET
+        """
+        reffile = self._write_ref_file(ref)
+        skoolfile = self.write_text_file(dedent(skool).strip(), '{}.skool'.format(reffile[:-4]))
+        output, error = self.run_skool2html('--jobs 2 -t -w dP -d {} {}'.format(self.odir, skoolfile))
+        self.assertEqual(error, '')
+        lines = [line for line in output.split('\n') if line.startswith(('Writing', 'Wrote'))]
+        self.assertRegex(lines[0], r'^Writing disassembly files in asm \([0-9]+\.[0-9][0-9]s\)$')
+        self.assertRegex(lines[1], r'^Writing Custom1\.html \([0-9]+\.[0-9][0-9]s\)$')
+        self.assertRegex(lines[2], r'^Writing Custom2\.html \([0-9]+\.[0-9][0-9]s\)$')
+        self.assertRegex(lines[3], r'^Wrote 2 files using 2 jobs \([0-9]+\.[0-9][0-9]s\)$')
+
+    def test_option_jobs_with_error_in_worker(self):
+        ref = """
+            [Page:Custom1]
+            PageContent=OK
+
+            [Page:Custom2]
+            PageContent=#R32769
+        """
+        reffile = self._write_ref_file(ref)
+        skoolfile = self.write_text_file('; Routine\nc32768 RET', '{}.skool'.format(reffile[:-4]))
+        with self.assertRaisesRegex(SkoolKitError, 'Error while parsing #R macro: Address not found: 32769'):
+            self.run_skool2html('--jobs 2 -w P -d {} {}'.format(self.odir, skoolfile))
+
+    def test_option_image_cache(self):
+        ref = """
+            [Page:Images]
+            PageContent=#FONT32768,1(font)#UDG32768(udg)#SCR1(scr)
+        """
+        reffile = self._write_ref_file(ref)
+        skoolfile = self.write_text_file('; Data\nb32768 DEFB 1,2,3,4,5,6,7,8', '{}.skool'.format(reffile[:-4]))
+        game_dir = reffile[:-4]
+        cache_dir = self.make_directory()
+        odir1 = self.make_directory()
+        output, error = self.run_skool2html('-w P -d {} {}'.format(odir1, skoolfile))
+        self.assertEqual(error, '')
+        exp_files = self._get_files(os.path.join(odir1, game_dir))
+        self.assertNotIn('Image cache:', output)
+
+        for option in ('--image-cache {}'.format(cache_dir), '-I ImageCache={}'.format(cache_dir)):
+            odir2 = self.make_directory()
+            output, error = self.run_skool2html('{} -w P -d {} {}'.format(option, odir2, skoolfile))
+            self.assertEqual(error, '')
+            self.assertEqual(exp_files, self._get_files(os.path.join(odir2, game_dir)))
+            if option.startswith('--'):
+                self.assertIn('Image cache: 0 hits, 3 misses\n', output)
+                self.assertEqual(len(os.listdir(cache_dir)), 3)
+            else:
+                self.assertIn('Image cache: 3 hits, 0 misses\n', output)
+
+    def test_option_image_cache_with_jobs(self):
+        ref = """
+            [Page:Custom1]
+            PageContent=#UDG32768(udg1)
+
+            [Page:Custom2]
+            PageContent=#UDG32768,7(udg2)
+        """
+        reffile = self._write_ref_file(ref)
+        skoolfile = self.write_text_file('; Data\nb32768 DEFB 1,2,3,4,5,6,7,8', '{}.skool'.format(reffile[:-4]))
+        cache_dir = self.make_directory()
+        for exp_output in ('0 hits, 2 misses', '2 hits, 0 misses'):
+            odir = self.make_directory()
+            output, error = self.run_skool2html('--image-cache {} --jobs 2 -w P -d {} {}'.format(cache_dir, odir, skoolfile))
+            self.assertEqual(error, '')
+            self.assertIn('Image cache: {}\n'.format(exp_output), output)
+
+    def test_option_image_cache_size(self):
+        ref = """
+            [Page:Images]
+            PageContent=#UDG32768(udg1)#UDG32768,7(udg2)
+        """
+        reffile = self._write_ref_file(ref)
+        skoolfile = self.write_text_file('; Data\nb32768 DEFB 1,2,3,4,5,6,7,8', '{}.skool'.format(reffile[:-4]))
+        cache_dir = self.make_directory()
+        output, error = self.run_skool2html('--image-cache {} -I ImageCacheSize=0 -w P -d {} {}'.format(cache_dir, self.odir, skoolfile))
+        self.assertEqual(error, '')
+        self.assertIn('Image cache: 0 hits, 2 misses\n', output)
+        self.assertEqual(os.listdir(cache_dir), [])
+
+    def test_option_skool_cache(self):
+        skool = """
+            ; Routine at 32768
+            c32768 JP 32771
+
+            ; Routine at 32771
+            c32771 JR 32768
+        """
+        skoolfile = self.write_text_file(dedent(skool).strip(), suffix='.skool')
+        game_dir = skoolfile[:-6]
+        cache_dir = self.make_directory()
+        odir1 = self.make_directory()
+        output, error = self.run_skool2html('-d {} {}'.format(odir1, skoolfile))
+        self.assertEqual(error, '')
+        exp_files = self._get_files(os.path.join(odir1, game_dir))
+
+        for option in ('--skool-cache {}'.format(cache_dir), '-I SkoolCache={}'.format(cache_dir)):
+            odir2 = self.make_directory()
+            output, error = self.run_skool2html('{} -d {} {}'.format(option, odir2, skoolfile))
+            self.assertEqual(error, '')
+            self.assertEqual(exp_files, self._get_files(os.path.join(odir2, game_dir)))
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+    def _write_incremental_skool(self, skool, ref=''):
+        reffile = self._write_ref_file(ref)
+        skoolfile = '{}.skool'.format(reffile[:-4])
+        self.write_text_file(dedent(skool).strip(), skoolfile)
+        return skoolfile, os.path.join(self.odir, reffile[:-4])
+
+    def _tamper(self, game_dir, *fnames):
+        for fname in fnames:
+            with open(os.path.join(game_dir, fname), 'w') as f:
+                f.write('tampered')
+
+    def _is_tampered(self, game_dir, fname):
+        with open(os.path.join(game_dir, fname), 'rb') as f:
+            return f.read() == b'tampered'
+
+    def test_option_incremental(self):
+        skool = """
+            ; Routine 1
+            c32768 RET ; {comment1}
+
+            ; Routine 2
+            c32769 RET ; {comment2}
+
+            ; Routine 3
+            c32770 RET ; {comment3}
+
+            ; Routine 4
+            c32771 RET ; {comment4}
+        """
+        ref = '[Page:Custom]\nPageContent=#R32769'
+        pages = ('asm/32768.html', 'asm/32769.html', 'asm/32770.html', 'asm/32771.html', 'maps/all.html', 'Custom.html')
+        for option in ('--incremental', '-I Incremental=1'):
+            comments = {'comment1': 'A', 'comment2': 'B', 'comment3': 'C', 'comment4': 'D'}
+            skoolfile, game_dir = self._write_incremental_skool(skool.format(**comments), ref)
+            output, error = self.run_skool2html('{} -d {} {}'.format(option, self.odir, skoolfile))
+            self.assertEqual(error, '')
+            self.assertTrue(os.path.isfile(os.path.join(game_dir, '.skool2html.json')))
+            self._tamper(game_dir, *pages)
+
+            comments['comment3'] = 'Changed'
+            self.write_text_file(dedent(skool.format(**comments)).strip(), skoolfile)
+            output, error = self.run_skool2html('{} -d {} {}'.format(option, self.odir, skoolfile))
+            self.assertEqual(error, '')
+            self.assertTrue(self._is_tampered(game_dir, 'asm/32768.html'))
+            self.assertFalse(self._is_tampered(game_dir, 'asm/32769.html'))
+            self.assertFalse(self._is_tampered(game_dir, 'asm/32770.html'))
+            self.assertFalse(self._is_tampered(game_dir, 'asm/32771.html'))
+            self.assertFalse(self._is_tampered(game_dir, 'maps/all.html'))
+            self.assertTrue(self._is_tampered(game_dir, 'Custom.html'))
+
+            odir = self.make_directory()
+            self.run_skool2html('-d {} {}'.format(odir, skoolfile))
+            exp_files = self._get_files(os.path.join(odir, os.path.basename(game_dir)))
+            self._tamper(game_dir, 'asm/32768.html', 'Custom.html')
+            os.remove(os.path.join(game_dir, 'asm/32768.html'))
+            os.remove(os.path.join(game_dir, 'Custom.html'))
+            self.run_skool2html('{} -d {} {}'.format(option, self.odir, skoolfile))
+            files = self._get_files(game_dir)
+            files.pop('.skool2html.json')
+            self.assertEqual(exp_files, files)
+
+    def test_option_incremental_with_structural_change(self):
+        skool = """
+            ; Routine 1
+            c32768 RET
+
+            ; Routine 2
+            c32769 {}
+        """
+        skoolfile, game_dir = self._write_incremental_skool(skool.format('RET'))
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        self._tamper(game_dir, 'asm/32768.html', 'asm/32769.html')
+        self.write_text_file(dedent(skool.format('NOP')).strip(), skoolfile)
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertFalse(self._is_tampered(game_dir, 'asm/32768.html'))
+        self.assertFalse(self._is_tampered(game_dir, 'asm/32769.html'))
+
+    def test_option_incremental_with_ref_file_change(self):
+        skool = """
+            ; Routine
+            c32768 RET
+        """
+        skoolfile, game_dir = self._write_incremental_skool(skool, '[Game]\nGame=Foo')
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        self._tamper(game_dir, 'asm/32768.html')
+        self.write_text_file('[Game]\nGame=Bar', skoolfile[:-6] + '.ref')
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertFalse(self._is_tampered(game_dir, 'asm/32768.html'))
+
+    def test_option_incremental_with_state_changing_macros(self):
+        skool = """
+            ; Routine 1
+            c32768 RET ; #POKES32768,{}
+
+            ; Routine 2
+            c32769 RET
+
+            ; Routine 3
+            c32770 RET
+
+            ; Routine 4
+            c32771 RET ; #PEEK32768
+        """
+        skoolfile, game_dir = self._write_incremental_skool(skool.format(1))
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        pages = ('asm/32768.html', 'asm/32769.html', 'asm/32770.html', 'asm/32771.html')
+        self._tamper(game_dir, *pages)
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertFalse(self._is_tampered(game_dir, 'asm/32768.html'))
+        self.assertTrue(self._is_tampered(game_dir, 'asm/32769.html'))
+        self.assertTrue(self._is_tampered(game_dir, 'asm/32770.html'))
+        self.assertTrue(self._is_tampered(game_dir, 'asm/32771.html'))
+
+        self.write_text_file(dedent(skool.format(2)).strip(), skoolfile)
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        for page in pages:
+            self.assertFalse(self._is_tampered(game_dir, page))
+        with open(os.path.join(game_dir, 'asm/32771.html')) as f:
+            self.assertIn('<td class="comment-1" rowspan="1">2</td>', f.read())
+
+    def test_option_incremental_with_missing_image(self):
+        skool = """
+            ; Routine 1
+            ;
+            ; #UDG32768(udg)
+            c32768 RET
+        """
+        skoolfile, game_dir = self._write_incremental_skool(skool)
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        image = os.path.join(game_dir, 'images', 'udgs', 'udg.png')
+        self.assertTrue(os.path.isfile(image))
+        self._tamper(game_dir, 'asm/32768.html')
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertTrue(self._is_tampered(game_dir, 'asm/32768.html'))
+        os.remove(image)
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertFalse(self._is_tampered(game_dir, 'asm/32768.html'))
+        self.assertTrue(os.path.isfile(image))
+
+    def test_option_incremental_with_rebuild_images_and_audio(self):
+        skool = """
+            ; Routine 1
+            ;
+            ; #UDG32768(udg)
+            c32768 RET
+
+            ; Routine 2
+            ;
+            ; #AUDIO0(sound.wav)(100,100)
+            c32769 RET
+        """
+        skoolfile, game_dir = self._write_incremental_skool(skool)
+        for option, fname in (('--rebuild-images', 'images/udgs/udg.png'), ('--rebuild-audio', 'audio/sound.wav')):
+            self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+            self._tamper(game_dir, 'asm/32768.html', 'asm/32769.html', fname)
+            self.run_skool2html('--incremental {} -d {} {}'.format(option, self.odir, skoolfile))
+            self.assertFalse(self._is_tampered(game_dir, 'asm/32768.html'))
+            self.assertFalse(self._is_tampered(game_dir, 'asm/32769.html'))
+            self.assertFalse(self._is_tampered(game_dir, fname))
+
+    def test_option_incremental_with_frames(self):
+        skool = """
+            ; Routine 1
+            ;
+            ; #UDG32768(udg*)
+            c32768 RET
+
+            ; Routine 2
+            ;
+            ; #FRAMES(udg)(frames)
+            c32769 RET
+        """
+        skoolfile, game_dir = self._write_incremental_skool(skool)
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        self._tamper(game_dir, 'asm/32768.html', 'asm/32769.html')
+        self.run_skool2html('--incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertFalse(self._is_tampered(game_dir, 'asm/32768.html'))
+        self.assertTrue(self._is_tampered(game_dir, 'asm/32769.html'))
+
+    def test_option_incremental_with_jobs(self):
+        skool = """
+            ; Routine 1
+            c32768 RET ; {}
+
+            ; Routine 2
+            c32769 RET
+
+            ; Routine 3
+            c32770 RET
+
+            ; Routine 4
+            c32771 RET
+        """
+        skoolfile, game_dir = self._write_incremental_skool(skool.format('A'))
+        self.run_skool2html('--incremental --jobs 2 -d {} {}'.format(self.odir, skoolfile))
+        pages = ('asm/32768.html', 'asm/32769.html', 'asm/32770.html', 'asm/32771.html')
+        self._tamper(game_dir, *pages)
+        self.write_text_file(dedent(skool.format('B')).strip(), skoolfile)
+        self.run_skool2html('--incremental --jobs 2 -d {} {}'.format(self.odir, skoolfile))
+        self.assertFalse(self._is_tampered(game_dir, 'asm/32768.html'))
+        self.assertFalse(self._is_tampered(game_dir, 'asm/32769.html'))
+        self.assertTrue(self._is_tampered(game_dir, 'asm/32770.html'))
+        self.assertTrue(self._is_tampered(game_dir, 'asm/32771.html'))
+
     def test_option_V(self):
         for option in ('-V', '--version'):
             output, error = self.run_skool2html(option, catch_exit=0)
@@ -1447,12 +1853,17 @@ class Skool2HtmlTest(SkoolKitTestCase):
             CreateLabels=0
             EntryLabel=L{address}
             EntryPointLabel={main}_{index}
+            ImageCache=
+            ImageCacheSize=100
+            Incremental=0
+            Jobs=1
             JoinCss=
             OutputDir=.
             Quiet=0
             RebuildAudio=0
             RebuildImages=0
             Search=
+            SkoolCache=
             Theme=
             Time=0
         """
@@ -1478,12 +1889,17 @@ class Skool2HtmlTest(SkoolKitTestCase):
             CreateLabels=0
             EntryLabel=L{address}
             EntryPointLabel={main}_{index}
+            ImageCache=
+            ImageCacheSize=100
+            Incremental=0
+            Jobs=1
             JoinCss=
             OutputDir=html
             Quiet=1
             RebuildAudio=0
             RebuildImages=0
             Search=
+            SkoolCache=
             Theme=dark,wide
             Time=0
         """
@@ -229,6 +229,8 @@ class MockFileInfo:
         self.fname = None
         self.mode = None
         self.files = {}
+        self.image_cache = None
+        self.manifest = None
 
     def open_file(self, *names, mode='w'):
         self.fname = join(*names)
@@ -1396,6 +1398,44 @@ class MethodTest(HtmlWriterTestCase):
         """
         self._test_format_template(ref, 'test', fields, exp_output)
 
+    def test_format_template_repeatedly_with_different_fields(self):
+        ref = """
+            [Template:test]
+            <# include({name}) #>
+            <# foreach($i,list) #>
+            <# if($i[on]) #>
+            On: {$i[name]}
+            <# endif #>
+            <# endfor #>
+
+            [Template:one]
+            One
+
+            [Template:two]
+            Two
+        """
+        writer = self._get_writer(ref=ref)
+        cases = (
+            ({'name': 'one', 'list': [{'on': 1, 'name': 'A'}]}, 'One\nOn: A'),
+            ({'name': 'two', 'list': [{'on': 0, 'name': 'B'}, {'on': 1, 'name': 'C'}]}, 'Two\nOn: C'),
+            ({'name': '', 'list': ()}, ''),
+            ({'name': 'one', 'list': [{'on': 1, 'name': 'D'}, {'on': 1, 'name': 'E'}]}, 'One\nOn: D\nOn: E')
+        )
+        for fields, exp_output in cases:
+            self.assertEqual(exp_output, writer.format_template('test', fields))
+
+    def test_format_template_after_template_is_modified(self):
+        ref = """
+            [Template:test]
+            <# if(on) #>
+            On
+            <# endif #>
+        """
+        writer = self._get_writer(ref=ref)
+        self.assertEqual('On', writer.format_template('test', {'on': 1}))
+        writer.formatter.templates['test'] = 'Now {on}'
+        self.assertEqual('Now 1', writer.format_template('test', {'on': 1}))
+
     def test_push_snapshot_keeps_original_in_place(self):
         writer = self._get_writer(snapshot=[0])
         snapshot = writer.snapshot
@@ -1,4 +1,5 @@
 import hashlib
+import os
 from textwrap import dedent
 import re
 from unittest.mock import patch
@@ -6,7 +7,7 @@ from unittest.mock import patch
 from skoolkittest import SkoolKitTestCase
 from skoolkit import SkoolParsingError, BASE_10, BASE_16, CASE_LOWER, CASE_UPPER, components, z80
 from skoolkit.skoolparser import SkoolParser
-from skoolkit.skoolutils import TableParser, set_bytes
+from skoolkit.skoolutils import SkoolCache, TableParser, set_bytes
 
 TEST_BASE_CONVERSION_SKOOL = r"""
 c30000 LD A,%11101011
@@ -1953,6 +1954,76 @@ class SkoolParserTest(SkoolKitTestCase):
         """
         self.assert_error(skool, "Error while parsing @bank directive: nonexistent.skool: file not found")
 
+    def test_cache(self):
+        skool = """
+            @start
+            @replace=/#foo/bar
+            ; Routine at 30000
+            ;
+            ; Used by #foo.
+            c30000 LD A,(30005) ; Comment
+             30003 JR 30001
+             30005 DEFB 1
+        """
+        skoolfile = self.write_text_file(dedent(skool).strip(), suffix='.skool')
+        cache = SkoolCache(self.make_directory())
+        parser1 = SkoolParser(skoolfile, asm_mode=2, warnings=True, cache=cache)
+        warnings = self.err.getvalue()
+        self.assertIn('WARNING: Unreplaced address (30001):\n  30003 JR 30001\n', warnings)
+        parser2 = SkoolParser(skoolfile, asm_mode=2, warnings=True, cache=cache)
+        self.assertEqual(self.err.getvalue(), warnings * 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(parser1.snapshot[30000:30006], parser2.snapshot[30000:30006])
+        self.assertEqual(len(parser1.memory_map), len(parser2.memory_map))
+        entry = parser2.get_entry(30000)
+        self.assertIs(entry, parser2.memory_map[0])
+        self.assertEqual(entry.description, 'Routine at 30000')
+        self.assertEqual(entry.details, ['Used by bar.'])
+        instructions = entry.instructions
+        self.assertEqual([(i.address, i.operation) for i in instructions], [(i.address, i.operation) for i in parser1.memory_map[0].instructions])
+        self.assertEqual(instructions[0].comment.text, 'Comment')
+        self.assertIs(instructions[0].container, entry)
+        self.assertIs(instructions[0].reference.entry, entry)
+        self.assertIs(parser2.get_instruction(30005), instructions[2])
+
+    def test_cache_with_different_options(self):
+        skoolfile = self.write_text_file('; Data\nb30000 DEFB 1', suffix='.skool')
+        cache = SkoolCache(self.make_directory())
+        for kwargs in ({}, {'asm_mode': 1}, {'html': True}, {'case': CASE_LOWER}, {'variables': [('foo', 1)]}, {}):
+            SkoolParser(skoolfile, cache=cache, **kwargs)
+        self.assertEqual((cache.hits, cache.misses), (1, 5))
+
+    def test_cache_with_modified_skool_file(self):
+        skoolfile = self.write_text_file('; Data\nb30000 DEFB 1', suffix='.skool')
+        cache = SkoolCache(self.make_directory())
+        SkoolParser(skoolfile, cache=cache)
+        self.write_text_file('; Data\nb30000 DEFB 2', skoolfile)
+        parser = SkoolParser(skoolfile, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        self.assertEqual(parser.snapshot[30000], 2)
+
+    def test_cache_with_modified_bank_skool_file(self):
+        bankskool = self.write_text_file('b49152 DEFB 1', suffix='.skool')
+        skoolfile = self.write_text_file(f'@bank=3,{bankskool}\n; Data\nb30000 DEFB 1', suffix='.skool')
+        cache = SkoolCache(self.make_directory())
+        SkoolParser(skoolfile, cache=cache)
+        self.assertEqual(SkoolParser(skoolfile, cache=cache).snapshot.banks[3][0], 1)
+        self.write_text_file('b49152 DEFB 2', bankskool)
+        self.assertEqual(SkoolParser(skoolfile, cache=cache).snapshot.banks[3][0], 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_cache_with_corrupt_file(self):
+        skoolfile = self.write_text_file('; Data\nb30000 DEFB 1', suffix='.skool')
+        cache_dir = self.make_directory()
+        cache = SkoolCache(cache_dir)
+        SkoolParser(skoolfile, cache=cache)
+        cache_file = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+        with open(cache_file, 'wb') as f:
+            f.write(b'\x80\x05junk')
+        parser = SkoolParser(skoolfile, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        self.assertEqual(parser.snapshot[30000], 1)
+
     def test_bytes_directives(self):
         skool = """
             @bytes=237,107,0,192
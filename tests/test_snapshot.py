@@ -72,6 +72,27 @@ class MemoryTest(SkoolKitTestCase):
         self.assertEqual(values, [memory[a] for a in range(start, end, step)])
         self.assertEqual(values, memory[start:end:step])
 
+    def test_address_range_across_pages(self):
+        memory = Memory([0] * 0x20000, page=1)
+        start = 0x7FFD
+        values = [0x47, 0x39, 0xF7, 0x24, 0x6D, 0xA2]
+        end = start + len(values)
+        memory[start:end] = values
+        self.assertEqual(values[:3], list(memory.banks[5][-3:]))
+        self.assertEqual(values[3:], list(memory.banks[2][:3]))
+        self.assertEqual(values, memory[start:end])
+        self.assertEqual(0x8000, len(memory[0x4000:0xC000]))
+        self.assertEqual(0x4000, len(memory[0xC000:0x10004]))
+
+    def test_banks_are_shared(self):
+        banks = [bytearray([b]) * 0x4000 for b in range(8)]
+        memory = Memory(banks=banks, page=7)
+        for b in range(8):
+            self.assertIs(memory.banks[b], banks[b])
+        memory[0xC000] = 0x48
+        self.assertEqual(banks[7][0], 0x48)
+        self.assertEqual([list(b) for b in banks], memory.contents())
+
 class SnapshotTest(SkoolKitTestCase):
     def _check_ram(self, ram, exp_ram, model, out_7ffd, pages, page):
         if model == 0:
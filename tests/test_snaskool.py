@@ -5163,6 +5163,40 @@ class SkoolWriterTest(SkoolKitTestCase):
         """
         self._test_write_skool(snapshot, ctl, exp_skool)
 
+    @patch.object(components, 'SK_CONFIG', None)
+    def test_snapshot_reference_operations_changed_between_runs(self):
+        snapshot = [205, 4, 0, 201, 175, 201]
+        ctl = """
+            c 00000
+            c 00004
+            i 00006
+        """
+        exp_skool = """
+            ; Routine at 0
+            c00000 CALL 4        ;
+             00003 RET           ;
+
+            ; Routine at 4
+            ;
+            ; Used by the routine at #R0.
+            c00004 XOR A         ;
+             00005 RET           ;
+        """
+        self._test_write_skool(snapshot, ctl, exp_skool)
+
+        self.write_text_file("[skoolkit]\nSnapshotReferenceOperations=JP", 'skoolkit.ini')
+        components.SK_CONFIG = None
+        exp_skool = """
+            ; Routine at 0
+            c00000 CALL 4        ;
+             00003 RET           ;
+
+            ; Routine at 4
+            c00004 XOR A         ;
+             00005 RET           ;
+        """
+        self._test_write_skool(snapshot, ctl, exp_skool)
+
     @patch.object(components, 'SK_CONFIG', None)
     def test_custom_snapshot_reference_operations_as_regex_with_custom_separator(self):
         ini = "[skoolkit]\nSnapshotReferenceOperations=;LD A,\\(\\d+\\);LD \\(\\d+\\),A"
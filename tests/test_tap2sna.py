@@ -1,4 +1,5 @@
 import hashlib
+import json
 import os
 from textwrap import dedent
 import urllib
@@ -366,6 +367,109 @@ class Tap2SnaTest(SkoolKitTestCase):
         self.assertEqual(tap1_data[2:], list(load_tracer.blocks[0].data))
         self.assertEqual(tap2_data[2:], list(load_tracer.blocks[1].data))
 
+    def test_option_batch(self):
+        tap1 = self._write_basic_loader(32768, [1, 2, 3])[0]
+        tap2 = self._write_basic_loader(49152, [4, 5])[0]
+        odir = self.make_directory()
+        manifest = f"""
+            # Tapes to convert
+            {tap1} one.z80 --start 32768
+            {tap2}
+            missing.tap
+        """
+        batch_file = self.write_text_file(dedent(manifest).strip())
+        output, error = self.run_tap2sna(f'--batch {batch_file} -d {odir}')
+        self.assertEqual(error, '')
+        summaries = [json.loads(line) for line in output.strip().split('\n')]
+        self.assertEqual(len(summaries), 3)
+
+        s1, s2, s3 = summaries
+        self.assertEqual(s1['args'], [tap1, 'one.z80', '--start', '32768'])
+        self.assertEqual(s1['output'], os.path.join(odir, 'one.z80'))
+        self.assertEqual(s1['stop'], 'PC at start address')
+        self.assertEqual(s1['pc'], 32768)
+        self.assertGreater(s1['tstates'], 0)
+        self.assertIn('time', s1)
+        self.assertTrue(os.path.isfile(s1['output']))
+
+        self.assertEqual(s2['args'], [tap2])
+        self.assertEqual(s2['output'], os.path.join(odir, tap2[:-4] + '.z80'))
+        self.assertEqual(s2['stop'], 'PC in RAM')
+        self.assertEqual(s2['pc'], 49152)
+        self.assertTrue(os.path.isfile(s2['output']))
+
+        self.assertEqual(s3['args'], ['missing.tap'])
+        self.assertEqual(s3['error'], 'missing.tap: file not found')
+
+    def test_option_batch_with_directory(self):
+        tapdir = self.make_directory()
+        for name, start in (('a.tap', 32768), ('b.tap', 49152)):
+            blocks = self._write_basic_loader(start, [1, 2, 3], False)[0]
+            self.write_bin_file([b for block in blocks for b in block], os.path.join(tapdir, name))
+        self.write_text_file('Not a tape', os.path.join(tapdir, 'readme.txt'))
+        odir = self.make_directory()
+        output, error = self.run_tap2sna(f'-d {odir} --batch {tapdir}')
+        self.assertEqual(error, '')
+        summaries = [json.loads(line) for line in output.strip().split('\n')]
+        self.assertEqual([[os.path.join(tapdir, 'a.tap')], [os.path.join(tapdir, 'b.tap')]], [s['args'] for s in summaries])
+        self.assertEqual([32768, 49152], [s['pc'] for s in summaries])
+        for s in summaries:
+            self.assertTrue(os.path.isfile(s['output']))
+
+    def test_option_batch_with_zip_archive(self):
+        blocks1 = self._write_basic_loader(32768, [1, 2, 3], False)[0]
+        blocks2 = self._write_basic_loader(49152, [4, 5], False)[0]
+        zip_fname = self.write_bin_file(suffix='.zip')
+        with ZipFile(zip_fname, 'w') as archive:
+            archive.writestr('one.tap', bytes(b for block in blocks1 for b in block))
+            archive.writestr('readme.txt', 'Not a tape')
+            archive.writestr('two.tap', bytes(b for block in blocks2 for b in block))
+        odir = self.make_directory()
+        output, error = self.run_tap2sna(f'--batch {zip_fname} -d {odir}')
+        self.assertEqual(error, '')
+        summaries = [json.loads(line) for line in output.strip().split('\n')]
+        self.assertEqual([os.path.join(odir, 'one.z80'), os.path.join(odir, 'two.z80')], [s['output'] for s in summaries])
+        self.assertEqual([32768, 49152], [s['pc'] for s in summaries])
+
+    def test_option_batch_with_jobs(self):
+        tapes = [self._write_basic_loader(32768 + 256 * i, [i])[0] for i in range(4)]
+        batch_file = self.write_text_file('\n'.join(tapes))
+        odir = self.make_directory()
+        output, error = self.run_tap2sna(f'--batch {batch_file} --jobs 3 -d {odir} -c accelerator=list')
+        self.assertEqual(error, '')
+        summaries = [json.loads(line) for line in output.strip().split('\n')]
+        self.assertEqual([[t] for t in tapes], [s['args'] for s in summaries])
+        self.assertEqual([32768 + 256 * i for i in range(4)], [s['pc'] for s in summaries])
+        for s in summaries:
+            self.assertEqual(s['stop'], 'PC in RAM')
+            self.assertEqual(s['accelerators'], {})
+            self.assertTrue(os.path.isfile(s['output']))
+
+    @patch.object(tap2sna, 'LoadTracer', MockLoadTracer)
+    @patch.object(tap2sna, 'write_snapshot', null_write_snapshot)
+    def test_option_batch_collects_accelerator_hits(self):
+        tapfile = self._write_tap([create_tap_data_block([0])])
+        batch_file = self.write_text_file(tapfile)
+        output, error = self.run_tap2sna(f'--batch {batch_file}')
+        self.assertEqual(error, '')
+        summary = json.loads(output)
+        self.assertEqual(summary['accelerators'], {})
+        self.assertTrue(load_tracer.list_accelerators)
+
+    def test_option_batch_with_invalid_arguments(self):
+        tapfile = self._write_basic_loader(32768, [1, 2, 3])[0]
+        batch_file = self.write_text_file(f'{tapfile} --foo')
+        output, error = self.run_tap2sna(f'--batch {batch_file}')
+        self.assertEqual(error, '')
+        summary = json.loads(output)
+        self.assertEqual(summary['args'], [tapfile, '--foo'])
+        self.assertEqual(summary['error'], 'Invalid arguments')
+
+    def test_option_batch_with_input_file(self):
+        output, error = self.run_tap2sna('--batch tapes.txt in.tap', catch_exit=2)
+        self.assertEqual(output, '')
+        self.assertTrue(error.startswith('usage:'))
+
     @patch.object(tap2sna, 'write_snapshot', mock_write_snapshot)
     def test_option_d(self):
         odir = 'tap2sna'
@@ -6,10 +6,11 @@ from textwrap import dedent
 from unittest.mock import patch, Mock
 
 from skoolkittest import QUIT, MockPygame, MockPygameIO, SkoolKitTestCase, mock_find_file
-from skoolkit import SkoolKitError, VERSION, CSimulator, components, config, screen, trace
+from skoolkit import SkoolKitError, VERSION, CSimulator, components, config, read_bin_file, screen, trace
 from skoolkit.simulator import Simulator
 from skoolkit.simutils import PC, IFF, IM, T, B, C
 from skoolkit.trace import Tracer
+from skoolkit.traceutils import BinaryTrace
 
 if CSimulator is None:
     # Pre-load the simtables module so that its (significant) load time does
@@ -149,6 +150,12 @@ class TestSimulator(CSimulator or Simulator):
         simulator = self
         super().__init__(memory, registers, state, config)
 
+class BlockCacheSimulator(Simulator):
+    def __init__(self, memory, registers=None, state=None, config=None):
+        global simulator
+        simulator = self
+        super().__init__(memory, registers, state, config)
+
 class TraceTest(SkoolKitTestCase):
     def setUp(self):
         super().setUp()
@@ -1397,6 +1404,115 @@ class TraceTest(SkoolKitTestCase):
         self.assertEqual(ay_audio_writer.options.ay_res, 70908)
         self.assertFalse(ay_audio_writer.options.beeper)
 
+    def test_option_bin_trace(self):
+        data = (
+            0x21, 0x34, 0x12,       # $8000 LD HL,$1234
+            0x06, 0x02,             # $8003 LD B,$02
+            0x10, 0xFE,             # $8005 DJNZ $8005
+            0xDD, 0x75, 0x02,       # $8007 LD (IX+$02),L
+        )
+        binfile = self.write_bin_file(data, suffix='.bin')
+        start = 32768
+        stop = start + len(data)
+        tracefile = 'trace.bin'
+        exp_output = f"""
+            Stopped at ${stop:04X}
+            Wrote {tracefile}
+        """
+        exp_trace = [
+            "0 $8000 LD HL,$1234 HL=$1234 B=$00 R=$01",
+            "10 $8003 LD B,$02 HL=$1234 B=$02 R=$02",
+            "17 $8005 DJNZ $8005 HL=$1234 B=$01 R=$03",
+            "30 $8005 DJNZ $8005 HL=$1234 B=$00 R=$04",
+            "38 $8007 LD (IX+$02),L HL=$1234 B=$00 R=$06",
+        ]
+        trace_line = '{t} ${pc:04X} {i} HL=${r[hl]:04X} B=${r[b]:02X} R=${r[r]:02X}'
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o {start} -S {stop} {option} --bin-trace {tracefile} {binfile}')
+            self.assertEqual(error, '')
+            self.assertEqual(dedent(exp_output).strip(), output.rstrip())
+            trace = BinaryTrace(tracefile)
+            self.assertEqual(len(trace), 5)
+            self.assertEqual(exp_trace, list(trace.lines(trace_line)))
+
+    def test_option_bin_trace_with_verbose(self):
+        with self.assertRaises(SkoolKitError) as cm:
+            self.run_trace('--bin-trace trace.bin -v 48')
+        self.assertEqual(cm.exception.args[0], '--bin-trace cannot be used with --verbose')
+
+    def _write_break_bin_file(self):
+        data = (
+            0x06, 0x10,             # $8000 LD B,$10
+            0x3E, 0x07,             # $8002 LD A,$07
+            0xD3, 0xFE,             # $8004 OUT ($FE),A
+            0x21, 0x00, 0x90,       # $8006 LD HL,$9000
+            0x34,                   # $8009 INC (HL)
+            0x10, 0xFD,             # $800A DJNZ $8009
+        )
+        return self.write_bin_file(data, suffix='.bin'), 32768 + len(data)
+
+    def test_option_break(self):
+        binfile, stop = self._write_break_bin_file()
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -S {stop} {option} --break pc=$8009 {binfile}')
+            self.assertEqual(error, '')
+            self.assertEqual(output, 'Stopped at $8009: pc=$8009\n')
+
+    def test_option_break_with_registers(self):
+        binfile, stop = self._write_break_bin_file()
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -S {stop} {option} --break b<14&&a=7&&hl!=0 {binfile}')
+            self.assertEqual(error, '')
+            self.assertEqual(output, 'Stopped at $8009: b<14&&a=7&&hl!=0\n')
+
+    def test_option_break_with_memory_contents(self):
+        binfile, stop = self._write_break_bin_file()
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -S {stop} {option} --break ($9000)>=3 {binfile}')
+            self.assertEqual(error, '')
+            self.assertEqual(output, 'Stopped at $800A: ($9000)>=3\n')
+
+    def test_option_break_with_out(self):
+        binfile, stop = self._write_break_bin_file()
+        for option in ('', '--python'):
+            for expr in ('out=$07FE', 'out&$FF=254', 'out&1=0'):
+                output, error = self.run_trace(f'-n -o 32768 -S {stop} {option} --break {expr} {binfile}')
+                self.assertEqual(error, '')
+                self.assertEqual(output, f'Stopped at $8006: {expr}\n')
+
+    def test_option_break_with_lists_and_ranges(self):
+        binfile, stop = self._write_break_bin_file()
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -S {stop} {option} --break pc=1,$8003-$8005 {binfile}')
+            self.assertEqual(error, '')
+            self.assertEqual(output, 'Stopped at $8004: pc=1,$8003-$8005\n')
+
+    def test_option_break_not_triggered(self):
+        binfile, stop = self._write_break_bin_file()
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -S {stop} {option} --break out&1!=0 --break a>7 {binfile}')
+            self.assertEqual(error, '')
+            self.assertEqual(output, f'Stopped at ${stop:04X}\n')
+
+    def test_option_break_multiple(self):
+        binfile, stop = self._write_break_bin_file()
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -S {stop} {option} --break pc=$800A --break a=7 {binfile}')
+            self.assertEqual(error, '')
+            self.assertEqual(output, 'Stopped at $8004: a=7\n')
+
+    def test_option_break_invalid(self):
+        for expr in ('x=1', 'pc', 'a=b', '(z)=1', 'pc&&a=1'):
+            with self.assertRaises(SkoolKitError) as cm:
+                self.run_trace(f'--break {expr} 48')
+            self.assertEqual(cm.exception.args[0], f"Invalid breakpoint: '{expr}'")
+
+    def test_option_break_help(self):
+        output, error = self.run_trace('--break help')
+        self.assertEqual(error, '')
+        self.assertTrue(output.startswith('Usage: --break EXPR\n'))
+        self.assertIn("--break 'a>=10&&(23672)=0'", output)
+
     def test_option_cmio(self):
         data = (
             0xAF,             # $6000 XOR A        ;  4T -> 10T [ 4T ->  10T]
@@ -1592,6 +1708,35 @@ class TraceTest(SkoolKitTestCase):
         """
         self.assertEqual(dedent(exp_output).strip(), output.rstrip())
 
+    def test_option_frames(self):
+        binfile = self.write_bin_file((0x18, 0xFE), suffix='.bin') # JR $8000
+        for i, option in enumerate(('', '--python')):
+            framesdir = f'frames{i}'
+            output, error = self.run_trace(f'-n -o 32768 -M 210000 {option} --frames {framesdir} {binfile}')
+            self.assertEqual(error, '')
+            exp_output = f"""
+                Stopped at $8000: 210000 T-states
+                Wrote 3 frames to {framesdir}
+            """
+            self.assertEqual(dedent(exp_output).strip(), output.rstrip())
+            self.assertEqual(['frame-000000.png', 'frame-000001.png', 'frame-000002.png'], sorted(os.listdir(framesdir)))
+
+    @patch.object(trace, 'get_image_writer', MockImageWriter)
+    def test_option_frames_animated_png(self):
+        binfile = self.write_bin_file((0x18, 0xFE), suffix='.bin') # JR $8000
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -M 210000 {option} --frames anim.png --frame-step 2 {binfile}')
+            self.assertEqual(error, '')
+            exp_output = """
+                Stopped at $8000: 210000 T-states
+                Wrote anim.png (2 frames)
+            """
+            self.assertEqual(dedent(exp_output).strip(), output.rstrip())
+            self.assertEqual(image_writer.fname, 'anim.png')
+            self.assertEqual(len(image_writer.frames), 2)
+            self.assertEqual(image_writer.frames[0].delay, 4)
+            self.assertEqual(image_writer.frames[0].width, 640)
+
     @patch.object(trace, 'run', mock_run)
     def test_option_I(self):
         self.run_trace('-I TraceLine=Hello in.z80')
@@ -1849,6 +1994,196 @@ class TraceTest(SkoolKitTestCase):
         ]
         self.assertEqual(exp_output, output.rstrip().split('\n')[3::5])
 
+    def _write_profile_bin_file(self):
+        data = (
+            0x06, 0x02,             # $8000 LD B,$02
+            0xCD, 0x08, 0x80,       # $8002 CALL $8008
+            0x10, 0xFB,             # $8005 DJNZ $8002
+            0x00,                   # $8007 NOP
+            0x3C,                   # $8008 INC A
+            0xC9,                   # $8009 RET
+        )
+        return self.write_bin_file(data, suffix='.bin')
+
+    def test_option_profile(self):
+        binfile = self._write_profile_bin_file()
+        profile = 'profile.txt'
+        exp_output = f"""
+            Stopped at $8007
+            Wrote {profile}
+        """
+        exp_profile = """
+            Total: 90 T-states, 9 instructions
+
+            Address      T-states       % Instructions
+            $8002              34   37.78            2
+            $8005              21   23.33            2
+            $8009              20   22.22            2
+            $8008               8    8.89            2
+            $8000               7    7.78            1
+        """
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -S 32775 {option} --profile {profile} {binfile}')
+            self.assertEqual(error, '')
+            self.assertEqual(dedent(exp_output).strip(), output.rstrip())
+            with open(profile) as f:
+                self.assertEqual(dedent(exp_profile).lstrip(), f.read())
+
+    def test_option_profile_with_decimal(self):
+        binfile = self._write_profile_bin_file()
+        profile = 'profile.txt'
+        exp_profile = """
+            Total: 90 T-states, 9 instructions
+
+            Address      T-states       % Instructions
+            32770              34   37.78            2
+            32773              21   23.33            2
+            32777              20   22.22            2
+            32776               8    8.89            2
+            32768               7    7.78            1
+        """
+        output, error = self.run_trace(f'-D -n -o 32768 -S 32775 --profile {profile} {binfile}')
+        self.assertEqual(error, '')
+        with open(profile) as f:
+            self.assertEqual(dedent(exp_profile).lstrip(), f.read())
+
+    def test_option_profile_with_cmio(self):
+        data = (
+            0xAF,                   # $6000 XOR A  ;  4T -> 10T
+            0x3C,                   # $6001 INC A  ;  4T ->  8T
+        )
+        binfile = self.write_bin_file(data, suffix='.bin')
+        profile = 'profile.txt'
+        exp_profile = """
+            Total: 18 T-states, 2 instructions
+
+            Address      T-states       % Instructions
+            $6000              10   55.56            1
+            $6001               8   44.44            1
+        """
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-c -n --state tstates=14335 -o 24576 -S 24578 {option} --profile {profile} {binfile}')
+            self.assertEqual(error, '')
+            with open(profile) as f:
+                self.assertEqual(dedent(exp_profile).lstrip(), f.read())
+
+    def test_option_profile_with_routines_from_ctl_file(self):
+        binfile = self._write_profile_bin_file()
+        ctl = """
+            c $8000 Main routine
+            c 32776
+        """
+        ctlfile = self.write_text_file(dedent(ctl).lstrip(), suffix='.ctl')
+        profile = 'profile.txt'
+        exp_profile = """
+            Total: 90 T-states, 9 instructions
+
+            Routine      T-states       % Instructions
+            $8000              62   68.89            5  Main routine
+            $8008              28   31.11            4
+
+            Address      T-states       % Instructions
+            $8002              34   37.78            2
+            $8005              21   23.33            2
+            $8009              20   22.22            2
+            $8008               8    8.89            2
+            $8000               7    7.78            1
+        """
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -S 32775 {option} --profile {profile} --routines {ctlfile} {binfile}')
+            self.assertEqual(error, '')
+            with open(profile) as f:
+                self.assertEqual(dedent(exp_profile).lstrip(), f.read())
+
+    def test_option_profile_with_routines_from_skool_file(self):
+        binfile = self._write_profile_bin_file()
+        skool = """
+            @start
+            ; Main routine
+            ;
+            ; Calls the subroutine twice.
+            c32768 LD B,2
+             32770 CALL 32776
+             32773 DJNZ 32770
+             32775 NOP
+
+            ; Subroutine
+            c$8008 INC A
+            ; This is a mid-block comment.
+             $8009 RET
+        """
+        skoolfile = self.write_text_file(dedent(skool).lstrip(), suffix='.skool')
+        profile = 'profile.txt'
+        exp_profile = """
+            Total: 90 T-states, 9 instructions
+
+            Routine      T-states       % Instructions
+            $8000              62   68.89            5  Main routine
+            $8008              28   31.11            4  Subroutine
+        """
+        output, error = self.run_trace(f'-n -o 32768 -S 32775 --profile {profile} --routines {skoolfile} {binfile}')
+        self.assertEqual(error, '')
+        with open(profile) as f:
+            contents = f.read()
+        self.assertEqual(dedent(exp_profile).lstrip(), contents[:contents.index('\n\nAddress') + 1])
+
+    def test_option_profile_as_ctl_file(self):
+        binfile = self._write_profile_bin_file()
+        ctl = """
+            @ $7FF0 start
+            b $7FF0 Data
+            B $7FF0,16,8
+            c $8000 Main routine
+            D $8000 Does stuff.
+            R $8000 A Input
+            N $8005 This is a mid-block comment.
+
+            ; Subroutine
+            c 32776
+            c $800A Unused
+            i $800C
+        """
+        ctlfile = self.write_text_file(dedent(ctl).lstrip(), suffix='.ctl')
+        profile = 'profile.ctl'
+        exp_output = f"""
+            Stopped at $8007
+            Wrote {profile}
+        """
+        exp_profile = """
+            @ $7FF0 start
+            b $7FF0 Data
+            B $7FF0,16,8
+            c $8000 Main routine
+            D $8000 Profile: 62 T-states (68.89%), 5 instructions executed.
+            D $8000 Does stuff.
+            R $8000 A Input
+            N $8005 This is a mid-block comment.
+
+            ; Subroutine
+            c 32776
+            D 32776 Profile: 28 T-states (31.11%), 4 instructions executed.
+            c $800A Unused
+            i $800C
+        """
+        output, error = self.run_trace(f'-n -o 32768 -S 32775 --profile {profile} --routines {ctlfile} {binfile}')
+        self.assertEqual(error, '')
+        self.assertEqual(dedent(exp_output).strip(), output.rstrip())
+        with open(profile) as f:
+            self.assertEqual(dedent(exp_profile).lstrip(), f.read())
+
+    def test_option_profile_as_ctl_file_without_routines(self):
+        binfile = self._write_profile_bin_file()
+        with self.assertRaises(SkoolKitError) as cm:
+            self.run_trace(f'-n -o 32768 -S 32775 --profile profile.ctl {binfile}')
+        self.assertEqual(cm.exception.args[0], '--profile FILE.ctl requires --routines')
+
+    def test_option_routines_without_profile(self):
+        binfile = self._write_profile_bin_file()
+        ctlfile = self.write_text_file('c $8000\n', suffix='.ctl')
+        with self.assertRaises(SkoolKitError) as cm:
+            self.run_trace(f'-n -o 32768 -S 32775 --routines {ctlfile} {binfile}')
+        self.assertEqual(cm.exception.args[0], '--routines requires --profile')
+
     @patch.object(trace, 'Simulator', partial(MockSimulator, pc=0x1234))
     def test_option_python(self):
         global simulator
@@ -2120,6 +2455,8 @@ class TraceTest(SkoolKitTestCase):
         self.assertEqual(error, '')
         exp_output = (
             "[trace]\n"
+            "BlockCache=0\n"
+            "MapFormat=0\n"
             "PNGScale=2\n"
             "Screen=0\n"
             "ScreenFps=50\n"
@@ -2150,6 +2487,8 @@ class TraceTest(SkoolKitTestCase):
         self.assertEqual(error, '')
         exp_output = """
             [trace]
+            BlockCache=0
+            MapFormat=0
             PNGScale=2
             Screen=0
             ScreenFps=50
@@ -2651,6 +2990,100 @@ class TraceTest(SkoolKitTestCase):
         self.assertEqual(exp_audio_log, ay_audio_writer.audio_log)
         self.assertEqual(ay_audio_writer.options.volume, 0)
 
+    def test_option_watch(self):
+        binfile, stop = self._write_break_bin_file()
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -S {stop} {option} --watch 36863-36864 {binfile}')
+            self.assertEqual(error, '')
+            self.assertEqual(output, 'Stopped at $800A: watched address written\n')
+
+    def test_option_watch_not_triggered(self):
+        binfile, stop = self._write_break_bin_file()
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -S {stop} {option} --watch $9001 --watch 0-$8FFF {binfile}')
+            self.assertEqual(error, '')
+            self.assertEqual(output, f'Stopped at ${stop:04X}\n')
+
+    def test_option_watch_unchanged_contents(self):
+        code = (
+            0x21, 0x00, 0x90,       # $8000 LD HL,$9000
+            0x36, 0x00,             # $8003 LD (HL),0
+            0x36, 0x01,             # $8005 LD (HL),1
+            0x00,                   # $8007 NOP
+        )
+        binfile = self.write_bin_file(code, suffix='.bin')
+        for option in ('', '--python'):
+            output, error = self.run_trace(f'-n -o 32768 -S 32776 {option} --watch $9000 {binfile}')
+            self.assertEqual(error, '')
+            self.assertEqual(output, 'Stopped at $8007: watched address written\n')
+
+    def test_option_watch_invalid(self):
+        for spec in ('x', '2-1', '1-65536'):
+            with self.assertRaises(SkoolKitError) as cm:
+                self.run_trace(f'--watch {spec} 48')
+            self.assertEqual(cm.exception.args[0], f"Invalid address range: '{spec}'")
+
+    @patch.object(trace, 'Simulator', BlockCacheSimulator)
+    def test_config_BlockCache_set_on_command_line(self):
+        code = (
+            0xFB,                   # $8000 EI
+            0x1E, 0x08,             # $8001 LD E,8
+            0x06, 0x00,             # $8003 LD B,0
+            0x7E,                   # $8005 LD A,(HL)
+            0x85,                   # $8006 ADD A,L
+            0x6F,                   # $8007 LD L,A
+            0x23,                   # $8008 INC HL
+            0x3A, 0x12, 0x80,       # $8009 LD A,($8012)
+            0xEE, 0x01,             # $800C XOR 1
+            0x32, 0x12, 0x80,       # $800E LD ($8012),A
+            0x0C,                   # $8011 INC C
+            0x2C,                   # $8012 INC L (or DEC L)
+            0x10, 0xF0,             # $8013 DJNZ $8005
+            0x1D,                   # $8015 DEC E
+            0x20, 0xEB,             # $8016 JR NZ,$8003
+        )
+        ram = [(i * 7) % 256 for i in range(49152)]
+        ram[0x4000:0x4000 + len(code)] = code
+        z80file = self.write_z80(ram, {'PC': 0x8000, 'SP': 0xFF00, 'HL': 0x5C00, 'IY': 0x5C3A}, version=3)
+        results = []
+        for value in (0, 1):
+            output, error = self.run_trace(f'--python -S 0x8018 --stats -I BlockCache={value} {z80file}')
+            self.assertEqual(error, '')
+            self.assertEqual(simulator.blocks is not None, value == 1)
+            o_lines = output.split('\n')
+            self.assertEqual(o_lines[0], 'Stopped at $8018')
+            results.append((o_lines[1:3], simulator.registers, simulator.memory))
+        self.assertEqual(results[0], results[1])
+        self.assertTrue(simulator.blocks)
+
+    def test_config_MapFormat_set_on_command_line(self):
+        data = (
+            0xAF,                   # $8000 XOR A
+            0x18, 0x03,             # $8001 JR $8006
+            0x00,                   # $8003 NOP
+            0x00,                   # $8004 NOP
+            0x00,                   # $8005 NOP
+            0x3C,                   # $8006 INC A
+            0x3C,                   # $8007 INC A
+            0x18, 0x00,             # $8008 JR $800A
+            0x00,                   # $800A NOP
+        )
+        mapfile = 'exec.map'
+        binfile = self.write_bin_file(data, suffix='.bin')
+        start = 32768
+        stop = start + len(data)
+        output, error = self.run_trace(f'-n -o {start} -S {stop} -I MapFormat=1 --map {mapfile} {binfile}')
+        self.assertEqual(error, '')
+        exp_output = f"""
+            Stopped at ${stop:04X}
+            Wrote {mapfile}
+        """
+        self.assertEqual(dedent(exp_output).strip(), output.rstrip())
+        exp_map = [0] * 8192
+        exp_map[0x1000] = 0b11000011 # $8000, $8001, $8006, $8007
+        exp_map[0x1001] = 0b00000101 # $8008, $800A
+        self.assertEqual(exp_map, list(read_bin_file(mapfile)))
+
     @patch.object(trace, 'get_image_writer', MockImageWriter)
     def test_config_PNGScale_read_from_file(self):
         ini = """
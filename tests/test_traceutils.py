@@ -1,5 +1,14 @@
+import os
+from unittest.mock import patch
+
 from skoolkittest import SkoolKitTestCase
-from skoolkit.traceutils import disassemble
+from skoolkit import SkoolKitError
+from skoolkit.graphics import Udg
+from skoolkit.image import ImageWriter
+from skoolkit import traceutils
+from skoolkit.simutils import A, SP, R, xA, MEMPTR
+from skoolkit.traceutils import (BORDER_LINE_TIMES, TRACE_MAGIC, BinaryTrace,
+                                 FrameWriter, disassemble, trace_record)
 
 OPCODES_HEX = {
     '00000000': ("NOP", 1),
@@ -4873,3 +4882,206 @@ class DisassembleTest(SkoolKitTestCase):
     def test_instructions_at_65533(self):
         opcodes = {h: (op, size) for h, (op, size) in OPCODES_HEX.items() if size > 3}
         self._test_instructions(opcodes, 65533)
+
+class BinaryTraceTest(SkoolKitTestCase):
+    def _write_trace(self, records):
+        data = bytearray(TRACE_MAGIC)
+        registers = [0] * 30
+        for pc, t, ibytes, a in records:
+            registers[A] = a
+            data.extend(trace_record(registers, pc, t, bytes(ibytes)))
+        return self.write_bin_file(data, suffix='.bin')
+
+    def test_registers(self):
+        registers = list(range(30))
+        registers[SP] = 0x5432
+        registers[MEMPTR] = 0x6543
+        tracefile = self.write_bin_file(TRACE_MAGIC + trace_record(registers, 0x8000, 12345678901, b'\x01\x02\x03\x04'))
+        trace = BinaryTrace(tracefile)
+        self.assertEqual(len(trace), 1)
+        pc, t, ibytes, r = next(trace.records())
+        self.assertEqual(pc, 0x8000)
+        self.assertEqual(t, 12345678901)
+        self.assertEqual(ibytes, b'\x01\x02\x03\x04')
+        self.assertEqual(r[A:SP], registers[A:SP])
+        self.assertEqual(r[SP], 0x5432)
+        self.assertEqual(r[R], registers[R])
+        self.assertEqual(r[xA:xA + 8], registers[xA:xA + 8])
+        self.assertEqual(r[MEMPTR], 0x6543)
+
+    def test_lines(self):
+        tracefile = self._write_trace((
+            (0x8000, 0, (0x3E, 0x01, 0, 0), 1),    # LD A,$01
+            (0x8002, 7, (0x3C, 0, 0, 0), 2),       # INC A
+            (0x8003, 11, (0xC3, 0x00, 0x80, 0), 2) # JP $8000
+        ))
+        exp_lines = [
+            "0 $8000 LD A,$01 A=1",
+            "7 $8002 INC A A=2",
+            "11 $8003 JP $8000 A=2"
+        ]
+        trace_line = '{t} ${pc:04X} {i} A={r[a]}'
+        self.assertEqual(exp_lines, list(BinaryTrace(tracefile).lines(trace_line)))
+
+    def test_lines_with_operand_formats(self):
+        tracefile = self._write_trace(((0x8000, 0, (0x21, 0x34, 0x12, 0), 0),))
+        lines = BinaryTrace(tracefile).lines('{pc} {i}', '0x', '02x', '04x')
+        self.assertEqual(['32768 LD HL,0x1234'], list(lines))
+
+    def test_lines_in_address_range(self):
+        tracefile = self._write_trace([(0x8000 + n, n * 4, (0,) * 4, 0) for n in range(10)])
+        lines = BinaryTrace(tracefile).lines('${pc:04X}', start=0x8003, end=0x8006)
+        self.assertEqual(['$8003', '$8004', '$8005'], list(lines))
+
+    def test_lines_in_time_range(self):
+        tracefile = self._write_trace([(0x8000 + n, n * 4, (0,) * 4, 0) for n in range(10)])
+        lines = BinaryTrace(tracefile).lines('{t}', min_time=9, max_time=20)
+        self.assertEqual(['12', '16', '20'], list(lines))
+
+    def test_lines_with_memory_contents(self):
+        tracefile = self._write_trace(((0x8000, 0, (0x3E, 0x01, 0, 0), 1),))
+        with BinaryTrace(tracefile) as trace:
+            for trace_line, field in (('{pc} {m[32768]}', '{m[32768]}'), ('{pc} {m[r[hl]]:02X}', '{m[r[hl]]}')):
+                with self.assertRaises(SkoolKitError) as cm:
+                    trace.lines(trace_line)
+                self.assertEqual(cm.exception.args[0], f"Memory contents are not available in a binary trace: '{field}'")
+
+    def test_close(self):
+        tracefile = self._write_trace(((0x8000, 0, (0, 0, 0, 0), 0),))
+        with BinaryTrace(tracefile) as trace:
+            self.assertEqual(['32768'], list(trace.lines('{pc}')))
+        self.assertTrue(trace.data.closed)
+        trace = BinaryTrace(tracefile)
+        trace.close()
+        self.assertTrue(trace.data.closed)
+
+    def test_find(self):
+        tracefile = self._write_trace([(0x8000, n * 4, (0,) * 4, 0) for n in range(1000)])
+        trace = BinaryTrace(tracefile)
+        self.assertEqual(trace.find(0), 0)
+        self.assertEqual(trace.find(2000), 500)
+        self.assertEqual(trace.find(2001), 501)
+        self.assertEqual(trace.find(4000), 1000)
+
+    def test_empty_trace(self):
+        tracefile = self.write_bin_file(TRACE_MAGIC)
+        trace = BinaryTrace(tracefile)
+        self.assertEqual(len(trace), 0)
+        self.assertEqual([], list(trace.lines('{pc}')))
+
+    def test_invalid_file(self):
+        tracefile = self.write_bin_file(b'SKTRACE0')
+        with self.assertRaises(SkoolKitError) as cm:
+            BinaryTrace(tracefile)
+        self.assertEqual(cm.exception.args[0], f'{tracefile}: not a binary trace file')
+
+class RecordingImageWriter:
+    def write_image(self, frames, img_file):
+        self.frames = frames
+        self.fname = img_file.name
+
+class RecordingScreen:
+    def __init__(self, rv=True):
+        self.rv = rv
+        self.calls = []
+
+    def draw(self, scr, frame, border, keyboard=None):
+        self.calls.append((frame, border[:], keyboard))
+        return self.rv
+
+class FrameWriterTest(SkoolKitTestCase):
+    def _get_scr(self, attr=0):
+        scr = [0] * 6912
+        scr[6144:] = [attr] * 768
+        return scr
+
+    def test_directory(self):
+        fw = FrameWriter('frames', 1, 1, False, ImageWriter())
+        border = [(0, 1)]
+        for frame in range(3):
+            self.assertTrue(fw.draw(self._get_scr(), frame, border))
+            self.assertEqual([(0, 1)], border)
+        self.assertEqual(fw.close(), 3)
+        self.assertEqual(['frame-000000.png', 'frame-000001.png', 'frame-000002.png'], sorted(os.listdir('frames')))
+        for fname in os.listdir('frames'):
+            with open(os.path.join('frames', fname), 'rb') as f:
+                self.assertEqual(f.read(8), b'\x89PNG\r\n\x1a\n')
+
+    def test_step(self):
+        fw = FrameWriter('frames', 3, 1, False, ImageWriter())
+        for frame in range(7):
+            fw.draw(self._get_scr(), frame, [(0, 0)])
+        self.assertEqual(fw.close(), 3)
+        self.assertEqual(['frame-000000.png', 'frame-000001.png', 'frame-000002.png'], sorted(os.listdir('frames')))
+
+    def test_animated_png(self):
+        image_writer = RecordingImageWriter()
+        fw = FrameWriter('anim.png', 2, 3, False, image_writer)
+        for frame in range(4):
+            fw.draw(self._get_scr(), frame, [(0, 2)])
+        self.assertEqual(fw.close(), 2)
+        self.assertEqual(image_writer.fname, 'anim.png')
+        self.assertEqual(len(image_writer.frames), 2)
+        for frame in image_writer.frames:
+            self.assertEqual(frame.scale, 3)
+            self.assertEqual(frame.delay, 4)
+            self.assertEqual(frame.width, 960)
+            self.assertEqual(frame.height, 720)
+
+    @patch.object(traceutils, 'MAX_APNG_FRAMES', 3)
+    def test_animated_png_with_too_many_frames(self):
+        image_writer = RecordingImageWriter()
+        fw = FrameWriter('anim.png', 2, 1, False, image_writer)
+        for frame in range(6):
+            fw.draw(self._get_scr(), frame, [(0, 0)])
+        with self.assertRaises(SkoolKitError) as cm:
+            fw.draw(self._get_scr(), 6, [(0, 0)])
+        self.assertEqual(cm.exception.args[0], 'Too many frames for anim.png (maximum 3); use --frame-step or write the frames to a directory')
+        fw.close()
+        self.assertFalse(hasattr(image_writer, 'frames'))
+
+    def test_border(self):
+        image_writer = RecordingImageWriter()
+        fw = FrameWriter('anim.png', 1, 1, False, image_writer)
+        # Change the border from blue to red at the start of the 4th line of
+        # the top border, and then to green at the start of the 12th line
+        border = [(0, 1), (BORDER_LINE_TIMES[0][3], 2), (BORDER_LINE_TIMES[0][11], 4)]
+        fw.draw(self._get_scr(), 0, border)
+        self.assertEqual([(0, 4)], border)
+        fw.close()
+        udgs = image_writer.frames[0].udgs
+        self.assertEqual(len(udgs), 30)
+        self.assertEqual(len(udgs[0]), 40)
+        self.assertEqual(udgs[0][0], Udg(0b001010, [0, 0, 0, 255, 255, 255, 255, 255]))
+        self.assertEqual(udgs[0][39], udgs[0][0])
+        self.assertEqual(udgs[1][0], Udg(0b010100, [0, 0, 0, 255, 255, 255, 255, 255]))
+        self.assertEqual(udgs[29][0], Udg(0b100000, [0] * 8))
+
+    def test_border_128k(self):
+        image_writer = RecordingImageWriter()
+        fw = FrameWriter('anim.png', 1, 1, True, image_writer)
+        border = [(0, 3), (BORDER_LINE_TIMES[1][232], 6)]
+        fw.draw(self._get_scr(), 0, border)
+        fw.close()
+        udgs = image_writer.frames[0].udgs
+        self.assertEqual(udgs[0][0], Udg(0b011000, [0] * 8))
+        self.assertEqual(udgs[29][0], Udg(0b110000, [0] * 8))
+
+    def test_flash(self):
+        image_writer = RecordingImageWriter()
+        fw = FrameWriter('anim.png', 16, 1, False, image_writer)
+        for frame in range(32):
+            fw.draw(self._get_scr(0b11001010), frame, [(0, 0)])
+        fw.close()
+        self.assertEqual(image_writer.frames[0].udgs[3][4].attr, 0b01001010)
+        self.assertEqual(image_writer.frames[1].udgs[3][4].attr, 0b01010001)
+
+    def test_screen(self):
+        screen = RecordingScreen(False)
+        fw = FrameWriter('anim.png', 1, 1, False, RecordingImageWriter(), screen)
+        border = [(0, 5), (100, 6)]
+        keyboard = [0] * 8
+        self.assertFalse(fw.draw(self._get_scr(), 7, border, keyboard))
+        self.assertEqual([(7, [(0, 5), (100, 6)], keyboard)], screen.calls)
+        self.assertEqual([(0, 5), (100, 6)], border)
+        self.assertEqual(fw.close(), 1)
@@ -1,7 +1,7 @@
 from unittest.mock import patch
 
 from skoolkittest import SkoolKitTestCase
-from skoolkit import components
+from skoolkit import components, z80
 from skoolkit.z80 import Assembler, get_timing
 
 OPERATIONS = (
@@ -3046,6 +3046,46 @@ class Z80Test(SkoolKitTestCase):
         for address, operation, exp_data in RELATIVE_JUMPS:
             self._test_assembly(operation, exp_data, address)
 
+    def test_relative_jumps_at_different_addresses(self):
+        assembler = Assembler()
+        for operation, address, exp_data in (
+                ('JR 32768', 32768, (24, 254)),
+                ('JR 32768', 32700, (24, 66)),
+                ('JR 32768', 32639, (24, 127)),
+                ('JR 32768', 32638, ()),
+                ('JR 32768', 32894, (24, 128)),
+                ('JR 32768', 32895, ()),
+                ('DJNZ 0', 65534, (16, 0)),
+                ('DJNZ 0', 0, (16, 254)),
+                ('JR NZ,40000', 40010, (32, 244)),
+                ('JR NZ,40000', 39990, (32, 8))
+        ):
+            self.assertEqual(assembler.assemble(operation, address), exp_data, f"assemble('{operation}', {address}) failed")
+            self.assertEqual(assembler.get_size(operation, address), len(exp_data), f"get_size('{operation}', {address}) failed")
+
+    def test_relative_jumps_without_address(self):
+        assembler = Assembler()
+        for operation, exp_data in (('JR 1', (24, 255)), ('JR NZ,1', (32, 255)), ('DJNZ 2', (16, 0))):
+            self.assertEqual(assembler.assemble(operation, None), (), f"assemble('{operation}', None) failed")
+            self.assertEqual(assembler.assemble(operation, 0), exp_data, f"assemble('{operation}', 0) failed")
+
+    @patch.object(z80, 'ASSEMBLER_CACHE_SIZE', 2)
+    def test_cache_size(self):
+        assembler = Assembler()
+        for i in range(4):
+            self.assertEqual(assembler.assemble(f'LD A,{i}', 0), (62, i))
+            self.assertLessEqual(len(assembler._cache), 2)
+        self.assertEqual(assembler.assemble('LD A,0', 0), (62, 0))
+
+    def test_repeated_operations(self):
+        assembler = Assembler()
+        for i in range(3):
+            self.assertEqual(assembler.assemble('LD A,(IX+3)', i), (221, 126, 3))
+            self.assertEqual(assembler.assemble('ld a , ( ix + 3 )', i), (221, 126, 3))
+            self.assertEqual(assembler.assemble('LD A,256', i), ())
+            self.assertEqual(assembler.assemble('DEFB 1,"a"', i), (1, 97))
+            self.assertEqual(assembler.get_size('JR 1', i), 2)
+
     def test_unusual_whitespace(self):
         for operation, exp_data in UNUSUAL_WHITESPACE:
             self._test_assembly(operation, exp_data)
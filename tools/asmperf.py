@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SKOOLKIT_HOME = os.environ.get('SKOOLKIT_HOME')
+
+def _write_skool_file(tmpdir):
+    # Four copies of the 48K ROM, disassembled as code from 0 to 65535
+    with open(ROM48, 'rb') as f:
+        rom = f.read()
+    binfile = os.path.join(tmpdir, 'rom64.bin')
+    with open(binfile, 'wb') as f:
+        f.write(rom * 4)
+    sna2skool = os.path.join(os.path.dirname(os.path.dirname(skoolkit.__file__)), 'sna2skool.py')
+    skoolfile = os.path.join(tmpdir, 'rom64.skool')
+    with open(skoolfile, 'w') as f:
+        subprocess.run((sys.executable, sna2skool, '-o', '0', binfile), stdout=f, stderr=subprocess.DEVNULL, check=True)
+    return skoolfile
+
+def _get_operations(skoolfile):
+    operations = []
+    with open(skoolfile) as f:
+        for line in f:
+            if line[:1] in 'bcgistuw ' and line[1:6].isdigit():
+                operation = line[7:].split(';', 1)[0].strip()
+                if operation:
+                    operations.append((operation, int(line[1:6])))
+    return operations
+
+def _assemble(operations, offset=0):
+    assembler = get_assembler()
+    return [assembler.assemble(op, (addr + offset) % 65536) for op, addr in operations]
+
+def _get_size(operations):
+    assembler = get_assembler()
+    return [assembler.get_size(op, addr) for op, addr in operations]
+
+def _parse(skoolfile, html):
+    parser = SkoolParser(skoolfile, html=html)
+    return [i.bytes for e in parser.memory_map for i in e.instructions]
+
+def get_cases(skoolfile, operations):
+    return (
+        ('parse-asm', lambda: _parse(skoolfile, False)),
+        ('parse-html', lambda: _parse(skoolfile, True)),
+        ('assemble', lambda: _assemble(operations)),
+        ('assemble-relocated', lambda: _assemble(operations, 37)),
+        ('get-size', lambda: _get_size(operations)),
+    )
+
+def run(options):
+    print('Using SkoolKit in {}'.format(os.path.dirname(os.path.dirname(skoolkit.__file__))))
+    total = 0
+    with tempfile.TemporaryDirectory() as tmpdir:
+        skoolfile = options.skoolfile or _write_skool_file(tmpdir)
+        operations = _get_operations(skoolfile)
+        print('{} instructions'.format(len(operations)))
+        for name, func in get_cases(skoolfile, operations):
+            if options.cases and name not in options.cases:
+                continue
+            timings = []
+            for i in range(options.runs):
+                start = time.perf_counter()
+                output = func()
+                timings.append(time.perf_counter() - start)
+            elapsed = min(timings)
+            total += elapsed
+            md5sum = hashlib.md5(repr(output).encode()).hexdigest()
+            print('{:<20} {:8.4f}s  {}'.format(name, elapsed, md5sum))
+    print('{:<20} {:8.4f}s'.format('Total', total))
+
+parser = argparse.ArgumentParser(
+    usage="%(prog)s [options] [CASE...]",
+    description="Time the assembly of every instruction in a skool file by SkoolParser (in\n"
+                "ASM mode and HTML mode) and by the assembler's assemble() and get_size()\n"
+                "methods (at the original addresses and at relocated addresses). By default\n"
+                "the skool file is a disassembly of four copies of the 48K ROM occupying the\n"
+                "whole 64K address space. Run this with '-s' pointing at two versions of\n"
+                "SkoolKit to compare timings and check that the output is identical.",
+    formatter_class=argparse.RawTextHelpFormatter,
+    add_help=False
+)
+parser.add_argument('cases', help=argparse.SUPPRESS, nargs='*')
+group = parser.add_argument_group('Options')
+group.add_argument('-f', dest='skoolfile', metavar='FILE',
+                   help='Use this skool file instead of a disassembly of the ROM.')
+group.add_argument('-n', dest='runs', metavar='N', type=int, default=3,
+                   help='Run each case N times and show the shortest time (default: 3).')
+group.add_argument('-s', dest='skoolkit_home', metavar='DIR', default=SKOOLKIT_HOME,
+                   help='Use SkoolKit in this directory (default: $SKOOLKIT_HOME).')
+namespace, unknown_args = parser.parse_known_args()
+if unknown_args:
+    parser.exit(2, parser.format_help())
+if namespace.skoolkit_home:
+    if not os.path.isdir(namespace.skoolkit_home):
+        sys.stderr.write('{}: directory not found\n'.format(namespace.skoolkit_home))
+        sys.exit(1)
+    sys.path.insert(0, namespace.skoolkit_home)
+import skoolkit
+from skoolkit import ROM48
+from skoolkit.components import get_assembler
+from skoolkit.skoolparser import SkoolParser
+run(namespace)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SKOOLKIT_HOME = os.environ.get('SKOOLKIT_HOME')
+
+def _write_files(tmpdir, step):
+    with open(ROM48, 'rb') as f:
+        rom = f.read()
+    rom16 = os.path.join(tmpdir, 'rom16.bin')
+    with open(rom16, 'wb') as f:
+        f.write(rom)
+    # Four copies of the 48K ROM, occupying the whole 64K address space
+    rom64 = os.path.join(tmpdir, 'rom64.bin')
+    with open(rom64, 'wb') as f:
+        f.write(rom * 4)
+    # A code map containing the address of every Nth instruction in the ROM
+    code_map = os.path.join(tmpdir, 'rom16.map')
+    with open(code_map, 'w') as f:
+        for i, instruction in enumerate(decode(rom, 0, len(rom))):
+            if i % step == 0:
+                f.write('${:04X}\n'.format(instruction[0]))
+    return rom16, rom64, code_map
+
+def _run(script, *args):
+    cmd = (sys.executable, os.path.join(SK_DIR, script), *args)
+    return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+
+def get_cases(tmpdir, step):
+    rom16, rom64, code_map = _write_files(tmpdir, step)
+    ctlfile = os.path.join(tmpdir, 'rom64.ctl')
+    with open(ctlfile, 'wb') as f:
+        f.write(_run('sna2ctl.py', '-o', '0', rom64))
+    return (
+        ('sna2ctl', lambda: _run('sna2ctl.py', '-o', '0', rom64)),
+        ('sna2ctl-map', lambda: _run('sna2ctl.py', '-o', '0', '-m', code_map, rom16)),
+        ('sna2skool', lambda: _run('sna2skool.py', '-o', '0', '-c', ctlfile, rom64)),
+    )
+
+def run(options):
+    print('Using SkoolKit in {}'.format(SK_DIR))
+    total = 0
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, func in get_cases(tmpdir, options.step):
+            if options.cases and name not in options.cases:
+                continue
+            timings = []
+            for i in range(options.runs):
+                start = time.perf_counter()
+                output = func()
+                timings.append(time.perf_counter() - start)
+            elapsed = min(timings)
+            total += elapsed
+            print('{:<12} {:8.4f}s  {}'.format(name, elapsed, hashlib.md5(output).hexdigest()))
+    print('{:<12} {:8.4f}s'.format('Total', total))
+
+parser = argparse.ArgumentParser(
+    usage="%(prog)s [options] [CASE...]",
+    description="Time sna2ctl.py on four copies of the 48K ROM occupying the whole 64K address\n"
+                "space (sna2ctl), sna2ctl.py with a code map on the 48K ROM (sna2ctl-map),\n"
+                "and sna2skool.py on the 64K image (sna2skool). The code map contains the\n"
+                "address of every Nth instruction in the ROM. Run this with '-s' pointing at\n"
+                "two versions of SkoolKit to compare timings and check that the output is\n"
+                "identical.",
+    formatter_class=argparse.RawTextHelpFormatter,
+    add_help=False
+)
+parser.add_argument('cases', help=argparse.SUPPRESS, nargs='*')
+group = parser.add_argument_group('Options')
+group.add_argument('-m', dest='step', metavar='N', type=int, default=48,
+                   help='Put every Nth instruction in the code map (default: 48).')
+group.add_argument('-n', dest='runs', metavar='N', type=int, default=3,
+                   help='Run each case N times and show the shortest time (default: 3).')
+group.add_argument('-s', dest='skoolkit_home', metavar='DIR', default=SKOOLKIT_HOME,
+                   help='Use SkoolKit in this directory (default: $SKOOLKIT_HOME).')
+namespace, unknown_args = parser.parse_known_args()
+if unknown_args:
+    parser.exit(2, parser.format_help())
+if namespace.skoolkit_home:
+    if not os.path.isdir(namespace.skoolkit_home):
+        sys.stderr.write('{}: directory not found\n'.format(namespace.skoolkit_home))
+        sys.exit(1)
+    sys.path.insert(0, namespace.skoolkit_home)
+import skoolkit
+from skoolkit import ROM48
+from skoolkit.opcodes import decode
+SK_DIR = os.path.dirname(os.path.dirname(skoolkit.__file__))
+run(namespace)
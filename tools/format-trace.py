@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+SKOOLKIT_HOME = os.environ.get('SKOOLKIT_HOME')
+if not SKOOLKIT_HOME:
+    sys.stderr.write('SKOOLKIT_HOME is not set; aborting\n')
+    sys.exit(1)
+if not os.path.isdir(SKOOLKIT_HOME):
+    sys.stderr.write(f'SKOOLKIT_HOME={SKOOLKIT_HOME}; directory not found\n')
+    sys.exit(1)
+sys.path.insert(0, SKOOLKIT_HOME)
+
+from skoolkit import SkoolKitError, integer
+from skoolkit.config import get_config
+from skoolkit.traceutils import BinaryTrace, Registers, get_trace_line
+
+def _range(arg):
+    a, sep, b = arg.partition('-')
+    return integer(a or '0'), integer(b) if b else None
+
+def run(infile, options):
+    config = get_config('trace')
+    b = ('', 'Decimal')[options.decimal]
+    s = ('', '2')[options.verbose > 1]
+    if options.trace_line is None:
+        orig_trace_line = config['TraceLine' + b + s]
+    else:
+        orig_trace_line = options.trace_line
+    trace_line = get_trace_line(orig_trace_line.replace(r'\n', '\n'))
+    try:
+        trace_line.format(pc=0, i='.', r=Registers([0] * 30), t=0, m=[0] * 65536)
+    except Exception:
+        raise SkoolKitError(f"Invalid format string: '{orig_trace_line}'")
+    trace_operand = config['TraceOperand' + b]
+    prefix, byte_fmt, word_fmt = (trace_operand + ',' * (2 - trace_operand.count(','))).split(',')[:3]
+    start, end = options.addresses
+    if end is None:
+        end = 65535
+    min_time, max_time = options.tstates
+    with BinaryTrace(infile) as trace:
+        for line in trace.lines(trace_line, prefix, byte_fmt, word_fmt, start, end + 1, min_time, max_time):
+            print(line)
+
+parser = argparse.ArgumentParser(
+    usage="%(prog)s [options] FILE",
+    description="Print the instructions in a binary trace file written by 'trace.py --bin-trace'.\n"
+                "By default, each instruction is formatted according to the TraceLine\n"
+                "configuration parameter of trace.py. Memory contents are not recorded in\n"
+                "binary trace files, so the 'm' replacement field is not supported.",
+    formatter_class=argparse.RawTextHelpFormatter,
+    add_help=False
+)
+parser.add_argument('infile', help=argparse.SUPPRESS, nargs='?')
+group = parser.add_argument_group('Options')
+group.add_argument('-a', dest='addresses', metavar='A[-B]', type=_range, default=(0, None),
+                   help='Print only instructions at addresses from A to B.')
+group.add_argument('-D', dest='decimal', action='store_true',
+                   help='Use the TraceLineDecimal* and TraceOperandDecimal parameters.')
+group.add_argument('-f', dest='trace_line', metavar='FORMAT',
+                   help='Use this format instead of the TraceLine* parameter.')
+group.add_argument('-t', dest='tstates', metavar='T1[-T2]', type=_range, default=(0, None),
+                   help='Print only instructions executed from T-state T1 to T2.')
+group.add_argument('-v', dest='verbose', action='count', default=1,
+                   help='Use the TraceLine2 (or TraceLineDecimal2) parameter.')
+namespace, unknown_args = parser.parse_known_args()
+if unknown_args or namespace.infile is None:
+    parser.exit(2, parser.format_help())
+try:
+    run(namespace.infile, namespace)
+except SkoolKitError as e:
+    sys.stderr.write(f'ERROR: {e}\n')
+    sys.exit(1)
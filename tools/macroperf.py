@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import hashlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SKOOLKIT_HOME = os.environ.get('SKOOLKIT_HOME')
+
+SKOOL = """
+; Routine at 32768
+;
+; #LIST {{ Item }} LIST#
+c32768 LD A,B   ; Compare with #R32772
+ 32769 CP 1     ; #N1
+ 32771 RET      ;
+
+; Data at 32772
+b32772 DEFB 1,2,3,4,5,6,7,8
+"""
+
+def _long_description(count):
+    return ' '.join(f'See #R32768 and #R32772, #N({i}) and #IF({i}%2)(odd,even).' for i in range(count))
+
+def _for_table(count):
+    return f'#TABLE(default,centre) {{ =h N | Hex }} #FOR0,{count - 1}(n,{{ n | #N(n) }}, ) TABLE#'
+
+def _foreach_list(count):
+    items = ','.join(str(i) for i in range(count))
+    return f'#LIST #FOREACH({items})(n,{{ Item #MAP(n%3)(?,0:zero,1:one) }}, ) LIST#'
+
+def _page_content(count):
+    return '\n'.join(f'<p>#FORMAT(Line {{n}}: #PEEK(32772) #EVAL({i},16,4))</p>'.replace('{n}', str(i)) for i in range(count))
+
+def _synthetic_cases():
+    return (
+        ('description-200', _long_description(200)),
+        ('description-1000', _long_description(1000)),
+        ('for-table-500', _for_table(500)),
+        ('foreach-list-500', _foreach_list(500)),
+        ('page-content-500', _page_content(500)),
+    )
+
+def _get_writers(skoolfile):
+    ref_parser = RefParser()
+    ref_parser.parse(io.StringIO(defaults.get_section('Config')))
+    html_writer = HtmlWriter(SkoolParser(skoolfile, html=True), ref_parser, FileInfo('', 'game', False, False))
+    html_writer._set_cwd('GameIndex', None)
+    asm_parser = SkoolParser(skoolfile, asm_mode=1)
+    properties = dict(asm_parser.properties)
+    properties['warnings'] = '0'
+    asm_writer = AsmWriter(asm_parser, properties, {}, get_config('skool2asm'))
+    return html_writer, asm_writer, asm_parser
+
+def _comments(parser):
+    texts = []
+    for entry in parser.memory_map:
+        texts.append(entry.description)
+        texts.extend(entry.details)
+        texts.extend(entry.end_comment)
+        for instruction in entry.instructions:
+            if instruction.mid_block_comment:
+                texts.extend(instruction.mid_block_comment)
+            if instruction.comment:
+                texts.append(instruction.comment.text)
+    return [t for t in texts if isinstance(t, str) and t]
+
+def _skool_files(options, tmpdir):
+    if options.skoolfiles:
+        for skoolfile in options.skoolfiles:
+            yield os.path.basename(skoolfile), skoolfile
+        return
+    examples = os.path.join(options.skoolkit_home or os.path.dirname(os.path.dirname(skoolkit.__file__)), 'examples')
+    sna2ctl, sna2skool = [os.path.join(os.path.dirname(os.path.dirname(skoolkit.__file__)), p) for p in ('sna2ctl.py', 'sna2skool.py')]
+    for ctlfile in sorted(glob.glob(os.path.join(examples, '*.ctl'))):
+        name = os.path.basename(ctlfile)[:-4]
+        snapshot = os.path.join(options.snapshot_dir or examples, name + '.z80')
+        if not os.path.isfile(snapshot):
+            print(f'{name:<20} skipped ({snapshot} not found)')
+            continue
+        skoolfile = os.path.join(tmpdir, name + '.skool')
+        with open(skoolfile, 'w') as f:
+            subprocess.run((sys.executable, sna2skool, '-c', ctlfile, snapshot), stdout=f, check=True)
+        yield name, skoolfile
+    ctlfile = os.path.join(tmpdir, 'rom.ctl')
+    with open(ctlfile, 'w') as f:
+        subprocess.run((sys.executable, sna2ctl, '-o', '0', ROM48), stdout=f, check=True)
+    skoolfile = os.path.join(tmpdir, 'rom.skool')
+    with open(skoolfile, 'w') as f:
+        subprocess.run((sys.executable, sna2skool, '-c', ctlfile, '-o', '0', ROM48), stdout=f, stderr=subprocess.DEVNULL, check=True)
+    yield '48.rom', skoolfile
+
+def _time(options, expand, texts):
+    timings = []
+    for i in range(options.runs):
+        start = time.perf_counter()
+        output = [expand(t) for t in texts]
+        timings.append(time.perf_counter() - start)
+    return min(timings), hashlib.md5('\n'.join(output).encode()).hexdigest()
+
+def run(options):
+    print('Using SkoolKit in {}'.format(os.path.dirname(os.path.dirname(skoolkit.__file__))))
+    total = 0
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cases = []
+        skoolfile = os.path.join(tmpdir, 'synthetic.skool')
+        with open(skoolfile, 'w') as f:
+            f.write(SKOOL)
+        html_writer, asm_writer, asm_parser = _get_writers(skoolfile)
+        for name, text in _synthetic_cases():
+            cases.append((name, html_writer, asm_writer, [text]))
+        for name, skoolfile in _skool_files(options, tmpdir):
+            html_writer, asm_writer, asm_parser = _get_writers(skoolfile)
+            cases.append((name, html_writer, asm_writer, _comments(asm_parser)))
+        for name, html_writer, asm_writer, texts in cases:
+            for wtype, expand in (('html', lambda t: html_writer.expand(t, '')), ('asm', asm_writer.expand)):
+                elapsed, md5sum = _time(options, expand, texts)
+                total += elapsed
+                print('{:<20} {:<4} {:8.4f}s  {}'.format(name, wtype, elapsed, md5sum))
+    print('{:<25} {:8.4f}s'.format('Total', total))
+
+parser = argparse.ArgumentParser(
+    usage="%(prog)s [options] [FILE.skool...]",
+    description="Time the expansion of skool macros by HtmlWriter and AsmWriter on synthetic\n"
+                "texts (long descriptions, #FOR-generated tables, #FOREACH lists and page\n"
+                "content), and on the comments in each skool file given, or (by default) in\n"
+                "the example disassemblies and a disassembly of the 48K ROM. Each example\n"
+                "requires a snapshot (e.g. hungry_horace.z80) in the examples directory or\n"
+                "the directory given by '-d'. Run this with '-s' pointing at two versions of\n"
+                "SkoolKit to compare timings and check that the output is identical.",
+    formatter_class=argparse.RawTextHelpFormatter,
+    add_help=False
+)
+parser.add_argument('skoolfiles', help=argparse.SUPPRESS, nargs='*')
+group = parser.add_argument_group('Options')
+group.add_argument('-d', dest='snapshot_dir', metavar='DIR',
+                   help='Look for snapshots of the example games in this directory.')
+group.add_argument('-n', dest='runs', metavar='N', type=int, default=3,
+                   help='Expand each text N times and show the shortest time (default: 3).')
+group.add_argument('-s', dest='skoolkit_home', metavar='DIR', default=SKOOLKIT_HOME,
+                   help='Use SkoolKit in this directory (default: $SKOOLKIT_HOME).')
+namespace, unknown_args = parser.parse_known_args()
+if unknown_args:
+    parser.exit(2, parser.format_help())
+if namespace.skoolkit_home:
+    if not os.path.isdir(namespace.skoolkit_home):
+        sys.stderr.write('{}: directory not found\n'.format(namespace.skoolkit_home))
+        sys.exit(1)
+    sys.path.insert(0, namespace.skoolkit_home)
+import skoolkit
+from skoolkit import ROM48, defaults
+from skoolkit.config import get_config
+from skoolkit.refparser import RefParser
+from skoolkit.skoolasm import AsmWriter
+from skoolkit.skoolhtml import FileInfo, HtmlWriter
+from skoolkit.skoolparser import SkoolParser
+run(namespace)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import random
+import sys
+import time
+
+SKOOLKIT_HOME = os.environ.get('SKOOLKIT_HOME')
+
+def _ram(rng, size):
+    return [rng.randrange(256) for i in range(size)]
+
+def _read_bytes(memory):
+    for a in range(0x4000, 0x10000):
+        memory[a]
+
+def _write_bytes(memory):
+    for a in range(0x4000, 0x10000):
+        memory[a] = a % 256
+
+def _read_screens(memory):
+    for i in range(50):
+        memory[16384:23296]
+
+def _read_across_pages(memory):
+    for i in range(50):
+        memory[0x7000:0x9000]
+
+def _write_slices(memory, data):
+    for a in range(0x4000, 0x10000, len(data)):
+        memory[a:a + len(data)] = data
+
+def _page(memory):
+    for i in range(20000):
+        memory.out7ffd(i % 8)
+
+def get_cases(rng):
+    ram48 = [0] * 16384 + _ram(rng, 49152)
+    ram128 = _ram(rng, 0x20000)
+    banks = [ram128[a:a + 0x4000] for a in range(0, 0x20000, 0x4000)]
+    data = _ram(rng, 768)
+    sna48 = Memory(ram48)
+    sna128 = Memory(ram128, page=0)
+    mem128 = PagingMemory(banks)
+    cases = [
+        ('sna-init-48k', lambda: Memory(ram48)),
+        ('sna-init-128k', lambda: Memory(ram128, page=0)),
+        ('sna-read', lambda: _read_bytes(sna48)),
+        ('sna-write', lambda: _write_bytes(sna48)),
+        ('sna-screen', lambda: _read_screens(sna48)),
+        ('sna-cross-page', lambda: _read_across_pages(sna48)),
+        ('sna-write-slices', lambda: _write_slices(sna48, data)),
+        ('sna-ram-48k', lambda: sna48.ram(None)),
+        ('sna-ram-128k', lambda: sna128.ram(-1)),
+        ('sim-init-128k', lambda: PagingMemory(banks)),
+        ('sim-read-128k', lambda: _read_bytes(mem128)),
+        ('sim-write-128k', lambda: _write_bytes(mem128)),
+        ('sim-page-128k', lambda: _page(mem128)),
+    ]
+    if CSimulator:
+        cases.extend((
+            ('csim-init-48k', lambda: CSimulator(ram48)),
+            ('csim-init-128k', lambda: CSimulator(PagingMemory(banks))),
+        ))
+    return cases
+
+def run(options):
+    print('Using SkoolKit in {}'.format(os.path.dirname(os.path.dirname(skoolkit.__file__))))
+    total = 0
+    for name, func in get_cases(random.Random(0)):
+        if options.cases and name not in options.cases:
+            continue
+        timings = []
+        for i in range(options.runs):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        elapsed = min(timings)
+        total += elapsed
+        print('{:<16} {:8.4f}s'.format(name, elapsed))
+    print('{:<16} {:8.4f}s'.format('Total', total))
+
+parser = argparse.ArgumentParser(
+    usage="%(prog)s [options] [CASE...]",
+    description="Time typical memory access patterns (byte reads and writes, screen and\n"
+                "cross-page slices, RAM extraction and 128K paging) on the memory\n"
+                "objects used by snapshot readers and writers and by the simulators.\n"
+                "Run this with '-s' pointing at two versions of SkoolKit to compare\n"
+                "timings.",
+    formatter_class=argparse.RawTextHelpFormatter,
+    add_help=False
+)
+parser.add_argument('cases', help=argparse.SUPPRESS, nargs='*')
+group = parser.add_argument_group('Options')
+group.add_argument('-n', dest='runs', metavar='N', type=int, default=5,
+                   help='Run each case N times and show the shortest time (default: 5).')
+group.add_argument('-s', dest='skoolkit_home', metavar='DIR', default=SKOOLKIT_HOME,
+                   help='Use SkoolKit in this directory (default: $SKOOLKIT_HOME).')
+namespace, unknown_args = parser.parse_known_args()
+if unknown_args:
+    parser.exit(2, parser.format_help())
+if namespace.skoolkit_home:
+    if not os.path.isdir(namespace.skoolkit_home):
+        sys.stderr.write('{}: directory not found\n'.format(namespace.skoolkit_home))
+        sys.exit(1)
+    sys.path.insert(0, namespace.skoolkit_home)
+import skoolkit
+from skoolkit import CSimulator
+from skoolkit.pagingtracer import Memory as PagingMemory
+from skoolkit.snapshot import Memory
+run(namespace)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import io
+import os
+import random
+import sys
+import time
+
+SKOOLKIT_HOME = os.environ.get('SKOOLKIT_HOME')
+
+def _udgs(rng, rows, cols, attrs, masked=False):
+    udgs = []
+    for r in range(rows):
+        row = []
+        for c in range(cols):
+            data = [rng.randrange(256) for i in range(8)]
+            if masked:
+                mask = [rng.randrange(256) for i in range(8)]
+            else:
+                mask = None
+            row.append(Udg(rng.choice(attrs), data, mask))
+        udgs.append(row)
+    return udgs
+
+def _screen(rng, attrs, scale=1, **kwargs):
+    return [Frame(_udgs(rng, 24, 32, attrs), scale, **kwargs)]
+
+def _animation(rng, attrs, count, rows, cols, scale, mask=0):
+    return [Frame(_udgs(rng, rows, cols, attrs, mask > 0), scale, mask, delay=10) for i in range(count)]
+
+def _sprite_animation(rng, attrs, count, scale):
+    background = _udgs(rng, 12, 16, attrs)
+    sprite = _udgs(rng, 2, 2, attrs)
+    frames = []
+    for i in range(count):
+        udgs = [row[:] for row in background]
+        x, y = i % 15, (i // 3) % 11
+        for r in range(2):
+            udgs[y + r][x:x + 2] = sprite[r]
+        frames.append(Frame(udgs, scale, delay=10))
+        frames.append(Frame(udgs, scale, delay=10))
+    return frames
+
+def get_corpus():
+    rng = random.Random(0)
+    bd1 = (56, 57)
+    bd2 = (56, 57, 58, 121)
+    bd4 = tuple(range(128))
+    flash = (56, 57, 184, 185)
+    return (
+        ('scr-bd1-x1', _screen(rng, bd1)),
+        ('scr-bd1-x2', _screen(rng, bd1, 2)),
+        ('scr-bd2-x1', _screen(rng, bd2)),
+        ('scr-bd4-x1', _screen(rng, bd4)),
+        ('scr-bd4-x2', _screen(rng, bd4, 2)),
+        ('scr-bd4-x3', _screen(rng, bd4, 3)),
+        ('scr-bd4-cropped', _screen(rng, bd4, 2, x=5, y=3, width=400, height=300)),
+        ('scr-flash', _screen(rng, flash, 2)),
+        ('udgarray-masked', _animation(rng, bd2, 1, 4, 4, 4, 1)),
+        ('anim-bd2-x2', _animation(rng, bd2, 16, 3, 3, 2)),
+        ('anim-bd4-x2', _animation(rng, bd4, 16, 3, 3, 2)),
+        ('anim-masked-x2', _animation(rng, bd2, 16, 3, 3, 2, 1)),
+        ('anim-sprite-x2', _sprite_animation(rng, bd4, 16, 2)),
+    )
+
+def run(options):
+    iw = ImageWriter()
+    print('Using SkoolKit in {}'.format(os.path.dirname(os.path.dirname(skoolkit.__file__))))
+    total = 0
+    for name, frames in get_corpus():
+        if options.cases and name not in options.cases:
+            continue
+        timings = []
+        for i in range(options.runs):
+            img_file = io.BytesIO()
+            start = time.perf_counter()
+            iw.write_image(frames, img_file)
+            timings.append(time.perf_counter() - start)
+        elapsed = min(timings)
+        total += elapsed
+        data = img_file.getvalue()
+        md5sum = hashlib.md5(data).hexdigest()
+        print('{:<16} {:8.4f}s {:8} bytes  {}'.format(name, elapsed, len(data), md5sum))
+    print('{:<16} {:8.4f}s'.format('Total', total))
+
+parser = argparse.ArgumentParser(
+    usage="%(prog)s [options] [CASE...]",
+    description="Time ImageWriter.write_image() on a corpus of frames (screenshots, masked\n"
+                "UDG arrays and animations), and show the size and MD5 sum of each image.\n"
+                "Run this with '-s' pointing at two versions of SkoolKit to compare\n"
+                "timings and check that the output is identical.",
+    formatter_class=argparse.RawTextHelpFormatter,
+    add_help=False
+)
+parser.add_argument('cases', help=argparse.SUPPRESS, nargs='*')
+group = parser.add_argument_group('Options')
+group.add_argument('-n', dest='runs', metavar='N', type=int, default=5,
+                   help='Write each image N times and show the shortest time (default: 5).')
+group.add_argument('-s', dest='skoolkit_home', metavar='DIR', default=SKOOLKIT_HOME,
+                   help='Use SkoolKit in this directory (default: $SKOOLKIT_HOME).')
+namespace, unknown_args = parser.parse_known_args()
+if unknown_args:
+    parser.exit(2, parser.format_help())
+if namespace.skoolkit_home:
+    if not os.path.isdir(namespace.skoolkit_home):
+        sys.stderr.write('{}: directory not found\n'.format(namespace.skoolkit_home))
+        sys.exit(1)
+    sys.path.insert(0, namespace.skoolkit_home)
+import skoolkit
+from skoolkit.graphics import Frame, Udg
+from skoolkit.image import ImageWriter
+run(namespace)
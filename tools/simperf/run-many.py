@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import time
+
+SKOOLKIT_HOME = os.environ.get('SKOOLKIT_HOME')
+
+START = 32768
+CODE = (
+    0x11, 0x00, 0x00,   # 32768 LD DE,0 (the outer loop counter)
+    0x06, 0x00,         # 32771 LD B,0
+    0x7E,               # 32773 LD A,(HL)
+    0x23,               # 32774 INC HL
+    0x10, 0xFC,         # 32775 DJNZ 32773
+    0x1B,               # 32777 DEC DE
+    0x7A,               # 32778 LD A,D
+    0xB3,               # 32779 OR E
+    0x20, 0xF5,         # 32780 JR NZ,32771
+)
+STOP = START + len(CODE)
+
+def _simulators(simulator_cls, count, iterations):
+    simulators = []
+    for i in range(count):
+        memory = [0] * 65536
+        memory[START:STOP] = CODE
+        memory[START + 1:START + 3] = (iterations % 256, iterations // 256)
+        simulators.append(simulator_cls(memory))
+    return simulators
+
+def run(options):
+    simulator_cls = Simulator if options.python else (CSimulator or Simulator)
+    print('Using SkoolKit in {}'.format(os.path.dirname(os.path.dirname(skoolkit.__file__))))
+    print(f'Simulator: {simulator_cls.__name__}')
+    print(f'CPUs: {os.cpu_count()}')
+    base = None
+    for jobs in range(1, options.jobs + 1):
+        timings = []
+        for i in range(options.runs):
+            simulators = _simulators(simulator_cls, options.simulators, options.iterations)
+            start = time.perf_counter()
+            states = run_many(simulators, START, STOP, jobs=jobs)
+            timings.append(time.perf_counter() - start)
+        elapsed = min(timings)
+        if base is None:
+            base = elapsed
+        tstates = sum(r[T] for r in states)
+        print(f'jobs={jobs:<3} {elapsed:8.4f}s  {tstates / elapsed / 1e6:10.1f}M T-states/s  x{base / elapsed:.2f}')
+
+parser = argparse.ArgumentParser(
+    usage="%(prog)s [options]",
+    description="Time simutils.run_many() on a batch of simulators, each running the same\n"
+                "loop, with 1, 2, ... N threads, and show the speedup relative to one\n"
+                "thread. CSimulator releases the GIL while running (when no port tracers\n"
+                "are set), so the speedup should approach the number of available CPUs.",
+    formatter_class=argparse.RawTextHelpFormatter,
+    add_help=False
+)
+group = parser.add_argument_group('Options')
+group.add_argument('-i', dest='iterations', metavar='N', type=int, default=4096,
+                   help='Run the outer loop N times in each simulator (default: 4096).')
+group.add_argument('-j', dest='jobs', metavar='N', type=int, default=os.cpu_count(),
+                   help='Time the batch with up to N threads (default: number of CPUs).')
+group.add_argument('-m', dest='simulators', metavar='N', type=int, default=16,
+                   help='Run N simulators in each batch (default: 16).')
+group.add_argument('-n', dest='runs', metavar='N', type=int, default=3,
+                   help='Run each batch N times and show the shortest time (default: 3).')
+group.add_argument('-p', dest='python', action='store_true',
+                   help='Use the Python Simulator instead of CSimulator.')
+group.add_argument('-s', dest='skoolkit_home', metavar='DIR', default=SKOOLKIT_HOME,
+                   help='Use SkoolKit in this directory (default: $SKOOLKIT_HOME).')
+namespace, unknown_args = parser.parse_known_args()
+if unknown_args or not 0 < namespace.iterations < 65536:
+    parser.exit(2, parser.format_help())
+if namespace.skoolkit_home:
+    if not os.path.isdir(namespace.skoolkit_home):
+        sys.stderr.write('{}: directory not found\n'.format(namespace.skoolkit_home))
+        sys.exit(1)
+    sys.path.insert(0, namespace.skoolkit_home)
+import skoolkit
+from skoolkit import CSimulator
+from skoolkit.simulator import Simulator
+from skoolkit.simutils import T, run_many
+run(namespace)
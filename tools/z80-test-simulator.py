@@ -42,6 +42,15 @@ class Tracer:
             elif pc == STOP:
                 break
 
+    def run_blocks(self, simulator):
+        registers = simulator.registers
+        rst16 = simulator.opcodes[0xD7]
+        def rst16_cb():
+            self.rst16_cb(registers[0])
+            rst16()
+        simulator.opcodes[0xD7] = rst16_cb
+        simulator.run(stop=STOP)
+
     def read_port(self, registers, port):
         if port % 256 == 0xFE:
             return 0xBF
@@ -83,6 +92,9 @@ def run(tapfile, options):
     if options.ccmio and CCMIOSimulator is None:
         sys.stderr.write('ERROR: CCMIOSimulator is not available\n')
         sys.exit(1)
+    if options.blocks and (options.csim or options.ccmio or options.cmio):
+        sys.stderr.write('ERROR: --blocks can be used only with --sim\n')
+        sys.exit(1)
     start, snapshot = load_tap(tapfile)
     print()
     snapshot[23692] = 255 # Inhibit 'scroll?' prompt
@@ -101,12 +113,14 @@ def run(tapfile, options):
         simulator_cls = CCMIOSimulator if options.ccmio else CSimulator
     else:
         simulator_cls = CMIOSimulator if options.cmio else Simulator
-    simulator = simulator_cls(snapshot, {'PC': start})
+    simulator = simulator_cls(snapshot, {'PC': start}, config={'block_cache': options.blocks})
     tracer = Tracer()
     simulator.set_tracer(tracer)
     begin = time.time()
     if c:
         simulator.exec_with_cb(STOP, tracer.rst16_cb)
+    elif options.blocks:
+        tracer.run_blocks(simulator)
     else:
         tracer.run(simulator)
     rt = time.time() - begin
@@ -126,6 +140,8 @@ if __name__ == '__main__':
     )
     parser.add_argument('tapfile', help=argparse.SUPPRESS, nargs='?')
     group = parser.add_argument_group('Options')
+    group.add_argument('--blocks', action='store_true',
+                       help="Run tests with the Simulator block cache enabled.")
     group.add_argument('--ccmio', action='store_true',
                        help="Run tests with CCMIOSimulator.")
     group.add_argument('--cmio', action='store_true',